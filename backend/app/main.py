@@ -1,10 +1,66 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import chat, survey, recommend, policy, claim, form, admin, stt
-from fastapi.staticfiles import StaticFiles
+from .routes import chat, survey, recommend, policy, claim, form, admin, stt, audio
+from .services import http_client
+from .services.tts import run_audio_janitor, shutdown_tts_pool, warm_tts_pool
+from .services.sessions import run_session_janitor
+from .services.pdf_parser import shutdown_pdf_pool
+from .services.analytics import run_analytics
+from .services.policy_jobs import run_policy_workers
+from .services.admission import AdmissionMiddleware
+from .services.tracing import (TracingMiddleware, TRACING_ENABLED, install_log_context, loop_monitor,
+                               run_trace_exporter)
 import os
+import asyncio
+import logging
+
+# Every record carries the request's trace id (see services/tracing.py)
+install_log_context()
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s [trace=%(trace_id)s] %(message)s",
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled Groq client for the whole process (LLM + STT share keep-alive connections)
+    await http_client.init_http_client()
+    # Spawns the TTS engine's worker threads now, so the first synthesis does not pay for them
+    await warm_tts_pool()
+    background = [
+        # Keeps app/audio within TTS_CACHE_MAX_BYTES / TTS_CACHE_MAX_AGE_DAYS
+        asyncio.create_task(run_audio_janitor()),
+        # Drops idle chat sessions from memory (they stay in the session backend)
+        asyncio.create_task(run_session_janitor()),
+        # Folds recorded usage events into /admin/stats aggregates and snapshots them to disk
+        asyncio.create_task(run_analytics()),
+        # Bounded worker pool for /policy/simplify and /policy/jobs (resumes queued jobs)
+        asyncio.create_task(run_policy_workers()),
+        # Reports event-loop stalls (something blocking the loop) in /admin/tracing and the logs
+        asyncio.create_task(loop_monitor.run()),
+    ]
+    if TRACING_ENABLED:
+        # Appends sampled request traces to the Chrome trace-event file
+        background.append(asyncio.create_task(run_trace_exporter()))
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        # let cancelled tasks finish their cleanup (e.g. the final analytics snapshot)
+        await asyncio.gather(*background, return_exceptions=True)
+        shutdown_pdf_pool()
+        shutdown_tts_pool()
+        await http_client.close_http_client()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
+
+# Concurrency limits, priority queues and upload caps for the expensive endpoints
+# (services/admission.py). Added before CORS so shed responses still carry CORS headers.
+app.add_middleware(AdmissionMiddleware)
 
 # Enable CORS for the frontend (Vite dev server)
 origins = [
@@ -18,8 +74,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
+# Outermost, so a request's trace covers CORS, admission queueing and the response body
+if TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(chat.router)
 app.include_router(survey.router)
@@ -29,11 +90,9 @@ app.include_router(claim.router)
 app.include_router(form.router)
 app.include_router(admin.router)
 app.include_router(stt.router)
-
-# Serve generated audio files at /audio
-audio_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "audio"))
-os.makedirs(audio_dir, exist_ok=True)
-app.mount("/audio", StaticFiles(directory=audio_dir), name="audio")
+# Generated audio at /audio/ab/cd/<sha256>.mp3 (see services/tts.py); files that were
+# handed out lazily are synthesized on first request
+app.include_router(audio.router)
 
 
 @app.get("/")
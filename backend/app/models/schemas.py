@@ -6,13 +6,17 @@ class ChatRequest(BaseModel):
     message: str
     language: str  # 'en' or 'hi'
     context: Optional[Any] = None
+    policy_id: Optional[str] = None  # from /policy/simplify; grounds answers in that policy
+    tts: Optional[str] = None  # 'lazy' (default), 'on_demand', 'wait' or 'off'; see services/tts.py
 
 class ChatResponse(BaseModel):
     session_id: str
     response: str
     language: str
     tts_audio: Optional[str] = None  # base64 or URL to audio file
+    tts_ready: bool = False  # False: the URL works but may block until synthesized (see /tts/status)
     context: Optional[Any] = None
+    cached: bool = False  # answered from the FAQ cache (services/faq_cache.py) without calling Groq
 
 
 class RecommendRequest(BaseModel):
@@ -25,6 +29,11 @@ class Plan(BaseModel):
     name: str
     reason: Optional[str] = None
     estimated_premium: Optional[float] = None
+    # LLM refinement (/recommend only)
+    refined_explanation: Optional[str] = None
+    trust_score: Optional[float] = None
+    trust_reason: Optional[str] = None
+    hindi_explanation: Optional[str] = None
 
 
 class RecommendResponse(BaseModel):
@@ -32,6 +41,7 @@ class RecommendResponse(BaseModel):
     trust_score: float
     total_premium: float
     explanation: Optional[str] = None
+    enhancement: Optional[str] = None  # "llm", "cache", "heuristic" or None when not requested
 
 
 class FormRequest(BaseModel):
@@ -49,4 +59,5 @@ class FormAssistResponse(BaseModel):
     aadhaar_valid: bool
     aadhaar_suggestion: Optional[str] = None
     hints: list[str]
-    cleaned: dict
\ No newline at end of file
+    cleaned: dict
+    invalid_fields: dict = {}  # field -> reason, for values present but not valid
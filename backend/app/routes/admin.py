@@ -1,7 +1,38 @@
-from fastapi import APIRouter
+import os
+import hmac
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from ..services.http_client import pool_stats
+from ..services.result_cache import policy_cache
+from ..services.tts import tts_cache_info
+from ..services.sessions import session_store
+from ..services.llm_cache import completion_cache
+from ..services.analytics import analytics
+from ..services.policy_jobs import policy_jobs
+from ..services.stt import stt_info, stt_policy
+from ..services.llm import llm_policy
+from ..services.admission import admission
+from ..services.recommend_enhancer import enhancer
+from ..services.faq_cache import faq_cache
+from ..services.catalogs import catalogs
+from ..services.tracing import tracer, loop_monitor, chrome_events, sample_stacks, ProfilerBusy, PROFILE_MAX_SECONDS
 
 router = APIRouter()
 
+# Routes that change server state (or start the profiler) need X-Admin-Token to match this; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Reject the request unless it carries the configured admin token (fails closed when unset)."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin actions are disabled (ADMIN_TOKEN is not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
 
 @router.get("/admin")
 def get_admin():
@@ -9,22 +40,180 @@ def get_admin():
 
 
 @router.get("/admin/stats")
-def admin_stats():
-    """Return static admin statistics for now."""
-    data = {
-        "total_chats": 1245,
-        "total_surveys": 312,
-        "top_queries": [
-            "How to file a claim?",
-            "What does my policy cover?",
-            "How to renew my policy?",
-            "Documents required for claim"
-        ],
-        "recommendation_counts": {
-            "crop": 420,
-            "health": 310,
-            "life": 150,
-            "micro": 95
-        }
-    }
-    return data
\ No newline at end of file
+def admin_stats(top: int = 10):
+    """Usage counters and top chat queries, all-time and over the last hour / day.
+
+    Events are recorded by /chat, /survey, /recommend, /policy/simplify and /claim/guide
+    and survive restarts via periodic snapshots (services/analytics.py).
+    """
+    return analytics.report(k=max(1, min(top, 100)))
+
+
+@router.get("/admin/http-pool")
+def admin_http_pool():
+    """Connection pool usage of the shared Groq HTTP client."""
+    return pool_stats()
+
+
+@router.get("/admin/policy-cache")
+async def admin_policy_cache():
+    """Hit/miss counters and size of the /policy/simplify result cache."""
+    return await policy_cache.stats()
+
+
+@router.get("/admin/tts-cache")
+def admin_tts_cache():
+    """Hit/miss/coalesce counters and janitor evictions of the TTS audio cache."""
+    return tts_cache_info()
+
+
+@router.get("/admin/sessions")
+def admin_sessions():
+    """Active chat sessions, their memory footprint and eviction counters."""
+    return session_store.stats()
+
+
+@router.get("/admin/llm-cache")
+def admin_llm_cache():
+    """Upstream Groq calls and tokens saved by single-flight coalescing and the response cache."""
+    return completion_cache.info()
+
+
+@router.get("/admin/jobs")
+async def admin_jobs():
+    """Policy job queue depth, worker count and recent per-stage durations."""
+    return await policy_jobs.stats()
+
+
+@router.get("/admin/stt")
+def admin_stt():
+    """STT requests, segments uploaded and bytes saved by local compaction."""
+    return stt_info()
+
+
+@router.get("/admin/upstream")
+def admin_upstream():
+    """Groq call resilience: retries, hedges, fallbacks, breaker state and latency quantiles."""
+    return {"llm": llm_policy.info(), "stt": stt_policy.info()}
+
+
+@router.get("/admin/admission")
+def admin_admission():
+    """Admission control per endpoint class: active, queued, admitted, rejections and queue wait."""
+    return admission.info()
+
+
+@router.get("/admin/recommend-enhance")
+def admin_recommend_enhance():
+    """/recommend LLM refinement: Groq calls per request, batch sizes, cache hits, fallbacks, added latency."""
+    return enhancer.info()
+
+
+class FAQEntry(BaseModel):
+    question: str
+    answer: str
+    language: str = "en"
+
+
+@router.get("/admin/faq")
+def admin_faq(top: int = 20):
+    """FAQ answer cache: hit rate, lookup latency, size and the most-hit entries."""
+    return {**faq_cache.info(), "top": faq_cache.entries(max(1, min(top, 200)))}
+
+
+async def _save_faq_pins() -> None:
+    await asyncio.to_thread(faq_cache.save_pinned, faq_cache.pinned_data())
+
+
+@router.post("/admin/faq", dependencies=[Depends(require_admin)])
+async def admin_faq_add(entry: FAQEntry):
+    """Add (or replace the answer of) a pinned entry; pinned entries never expire or get evicted."""
+    if entry.language not in ("en", "hi"):
+        raise HTTPException(status_code=400, detail="Unsupported language")
+    entry_id = faq_cache.add(entry.question, entry.language, entry.answer, pinned=True)
+    if entry_id is None:
+        raise HTTPException(status_code=400, detail="Question is too short to match on, or the cache is full of pinned entries")
+    await _save_faq_pins()
+    return {"id": entry_id}
+
+
+@router.post("/admin/faq/{entry_id}/pin", dependencies=[Depends(require_admin)])
+async def admin_faq_pin(entry_id: int, pinned: Optional[bool] = True):
+    """Pin (or with ?pinned=false unpin) a cached entry."""
+    if not faq_cache.pin(entry_id, bool(pinned)):
+        raise HTTPException(status_code=404, detail="Unknown FAQ entry")
+    await _save_faq_pins()
+    return {"id": entry_id, "pinned": bool(pinned)}
+
+
+@router.delete("/admin/faq/{entry_id}", dependencies=[Depends(require_admin)])
+async def admin_faq_evict(entry_id: int):
+    """Drop one entry, pinned or not."""
+    if not faq_cache.evict(entry_id):
+        raise HTTPException(status_code=404, detail="Unknown FAQ entry")
+    await _save_faq_pins()
+    return {"evicted": 1}
+
+
+@router.delete("/admin/faq", dependencies=[Depends(require_admin)])
+async def admin_faq_clear(include_pinned: bool = False):
+    """Drop all unpinned entries (and pinned ones with ?include_pinned=true)."""
+    evicted = faq_cache.clear(include_pinned)
+    if include_pinned:
+        await _save_faq_pins()
+    return {"evicted": evicted}
+
+
+@router.get("/admin/tracing")
+def admin_tracing():
+    """Trace sampling and export counters, plus event-loop lag."""
+    return {"tracing": tracer.info(), "event_loop": loop_monitor.info()}
+
+
+@router.post("/admin/tracing", dependencies=[Depends(require_admin)])
+def admin_tracing_sample_rate(sample_rate: float):
+    """Change the fraction of requests traced (0 records no spans; trace ids are still assigned)."""
+    if not 0 <= sample_rate <= 1:
+        raise HTTPException(status_code=400, detail="sample_rate must be between 0 and 1")
+    tracer.sample_rate = sample_rate
+    return tracer.info()
+
+
+@router.get("/admin/traces")
+def admin_traces(limit: int = 20):
+    """The most recent sampled traces with their duration and slowest spans."""
+    return tracer.recent(max(1, min(limit, 200)))
+
+
+@router.get("/admin/traces/{trace_id}")
+def admin_trace(trace_id: str):
+    """One recent trace as Chrome trace events (save as .json and open in Perfetto)."""
+    trace = tracer.find(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (not sampled, or no longer recent)")
+    return {"traceEvents": chrome_events(trace), "displayTimeUnit": "ms"}
+
+
+@router.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def admin_profile(seconds: float = 10, interval_ms: float = 5, idle: bool = False):
+    """Sample all threads' stacks for `seconds`; returns collapsed stacks for flamegraph.pl / speedscope."""
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS:g}]")
+    try:
+        profile = await asyncio.to_thread(sample_stacks, seconds, max(1.0, interval_ms) / 1000, idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(profile["collapsed"] + "\n", headers={
+        "X-Profile-Samples": str(profile["samples"]), "X-Profile-Interval-Ms": str(profile["interval_ms"])})
+
+
+@router.get("/admin/catalogs")
+def admin_catalogs():
+    """Static catalogs: version, variants, raw vs gzip size, 304s and bytes sent."""
+    return catalogs.info()
+
+
+@router.post("/admin/catalogs/reload", dependencies=[Depends(require_admin)])
+async def admin_catalogs_reload():
+    """Re-read the catalog files after deploying a new version (new ETags; clients revalidate)."""
+    return await asyncio.to_thread(catalogs.reload)
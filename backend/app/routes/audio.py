@@ -0,0 +1,45 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
+from ..services.tts import TTSError, is_audio_key, audio_path_for_key, synthesize_key, tts_status
+import os
+
+router = APIRouter()
+
+# Audio is content-addressed, so a URL's bytes never change
+_AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/audio/{shard1}/{shard2}/{name}")
+async def get_audio(shard1: str, shard2: str, name: str, wait: bool = True):
+    """
+    Serve /audio/ab/cd/<key>.mp3, synthesizing it on first request if /chat or
+    /policy/simplify handed out the URL before the audio existed. Concurrent requests
+    for the same file share one synthesis. With wait=false a missing file answers
+    202 + Retry-After instead of blocking.
+    """
+    key = name[:-4] if name.endswith(".mp3") else ""
+    if not is_audio_key(key) or (shard1, shard2) != (key[:2], key[2:4]):
+        raise HTTPException(status_code=404, detail="Not Found")
+    path = audio_path_for_key(key)
+    if not os.path.exists(path):
+        if not wait:
+            status = tts_status(key)
+            if not status["known"]:
+                raise HTTPException(status_code=404, detail="Not Found")
+            return JSONResponse(status, status_code=202, headers={"Retry-After": "1"})
+        try:
+            path = await synthesize_key(key)
+        except TTSError:
+            raise HTTPException(status_code=503, detail="Speech synthesis failed; please retry.",
+                                headers={"Retry-After": "5"})
+        if path is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+    return FileResponse(path, media_type="audio/mpeg", headers={"Cache-Control": _AUDIO_CACHE_CONTROL})
+
+
+@router.get("/tts/status/{key}")
+def get_tts_status(key: str):
+    """Whether the audio for a key is ready ({key, url, ready, known, synthesizing})."""
+    if not is_audio_key(key):
+        raise HTTPException(status_code=404, detail="Unknown audio key")
+    return tts_status(key)
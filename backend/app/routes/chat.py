@@ -1,44 +1,219 @@
 from fastapi import APIRouter
 from fastapi import HTTPException
 from fastapi import status
+from fastapi.responses import StreamingResponse
 from ..models.schemas import ChatRequest, ChatResponse
-from ..services.llm import generate_chat_response
-from ..services.tts import synthesize_tts
+from ..services.llm import generate_chat_response, stream_chat_response, FALLBACK_RESPONSE
+from ..services.tts import synthesize_tts, audio_path_to_url, prepare_tts, TTS_MODES
+from ..services.sessions import session_store
+from ..services.retrieval import retrieve, is_policy_id
+from ..services.analytics import analytics
+from ..services.resilience import deadline
+from ..services.faq_cache import faq_cache, FAQ_CACHE_ENABLED
+from ..services.tracing import annotate
 import os
+import re
+import json
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# End of a sentence: terminal punctuation (incl. Devanagari danda) followed by whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?\u0964])\s+")
 
 router = APIRouter()
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
-    if request.language not in ("en", "hi"):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported language")
+# Time /chat may spend waiting on Groq, and /chat/stream on its first token
+CHAT_DEADLINE_S = float(os.getenv("CHAT_DEADLINE_S", "15"))
 
-    # Generate chat response using LLM
-    # our LLM helper expects (message, context). Pass session and language inside context.
-    llm_context = {
+
+async def _build_llm_context(request: ChatRequest, session) -> dict:
+    """LLM context for a chat turn: policy excerpts (if a policy_id is given) + session history."""
+    messages = []
+    if request.policy_id:
+        if not is_policy_id(request.policy_id):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid policy_id")
+        passages = await retrieve(request.policy_id, request.message)
+        if passages is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown policy_id. Upload the policy via /policy/simplify first.")
+        excerpts = "\n\n".join(f"[page {p['page']}] {p['text']}" for p in passages) or "(no matching text found)"
+        messages.append({
+            "role": "system",
+            "content": "Relevant excerpts from the user's policy document. Answer from these excerpts only; "
+                       "if they do not answer the question, say the policy text does not mention it.\n\n" + excerpts,
+        })
+    messages.extend(session_store.history(session))
+    return {
         "session_id": request.session_id,
         "language": request.language,
         "conversation": request.context,
+        "messages": messages,
     }
-    response_text = await generate_chat_response(request.message, context=llm_context)
 
-    # Synthesize TTS audio
-    tts_audio_path = await synthesize_tts(response_text, request.language)
+def _faq_eligible(request: ChatRequest, session) -> bool:
+    # only standalone questions: no policy excerpts and no earlier turns shaping the answer
+    return FAQ_CACHE_ENABLED and not request.policy_id and not session.turns and not session.summary
 
-    # convert absolute file path to a URL under /audio if synthesis succeeded
-    if tts_audio_path != "tts_error":
-        audio_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "audio"))
-        try:
-            tts_audio_url = tts_audio_path.replace(audio_dir, "/audio").replace("\\", "/")
-        except Exception:
-            tts_audio_url = tts_audio_path
+
+def _faq_store(request: ChatRequest, response_text: str, outcome: dict) -> None:
+    # only whole answers from the primary model: a truncated stream or a fallback-model
+    # answer would otherwise be served to every matching question until it expires
+    if not outcome.get("complete") or outcome.get("fallback_model"):
+        return
+    if response_text and response_text != FALLBACK_RESPONSE:
+        faq_cache.add(request.message, request.language, response_text)
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest):
+    if request.language not in ("en", "hi"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported language")
+    if request.tts is not None and request.tts not in TTS_MODES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"tts must be one of {', '.join(TTS_MODES)}")
+    analytics.record("chat", request.language, query=request.message)
+
+    # Generate chat response using LLM
+    # our LLM helper expects (message, context). Pass session and language inside context.
+    # History comes from the server-side session store, windowed to a fixed token budget.
+    session = await session_store.get(request.session_id)
+    faq = _faq_eligible(request, session)
+    hit = faq_cache.lookup(request.message, request.language) if faq else None
+    annotate(faq_hit=hit is not None)
+    if hit:
+        response_text = hit["answer"]
     else:
-        tts_audio_url = "tts_error"
+        llm_context = await _build_llm_context(request, session)
+        outcome = {}
+        with deadline(CHAT_DEADLINE_S):
+            response_text = await generate_chat_response(request.message, context=llm_context, outcome=outcome)
+        if faq:
+            _faq_store(request, response_text, outcome)
+    await session_store.append(session, request.message, response_text)
+
+    # TTS audio: by default the URL is returned right away and synthesized in the
+    # background (or on first GET), so the reply does not wait on speech synthesis
+    tts_audio_url, tts_ready = await prepare_tts(response_text, request.language, request.tts)
 
     return ChatResponse(
         session_id=request.session_id,
         response=response_text,
         language=request.language,
         tts_audio=tts_audio_url,
-        context=request.context
-    )
\ No newline at end of file
+        tts_ready=tts_ready,
+        context=request.context,
+        cached=hit is not None,
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Server-Sent Events variant of /chat.
+
+    Events: `token` ({text}) for each streamed delta, `audio` ({index, text, url}) as
+    each sentence's TTS finishes (possibly out of order; play by index), and a final
+    `done` with the full response, ordered audio URLs and timings (ttft_ms, ttfa_ms).
+    With tts=off no sentences are synthesized and no `audio` events are sent. Answers
+    from the FAQ cache arrive the same way, as one `token` per sentence.
+    """
+    if request.language not in ("en", "hi"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported language")
+    if request.tts is not None and request.tts not in TTS_MODES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"tts must be one of {', '.join(TTS_MODES)}")
+    speak_sentences = request.tts != "off"
+    analytics.record("chat", request.language, "stream", query=request.message)
+
+    session = await session_store.get(request.session_id)
+    faq = _faq_eligible(request, session)
+    hit = faq_cache.lookup(request.message, request.language) if faq else None
+    llm_context = None if hit else await _build_llm_context(request, session)
+    # filled in by stream_chat_response: did the stream finish, and from which model
+    outcome = {}
+
+    async def cached_answer():
+        for sentence in _SENTENCE_END.split(hit["answer"]):
+            yield sentence + " "
+
+    async def events():
+        started = time.perf_counter()
+        queue: asyncio.Queue = asyncio.Queue()
+        tts_tasks = []
+        audio_urls = []
+        parts = []
+        timings = {"ttft_ms": None, "ttfa_ms": None}
+
+        async def speak(index: int, sentence: str):
+            url = audio_path_to_url(await synthesize_tts(sentence, request.language))
+            audio_urls[index] = url
+            if timings["ttfa_ms"] is None and url != "tts_error":
+                timings["ttfa_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            await queue.put(("audio", {"index": index, "text": sentence, "url": url}))
+
+        def start_tts(sentence: str):
+            if not speak_sentences:
+                return
+            audio_urls.append(None)
+            tts_tasks.append(asyncio.create_task(speak(len(audio_urls) - 1, sentence)))
+
+        async def produce():
+            pending = ""
+            try:
+                deltas = cached_answer() if hit else stream_chat_response(request.message, context=llm_context,
+                                                                          outcome=outcome)
+                async for delta in deltas:
+                    if timings["ttft_ms"] is None:
+                        timings["ttft_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                    parts.append(delta)
+                    await queue.put(("token", {"text": delta}))
+                    # synthesize each sentence as soon as it is complete
+                    pending += delta
+                    *sentences, pending = _SENTENCE_END.split(pending)
+                    for sentence in sentences:
+                        if sentence.strip():
+                            start_tts(sentence.strip())
+                if pending.strip():
+                    start_tts(pending.strip())
+                await asyncio.gather(*tts_tasks)
+            finally:
+                await queue.put(None)
+
+        # the task copies the current context, deadline included
+        with deadline(CHAT_DEADLINE_S):
+            producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield _sse(*item)
+            timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            logger.info("chat stream timings: %s", timings)
+            response_text = "".join(parts).strip()
+            if faq and not hit:
+                _faq_store(request, response_text, outcome)
+            await session_store.append(session, request.message, response_text)
+            yield _sse("done", {
+                "session_id": request.session_id,
+                "response": response_text,
+                "language": request.language,
+                "tts_audio": audio_urls,
+                "timings": timings,
+                "cached": hit is not None,
+            })
+        finally:
+            # client went away: stop reading from Groq and drop pending synthesis
+            producer.cancel()
+            for task in tts_tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
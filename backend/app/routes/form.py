@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
 from ..models.schemas import FormRequest, FormAssistResponse
-import re
+from ..services.form_validation import REQUIRED_FIELDS, assist_one, bulk_ndjson
+from ..utils.records import detect_format, iter_record_batches
 
 router = APIRouter()
 
@@ -12,43 +16,34 @@ def get_form():
 
 @router.post("/form/assist", response_model=FormAssistResponse)
 async def assist_form(data: FormRequest):
-    """Validate required fields and provide Aadhaar correction suggestion and hints."""
-    required = ["name", "aadhaar", "address", "phone", "age"]
-    missing = []
-    cleaned = {}
-    # collect cleaned values
-    for field in required:
-        value = getattr(data, field, None)
-        if value is None or (isinstance(value, str) and not value.strip()):
-            missing.append(field)
-        else:
-            cleaned[field] = value
-
-    # Aadhaar validation: should be 12 digits. Accept spaces or dashes, but suggest cleaned version.
-    aad = (data.aadhaar or "")
-    aad_digits = re.sub(r"\D", "", aad)
-    aad_valid = len(aad_digits) == 12
-    aad_suggestion = None
-    if aad and not aad_valid:
-        if len(aad_digits) < 12:
-            aad_suggestion = f"Aadhaar looks short. After removing non-digits we got '{aad_digits}'. Aadhaar must be 12 digits."
-        elif len(aad_digits) > 12:
-            aad_suggestion = f"Aadhaar looks long. After removing non-digits we got '{aad_digits}'. Aadhaar must be 12 digits — please verify."
-        else:
-            aad_suggestion = f"Please provide a 12-digit Aadhaar number. Cleaned value: '{aad_digits}'."
-    elif aad and aad_valid:
-        # format suggestion: grouped by 4 for readability
-        formatted = " ".join([aad_digits[i:i+4] for i in range(0, 12, 4)])
-        aad_suggestion = formatted
-        cleaned["aadhaar"] = aad_digits
-
-    # LLM hint (static for now)
-    hints = ["Fill Aadhaar exactly as shown on card."]
-
-    return FormAssistResponse(
-        missing_fields=missing,
-        aadhaar_valid=aad_valid,
-        aadhaar_suggestion=aad_suggestion,
-        hints=hints,
-        cleaned=cleaned
-    )
\ No newline at end of file
+    """Validate required fields and provide Aadhaar correction suggestion and hints.
+
+    Aadhaar must be 12 digits, not start with 0/1 and pass the Verhoeff checksum; phone
+    is normalized to a 10-digit mobile number and age to whole years. Values that are
+    present but invalid are listed in invalid_fields. This is a one-row call into the
+    same validator as /form/assist/bulk, so results are identical.
+    """
+    record = {field: getattr(data, field, None) for field in REQUIRED_FIELDS}
+    return FormAssistResponse(**assist_one(record))
+
+
+@router.post("/form/assist/bulk")
+async def assist_form_bulk(file: UploadFile = File(...), format: Optional[str] = None):
+    """Validate digitized enrollment forms (CSV with a header row, or JSONL).
+
+    Columns/keys: name, aadhaar, address, phone, age. Results stream back as NDJSON,
+    one line per input row in input order: {"row", ...the /form/assist fields}, or
+    {"row", "error"} for rows that cannot be parsed. The upload is read and answered
+    batch by batch, so memory stays flat regardless of file size.
+    """
+    try:
+        fmt = detect_format(file.filename, file.content_type, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def results():
+        async for batch in iter_record_batches(file, fmt):
+            # CPU work; keep it off the event loop
+            yield await asyncio.to_thread(bulk_ndjson, batch)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
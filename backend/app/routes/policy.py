@@ -1,39 +1,147 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 import os
-from ..services.pdf_parser import extract_text_from_pdf
-from ..services.llm import summarize_policy
-from ..services.tts import synthesize_tts
+import json
+from typing import Optional
+from ..services.pdf_parser import spool_upload, PDFLimitError
+from ..services.policy_jobs import policy_jobs, JOBS_SPOOL_DIR, JOB_POLL_INTERVAL, FINISHED, QueueFullError
+from ..services.tts import TTS_MODES, TTS_DEFAULT_MODE
+from ..services.tracing import annotate
 
 router = APIRouter()
 
-@router.post("/policy/simplify")
-async def simplify_policy(pdf: UploadFile = File(...)):
-    # 1. Accept PDF UploadFile
+# Seconds between SSE keep-alive comments while a job is idle in the queue
+_KEEPALIVE_S = 15
+
+
+async def _submit(pdf: UploadFile) -> str:
+    """Spool the upload next to the job queue and enqueue it. Returns the job id."""
+    # 1. Accept PDF UploadFile (spooled to disk and hashed in chunks, never fully in memory)
     if not pdf.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported.")
-    file_bytes = await pdf.read()
+    try:
+        pdf_path, pdf_hash, _ = await spool_upload(pdf, dir=JOBS_SPOOL_DIR)
+    except PDFLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        job_id, created = await policy_jobs.create(pdf_hash, pdf_path)
+    except QueueFullError:
+        os.remove(pdf_path)
+        raise HTTPException(status_code=503, detail="Too many policies are being processed; please retry shortly.",
+                            headers={"Retry-After": "30"})
+    if not created:
+        # the same PDF is already queued or running; follow that job instead
+        os.remove(pdf_path)
+    annotate(job_id=job_id, job_created=created)
+    return job_id
 
-    # 2. Extract text from PDF
-    text = await extract_text_from_pdf(file_bytes)
-    if not text.strip():
-        raise HTTPException(status_code=400, detail="Could not extract text from PDF.")
 
-    # 3. Summarize policy
-    summary_result = await summarize_policy(text)
-    summary = summary_result.get("summary", "")
-    explanation = summary_result.get("eli5", "")
-
-    # 4. Generate TTS audio for explanation
-    tts_audio_path = await synthesize_tts(explanation, lang="en")
-    # Optionally, convert file path to URL if serving statically
-    tts_audio_url = tts_audio_path.replace(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "audio")), "/audio").replace("\\", "/") if tts_audio_path != "tts_error" else "tts_error"
+@router.post("/policy/simplify")
+async def simplify_policy(pdf: UploadFile = File(...), tts: Optional[str] = None):
+    """
+    Upload a policy PDF and wait for the result: {policy_id, summary, exclusions[],
+    explanation, tts_audio_url, tts_ready}.
 
-    # 5. Return summary, exclusions[], explanation, tts_audio_url
-    # Exclusions extraction is not implemented, so return empty list for now
+    Runs as a job on the policy worker pool (see /policy/jobs). If the connection drops,
+    the job still completes and a retry of the same PDF picks up the running job or
+    the cached result. Unless tts=wait, the response is sent as soon as the text is
+    ready; tts_audio_url then works immediately but may block until the audio exists
+    (tts_ready / GET /tts/status/{key}). tts=off omits the audio URL.
+    """
+    mode = tts or TTS_DEFAULT_MODE
+    if mode not in TTS_MODES:
+        raise HTTPException(status_code=400, detail=f"tts must be one of {', '.join(TTS_MODES)}")
+    job_id = await _submit(pdf)
+    job = await policy_jobs.wait_finished(job_id, result_key=None if mode == "wait" else "tts_audio_url")
+    if job is None:
+        raise HTTPException(status_code=500, detail="Job disappeared.")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=job["error"]["status_code"], detail=job["error"]["detail"])
+    # 5. Return policy_id, summary, exclusions[], explanation, tts_audio_url
+    result = job["result"]
+    if "exclusions" not in result:
+        # computed alongside the summary; only missing if that side task is still finishing.
+        # The job may have been purged meanwhile: answer with what we already have
+        later = await policy_jobs.wait_finished(job_id, result_key="exclusions")
+        if later is not None and later.get("result"):
+            result = later["result"]
     return JSONResponse({
-        "summary": summary,
-        "exclusions": [],
-        "explanation": explanation,
-        "tts_audio_url": tts_audio_url
-    })
\ No newline at end of file
+        "policy_id": result["policy_id"],
+        "summary": result["summary"],
+        "exclusions": result.get("exclusions", []),
+        "explanation": result["explanation"],
+        "tts_audio_url": None if mode == "off" else result.get("tts_audio_url"),
+        "tts_ready": mode != "off" and bool(result.get("tts_ready")),
+    })
+
+
+@router.post("/policy/jobs", status_code=202)
+async def create_policy_job(request: Request, pdf: UploadFile = File(...)):
+    """
+    Queue a policy PDF for simplification and return immediately with the job id.
+
+    Stages run in order: extract -> summarize -> eli5 -> tts. Poll status_url or
+    subscribe to events_url (SSE) for per-stage progress and partial results.
+    """
+    job_id = await _submit(pdf)
+    job = await policy_jobs.get(job_id)
+    return {
+        "job_id": job_id,
+        "status": job["status"] if job else "queued",
+        "status_url": str(request.url_for("get_policy_job", job_id=job_id)),
+        "events_url": str(request.url_for("policy_job_events", job_id=job_id)),
+    }
+
+
+async def _get_job(job_id: str) -> dict:
+    job = await policy_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job_id.")
+    return job
+
+
+@router.get("/policy/jobs/{job_id}")
+async def get_policy_job(job_id: str):
+    """Current state of a job: status, per-stage progress, partial or final result, error."""
+    return await _get_job(job_id)
+
+
+def _sse(event: str, data: dict, event_id: int) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.get("/policy/jobs/{job_id}/events")
+async def policy_job_events(job_id: str):
+    """
+    Server-Sent Events for a job: `progress` with the full job state on every change,
+    then one `done` or `failed`. Every (re)connection starts with the current state,
+    so a client that dropped off just subscribes again.
+    """
+    job = await _get_job(job_id)
+
+    async def events():
+        current = job
+        version = None
+        idle = 0.0
+        while True:
+            if current["version"] != version:
+                version = current["version"]
+                idle = 0.0
+                finished = current["status"] in FINISHED
+                yield _sse(current["status"] if finished else "progress", current, version)
+                if finished:
+                    return
+            elif idle >= _KEEPALIVE_S:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await policy_jobs.wait_change(job_id, JOB_POLL_INTERVAL)
+            idle += JOB_POLL_INTERVAL
+            current = await policy_jobs.get(job_id)
+            if current is None:
+                return
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
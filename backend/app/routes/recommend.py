@@ -1,59 +1,74 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
 from ..models.schemas import RecommendRequest, RecommendResponse, Plan
+from ..services.recommender import engine, HouseholdError
+from ..services.recommend_enhancer import enhancer, RECOMMEND_ENHANCE, RECOMMEND_ENHANCE_DEADLINE_S
+from ..services.resilience import deadline
+from ..services.analytics import analytics
+from ..utils.records import detect_format, iter_record_batches
 
 router = APIRouter()
 
 
 @router.post("/recommend", response_model=RecommendResponse)
-async def recommend(req: RecommendRequest):
-    """Simple rule-based recommendation engine.
+async def recommend(req: RecommendRequest, enhance: bool = True):
+    """Rule-based recommendation engine.
 
     Inputs: occupation, income, family_size
-    Rules:
+    Rules, premiums and trust-score weights live in app/data/recommend_rules.json:
       - If occupation == 'farmer' -> Crop Insurance
       - If family_size > 3 -> Family Health Plan
       - If income < 15000 -> Micro Insurance
 
-    Returns list of plans, trust_score, total_premium, and explanation.
+    Returns list of plans, trust_score, total_premium, and explanation; 422 when income
+    is outside 0..MAX_INCOME or family_size outside 0..MAX_FAMILY_SIZE.
+    This is a one-row call into the same engine as /recommend/bulk, so results are identical.
+
+    Unless enhance=false, each plan also gets an LLM-refined explanation, trust score
+    with reasoning and a Hindi explanation. Concurrent requests share one batched Groq
+    call and similar households share cached text; if that takes longer than
+    RECOMMEND_ENHANCE_DEADLINE_S the heuristic text is returned (enhancement says which).
     """
-    occ = (req.occupation or "").strip().lower()
-    income = req.income
-    family_size = req.family_size
-
-    plans: list[Plan] = []
-
-    # Rule: farmer -> Crop Insurance
-    if occ == "farmer":
-        plans.append(Plan(name="Crop Insurance", reason="Occupation is farmer", estimated_premium=2000.0))
-
-    # Rule: family size > 3 -> Family Health Plan
-    if family_size > 3:
-        plans.append(Plan(name="Family Health Plan", reason="Large family size", estimated_premium=5000.0))
-
-    # Rule: low income -> micro-insurance
-    if income < 15000:
-        plans.append(Plan(name="Micro Insurance", reason="Low income", estimated_premium=300.0))
-
-    # If no rules matched, provide a safe default recommendation
-    if not plans:
-        plans.append(Plan(name="Standard Life Cover", reason="No specific rule matched; generic protection", estimated_premium=1500.0))
-
-    total_premium = sum(p.estimated_premium or 0.0 for p in plans)
-
-    # Simple trust score heuristic: higher for lower income (needs protection) and for farmers
-    trust_score = 0.7
-    if occ == "farmer":
-        trust_score += 0.1
-    # adjust by family size modestly
-    trust_score += min(0.15, 0.01 * max(0, family_size - 1))
-    # lower income => slightly higher priority/trust
-    if income < 15000:
-        trust_score += 0.05
-    # clamp
-    trust_score = max(0.0, min(1.0, trust_score))
-
-    # Build an explanation string
-    reasons = [f"{p.name}: {p.reason or 'recommended'} (premium ₹{p.estimated_premium:.2f})" for p in plans]
-    explanation = "; ".join(reasons)
-
-    return RecommendResponse(plans=plans, trust_score=round(trust_score, 2), total_premium=round(total_premium, 2), explanation=explanation)
\ No newline at end of file
+    try:
+        result = engine.recommend_one(req.occupation, req.income, req.family_size)
+    except HouseholdError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    analytics.record("recommend", *(p["name"] for p in result["plans"]))
+    plans = result["plans"]
+    source = None
+    if enhance and RECOMMEND_ENHANCE:
+        survey = {"occupation": req.occupation, "income": req.income, "family_size": req.family_size}
+        with deadline(RECOMMEND_ENHANCE_DEADLINE_S):
+            improved, source = await enhancer.enhance(plans, survey)
+        plans = [{**plan, **{k: v for k, v in extra.items() if k != "name"}} for plan, extra in zip(plans, improved)]
+    return RecommendResponse(
+        plans=[Plan(**p) for p in plans],
+        trust_score=result["trust_score"],
+        total_premium=result["total_premium"],
+        explanation=result["explanation"],
+        enhancement=source,
+    )
+
+
+@router.post("/recommend/bulk")
+async def recommend_bulk(file: UploadFile = File(...), format: Optional[str] = None):
+    """Score a household register (CSV with a header row, or JSONL).
+
+    Each row needs occupation, income and family_size. Results stream back as NDJSON,
+    one line per input row in input order: {"row", "trust_score", "plans",
+    "total_premium", "explanation"}, or {"row", "error"} for rows that fail validation.
+    """
+    try:
+        fmt = detect_format(file.filename, file.content_type, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    analytics.record("recommend_bulk", fmt)
+
+    async def results():
+        async for batch in iter_record_batches(file, fmt):
+            # vectorized scoring is CPU work; keep it off the event loop
+            yield await asyncio.to_thread(engine.bulk_ndjson, batch)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
@@ -1,16 +1,38 @@
 from fastapi import APIRouter, UploadFile, HTTPException, status
-from ..services.stt import transcribe_audio
+from ..services.stt import transcribe_audio, STT_MAX_BYTES
+from ..services.resilience import deadline
+import os
 
 router = APIRouter()
 
+# Total time a transcription request may spend on Groq calls (retries and fallbacks included)
+STT_DEADLINE_S = float(os.getenv("STT_DEADLINE_S", "60"))
+_READ_CHUNK = 1024 * 1024
+
+
+async def _read_capped(file: UploadFile, max_bytes: int) -> bytes:
+    # read in chunks so an oversized upload is refused without loading all of it
+    parts = []
+    size = 0
+    while True:
+        chunk = await file.read(_READ_CHUNK)
+        if not chunk:
+            return b"".join(parts)
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                detail=f"Audio is larger than {max_bytes // (1024 * 1024)} MB.")
+        parts.append(chunk)
+
 
 @router.post("/stt/transcribe")
 async def stt_transcribe(file: UploadFile, language: str = "en"):
     if language not in ("en", "hi"):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported language")
+    data = await _read_capped(file, STT_MAX_BYTES)
     try:
-        data = await file.read()
-        text = await transcribe_audio(data, language)
+        with deadline(STT_DEADLINE_S):
+            text = await transcribe_audio(data, language)
         return {"text": text}
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -0,0 +1,350 @@
+# Admission control for the expensive endpoints
+#
+# Each endpoint class (interactive chat, speech-to-text, policy uploads, bulk files) gets
+# a concurrency limit and a bounded wait queue, and all classes share ADMISSION_SLOTS,
+# fewer than the class limits add up to. When a slot frees up, the waiting request with
+# the best priority goes first, so a burst of PDF uploads queues behind chat instead of
+# in front of it; the last ADMISSION_RESERVED slots only ever go to interactive requests.
+# Requests that would wait too long, or find their queue full, are shed with 503 +
+# Retry-After before their body is read, and uploads larger than the class cap get 413
+# the same way.
+import os
+import json
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from .pdf_parser import PDF_MAX_BYTES
+from .stt import STT_MAX_BYTES
+from .tracing import span
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") != "0"
+# Requests of all classes running at once; below the sum of the class limits, so classes
+# compete for slots and priority decides who gets the next one
+ADMISSION_SLOTS = int(os.getenv("ADMISSION_SLOTS", "16"))
+# Slots only priority-0 (interactive) requests may take, so batch work can never fill the pool
+ADMISSION_RESERVED = int(os.getenv("ADMISSION_RESERVED", "4"))
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(256 * 1024 * 1024)))
+CHAT_MAX_BYTES = int(os.getenv("CHAT_MAX_BYTES", str(256 * 1024)))
+# multipart boundaries and part headers around an uploaded file
+_MULTIPART_SLACK = 64 * 1024
+_WAIT_SAMPLES = 1024
+
+
+@dataclass(frozen=True)
+class AdmissionClass:
+    name: str
+    priority: int      # lower is served first
+    limit: int         # requests of this class running at once
+    queue_size: int    # requests of this class allowed to wait for a slot
+    max_wait: float    # seconds a request may wait before it is shed
+    max_body: int      # request body cap in bytes
+
+
+def _admission_class(name: str, priority: int, limit: int, queue_size: int, max_wait: float,
+                     max_body: int) -> AdmissionClass:
+    # ADMIT_<NAME>_LIMIT / _QUEUE / _WAIT override the defaults
+    env = f"ADMIT_{name.upper()}_"
+    return AdmissionClass(
+        name=name,
+        priority=priority,
+        limit=int(os.getenv(env + "LIMIT", str(limit))),
+        queue_size=int(os.getenv(env + "QUEUE", str(queue_size))),
+        max_wait=float(os.getenv(env + "WAIT", str(max_wait))),
+        max_body=max_body,
+    )
+
+
+ADMISSION_CLASSES: Dict[str, AdmissionClass] = {c.name: c for c in (
+    _admission_class("interactive", 0, 24, 64, 2.0, CHAT_MAX_BYTES),
+    _admission_class("stt", 1, 4, 16, 10.0, STT_MAX_BYTES + _MULTIPART_SLACK),
+    _admission_class("policy", 2, 2, 8, 30.0, PDF_MAX_BYTES + _MULTIPART_SLACK),
+    _admission_class("bulk", 2, 2, 4, 30.0, BULK_MAX_BYTES + _MULTIPART_SLACK),
+)}
+
+# (method, path) -> class; everything else (guides, surveys, job status, audio) is not gated
+ADMISSION_ROUTES: Dict[Tuple[str, str], str] = {
+    ("POST", "/chat"): "interactive",
+    ("POST", "/chat/stream"): "interactive",
+    ("POST", "/recommend"): "interactive",
+    ("POST", "/stt/transcribe"): "stt",
+    ("POST", "/policy/simplify"): "policy",
+    ("POST", "/policy/jobs"): "policy",
+    ("POST", "/recommend/bulk"): "bulk",
+    ("POST", "/form/assist/bulk"): "bulk",
+}
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _Ring:
+    """The last _WAIT_SAMPLES durations in a numpy ring buffer."""
+
+    def __init__(self, size: int = _WAIT_SAMPLES):
+        self._values = np.zeros(size, dtype=np.float64)
+        self._count = 0
+
+    def record(self, seconds: float) -> None:
+        self._values[self._count % len(self._values)] = seconds
+        self._count += 1
+
+    def values(self) -> np.ndarray:
+        return self._values[:min(self._count, len(self._values))]
+
+    def mean(self) -> Optional[float]:
+        values = self.values()
+        return float(values.mean()) if len(values) else None
+
+    def summary_ms(self) -> Optional[dict]:
+        values = self.values()
+        if not len(values):
+            return None
+        p50, p95, p99 = np.quantile(values, (0.5, 0.95, 0.99)) * 1000
+        return {"p50": round(p50, 1), "p95": round(p95, 1), "p99": round(p99, 1),
+                "max": round(float(values.max()) * 1000, 1)}
+
+
+class _ClassState:
+    def __init__(self):
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.waited = 0
+        self.rejected = {"queue_full": 0, "timeout": 0, "too_large": 0}
+        self.wait = _Ring()
+        self.hold = _Ring()
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "name", "future", "granted", "abandoned")
+
+    def __init__(self, priority: int, seq: int, name: str, future: "asyncio.Future[None]"):
+        self.priority = priority
+        self.seq = seq
+        self.name = name
+        self.future = future
+        self.granted = False
+        self.abandoned = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """Slots shared by all classes, handed to waiters in (priority, arrival) order."""
+
+    def __init__(self, classes: Dict[str, AdmissionClass] = ADMISSION_CLASSES, slots: int = ADMISSION_SLOTS,
+                 reserved: int = ADMISSION_RESERVED):
+        self.classes = classes
+        self.slots = slots
+        self.reserved = reserved
+        self.in_use = 0
+        self._state = {name: _ClassState() for name in classes}
+        self._heap: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    def _has_room(self, name: str) -> bool:
+        cls = self.classes[name]
+        free = self.slots - self.in_use
+        if cls.priority > 0:
+            free -= self.reserved
+        return free > 0 and self._state[name].active < cls.limit
+
+    def _take(self, name: str) -> None:
+        self.in_use += 1
+        state = self._state[name]
+        state.active += 1
+        state.admitted += 1
+
+    def retry_after(self, name: str) -> int:
+        """Seconds until a slot is likely free: mean hold time x queue length / limit."""
+        cls, state = self.classes[name], self._state[name]
+        hold = state.hold.mean() or cls.max_wait
+        return max(1, min(120, math.ceil(hold * (state.queued + 1) / cls.limit)))
+
+    def reject_too_large(self, name: str) -> AdmissionRejected:
+        self._state[name].rejected["too_large"] += 1
+        limit = self.classes[name].max_body
+        return AdmissionRejected(413, f"Request body is larger than {limit // 1024} KB." if limit < 1024 * 1024
+                                 else f"Request body is larger than {limit // (1024 * 1024)} MB.")
+
+    async def acquire(self, name: str) -> float:
+        """Wait for a slot of class `name`; returns the seconds spent queued."""
+        cls, state = self.classes[name], self._state[name]
+        # Waiters still in the heap are blocked on a full class or on the shared slots,
+        # so a request that finds room here is not jumping ahead of anyone it competes with
+        if self._has_room(name):
+            self._take(name)
+            state.wait.record(0.0)
+            return 0.0
+        if state.queued >= cls.queue_size:
+            state.rejected["queue_full"] += 1
+            raise AdmissionRejected(503, "Server is busy; please retry shortly.", self.retry_after(name))
+
+        waiter = _Waiter(cls.priority, next(self._seq), name, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, waiter)
+        state.queued += 1
+        state.waited += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), cls.max_wait)
+        except asyncio.TimeoutError:
+            if not waiter.granted:
+                self._abandon(waiter)
+                state.rejected["timeout"] += 1
+                raise AdmissionRejected(503, "Server is busy; please retry shortly.", self.retry_after(name))
+        except asyncio.CancelledError:
+            # client went away while queued; hand back the slot if it arrived meanwhile
+            if waiter.granted:
+                self.release(name)
+            else:
+                self._abandon(waiter)
+            raise
+        waited = time.perf_counter() - started
+        state.wait.record(waited)
+        return waited
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        # lazy deletion: _dispatch skips abandoned heap entries
+        waiter.abandoned = True
+        self._state[waiter.name].queued -= 1
+
+    def release(self, name: str, held: Optional[float] = None) -> None:
+        self.in_use -= 1
+        state = self._state[name]
+        state.active -= 1
+        if held is not None:
+            state.hold.record(held)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        blocked = []
+        while self._heap and self.in_use < self.slots:
+            waiter = heapq.heappop(self._heap)
+            if waiter.abandoned:
+                continue
+            if not self._has_room(waiter.name):
+                # its class is at its limit (or only reserved slots are left); others may still run
+                blocked.append(waiter)
+                continue
+            waiter.granted = True
+            self._state[waiter.name].queued -= 1
+            self._take(waiter.name)
+            waiter.future.set_result(None)
+        for waiter in blocked:
+            heapq.heappush(self._heap, waiter)
+
+    def info(self) -> dict:
+        classes = {}
+        for name, cls in self.classes.items():
+            state = self._state[name]
+            classes[name] = {
+                "priority": cls.priority,
+                "limit": cls.limit,
+                "queue_size": cls.queue_size,
+                "max_wait_s": cls.max_wait,
+                "max_body_bytes": cls.max_body,
+                "active": state.active,
+                "queued": state.queued,
+                "admitted": state.admitted,
+                "waited": state.waited,
+                "rejected": dict(state.rejected),
+                "wait_ms": state.wait.summary_ms(),
+                "hold_ms": state.hold.summary_ms(),
+            }
+        return {"enabled": ADMISSION_ENABLED, "slots": self.slots, "reserved": self.reserved,
+                "in_use": self.in_use, "classes": classes}
+
+
+admission = AdmissionController()
+
+
+async def _send_error(send, status_code: int, detail: str, retry_after: Optional[int] = None) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(retry_after).encode()))
+    await send({"type": "http.response.start", "status": status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _content_length(scope) -> Optional[int]:
+    for key, value in scope.get("headers", ()):
+        if key == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying the controller to ADMISSION_ROUTES. Runs before the body is
+    read: oversized Content-Length and shed requests never reach multipart parsing, and
+    bodies without a Content-Length are cut off with 413 once they pass the class cap.
+    The slot is held until the response (including a streamed one) has been sent, and
+    the queue wait is reported in a Server-Timing header.
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        name = ADMISSION_ROUTES.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if name is None or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        controller = self.controller
+        max_body = controller.classes[name].max_body
+        length = _content_length(scope)
+        if length is not None and length > max_body:
+            rejected = controller.reject_too_large(name)
+            await _send_error(send, rejected.status_code, rejected.detail)
+            return
+        try:
+            with span("admission.queue", cls=name):
+                waited = await controller.acquire(name)
+        except AdmissionRejected as e:
+            await _send_error(send, e.status_code, e.detail, e.retry_after)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    rejected = controller.reject_too_large(name)
+                    # raised inside the endpoint's body parsing, so FastAPI answers 413
+                    raise HTTPException(status_code=rejected.status_code, detail=rejected.detail)
+            return message
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"server-timing", f"queue;dur={waited * 1000:.1f}".encode())]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, limited_receive, timed_send)
+        finally:
+            controller.release(name, time.perf_counter() - started)
@@ -0,0 +1,324 @@
+# In-process usage analytics: windowed counters and top queries, snapshotted to disk
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import itertools
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cache"))
+ANALYTICS_SNAPSHOT_PATH = os.getenv("ANALYTICS_SNAPSHOT_PATH", os.path.join(CACHE_DIR, "analytics.json"))
+ANALYTICS_SNAPSHOT_INTERVAL = float(os.getenv("ANALYTICS_SNAPSHOT_INTERVAL", "60"))
+ANALYTICS_DRAIN_INTERVAL = float(os.getenv("ANALYTICS_DRAIN_INTERVAL", "1"))
+# Events buffered between drains; beyond this the oldest are dropped (and counted)
+ANALYTICS_BUFFER = int(os.getenv("ANALYTICS_BUFFER", "100000"))
+# Distinct queries tracked per Space-Saving summary
+ANALYTICS_TOP_K = int(os.getenv("ANALYTICS_TOP_K", "200"))
+
+# Counters keep one bucket per minute for a day; top queries one summary per 10 minutes
+MINUTES = 24 * 60
+SLOT_SECONDS = 600
+SLOTS = 24 * 3600 // SLOT_SECONDS
+WINDOWS = {"last_hour": 3600, "last_day": 24 * 3600}
+
+_PUNCT = re.compile(r"[!-/:-@\[-`{-~।॥‘-‟…]+")
+_SPACE = re.compile(r"\s+")
+MAX_QUERY_CHARS = 120
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, drop punctuation (keeps Devanagari vowel signs), collapse whitespace."""
+    text = _PUNCT.sub(" ", (text or "").lower())
+    return _SPACE.sub(" ", text).strip()[:MAX_QUERY_CHARS]
+
+
+class WindowedCounter:
+    """All-time total plus a ring of per-minute buckets covering the last day."""
+
+    __slots__ = ("total", "buckets", "stamps")
+
+    def __init__(self):
+        self.total = 0
+        self.buckets = [0] * MINUTES
+        self.stamps = [-1] * MINUTES
+
+    def add(self, minute: int, n: int = 1) -> None:
+        self.total += n
+        i = minute % MINUTES
+        if self.stamps[i] != minute:
+            self.stamps[i] = minute
+            self.buckets[i] = 0
+        self.buckets[i] += n
+
+    def window(self, now_minute: int, minutes: int) -> int:
+        oldest = now_minute - minutes
+        return sum(b for b, s in zip(self.buckets, self.stamps) if s > oldest)
+
+    def to_dict(self) -> Dict[str, Any]:
+        live = [(s, b) for s, b in zip(self.stamps, self.buckets) if s >= 0 and b]
+        return {"total": self.total, "minutes": live}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WindowedCounter":
+        counter = cls()
+        counter.total = int(data.get("total", 0))
+        for stamp, count in data.get("minutes", []):
+            counter.stamps[stamp % MINUTES] = stamp
+            counter.buckets[stamp % MINUTES] = count
+        return counter
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters summary (Metwally et al.): at most `capacity` items, each
+    with a count and the maximum overestimate inherited from the item it replaced.
+    Any item with true frequency above N/capacity is guaranteed to be present.
+    """
+
+    __slots__ = ("capacity", "counts", "errors")
+
+    def __init__(self, capacity: int = ANALYTICS_TOP_K):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, item: str, n: int = 1) -> None:
+        counts = self.counts
+        if item in counts:
+            counts[item] += n
+        elif len(counts) < self.capacity:
+            counts[item] = n
+            self.errors[item] = 0
+        else:
+            # replace the current minimum; O(capacity) but only for unseen items
+            victim = min(counts, key=counts.__getitem__)
+            floor = counts.pop(victim)
+            del self.errors[victim]
+            counts[item] = floor + n
+            self.errors[item] = floor
+
+    def merge(self, other: "SpaceSaving") -> None:
+        for item, count in other.counts.items():
+            if item in self.counts:
+                self.counts[item] += count
+                self.errors[item] += other.errors[item]
+            else:
+                self.counts[item] = count
+                self.errors[item] = other.errors[item]
+        if len(self.counts) > self.capacity:
+            keep = sorted(self.counts, key=self.counts.__getitem__, reverse=True)[:self.capacity]
+            self.counts = {k: self.counts[k] for k in keep}
+            self.errors = {k: self.errors[k] for k in keep}
+
+    def top(self, k: int) -> List[Dict[str, Any]]:
+        items = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return [{"query": q, "count": c, "max_overcount": self.errors[q]} for q, c in items]
+
+    def to_dict(self) -> Dict[str, Any]:
+        # copies: the snapshot is serialized in a worker thread while drain() keeps adding
+        return {"counts": dict(self.counts), "errors": dict(self.errors)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], capacity: int = ANALYTICS_TOP_K) -> "SpaceSaving":
+        summary = cls(capacity)
+        summary.counts = {k: int(v) for k, v in data.get("counts", {}).items()}
+        summary.errors = {k: int(data.get("errors", {}).get(k, 0)) for k in summary.counts}
+        return summary
+
+
+class Analytics:
+    """
+    Request handlers call record(), which only appends a tuple to a deque (atomic under
+    the GIL, so no lock even when called from worker threads). drain() folds buffered
+    events into the windowed counters and top-query summaries; it runs every
+    ANALYTICS_DRAIN_INTERVAL seconds and before every read.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = ANALYTICS_SNAPSHOT_PATH, buffer: int = ANALYTICS_BUFFER):
+        self.snapshot_path = snapshot_path
+        self._events: deque = deque(maxlen=buffer)
+        # next() on itertools.count is atomic in CPython: a lock-free sequence number
+        self._seq = itertools.count()
+        self._next_seq = 0
+        self._dropped = 0
+        self.counters: Dict[str, WindowedCounter] = {}
+        self.top_all = SpaceSaving()
+        self._top_slots: List[Tuple[int, SpaceSaving]] = [(-1, SpaceSaving()) for _ in range(SLOTS)]
+        self.started = time.time()
+
+    # -- hot path ------------------------------------------------------------
+    def record(self, event: str, *labels: str, query: Optional[str] = None) -> None:
+        """Count `event` (and `event.label` for each label); track `query` text for top queries."""
+        self._events.append((next(self._seq), time.time(), event, labels, query))
+
+    # -- aggregation ---------------------------------------------------------
+    def drain(self) -> int:
+        events = self._events
+        n = 0
+        while True:
+            try:
+                seq, ts, event, labels, query = events.popleft()
+            except IndexError:
+                break
+            n += 1
+            # a gap in sequence numbers means the bounded buffer overflowed; threads can
+            # append slightly out of order, so a late arrival cancels a counted gap
+            if seq >= self._next_seq:
+                self._dropped += seq - self._next_seq
+                self._next_seq = seq + 1
+            else:
+                self._dropped -= 1
+            minute = int(ts // 60)
+            self._count(event, minute)
+            for label in labels:
+                self._count(f"{event}.{label}", minute)
+            if query:
+                normalized = normalize_query(query)
+                if normalized:
+                    self.top_all.add(normalized)
+                    self._slot(int(ts // SLOT_SECONDS)).add(normalized)
+        return n
+
+    def _count(self, name: str, minute: int) -> None:
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters[name] = WindowedCounter()
+        counter.add(minute)
+
+    def _slot(self, slot: int) -> SpaceSaving:
+        i = slot % SLOTS
+        stamp, summary = self._top_slots[i]
+        if stamp != slot:
+            summary = SpaceSaving()
+            self._top_slots[i] = (slot, summary)
+        return summary
+
+    def top_queries(self, seconds: Optional[int] = None, k: int = 10) -> List[Dict[str, Any]]:
+        if seconds is None:
+            return self.top_all.top(k)
+        oldest = int(time.time() // SLOT_SECONDS) - seconds // SLOT_SECONDS
+        merged = SpaceSaving()
+        for stamp, summary in self._top_slots:
+            if stamp > oldest:
+                merged.merge(summary)
+        return merged.top(k)
+
+    def count(self, name: str, seconds: Optional[int] = None) -> int:
+        counter = self.counters.get(name)
+        if counter is None:
+            return 0
+        if seconds is None:
+            return counter.total
+        return counter.window(int(time.time() // 60), seconds // 60)
+
+    def labels(self, event: str, seconds: Optional[int] = None) -> Dict[str, int]:
+        prefix = event + "."
+        return {
+            name[len(prefix):]: self.count(name, seconds)
+            for name in self.counters if name.startswith(prefix)
+        }
+
+    def report(self, k: int = 10) -> Dict[str, Any]:
+        self.drain()
+        events = sorted(name for name in self.counters if "." not in name)
+
+        def view(seconds: Optional[int]) -> Dict[str, Any]:
+            return {
+                "events": {name: self.count(name, seconds) for name in events},
+                "top_queries": self.top_queries(seconds, k),
+                "recommendation_counts": self.labels("recommend", seconds),
+            }
+
+        all_time = view(None)
+        return {
+            # flat keys kept from the original static response
+            "total_chats": self.count("chat"),
+            "total_surveys": self.count("survey"),
+            "top_queries": [q["query"] for q in all_time["top_queries"]],
+            "recommendation_counts": all_time["recommendation_counts"],
+            "all_time": all_time,
+            **{name: view(seconds) for name, seconds in WINDOWS.items()},
+            "breakdown": {name: self.count(name) for name in sorted(self.counters) if "." in name},
+            "pipeline": {
+                "aggregated": self._next_seq - self._dropped,
+                "dropped": self._dropped,
+                "buffered": len(self._events),
+                "since": self.started,
+            },
+        }
+
+    # -- persistence ---------------------------------------------------------
+    def snapshot_data(self) -> Dict[str, Any]:
+        """Aggregates as a JSON-able dict. Call from the thread that drains (the event loop)."""
+        self.drain()
+        return {
+            "version": 1,
+            "saved_at": time.time(),
+            "started": self.started,
+            "counters": {name: c.to_dict() for name, c in self.counters.items()},
+            "top_all": self.top_all.to_dict(),
+            "top_slots": [[stamp, s.to_dict()] for stamp, s in self._top_slots if stamp >= 0 and s.counts],
+        }
+
+    def write_snapshot(self, data: Dict[str, Any]) -> None:
+        """Write a snapshot_data() dict to disk atomically (tmp file + rename)."""
+        if not self.snapshot_path:
+            return
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        tmp = f"{self.snapshot_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.snapshot_path)
+
+    def load(self) -> bool:
+        """Restore aggregates from the last snapshot, if any. Returns True on success."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.counters = {name: WindowedCounter.from_dict(c) for name, c in data.get("counters", {}).items()}
+            self.top_all = SpaceSaving.from_dict(data.get("top_all", {}))
+            for stamp, summary in data.get("top_slots", []):
+                self._top_slots[stamp % SLOTS] = (stamp, SpaceSaving.from_dict(summary))
+            self.started = float(data.get("started", self.started))
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.warning("ignoring unreadable analytics snapshot %s: %s", self.snapshot_path, e)
+            return False
+        return True
+
+
+async def run_analytics(
+    drain_interval: float = ANALYTICS_DRAIN_INTERVAL,
+    snapshot_interval: float = ANALYTICS_SNAPSHOT_INTERVAL,
+) -> None:
+    """Background task started from the app lifespan hook: drain events, snapshot periodically."""
+    last_snapshot = time.monotonic()
+    try:
+        while True:
+            await asyncio.sleep(drain_interval)
+            try:
+                analytics.drain()
+                if time.monotonic() - last_snapshot >= snapshot_interval:
+                    last_snapshot = time.monotonic()
+                    await asyncio.to_thread(analytics.write_snapshot, analytics.snapshot_data())
+            except OSError as e:
+                logger.warning("analytics snapshot failed: %s", e)
+            except Exception:
+                # one bad drain or snapshot must not stop counting for the rest of the process
+                logger.exception("analytics drain/snapshot failed")
+    finally:
+        # lifespan shutdown cancels us; keep what was counted since the last snapshot
+        try:
+            analytics.write_snapshot(analytics.snapshot_data())
+        except Exception as e:
+            logger.warning("analytics snapshot failed: %s", e)
+
+
+analytics = Analytics()
+analytics.load()
@@ -0,0 +1,212 @@
+# Local audio preparation for STT: decode WAV, downmix/resample to 16 kHz mono,
+# and split long recordings on silence with a vectorized energy VAD
+import io
+import os
+import wave
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .tracing import traced
+
+TARGET_RATE = 16000
+# Recordings shorter than this are sent as one piece (still compacted)
+STT_SEGMENT_MIN_SECONDS = float(os.getenv("STT_SEGMENT_MIN_SECONDS", "30"))
+# Upper bound for one segment; Whisper works on 30 s windows anyway
+STT_MAX_SEGMENT_SECONDS = float(os.getenv("STT_MAX_SEGMENT_SECONDS", "30"))
+
+VAD_FRAME_MS = 30
+# A pause at least this long is a candidate split point
+VAD_MIN_SILENCE_MS = 400
+# Speech shorter than this (clicks, taps) does not open a segment
+VAD_MIN_SPEECH_MS = 150
+# Speech context kept on each side of a segment
+VAD_PAD_MS = 150
+# Frames within this many dB of the noise floor count as silence
+VAD_MARGIN_DB = 12.0
+VAD_ABSOLUTE_FLOOR_DB = -50.0
+# Pause inserted where two speech spans are joined into one segment
+VAD_JOIN_MS = 300
+
+
+@dataclass
+class PreparedAudio:
+    """16 kHz mono PCM segments ready to upload, in playback order."""
+    segments: List[bytes]
+    duration_s: float
+    original_bytes: int
+    sent_bytes: int = 0
+    speech_s: float = 0.0
+    spans: List[Tuple[float, float]] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.sent_bytes = sum(len(s) for s in self.segments)
+
+
+def decode_wav(data: bytes) -> Optional[Tuple[np.ndarray, int]]:
+    """
+    PCM WAV bytes -> (float32 samples shaped (frames, channels) in [-1, 1], rate).
+    Returns None for anything the stdlib wave module cannot read (mp3, webm, float WAV).
+    """
+    try:
+        with wave.open(io.BytesIO(data)) as w:
+            channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+            raw = w.readframes(w.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        return None
+    frames = len(samples) // channels
+    return samples[:frames * channels].reshape(frames, channels), rate
+
+
+def _lowpass_taps(cutoff: float, taps: int = 63) -> np.ndarray:
+    """Windowed-sinc FIR low-pass; cutoff is a fraction of the input sample rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.blackman(taps)
+    return (h / h.sum()).astype(np.float32)
+
+
+def to_mono_16k(samples: np.ndarray, rate: int) -> np.ndarray:
+    """Downmix to mono and resample to 16 kHz (anti-aliased when downsampling)."""
+    mono = samples.mean(axis=1, dtype=np.float32) if samples.ndim == 2 else samples.astype(np.float32)
+    if rate == TARGET_RATE or len(mono) == 0:
+        return mono
+    if rate > TARGET_RATE:
+        # keep content below ~0.45 * 16 kHz so it does not fold back after resampling
+        mono = np.convolve(mono, _lowpass_taps(0.45 * TARGET_RATE / rate), mode="same")
+        if rate % TARGET_RATE == 0:
+            return mono[::rate // TARGET_RATE].copy()
+    out_len = int(round(len(mono) * TARGET_RATE / rate))
+    positions = np.arange(out_len, dtype=np.float64) * (rate / TARGET_RATE)
+    return np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+
+
+def encode_wav(samples: np.ndarray, rate: int = TARGET_RATE) -> bytes:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and end (exclusive) indices of each run of True in a boolean array."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return edges[::2], edges[1::2]
+
+
+def speech_spans(samples: np.ndarray, rate: int = TARGET_RATE) -> List[Tuple[int, int]]:
+    """
+    Energy VAD: frame RMS in dBFS against an adaptive noise floor (10th percentile),
+    with short pauses bridged and short blips dropped. Returns [(start, end)] sample spans.
+    """
+    frame = rate * VAD_FRAME_MS // 1000
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return [(0, len(samples))] if len(samples) else []
+    frames = samples[:n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1) + 1e-12)
+    db = 20 * np.log10(rms)
+    floor = np.percentile(db, 10)
+    speech = db > max(floor + VAD_MARGIN_DB, VAD_ABSOLUTE_FLOOR_DB)
+
+    # bridge pauses shorter than VAD_MIN_SILENCE_MS
+    starts, ends = _runs(~speech)
+    min_gap = VAD_MIN_SILENCE_MS // VAD_FRAME_MS
+    for s, e in zip(starts, ends):
+        if e - s < min_gap and s > 0 and e < n_frames:
+            speech[s:e] = True
+    # drop blips shorter than VAD_MIN_SPEECH_MS
+    starts, ends = _runs(speech)
+    keep = (ends - starts) >= max(1, VAD_MIN_SPEECH_MS // VAD_FRAME_MS)
+    pad = VAD_PAD_MS // VAD_FRAME_MS
+    spans = []
+    for s, e in zip(starts[keep], ends[keep]):
+        spans.append((max(0, int(s - pad) * frame), min(len(samples), int(e + pad) * frame)))
+    return spans
+
+
+def pack_spans(spans: List[Tuple[int, int]], rate: int,
+               max_seconds: float = STT_MAX_SEGMENT_SECONDS) -> List[List[Tuple[int, int]]]:
+    """
+    Group consecutive speech spans into segments of at most max_seconds of audio
+    (counting a VAD_JOIN_MS pause between spans); a single span longer than that is cut
+    at fixed intervals. Long silences between spans are never uploaded.
+    """
+    limit = int(max_seconds * rate)
+    join = rate * VAD_JOIN_MS // 1000
+    segments: List[List[Tuple[int, int]]] = []
+    used = 0
+    for start, end in spans:
+        while end - start > limit:
+            segments.append([(start, start + limit)])
+            used = limit
+            start += limit
+        length = end - start
+        if segments and used + join + length <= limit:
+            segments[-1].append((start, end))
+            used += join + length
+        else:
+            segments.append([(start, end)])
+            used = length
+    return segments
+
+
+def _join_spans(samples: np.ndarray, spans: List[Tuple[int, int]], rate: int) -> np.ndarray:
+    gap = np.zeros(rate * VAD_JOIN_MS // 1000, dtype=np.float32)
+    parts: List[np.ndarray] = []
+    for i, (s, e) in enumerate(spans):
+        if i:
+            parts.append(gap)
+        parts.append(samples[s:e])
+    return np.concatenate(parts)
+
+
+@traced()
+def prepare_audio(data: bytes, segment_min_s: float = STT_SEGMENT_MIN_SECONDS) -> Optional[PreparedAudio]:
+    """
+    Compact (16 kHz mono 16-bit) and, for recordings longer than segment_min_s, split
+    on silence. Returns None when the input is not a PCM WAV we can decode; the caller
+    then uploads the original bytes unchanged.
+    """
+    decoded = decode_wav(data)
+    if decoded is None:
+        return None
+    samples, rate = decoded
+    mono = to_mono_16k(samples, rate)
+    duration = len(mono) / TARGET_RATE
+    if duration < segment_min_s:
+        compact = encode_wav(mono)
+        if len(compact) >= len(data):
+            # already 16 kHz mono 16-bit (or smaller); send as recorded
+            compact = data
+        return PreparedAudio([compact], duration, len(data), speech_s=duration, spans=[(0.0, duration)])
+
+    segments = pack_spans(speech_spans(mono), TARGET_RATE)
+    if not segments:
+        return PreparedAudio([], duration, len(data))
+    spans = [span for segment in segments for span in segment]
+    return PreparedAudio(
+        [encode_wav(_join_spans(mono, segment, TARGET_RATE)) for segment in segments],
+        duration,
+        len(data),
+        speech_s=sum(e - s for s, e in spans) / TARGET_RATE,
+        spans=[(round(s / TARGET_RATE, 2), round(e / TARGET_RATE, 2)) for s, e in spans],
+    )
@@ -0,0 +1,194 @@
+# Static catalogs (claim guides, survey questions) served as pre-built responses
+#
+# Each catalog is a versioned JSON file in app/data/catalogs with one section per
+# language. At load time every (item, language) response body is serialized once,
+# gzipped once and given a strong ETag, so a request is a dict lookup plus header
+# checks: 304 when the client's If-None-Match matches, the gzipped bytes when it
+# accepts gzip (and they are smaller), the plain bytes otherwise. Items missing from a
+# language fall back to English.
+import os
+import gzip
+import json
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from fastapi import Response
+
+logger = logging.getLogger(__name__)
+
+CATALOG_DIR = os.getenv(
+    "CATALOG_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "catalogs")),
+)
+# Clients reuse a catalog this long without asking, then revalidate with If-None-Match
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "3600"))
+# ...and may keep showing the old copy this long while revalidating in the background
+CATALOG_STALE_WHILE_REVALIDATE = int(os.getenv("CATALOG_STALE_WHILE_REVALIDATE", "86400"))
+DEFAULT_LANGUAGE = "en"
+LANGUAGES = ("en", "hi")
+
+_CACHE_CONTROL = f"public, max-age={CATALOG_MAX_AGE}, stale-while-revalidate={CATALOG_STALE_WHILE_REVALIDATE}"
+
+
+@dataclass(frozen=True)
+class Variant:
+    body: bytes
+    gzipped: Optional[bytes]  # None when gzip does not make the body smaller
+    etag: str
+    gzip_etag: str
+
+
+def _variant(catalog: str, version: Any, payload: Any) -> Variant:
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    packed = gzip.compress(body, compresslevel=9, mtime=0)
+    tag = f"{catalog}-v{version}-{hashlib.sha256(body).hexdigest()[:20]}"
+    return Variant(body=body, gzipped=packed if len(packed) < len(body) else None,
+                   etag=f'"{tag}"', gzip_etag=f'"{tag}-gz"')
+
+
+def _qvalue(params: str) -> float:
+    for param in params.split(";"):
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value.strip())
+            except ValueError:
+                # a malformed weight still names the coding; don't fail the request over it
+                return 1.0
+    return 1.0
+
+
+def _accepts_gzip(value: str) -> bool:
+    # an explicit gzip entry wins over "*", wherever each appears in the list
+    wildcard = None
+    for part in value.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if coding == "gzip":
+            return _qvalue(params) > 0
+        if coding == "*" and wildcard is None:
+            wildcard = _qvalue(params) > 0
+    return bool(wildcard)
+
+
+def _matches(value: str, variant: Variant) -> bool:
+    # weak comparison, as If-None-Match requires; either encoding's tag revalidates
+    for tag in value.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == variant.etag or tag == variant.gzip_etag:
+            return True
+    return False
+
+
+class Catalog:
+    """One catalog file: {"version": n, "languages": {lang: {...}}} -> item -> language -> Variant."""
+
+    def __init__(self, name: str, filename: str, items: Callable[[Dict[str, Any]], Mapping[str, Any]]):
+        self.name = name
+        self.path = os.path.join(CATALOG_DIR, filename)
+        # section of the file for one language -> {item key: response payload}
+        self._items = items
+        self.version: Any = None
+        self._variants: Dict[Tuple[str, str], Variant] = {}
+        self.stats = {"requests": 0, "not_modified": 0, "gzip": 0, "identity": 0, "bytes_sent": 0}
+
+    def load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        sections = data["languages"]
+        if DEFAULT_LANGUAGE not in sections:
+            raise ValueError(f"{self.path}: no '{DEFAULT_LANGUAGE}' section")
+        version = data.get("version", 1)
+        default = self._items(sections[DEFAULT_LANGUAGE])
+        variants = {}
+        for language in LANGUAGES:
+            items = {**default, **self._items(sections.get(language, {}))}
+            for key, payload in items.items():
+                variants[(key, language)] = _variant(f"{self.name}-{language}", version, payload)
+        # swap in one step so requests never see a half-loaded catalog
+        self.version, self._variants = version, variants
+
+    def keys(self) -> list:
+        return sorted({key for key, _ in self._variants})
+
+    def get(self, key: str, language: str = DEFAULT_LANGUAGE) -> Optional[Variant]:
+        return self._variants.get((key, language))
+
+    def respond(self, variant: Variant, headers: Mapping[str, str]) -> Response:
+        """The response for `variant` given the request headers (conditional and encoding aware)."""
+        self.stats["requests"] += 1
+        use_gzip = variant.gzipped is not None and _accepts_gzip(headers.get("accept-encoding", ""))
+        response_headers = {
+            "ETag": variant.gzip_etag if use_gzip else variant.etag,
+            "Cache-Control": _CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, variant):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=response_headers)
+        if use_gzip:
+            self.stats["gzip"] += 1
+            response_headers["Content-Encoding"] = "gzip"
+            body = variant.gzipped
+        else:
+            self.stats["identity"] += 1
+            body = variant.body
+        self.stats["bytes_sent"] += len(body)
+        return Response(content=body, media_type="application/json", headers=response_headers)
+
+    def info(self) -> Dict[str, Any]:
+        sizes = [(len(v.body), len(v.gzipped or v.body)) for v in self._variants.values()]
+        requests = self.stats["requests"]
+        return {
+            **self.stats,
+            "version": self.version,
+            "variants": len(self._variants),
+            "body_bytes": sum(raw for raw, _ in sizes),
+            "gzip_bytes": sum(packed for _, packed in sizes),
+            "not_modified_rate": round(self.stats["not_modified"] / requests, 4) if requests else None,
+        }
+
+
+class Catalogs:
+    def __init__(self, *catalogs: Catalog):
+        self._catalogs = {c.name: c for c in catalogs}
+
+    def __getitem__(self, name: str) -> Catalog:
+        return self._catalogs[name]
+
+    def load(self) -> None:
+        for catalog in self._catalogs.values():
+            catalog.load()
+
+    def reload(self) -> Dict[str, Any]:
+        """Re-read the files (e.g. after a new version is deployed); a broken file keeps the old data."""
+        result = {}
+        for name, catalog in self._catalogs.items():
+            try:
+                catalog.load()
+                result[name] = {"version": catalog.version}
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning("catalog %s not reloaded: %s", name, e)
+                result[name] = {"version": catalog.version, "error": str(e)}
+        return result
+
+    def info(self) -> Dict[str, Any]:
+        return {name: catalog.info() for name, catalog in self._catalogs.items()}
+
+
+# Claim guides: one item per policy type, answered as {"policy_type", "guide"}
+claim_guides = Catalog("claim_guides", "claim_guides.json",
+                       lambda section: {key: {"policy_type": key, "guide": guide} for key, guide in section.items()})
+# Survey questions: a single item, the whole section
+survey_questions = Catalog("survey_questions", "survey_questions.json",
+                           lambda section: {"questions": section} if section else {})
+
+catalogs = Catalogs(claim_guides, survey_questions)
+catalogs.load()
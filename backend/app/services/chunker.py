@@ -0,0 +1,361 @@
+# Structure-aware chunking of policy text for summarization: strips repeated page
+# headers/footers, splits on headings, numbered clauses and paragraphs, packs blocks
+# to a token budget and drops near-duplicate chunks (MinHash over word shingles) whose
+# figures (amounts, limits, percentages, days) all match the earlier chunk
+import os
+import re
+import zlib
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, FrozenSet, List, Set
+
+import numpy as np
+
+# Bump when the chunking rules change; part of the summarizer's PROMPT_VERSION
+CHUNKER_VERSION = "2"
+CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1000"))
+# Pages held back before the first chunk is emitted, so headers/footers can be recognized
+BOILERPLATE_WARMUP_PAGES = int(os.getenv("CHUNK_BOILERPLATE_WARMUP_PAGES", "6"))
+# Estimated Jaccard similarity above which a chunk counts as a repeat of an earlier one
+# (only if it also states exactly the same numbers; see Chunker._near_duplicate)
+CHUNK_DUP_THRESHOLD = float(os.getenv("CHUNK_DUP_THRESHOLD", "0.8"))
+
+# First/last non-empty lines of a page that are header/footer candidates
+_EDGE_LINES = 3
+# Longer edge lines are body text (a clause that happens to start a page), not running heads
+_EDGE_MAX_WORDS = 15
+# A heading starts a new chunk once the current one is at least this full
+_HEADING_BREAK_FILL = 0.4
+# Blocks shorter than this are never treated as duplicates (short list items repeat legitimately)
+_DUP_MIN_TOKENS = 12
+_SHINGLE = 5
+_MINHASH_PERMS = 64
+_LSH_BANDS = 16
+
+# Fixed seed: the same document must always produce the same chunks (summary cache keys)
+_rng = np.random.default_rng(0x5EED)
+_HASH_A = _rng.integers(0, 1 << 63, size=_MINHASH_PERMS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_HASH_B = _rng.integers(0, 1 << 63, size=_MINHASH_PERMS, dtype=np.uint64)
+
+# Latin words, digit runs, Devanagari runs (letters and matras), or any other single symbol
+_TOKEN_PIECES = re.compile(r"[A-Za-z]+|[0-9]+|[ऀ-ॣ०-ॿ]+|\S")
+_WORD = re.compile(r"[a-z0-9]+|[ऀ-ॣ०-ॿ]+")
+_DIGITS = re.compile(r"\d+")
+_PAGE_NUMBER = re.compile(r"^(page|pg\.?|पृष्ठ)?\s*#\s*((of|/)\s*#)?$")
+_HEADING = re.compile(
+    r"^(section|chapter|part|schedule|annexure|appendix|article|clause|खंड|धारा|अनुभाग|अध्याय)\b",
+    re.IGNORECASE,
+)
+_CLAUSE_START = re.compile(r"^(\(?\d{1,3}(\.\d{1,3})*[.)]\s|\(?[a-z]\)\s|\(?[ivx]{1,5}\)\s|[-•*▪●◦]\s)", re.IGNORECASE)
+_CLAUSE_PREFIX = re.compile(r"^(\(?\d{1,3}(\.\d{1,3})*[.)]|\(?[a-z]\)|\(?[ivx]{1,5}\)|[-•*▪●◦])\s*", re.IGNORECASE)
+_SENTENCE_END = re.compile(r"[.:;?!।]$")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.?!।])\s+")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Local approximation of a BPE tokenizer: short Latin words are one token and long
+    ones a token per ~8 letters, digits go in groups of three, Devanagari costs a token
+    per ~2 characters and every other symbol is one token. Whitespace is free.
+    """
+    total = 0
+    for piece in _TOKEN_PIECES.findall(text):
+        c = piece[0]
+        if c.isascii() and c.isalpha():
+            total += 1 + len(piece) // 8
+        elif c.isdigit():
+            total += (len(piece) + 2) // 3
+        elif "ऀ" <= c <= "ॿ" and len(piece) > 1:
+            total += (len(piece) + 1) // 2
+        else:
+            total += 1
+    return total
+
+
+def _line_key(line: str) -> str:
+    return " ".join(line.lower().split())
+
+
+def _edge_key(line: str) -> str:
+    # "Page 3 of 20" and "Page 4 of 20" share a key; so do dated footers
+    return _DIGITS.sub("#", _line_key(line))
+
+
+def _dup_key(text: str) -> str:
+    # clause numbering and punctuation differ between copies of the same clause
+    return " ".join(_WORD.findall(_CLAUSE_PREFIX.sub("", text.lower())))
+
+
+def _is_heading(line: str) -> bool:
+    if _HEADING.match(line):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    # short all-caps lines ("WHAT IS NOT COVERED?") are headings in most policy wordings
+    return (len(letters) >= 4 and len(line.split()) <= 10 and line.upper() == line
+            and all(c.isascii() for c in letters) and not line.endswith("."))
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature (_MINHASH_PERMS uint64 values) of the text's word shingles."""
+    words = _WORD.findall(text.lower())
+    size = min(_SHINGLE, max(1, len(words)))
+    return minhash_shingles({" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))})
+
+
+def minhash_shingles(shingles: Set[str]) -> np.ndarray:
+    """MinHash signature of a non-empty set of shingles; values fit in 32 bits."""
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # multiply-shift hashing: (a*x + b) mod 2^64 (uint64 wraps), top 32 bits
+    with np.errstate(over="ignore"):
+        return ((np.outer(hashes, _HASH_A) + _HASH_B) >> np.uint64(32)).min(axis=0)
+
+
+@dataclass
+class Block:
+    text: str
+    tokens: int
+    heading: bool = False
+
+
+@dataclass
+class ChunkStats:
+    pages: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    chunks: int = 0
+    boilerplate_lines: int = 0
+    boilerplate_tokens: int = 0
+    duplicate_blocks: int = 0
+    duplicate_chunks: int = 0
+    duplicate_tokens: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        saved = self.input_tokens - self.output_tokens
+        data["token_reduction_pct"] = round(100.0 * saved / self.input_tokens, 1) if self.input_tokens else 0.0
+        return data
+
+
+class Chunker:
+    """
+    Incremental chunker fed one page at a time (add_page), so summarization can start
+    while later pages are still being extracted; flush() returns the remainder.
+
+    A line whose digit-normalized form appears at the top or bottom of at least two
+    pages and 40% of the pages seen, or that appears verbatim anywhere on three pages
+    and 60% of them, is boilerplate: its first occurrence is kept, repeats are dropped. Page-number-only
+    lines are always dropped. The first BOILERPLATE_WARMUP_PAGES pages are held back
+    until there is enough evidence to decide.
+    """
+
+    def __init__(self, budget: int = CHUNK_TOKENS, warmup_pages: int = BOILERPLATE_WARMUP_PAGES,
+                 dup_threshold: float = CHUNK_DUP_THRESHOLD):
+        self.budget = max(50, budget)
+        self.warmup_pages = max(1, warmup_pages)
+        self.dup_threshold = dup_threshold
+        self.stats = ChunkStats()
+        self._held: List[List[str]] = []
+        self._edge_counts: Dict[str, int] = {}
+        self._line_counts: Dict[str, int] = {}
+        self._kept_boilerplate: Set[str] = set()
+        self._block_keys: Set[str] = set()
+        self._current: List[Block] = []
+        self._used = 0
+        self._signatures: List[np.ndarray] = []
+        self._figures: List[FrozenSet[str]] = []
+        self._bands: Dict[tuple, List[int]] = {}
+
+    # -- page intake -------------------------------------------------------------
+
+    def add_page(self, text: str) -> List[str]:
+        lines = [line.strip() for line in (text or "").splitlines()]
+        self.stats.pages += 1
+        self.stats.input_tokens += count_tokens(text or "")
+        self._observe(lines)
+        self._held.append(lines)
+        if self.stats.pages < self.warmup_pages:
+            return []
+        return self._release()
+
+    def flush(self) -> List[str]:
+        out = self._release()
+        if self._current:
+            out.extend(self._emit(self._current))
+            self._current, self._used = [], 0
+        return out
+
+    def _observe(self, lines: List[str]) -> None:
+        non_empty = [line for line in lines if line]
+        edges = {_edge_key(line) for line in non_empty[:_EDGE_LINES] + non_empty[-_EDGE_LINES:]
+                 if len(line.split()) <= _EDGE_MAX_WORDS}
+        for key in edges:
+            self._edge_counts[key] = self._edge_counts.get(key, 0) + 1
+        for key in {_line_key(line) for line in non_empty}:
+            self._line_counts[key] = self._line_counts.get(key, 0) + 1
+
+    def _is_boilerplate(self, line: str) -> bool:
+        pages = self.stats.pages
+        edge = self._edge_counts.get(_edge_key(line), 0)
+        anywhere = self._line_counts.get(_line_key(line), 0)
+        return ((edge >= 2 and edge >= 0.4 * pages)
+                or (anywhere >= 3 and anywhere >= 0.6 * pages))
+
+    def _release(self) -> List[str]:
+        out: List[str] = []
+        for lines in self._held:
+            for block in self._blocks(self._strip(lines)):
+                out.extend(self._add_block(block))
+        self._held = []
+        return out
+
+    def _strip(self, lines: List[str]) -> List[str]:
+        kept = []
+        for line in lines:
+            if line:
+                key = _edge_key(line)
+                page_number = bool(_PAGE_NUMBER.match(key))
+                if page_number or self._is_boilerplate(line):
+                    if page_number or key in self._kept_boilerplate:
+                        self.stats.boilerplate_lines += 1
+                        self.stats.boilerplate_tokens += count_tokens(line)
+                        continue
+                    self._kept_boilerplate.add(key)
+            kept.append(line)
+        return kept
+
+    # -- structure -------------------------------------------------------------
+
+    def _blocks(self, lines: List[str]) -> List[Block]:
+        """Group lines into paragraphs, clauses and headings."""
+        blocks: List[Block] = []
+        current: List[str] = []
+
+        def close():
+            if current:
+                text = current[0]
+                for line in current[1:]:
+                    # re-join words hyphenated across a line break
+                    if text.endswith("-") and line[:1].islower():
+                        text = text[:-1] + line
+                    else:
+                        text = f"{text} {line}"
+                blocks.append(Block(text, count_tokens(text)))
+                current.clear()
+
+        for line in lines:
+            if not line:
+                close()
+                continue
+            if _is_heading(line):
+                close()
+                blocks.append(Block(line, count_tokens(line), heading=True))
+                continue
+            if current and (_CLAUSE_START.match(line) or _SENTENCE_END.search(current[-1])):
+                close()
+            current.append(line)
+        close()
+        return blocks
+
+    def _add_block(self, block: Block) -> List[str]:
+        out: List[str] = []
+        if not block.heading and block.tokens >= _DUP_MIN_TOKENS:
+            key = _dup_key(block.text)
+            if key in self._block_keys:
+                self.stats.duplicate_blocks += 1
+                self.stats.duplicate_tokens += block.tokens
+                return out
+            self._block_keys.add(key)
+        if block.tokens > self.budget:
+            for piece in self._split_long(block):
+                out.extend(self._add_block(piece))
+            return out
+        if block.heading and self._used >= _HEADING_BREAK_FILL * self.budget:
+            out.extend(self._close_chunk())
+        elif self._current and self._used + block.tokens > self.budget:
+            out.extend(self._close_chunk())
+        self._current.append(block)
+        self._used += block.tokens
+        return out
+
+    def _close_chunk(self) -> List[str]:
+        # a trailing heading belongs with the text that follows it
+        carry = []
+        while self._current and self._current[-1].heading:
+            carry.insert(0, self._current.pop())
+        out = self._emit(self._current) if self._current else []
+        self._current = carry
+        self._used = sum(b.tokens for b in carry)
+        return out
+
+    def _split_long(self, block: Block) -> List[Block]:
+        """Sentence-pack a block that does not fit the budget on its own; cut words as a last resort."""
+        pieces: List[Block] = []
+        current, used = [], 0
+        units: List[str] = []
+        for sentence in _SENTENCE_SPLIT.split(block.text):
+            if count_tokens(sentence) <= self.budget:
+                units.append(sentence)
+                continue
+            words = sentence.split()
+            step = max(1, len(words) * self.budget // (count_tokens(sentence) + 1))
+            units.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+        for unit in units:
+            cost = count_tokens(unit)
+            if current and used + cost > self.budget:
+                text = " ".join(current)
+                pieces.append(Block(text, count_tokens(text)))
+                current, used = [], 0
+            current.append(unit)
+            used += cost
+        if current:
+            text = " ".join(current)
+            pieces.append(Block(text, count_tokens(text)))
+        return pieces
+
+    # -- near-duplicate chunks ---------------------------------------------------
+
+    def _emit(self, blocks: List[Block]) -> List[str]:
+        text = "\n".join(b.text for b in blocks)
+        tokens = sum(b.tokens for b in blocks)
+        if not text.strip():
+            return []
+        # a headings-only tail is not worth hashing
+        if not all(b.heading for b in blocks) and self._near_duplicate(text):
+            self.stats.duplicate_chunks += 1
+            self.stats.duplicate_tokens += tokens
+            return []
+        self.stats.chunks += 1
+        self.stats.output_tokens += tokens
+        return [text]
+
+    def _near_duplicate(self, text: str) -> bool:
+        # plan tables and schedules repeat their wording with different sums insured,
+        # co-pays and waiting periods; a chunk with any figure of its own is never a repeat
+        figures = frozenset(_DIGITS.findall(text))
+        signature = minhash(text)
+        rows = _MINHASH_PERMS // _LSH_BANDS
+        bands = [(b,) + tuple(signature[b * rows:(b + 1) * rows].tolist()) for b in range(_LSH_BANDS)]
+        candidates = {i for band in bands for i in self._bands.get(band, ())}
+        for i in candidates:
+            if self._figures[i] == figures and float(np.mean(self._signatures[i] == signature)) >= self.dup_threshold:
+                return True
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._figures.append(figures)
+        for band in bands:
+            self._bands.setdefault(band, []).append(index)
+        return False
+
+
+def chunk_pages(pages: List[str], budget: int = CHUNK_TOKENS) -> Dict[str, Any]:
+    """Chunk a whole document at once. Returns {'chunks': [...], 'stats': {...}}."""
+    chunker = Chunker(budget)
+    chunks: List[str] = []
+    for page in pages:
+        chunks.extend(chunker.add_page(page))
+    chunks.extend(chunker.flush())
+    return {"chunks": chunks, "stats": chunker.stats.to_dict()}
+
+
+def chunk_text(text: str, budget: int = CHUNK_TOKENS) -> List[str]:
+    """Chunk plain text; form feeds are treated as page breaks."""
+    return chunk_pages((text or "").split("\f"), budget)["chunks"]
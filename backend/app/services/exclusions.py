@@ -0,0 +1,214 @@
+# Rule-based extraction of policy exclusions (no LLM calls)
+#
+# A precompiled phrase trie finds heading lines ("Exclusions", "What is not covered",
+# "अपवाद", and the headings that end such sections) in one pass over the lower-cased
+# document; the exclusion sections' bullet or numbered items are then collected and
+# de-duplicated. Linear in the document length.
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .tracing import traced
+
+EXCLUSION_HEADINGS = [
+    "exclusions",
+    "general exclusions",
+    "specific exclusions",
+    "permanent exclusions",
+    "what is not covered",
+    "what we will not cover",
+    "what is excluded",
+    "not covered",
+    "we will not pay",
+    "the company shall not be liable",
+    "अपवाद",
+    "अपवर्जन",
+    "बहिष्करण",
+    "क्या कवर नहीं है",
+    "जो कवर नहीं है",
+]
+
+# Headings that close an exclusion section
+SECTION_HEADINGS = [
+    "conditions",
+    "general conditions",
+    "claim procedure",
+    "claims procedure",
+    "how to claim",
+    "definitions",
+    "benefits",
+    "coverage",
+    "what is covered",
+    "scope of cover",
+    "premium",
+    "cancellation",
+    "renewal",
+    "grievance",
+    "waiting period",
+    "sum insured",
+    "शर्तें",
+    "दावा प्रक्रिया",
+    "लाभ",
+    "क्या कवर है",
+    "प्रीमियम",
+]
+
+MAX_HEADING_CHARS = 80
+MAX_SECTION_CHARS = 12000
+MAX_ITEM_CHARS = 400
+MIN_ITEM_CHARS = 3
+
+_EXCLUSION, _SECTION = 0, 1
+
+# "•", "-", "*", "1.", "1)", "(a)", "a)", "iv.", "(iv)", "१.", ...
+_BULLET = re.compile(
+    r"^\s*(?:[•●▪◦‣\-–*·o]\s+|\(?(?:\d{1,3}|[a-zA-Z]|[ivxlIVXL]{1,5}|[०-९]{1,3})[.)]\s+|\((?:\d{1,3}|[a-zA-Z]|[ivxlIVXL]{1,5})\)\s*)"
+)
+_HEADING_PREFIX = re.compile(
+    r"[\s#*]*(?:(?:section|part|खंड)\s+)?(?:(?:\d{1,3}(?:\.\d+)*|[a-z]|[ivxl]{1,4}|[०-९]{1,3})[.)]?\s+)?[\s\-–:]*"
+)
+_LINE = re.compile(r"[^\n]+")
+_NORMALIZE = re.compile(r"[^\w\s]|\d", re.UNICODE)
+_TRAILING = re.compile(r"[\s;,.:]+(?:and|or|और|या)?[\s;,.:]*$", re.IGNORECASE)
+
+
+class PhraseTrie:
+    """
+    Precompiled multi-pattern matcher (the goto trie of an Aho-Corasick automaton).
+    Heading phrases are anchored at the start of their line, so matching is a single
+    walk from that position and failure links are never needed: each line costs at
+    most the length of the longest phrase, whatever the number of phrases.
+    """
+
+    def __init__(self, patterns: List[Tuple[str, int]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._tag: List[Optional[int]] = [None]
+        for pattern, tag in patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._tag.append(None)
+                state = nxt
+            self._tag[state] = tag
+
+    def match_at(self, text: str, pos: int) -> List[Tuple[int, int]]:
+        """(end, tag) of every phrase that starts at text[pos], shortest first."""
+        goto, tags = self._goto, self._tag
+        matches = []
+        state = 0
+        for i in range(pos, len(text)):
+            state = goto[state].get(text[i])
+            if state is None:
+                break
+            if tags[state] is not None:
+                matches.append((i + 1, tags[state]))
+        return matches
+
+
+_MATCHER = PhraseTrie(
+    [(p, _EXCLUSION) for p in EXCLUSION_HEADINGS] + [(p, _SECTION) for p in SECTION_HEADINGS]
+)
+
+
+def _heading_tag(line: str) -> Optional[int]:
+    """
+    Tag of a heading line, or None. A heading is a short line that starts (after optional
+    "Section 2.1 -" style numbering) with a known phrase and has little after it:
+    "Exclusions:", "EXCLUSIONS (applicable to all sections)", "What is not covered?".
+    """
+    if len(line) > MAX_HEADING_CHARS and len(line.strip()) > MAX_HEADING_CHARS:
+        return None
+    pos = _HEADING_PREFIX.match(line).end()
+    best = None
+    for end, tag in _MATCHER.match_at(line, pos):
+        # whole words only ("conditions" must not fire on "conditionsxyz")
+        if end < len(line) and line[end].isalpha():
+            continue
+        rest = line[end:].strip()
+        if rest == "" or rest[0] in ":?-–(" or len(rest) <= 30 and rest.endswith(":"):
+            best = tag
+    return best
+
+
+def _headings(lowered: str) -> List[Tuple[int, int, int]]:
+    """(line_start, line_end, tag) of heading lines, in document order."""
+    found: List[Tuple[int, int, int]] = []
+    for m in _LINE.finditer(lowered):
+        tag = _heading_tag(m.group())
+        if tag is not None:
+            found.append((m.start(), m.end(), tag))
+    return found
+
+
+def _clean_item(raw: str) -> str:
+    item = " ".join(raw.split())
+    item = _TRAILING.sub("", item)
+    return item[:1].upper() + item[1:] if item else item
+
+
+def _section_items(section: str) -> List[str]:
+    bulleted: List[str] = []
+    paragraphs: List[str] = []
+    current: List[str] = []
+    in_bullet = False
+
+    def flush():
+        if current:
+            (bulleted if in_bullet else paragraphs).append(" ".join(current))
+            current.clear()
+
+    for line in section.split("\n"):
+        if not line.strip():
+            flush()
+            in_bullet = False
+            continue
+        bullet = _BULLET.match(line)
+        if bullet:
+            flush()
+            in_bullet = True
+            current.append(line[bullet.end():].strip())
+        else:
+            current.append(line.strip())
+    flush()
+    # Intro lines ("We will not pay for the following:") are dropped when the section has
+    # bullets; unbulleted sections fall back to one item per paragraph.
+    return bulleted or paragraphs
+
+
+@traced()
+def extract_exclusions(text: str, max_items: int = 50) -> List[str]:
+    """
+    Return the de-duplicated exclusion items found under "Exclusions" / "What is not
+    covered" / "अपवाद"-style headings, in document order.
+    """
+    if not text:
+        return []
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # a few characters (e.g. "İ") lower-case to two code points; keep offsets aligned
+        lowered = "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+    headings = _headings(lowered)
+
+    results: List[str] = []
+    seen = set()
+    for i, (_, line_end, tag) in enumerate(headings):
+        if tag != _EXCLUSION:
+            continue
+        # the section runs to the next heading of any kind
+        section_end = headings[i + 1][0] if i + 1 < len(headings) else len(text)
+        section = text[line_end:min(section_end, line_end + MAX_SECTION_CHARS)]
+        for raw in _section_items(section):
+            item = _clean_item(raw)
+            if not MIN_ITEM_CHARS <= len(item) <= MAX_ITEM_CHARS:
+                continue
+            key = " ".join(_NORMALIZE.sub(" ", item.lower()).split())
+            if key and key not in seen:
+                seen.add(key)
+                results.append(item)
+                if len(results) >= max_items:
+                    return results
+    return results
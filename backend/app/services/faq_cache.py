@@ -0,0 +1,470 @@
+# Approximate-match answer cache for recurring chat questions
+#
+# Messages are normalized (case, punctuation, Devanagari -> Latin transliteration,
+# Hinglish spelling folding, a small Hinglish -> English lexicon, stopwords, word order)
+# into a set of content words. Candidates come from character trigrams of the words'
+# consonant skeletons: a MinHash signature per entry and its LSH band keys live in NumPy
+# arrays, so a lookup is one vectorized band comparison over every entry and a signature
+# estimate on the few candidates. The best ones are verified word by word, since one
+# swapped word (PMSBY/PMJJBY, claim/cancel, crop/health, Punjab/Bihar) changes the answer
+# while trigrams barely move: every content word has to find its counterpart. Only
+# questions asked without a policy and without earlier turns are stored, so every
+# cached answer stands on its own.
+import os
+import re
+import json
+import time
+import logging
+import unicodedata
+from collections import deque
+from typing import Any, Deque, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from .chunker import minhash_shingles
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cache"))
+FAQ_CACHE_ENABLED = os.getenv("FAQ_CACHE_ENABLED", "1") != "0"
+# Word-level similarity (see similarity()) at or above which a stored answer is reused;
+# below 1 only through leftover question words
+FAQ_CACHE_THRESHOLD = float(os.getenv("FAQ_CACHE_THRESHOLD", "0.75"))
+FAQ_CACHE_MAX_ENTRIES = int(os.getenv("FAQ_CACHE_MAX_ENTRIES", "5000"))
+FAQ_CACHE_TTL = float(os.getenv("FAQ_CACHE_TTL_HOURS", "72")) * 3600
+# Pinned entries survive restarts in this file
+FAQ_PINNED_PATH = os.getenv("FAQ_PINNED_PATH", os.path.join(CACHE_DIR, "faq_pinned.json"))
+# Messages with fewer content words ("claim?", "hello") are too ambiguous to answer from cache
+FAQ_MIN_TOKENS = 2
+
+_NGRAM = 3
+_PERMS = 64
+_BANDS = 16
+_ROWS = _PERMS // _BANDS
+_CANDIDATES = 4
+_LATENCY_SAMPLES = 1024
+_LANGS = {"en": 0, "hi": 1}
+
+# Devanagari -> Latin, close to how people type Hindi in Latin script
+_CONSONANTS = {
+    "क": "k", "ख": "kh", "ग": "g", "घ": "gh", "ङ": "n", "च": "ch", "छ": "chh", "ज": "j", "झ": "jh",
+    "ञ": "n", "ट": "t", "ठ": "th", "ड": "d", "ढ": "dh", "ण": "n", "त": "t", "थ": "th", "द": "d",
+    "ध": "dh", "न": "n", "प": "p", "फ": "ph", "ब": "b", "भ": "bh", "म": "m", "य": "y", "र": "r",
+    "ल": "l", "व": "v", "श": "sh", "ष": "sh", "स": "s", "ह": "h", "क़": "k", "ख़": "kh", "ग़": "g",
+    "ज़": "z", "ड़": "r", "ढ़": "rh", "फ़": "f", "य़": "y",
+}
+_VOWELS = {"अ": "a", "आ": "aa", "इ": "i", "ई": "ii", "उ": "u", "ऊ": "uu", "ऋ": "ri", "ए": "e", "ऐ": "ai",
+           "ओ": "o", "औ": "au", "ऑ": "o"}
+_MATRAS = {"ा": "aa", "ि": "i", "ी": "ii", "ु": "u", "ू": "uu", "ृ": "ri", "े": "e", "ै": "ai", "ो": "o",
+           "ौ": "au", "ॉ": "o"}
+_VIRAMA, _NUKTA = "्", "़"
+_NASALS = {"ं": "n", "ँ": "n", "ः": "h"}
+_DEVANAGARI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+
+# Spelling variants of romanized Hindi (and English) folded to one form, in order
+_FOLDS = [
+    (re.compile(r"ph"), "f"), (re.compile(r"ck|q"), "k"), (re.compile(r"z"), "j"), (re.compile(r"w"), "v"),
+    (re.compile(r"c(?=[eiy])"), "s"), (re.compile(r"c(?!h)"), "k"), (re.compile(r"([kgtdbpj])h"), r"\1"),
+    (re.compile(r"ai|ay|ei|ey"), "e"), (re.compile(r"ee|ii"), "i"), (re.compile(r"oo|uu"), "u"),
+    (re.compile(r"au|ou"), "o"), (re.compile(r"(.)\1+"), r"\1"), (re.compile(r"(?<=[aeiou])n$"), ""),
+    (re.compile(r"(?<=.[^aeiou])a$"), ""),
+]
+# Common Hinglish words -> the English word they stand for (matched after folding)
+_LEXICON = {
+    "kaise": "how", "kese": "how", "kaisa": "how", "kab": "when", "kahan": "where", "kaha": "where",
+    "kyon": "why", "kyun": "why", "kyu": "why", "kitna": "much", "kitni": "much", "kitne": "much",
+    # what / which / who are one question word: "kaun" covers all three
+    "kya": "what", "kaun": "what", "kon": "what", "konse": "what", "kaunse": "what", "kaunsa": "what",
+    "konsa": "what", "which": "what", "who": "what",
+    "dava": "claim", "daava": "claim", "klem": "claim", "bima": "insurance", "beema": "insurance",
+    "insurence": "insurance", "fasal": "crop", "fasl": "crop", "kisan": "farmer", "nuksan": "loss",
+    "nuksaan": "loss", "prakriya": "process", "tarika": "process", "dastavej": "documents", "kagaj": "documents",
+    "kagjat": "documents", "document": "documents", "docs": "documents", "paisa": "money", "paise": "money",
+    "rashi": "amount", "milega": "get", "milta": "get", "milti": "get", "paana": "get", "nahi": "not",
+    "nahin": "not", "na": "not", "no": "not", "mat": "not", "jama": "submit", "bharna": "fill", "bhare": "fill",
+    "chahiye": "need", "chahie": "need", "chaiye": "need", "jaruri": "need", "avashyak": "need", "needed": "need",
+    "required": "need", "require": "need", "dekhe": "check", "dekhna": "check", "dekhen": "check",
+    "eligibility": "eligible", "patra": "eligible", "yogya": "eligible",
+    "kist": "premium", "samay": "time", "din": "days", "baad": "after", "pehle": "before",
+    "naveenikaran": "renew", "rinyu": "renew", "yojana": "scheme", "yojna": "scheme", "plan": "scheme",
+    "apply": "file", "darj": "file", "aavedan": "file", "avedan": "file",
+}
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "am", "was", "be", "to", "do", "does", "did", "i", "my", "me", "we", "our",
+    "of", "for", "in", "on", "at", "it", "this", "that", "please", "plz", "pls", "can", "could", "would", "you",
+    "your", "tell", "sir", "madam", "ji", "hi", "hello", "hey", "about", "kindly", "want", "know",
+    "hai", "h", "he", "hain", "ho", "hota", "hoti", "hote", "mujhe", "muje", "mera", "meri", "mere", "ka", "ki",
+    "ke", "ko", "mein", "main", "se", "to", "bhi", "batao", "bataiye", "bataye", "bata", "kar", "kare", "karen",
+    "karein", "karna", "karu", "kr", "krna", "aur", "ya", "ab", "apna", "apni", "apne", "liye", "lie", "wala",
+    "wali", "hum", "ham", "hame", "hamein", "hamara", "process", "file", "make", "s", "all", "under", "given",
+    "give", "lagta", "lagti", "lagte", "will", "shall", "should",
+}
+# Content words that may be left unmatched: a bare question word or "need" rarely changes
+# the answer ("documents for claim?" / "what documents are needed for claim?")
+_LIGHT = {"what", "need"}
+# Words whose presence or value changes the answer; entries only match with the same set
+_GUARD = re.compile(r"^(\d+|not|after|before)$")
+_SPLIT = re.compile(r"[^a-z0-9]+")
+_DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+_DEVANAGARI_WORD = re.compile(r"[ऀ-ॿ]+")
+_VOWEL_LETTERS = re.compile(r"[aeiouy]")
+
+_rng = np.random.default_rng(0xFA9)
+# odd multipliers folding each band's rows into one uint64 key
+_BAND_MIX = _rng.integers(0, 1 << 62, size=_ROWS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+
+def _syllables(word: str) -> List[List[str]]:
+    """[consonants, vowel] units of a Devanagari word; vowel None is the inherent "a"."""
+    units: List[List[str]] = []
+    for ch in word:
+        if ch in _CONSONANTS:
+            if units and units[-1][1] == "":
+                units[-1] = [units[-1][0] + _CONSONANTS[ch], None]   # conjunct after a virama
+            else:
+                units.append([_CONSONANTS[ch], None])
+        elif ch in _MATRAS and units and units[-1][1] is None:
+            units[-1][1] = _MATRAS[ch]
+        elif ch == _VIRAMA and units and units[-1][1] is None:
+            units[-1][1] = ""
+        elif ch in _VOWELS:
+            units.append(["", _VOWELS[ch]])
+        elif ch in _NASALS and units:
+            units[-1][1] = (units[-1][1] or "a") + _NASALS[ch]
+    return units
+
+
+def _romanize(word: str) -> str:
+    units = _syllables(word)
+    if len(units) > 1 and units[-1][1] is None:
+        units[-1][1] = ""                             # final schwa is silent
+    # medial schwa deletion: V C(a) C V -> V C C V, right to left, never twice in a row
+    i = len(units) - 2
+    while i > 0:
+        if units[i][1] is None and units[i][0] and units[i + 1][0] and units[i + 1][1] and units[i - 1][1]:
+            units[i][1] = ""
+            i -= 2
+        else:
+            i -= 1
+    return "".join(c + ("a" if v is None else v) for c, v in units)
+
+
+def transliterate(text: str) -> str:
+    """Devanagari words to Latin, close to how people type Hindi; other text passes through."""
+    text = unicodedata.normalize("NFC", text).replace(_NUKTA, "")
+    return _DEVANAGARI_WORD.sub(lambda m: _romanize(m.group(0)), text)
+
+
+def _fold(token: str) -> str:
+    for pattern, repl in _FOLDS:
+        token = pattern.sub(repl, token)
+    return token
+
+
+# Lexicon and stopwords as they look after folding
+_LEXICON_FOLDED = {_fold(k): _fold(v) for k, v in _LEXICON.items()}
+_STOPWORDS_FOLDED = {_fold(w) for w in _STOPWORDS}
+_LIGHT_FOLDED = {_fold(w) for w in _LIGHT}
+
+
+def normalize(text: str) -> Tuple[str, ...]:
+    """Content words of a message in canonical form, deduplicated and sorted."""
+    text = unicodedata.normalize("NFKC", text or "").lower().translate(_DEVANAGARI_DIGITS)
+    if _DEVANAGARI.search(text):
+        text = transliterate(text)
+    tokens = set()
+    for word in _SPLIT.split(text):
+        if not word:
+            continue
+        word = _fold(word)
+        word = _LEXICON_FOLDED.get(word, word)
+        if word and word not in _STOPWORDS_FOLDED:
+            tokens.add(word)
+    return tuple(sorted(tokens))
+
+
+def skeleton(token: str) -> str:
+    """Consonants of a word: what stays put across Hinglish spellings (status/stetas, premium/priimiyam)."""
+    return _VOWEL_LETTERS.sub("", token) or token
+
+
+def trigrams(tokens: Tuple[str, ...]) -> FrozenSet[str]:
+    """Character trigrams of the words' skeletons, the shingles behind the MinHash signature."""
+    grams = set()
+    for token in tokens:
+        padded = f"#{skeleton(token)}#"
+        grams.update(padded[i:i + _NGRAM] for i in range(max(1, len(padded) - _NGRAM + 1)))
+    return frozenset(grams)
+
+
+def similarity(a: Tuple[str, ...], b: Tuple[str, ...]) -> float:
+    """
+    Share of content words matched, counting two words as one when their skeletons agree.
+    0 when a content word (other than _LIGHT ones) on either side has no counterpart:
+    one swapped noun (crop/health, Punjab/Bihar) changes the answer, however many words agree.
+    """
+    same = set(a) & set(b)
+    rest_a = [t for t in a if t not in same]
+    rest_b = [t for t in b if t not in same]
+    matched = len(same)
+    for token in list(rest_a):
+        skel = skeleton(token)
+        if len(skel) < 2:
+            continue
+        other = next((t for t in rest_b if skeleton(t) == skel), None)
+        if other is not None:
+            rest_a.remove(token)
+            rest_b.remove(other)
+            matched += 1
+    if any(t not in _LIGHT_FOLDED for t in rest_a + rest_b):
+        return 0.0
+    # leftover light words only dilute the score (half weight each)
+    return matched / (matched + 0.5 * (len(rest_a) + len(rest_b))) if matched else 0.0
+
+
+def _guards(tokens: Tuple[str, ...]) -> Tuple[str, ...]:
+    return tuple(t for t in tokens if _GUARD.match(t))
+
+
+def _band_keys(signature: np.ndarray) -> np.ndarray:
+    with np.errstate(over="ignore"):
+        return (signature.reshape(_BANDS, _ROWS).astype(np.uint64) * _BAND_MIX).sum(axis=1, dtype=np.uint64)
+
+
+class FAQCache:
+    """Fixed-capacity answer cache; rows of the arrays are entries, freed rows are reused."""
+
+    def __init__(self, capacity: int = FAQ_CACHE_MAX_ENTRIES, threshold: float = FAQ_CACHE_THRESHOLD,
+                 ttl: float = FAQ_CACHE_TTL, pinned_path: Optional[str] = FAQ_PINNED_PATH):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.pinned_path = pinned_path
+        self._sigs = np.zeros((capacity, _PERMS), dtype=np.uint32)
+        self._bands = np.zeros((capacity, _BANDS), dtype=np.uint64)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._pinned = np.zeros(capacity, dtype=bool)
+        self._lang = np.zeros(capacity, dtype=np.uint8)
+        self._used = np.zeros(capacity, dtype=np.float64)     # last hit or store, for LRU eviction
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._hits = np.zeros(capacity, dtype=np.int64)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._rows: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._exact: Dict[Tuple[int, Tuple[str, ...]], int] = {}
+        self._by_id: Dict[int, int] = {}
+        self._free = list(range(capacity - 1, -1, -1))
+        self._next_id = 1
+        self._latency: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self.stats = {
+            "lookups": 0, "hits": 0, "exact_hits": 0, "too_short": 0, "stored": 0,
+            "evicted": 0, "expired": 0,
+        }
+
+    # -- lookup / store ---------------------------------------------------------
+
+    @traced("faq_cache.lookup")
+    def lookup(self, message: str, language: str) -> Optional[Dict[str, Any]]:
+        """The cached entry answering `message` ({id, question, answer, similarity, ...}) or None."""
+        started = time.perf_counter()
+        self.stats["lookups"] += 1
+        try:
+            tokens = normalize(message)
+            if len(tokens) < FAQ_MIN_TOKENS:
+                self.stats["too_short"] += 1
+                return None
+            lang = _LANGS.get(language, 0)
+            row = self._exact.get((lang, tokens))
+            if row is not None and self._live(row):
+                self.stats["exact_hits"] += 1
+                return self._hit(row, 1.0)
+            row, similarity = self._nearest(tokens, lang)
+            if row is None or similarity < self.threshold:
+                return None
+            return self._hit(row, similarity)
+        finally:
+            self._latency.append(time.perf_counter() - started)
+
+    def _nearest(self, tokens: Tuple[str, ...], lang: int) -> Tuple[Optional[int], float]:
+        grams = trigrams(tokens)
+        signature = minhash_shingles(set(grams)).astype(np.uint32)
+        bands = _band_keys(signature)
+        candidates = np.flatnonzero(
+            self._alive & (self._lang == lang) & (self._bands == bands).any(axis=1)
+        )
+        if not len(candidates):
+            return None, 0.0
+        estimate = (self._sigs[candidates] == signature).sum(axis=1)
+        best, best_similarity = None, 0.0
+        guards = _guards(tokens)
+        for row in candidates[np.argsort(-estimate, kind="stable")[:_CANDIDATES]].tolist():
+            entry = self._rows[row]
+            if entry["guards"] != guards or not self._live(row):
+                continue
+            score = similarity(tokens, entry["tokens"])
+            if score > best_similarity:
+                best, best_similarity = row, score
+        return best, best_similarity
+
+    def _live(self, row: int) -> bool:
+        if self._pinned[row] or self._expires[row] > time.time():
+            return True
+        self._remove(row)
+        self.stats["expired"] += 1
+        return False
+
+    def _hit(self, row: int, similarity: float) -> Dict[str, Any]:
+        self.stats["hits"] += 1
+        self._hits[row] += 1
+        self._used[row] = time.time()
+        entry = self._rows[row]
+        return {"id": int(self._ids[row]), "question": entry["question"], "answer": entry["answer"],
+                "similarity": round(similarity, 3), "pinned": bool(self._pinned[row])}
+
+    def add(self, question: str, language: str, answer: str, pinned: bool = False) -> Optional[int]:
+        """Store an answer; returns the entry id (None if the question is too short to match on)."""
+        tokens = normalize(question)
+        if len(tokens) < FAQ_MIN_TOKENS or not answer.strip():
+            return None
+        lang = _LANGS.get(language, 0)
+        row = self._exact.get((lang, tokens))
+        if row is not None:
+            # same question again: keep the entry, refresh it (and its answer if pinning)
+            if pinned:
+                self._rows[row]["answer"] = answer
+                self._pinned[row] = True
+            self._expires[row] = time.time() + self.ttl
+            return int(self._ids[row])
+        if not self._free and not self._evict_lru():
+            return None
+        row = self._free.pop()
+        grams = trigrams(tokens)
+        self._sigs[row] = minhash_shingles(set(grams)).astype(np.uint32)
+        self._bands[row] = _band_keys(self._sigs[row])
+        self._alive[row] = True
+        self._pinned[row] = pinned
+        self._lang[row] = lang
+        now = time.time()
+        self._used[row] = now
+        self._expires[row] = now + self.ttl
+        self._hits[row] = 0
+        self._ids[row] = self._next_id
+        self._by_id[self._next_id] = row
+        self._next_id += 1
+        self._rows[row] = {"question": question, "language": language, "answer": answer, "tokens": tokens,
+                           "guards": _guards(tokens), "created": now}
+        self._exact[(lang, tokens)] = row
+        self.stats["stored"] += 1
+        return int(self._ids[row])
+
+    def _evict_lru(self) -> bool:
+        candidates = np.flatnonzero(self._alive & ~self._pinned)
+        if not len(candidates):
+            return False
+        self._remove(int(candidates[np.argmin(self._used[candidates])]))
+        self.stats["evicted"] += 1
+        return True
+
+    def _remove(self, row: int) -> None:
+        entry = self._rows[row]
+        self._exact.pop((int(self._lang[row]), entry["tokens"]), None)
+        self._by_id.pop(int(self._ids[row]), None)
+        self._alive[row] = False
+        self._pinned[row] = False
+        self._bands[row] = 0
+        self._rows[row] = None
+        self._free.append(row)
+
+    # -- admin ------------------------------------------------------------------
+
+    def pin(self, entry_id: int, pinned: bool = True) -> bool:
+        row = self._by_id.get(entry_id)
+        if row is None:
+            return False
+        self._pinned[row] = pinned
+        if not pinned:
+            self._expires[row] = time.time() + self.ttl
+        return True
+
+    def evict(self, entry_id: int) -> bool:
+        row = self._by_id.get(entry_id)
+        if row is None:
+            return False
+        self._remove(row)
+        self.stats["evicted"] += 1
+        return True
+
+    def clear(self, include_pinned: bool = False) -> int:
+        rows = np.flatnonzero(self._alive if include_pinned else self._alive & ~self._pinned).tolist()
+        for row in rows:
+            self._remove(row)
+        self.stats["evicted"] += len(rows)
+        return len(rows)
+
+    def entries(self, k: int = 20) -> List[Dict[str, Any]]:
+        """The k most-hit entries (pinned first)."""
+        rows = np.flatnonzero(self._alive)
+        order = np.lexsort((-self._hits[rows], ~self._pinned[rows]))[:k]
+        now = time.time()
+        return [{
+            "id": int(self._ids[row]),
+            "question": self._rows[row]["question"],
+            "language": self._rows[row]["language"],
+            "answer": self._rows[row]["answer"],
+            "normalized": " ".join(self._rows[row]["tokens"]),
+            "hits": int(self._hits[row]),
+            "pinned": bool(self._pinned[row]),
+            "age_s": round(now - self._rows[row]["created"]),
+        } for row in rows[order].tolist()]
+
+    def info(self) -> Dict[str, Any]:
+        latency = np.asarray(self._latency) * 1000
+        lookups = self.stats["lookups"]
+        return {
+            **self.stats,
+            "enabled": FAQ_CACHE_ENABLED,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else None,
+            "entries": int(self._alive.sum()),
+            "pinned": int(self._pinned.sum()),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "index_bytes": int(self._sigs.nbytes + self._bands.nbytes + self._alive.nbytes + self._pinned.nbytes
+                               + self._lang.nbytes + self._used.nbytes + self._expires.nbytes + self._hits.nbytes
+                               + self._ids.nbytes),
+            "lookup_ms": {
+                "p50": round(float(np.quantile(latency, 0.5)), 3),
+                "p99": round(float(np.quantile(latency, 0.99)), 3),
+                "max": round(float(latency.max()), 3),
+            } if len(latency) else None,
+        }
+
+    # -- pinned entries on disk -------------------------------------------------
+
+    def pinned_data(self) -> List[Dict[str, str]]:
+        return [{"question": self._rows[row]["question"], "language": self._rows[row]["language"],
+                 "answer": self._rows[row]["answer"]} for row in np.flatnonzero(self._pinned).tolist()]
+
+    def save_pinned(self, data: List[Dict[str, str]]) -> None:
+        """Write a pinned_data() list to disk atomically (tmp file + rename)."""
+        if not self.pinned_path:
+            return
+        os.makedirs(os.path.dirname(self.pinned_path), exist_ok=True)
+        tmp = f"{self.pinned_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.pinned_path)
+
+    def load_pinned(self) -> int:
+        if not self.pinned_path or not os.path.exists(self.pinned_path):
+            return 0
+        try:
+            with open(self.pinned_path, encoding="utf-8") as f:
+                data = json.load(f)
+            return sum(self.add(e["question"], e["language"], e["answer"], pinned=True) is not None for e in data)
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.warning("ignoring unreadable FAQ pin file %s: %s", self.pinned_path, e)
+            return 0
+
+
+faq_cache = FAQCache()
+faq_cache.load_pinned()
@@ -0,0 +1,278 @@
+# Enrollment form validation: Aadhaar (Verhoeff checksum), phone and age normalization,
+# for one form (/form/assist) or a streamed batch of rows (/form/assist/bulk)
+import re
+import json
+from functools import lru_cache
+from json.encoder import encode_basestring as _quote
+from typing import Any, Dict, List, Optional, Tuple
+
+REQUIRED_FIELDS = ("name", "aadhaar", "address", "phone", "age")
+HINTS = ["Fill Aadhaar exactly as shown on card."]
+AGE_MIN, AGE_MAX = 0, 120
+MAX_SWAP_SUGGESTIONS = 3
+
+# Verhoeff: multiplication in the dihedral group D5, position permutation, inverses
+_VERHOEFF_D = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 2, 3, 4, 0, 6, 7, 8, 9, 5),
+    (2, 3, 4, 0, 1, 7, 8, 9, 5, 6),
+    (3, 4, 0, 1, 2, 8, 9, 5, 6, 7),
+    (4, 0, 1, 2, 3, 9, 5, 6, 7, 8),
+    (5, 9, 8, 7, 6, 0, 4, 3, 2, 1),
+    (6, 5, 9, 8, 7, 1, 0, 4, 3, 2),
+    (7, 6, 5, 9, 8, 2, 1, 0, 4, 3),
+    (8, 7, 6, 5, 9, 3, 2, 1, 0, 4),
+    (9, 8, 7, 6, 5, 4, 3, 2, 1, 0),
+)
+_VERHOEFF_P = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 5, 7, 6, 2, 8, 3, 0, 9, 4),
+    (5, 8, 0, 3, 7, 9, 6, 1, 4, 2),
+    (8, 9, 1, 6, 0, 4, 3, 5, 2, 7),
+    (9, 4, 5, 3, 1, 2, 6, 8, 7, 0),
+    (4, 2, 8, 6, 5, 7, 3, 9, 0, 1),
+    (2, 7, 9, 3, 8, 0, 6, 4, 1, 5),
+    (7, 0, 4, 6, 9, 1, 3, 2, 5, 8),
+)
+_DIGIT_VALUES = bytes.maketrans(b"0123456789", bytes(range(10)))
+# Per position from the right, one flat lookup: next = _STEP[pos][check * 10 + digit]
+_STEP = tuple(
+    tuple(_VERHOEFF_D[c][_VERHOEFF_P[pos % 8][d]] for c in range(10) for d in range(10))
+    for pos in range(12)
+)
+
+_NON_DIGITS = re.compile(r"[^0-9]+")
+# Forms filled in Hindi often use Devanagari numerals
+_DEVANAGARI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+# Indian numbers: strip a trunk/country prefix by length, then a mobile starts with 6-9
+_PHONE_PREFIX = {10: "", 11: "0", 12: "91", 13: "091", 14: "0091"}
+_MOBILE_FIRST_DIGIT = frozenset("6789")
+# "45", "45.0", "45 yrs", "45 years", "45 वर्ष", "45 साल"
+_AGE = re.compile(r"^\s*(\d{1,3})(?:\.0*)?\s*(?:y|yr|yrs|year|years|वर्ष|साल)?\.?\s*$", re.IGNORECASE)
+# one encoder for every row; json.dumps(..., ensure_ascii=False) builds a new one per call
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _digits(value: str) -> str:
+    if not value.isascii():
+        value = value.translate(_DEVANAGARI_DIGITS)
+    return _NON_DIGITS.sub("", value)
+
+
+def verhoeff_valid(digits: str) -> bool:
+    """True if a digit string (check digit last) passes the Verhoeff checksum."""
+    check = 0
+    # bytes iterate as ints; translate maps b"0".."9" to 0..9 in C
+    for step, digit in zip(_STEP, reversed(digits.encode("ascii").translate(_DIGIT_VALUES))):
+        check = step[check * 10 + digit]
+    return check == 0
+
+
+def _aadhaar_shape(digits: str) -> bool:
+    # UIDAI never issues numbers starting with 0 or 1
+    return len(digits) == 12 and digits[0] not in "01"
+
+
+def _transposition_fixes(digits: str) -> List[str]:
+    """Numbers one adjacent swap away that pass the checksum (Verhoeff catches every such swap)."""
+    # The checksum is a product in D5 of one element per digit (x[j] = P[j % 8][digit],
+    # j counted from the right), so a swap at j, j+1 only changes those two factors:
+    # with prefix/suffix products each candidate is four lookups, not a full pass
+    d, p = _VERHOEFF_D, _VERHOEFF_P
+    r = digits[::-1].encode("ascii").translate(_DIGIT_VALUES)
+    prefix = [0] * 13
+    for j in range(12):
+        prefix[j + 1] = d[prefix[j]][p[j % 8][r[j]]]
+    suffix = [0] * 13
+    for j in range(11, -1, -1):
+        suffix[j] = d[p[j % 8][r[j]]][suffix[j + 1]]
+    fixes = []
+    # left to right in the written number, i.e. j from the second-last digit down
+    for j in range(10, -1, -1):
+        a, b = r[j], r[j + 1]
+        if a != b and d[d[d[prefix[j]][p[j % 8][b]]][p[(j + 1) % 8][a]]][suffix[j + 2]] == 0:
+            i = 10 - j
+            candidate = digits[:i] + digits[i + 1] + digits[i] + digits[i + 2:]
+            if _aadhaar_shape(candidate):
+                fixes.append(candidate)
+    return fixes
+
+
+def _grouped(digits: str) -> str:
+    return f"{digits[:4]} {digits[4:8]} {digits[8:]}"
+
+
+def aadhaar_suggestion(raw: str, digits: str, valid: bool) -> Optional[str]:
+    if not raw:
+        return None
+    if valid:
+        # format suggestion: grouped by 4 for readability
+        return _grouped(digits)
+    if len(digits) < 12:
+        return f"Aadhaar looks short. After removing non-digits we got '{digits}'. Aadhaar must be 12 digits."
+    if len(digits) > 12:
+        return f"Aadhaar looks long. After removing non-digits we got '{digits}'. Aadhaar must be 12 digits — please verify."
+    if digits[0] in "01":
+        return "Aadhaar numbers never start with 0 or 1. Please check the first digit against the card."
+    fixes = _transposition_fixes(digits)
+    # more than a few candidates is no help to the person correcting the form
+    if 0 < len(fixes) <= MAX_SWAP_SUGGESTIONS:
+        options = " or ".join(_grouped(fix) for fix in fixes)
+        return f"Aadhaar checksum does not match. Did you mean {options}? Two digits look swapped."
+    return "Aadhaar checksum does not match; one digit is probably wrong. Please check it against the card."
+
+
+def normalize_phone(value: Any) -> Tuple[Optional[str], Optional[str]]:
+    """(10-digit mobile number, None) or (None, reason)."""
+    digits = _digits(str(value))
+    prefix = _PHONE_PREFIX.get(len(digits))
+    if prefix is None or not digits.startswith(prefix):
+        return None, "phone must be a 10-digit mobile number (optionally with +91 or 0)"
+    number = digits[len(prefix):]
+    if number[0] not in _MOBILE_FIRST_DIGIT:
+        return None, "mobile numbers start with 6, 7, 8 or 9"
+    return number, None
+
+
+def normalize_age(value: Any) -> Tuple[Optional[int], Optional[str]]:
+    """(age in years, None) or (None, reason)."""
+    if isinstance(value, bool):
+        return None, "age must be a number of years"
+    if isinstance(value, int):
+        age = value
+    elif isinstance(value, float) and value.is_integer():
+        age = int(value)
+    else:
+        return _parse_age(str(value))
+    if not AGE_MIN <= age <= AGE_MAX:
+        return None, f"age must be between {AGE_MIN} and {AGE_MAX}"
+    return age, None
+
+
+# a register spells ages a few hundred ways at most ("45", "45 yrs", "४५ वर्ष")
+@lru_cache(maxsize=4096)
+def _parse_age(text: str) -> Tuple[Optional[int], Optional[str]]:
+    match = _AGE.match(text.translate(_DEVANAGARI_DIGITS))
+    if match is None:
+        return None, "age must be a number of years"
+    return normalize_age(int(match.group(1)))
+
+
+def _present(value: Any) -> bool:
+    return value is not None and (value.__class__ is not str or not value.isspace() and value != "")
+
+
+def _check(record: Dict[str, Any]) -> Tuple[List[str], Dict[str, Any], Dict[str, str], str, str]:
+    """Everything except the checksum: (missing, cleaned, invalid, raw aadhaar, aadhaar digits)."""
+    get = record.get
+    missing: List[str] = []
+    cleaned: Dict[str, Any] = {}
+    invalid: Dict[str, str] = {}
+    for field in ("name", "address"):
+        value = get(field)
+        # collapsing whitespace doubles as the presence check for text fields
+        value = " ".join(str(value).split()) if value is not None else ""
+        if value:
+            cleaned[field] = value
+        else:
+            missing.append(field)
+    raw_aadhaar = get("aadhaar")
+    if _present(raw_aadhaar):
+        raw_aadhaar = str(raw_aadhaar)
+    else:
+        missing.append("aadhaar")
+        raw_aadhaar = ""
+    phone = get("phone")
+    if _present(phone):
+        phone, reason = normalize_phone(phone)
+        if reason is None:
+            cleaned["phone"] = phone
+        else:
+            invalid["phone"] = reason
+    else:
+        missing.append("phone")
+    age = get("age")
+    if _present(age):
+        age, reason = normalize_age(age)
+        if reason is None:
+            cleaned["age"] = age
+        else:
+            invalid["age"] = reason
+    else:
+        missing.append("age")
+    # keep the declared field order in missing_fields
+    missing.sort(key=REQUIRED_FIELDS.index)
+    return missing, cleaned, invalid, raw_aadhaar, _digits(raw_aadhaar)
+
+
+def _finish(missing, cleaned, invalid, raw_aadhaar: str, digits: str, valid: bool) -> Dict[str, Any]:
+    if valid:
+        cleaned["aadhaar"] = digits
+    elif raw_aadhaar:
+        invalid["aadhaar"] = "invalid Aadhaar number"
+    return {
+        "missing_fields": missing,
+        "aadhaar_valid": valid,
+        "aadhaar_suggestion": aadhaar_suggestion(raw_aadhaar, digits, valid),
+        "hints": list(HINTS),
+        "cleaned": cleaned,
+        "invalid_fields": invalid,
+    }
+
+
+def assist_one(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate one form; the result matches FormAssistResponse."""
+    missing, cleaned, invalid, raw, digits = _check(record)
+    valid = _aadhaar_shape(digits) and verhoeff_valid(digits)
+    return _finish(missing, cleaned, invalid, raw, digits, valid)
+
+
+# JSON for the parts of a bulk row that repeat across rows, encoded once
+_HINTS_JSON = _encode(HINTS)
+_MISSING_JSON: Dict[Tuple[str, ...], str] = {}
+_INVALID_JSON: Dict[Tuple[Tuple[str, str], ...], str] = {}
+_FIELD_JSON = {field: f"{_quote(field)}: " for field in REQUIRED_FIELDS}
+
+
+def _cleaned_json(cleaned: Dict[str, Any]) -> str:
+    # values are str, or int for age; _quote is json's C string encoder
+    return "{" + ", ".join(
+        _FIELD_JSON[field] + (_quote(value) if value.__class__ is str else str(value))
+        for field, value in cleaned.items()
+    ) + "}"
+
+
+def _row_json(row_no: int, result: Dict[str, Any]) -> str:
+    """_encode({"row": row_no, **result}), with the repeating parts taken from the caches above."""
+    missing = tuple(result["missing_fields"])
+    missing_json = _MISSING_JSON.get(missing)
+    if missing_json is None:
+        missing_json = _MISSING_JSON[missing] = _encode(result["missing_fields"])
+    # invalid_fields: a handful of fixed reasons per field, so few distinct combinations
+    invalid = tuple(result["invalid_fields"].items())
+    invalid_json = _INVALID_JSON.get(invalid)
+    if invalid_json is None:
+        invalid_json = _INVALID_JSON[invalid] = _encode(result["invalid_fields"])
+    suggestion = result["aadhaar_suggestion"]
+    return (
+        f'{{"row": {row_no}, "missing_fields": {missing_json}, '
+        f'"aadhaar_valid": {"true" if result["aadhaar_valid"] else "false"}, '
+        f'"aadhaar_suggestion": {"null" if suggestion is None else _quote(suggestion)}, '
+        f'"hints": {_HINTS_JSON}, "cleaned": {_cleaned_json(result["cleaned"])}, "invalid_fields": {invalid_json}}}'
+    )
+
+
+def bulk_ndjson(records: List[Tuple[int, Optional[dict], Optional[str]]]) -> str:
+    """
+    Validate a batch of (row_number, record, parse_error) and return NDJSON lines in row
+    order: {"row", ...FormAssistResponse fields} (exactly what assist_one returns) or
+    {"row", "error"}.
+    """
+    lines: List[str] = []
+    for row_no, record, error in records:
+        if error is not None:
+            lines.append(_encode({"row": row_no, "error": error}))
+        else:
+            lines.append(_row_json(row_no, assist_one(record)))
+    lines.append("")
+    return "\n".join(lines)
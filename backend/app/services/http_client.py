@@ -0,0 +1,157 @@
+# Shared, pooled HTTP client for outbound Groq calls (LLM + STT)
+import os
+import time
+from typing import Optional, Dict, Any
+
+import httpx
+
+GROQ_API_BASE = os.getenv("GROQ_API_BASE", "https://api.groq.com/openai/v1").rstrip("/")
+
+# Pool sizing. Keep-alive connections are reused across requests so only the
+# first call per connection pays the TCP + TLS handshake.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+
+_client: Optional[httpx.AsyncClient] = None
+_transport: Optional["_InstrumentedTransport"] = None
+
+
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Response stream wrapper that releases the in-flight slot on close."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+                self._on_close = None
+
+
+class _InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """
+    AsyncHTTPTransport that counts requests, in-flight requests and pool waits.
+    A request counts as a wait when it starts while every connection slot is busy.
+    """
+
+    def __init__(self, *, limits: httpx.Limits, **kwargs):
+        super().__init__(limits=limits, **kwargs)
+        self.max_connections = limits.max_connections
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waits = 0
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.max_connections is not None and self.in_flight >= self.max_connections:
+            self.waits += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            self._release()
+            raise
+        response.stream = _TrackedStream(response.stream, self._release)
+        return response
+
+    def connection_counts(self) -> Dict[str, int]:
+        # httpcore keeps its connection list on the pool; read it defensively.
+        connections = list(getattr(self._pool, "connections", []) or [])
+        idle = sum(1 for c in connections if c.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+def request_timeout(seconds: float) -> httpx.Timeout:
+    """Per-call timeout: `seconds` for read/write, shared connect and pool limits."""
+    return httpx.Timeout(seconds, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT)
+
+
+def _build_client() -> httpx.AsyncClient:
+    global _transport
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    http2 = HTTP2_ENABLED and _h2_available()
+    _transport = _InstrumentedTransport(limits=limits, http2=http2)
+    return httpx.AsyncClient(
+        base_url=GROQ_API_BASE,
+        transport=_transport,
+        timeout=request_timeout(30),
+    )
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Create the application-scoped client. Called from the FastAPI lifespan hook."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client, _transport
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _transport = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared client. Created lazily so services also work outside the app
+    (scripts, benchmarks) where the lifespan hook never ran.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Snapshot of pool usage for sizing HTTP_MAX_CONNECTIONS / HTTP_MAX_KEEPALIVE."""
+    stats: Dict[str, Any] = {
+        "base_url": GROQ_API_BASE,
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive": HTTP_MAX_KEEPALIVE,
+        "keepalive_expiry": HTTP_KEEPALIVE_EXPIRY,
+        "http2": HTTP2_ENABLED and _h2_available(),
+        "initialized": _client is not None and not _client.is_closed,
+        "timestamp": time.time(),
+    }
+    if _transport is None:
+        return stats
+    stats.update({
+        "requests": _transport.requests,
+        "in_use": _transport.in_flight,
+        "peak_in_use": _transport.peak_in_flight,
+        "waits": _transport.waits,
+    })
+    stats.update({f"connections_{k}": v for k, v in _transport.connection_counts().items()})
+    return stats
@@ -1,9 +1,13 @@
 
 import os
+import json
 import asyncio
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 
-import httpx
+from .http_client import get_http_client, request_timeout
+from .llm_cache import completion_cache, completion_key
+from .resilience import UpstreamPolicy
+from .tracing import traced
 
 SYSTEM_PROMPT = (
     "You are an insurance advisor for rural India. Provide accurate, simple, rural-friendly explanations, "
@@ -12,6 +16,18 @@ SYSTEM_PROMPT = (
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 GROQ_MODEL = "llama3-70b-8192"
+# Smaller, faster model used when the primary is rate limited, failing or too slow for
+# the time left in the request (see services/resilience.py); empty disables fallback
+GROQ_FALLBACK_MODEL = os.getenv("GROQ_FALLBACK_MODEL", "llama3-8b-8192")
+FALLBACK_RESPONSE = "Sorry, I am facing technical issues right now."
+# Chat runs at temperature 0.7, so caching its answers is opt-in
+LLM_CACHE_CHAT = os.getenv("LLM_CACHE_CHAT", "0") == "1"
+
+llm_policy = UpstreamPolicy("llm", [GROQ_MODEL, GROQ_FALLBACK_MODEL])
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English policy text)."""
+    return len(text) // 4 + 1
 
 def build_messages(message: str, context: Optional[dict]) -> List[dict]:
     messages = [
@@ -22,157 +38,191 @@ def build_messages(message: str, context: Optional[dict]) -> List[dict]:
     messages.append({"role": "user", "content": message})
     return messages
 
-async def call_groq(messages: List[dict]) -> str:
-    url = "https://api.groq.com/openai/v1/chat/completions"
+async def call_groq_completion(
+    messages: List[dict],
+    model: str = GROQ_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 512,
+    timeout: float = 30,
+    cache: Optional[bool] = None,
+    response_format: Optional[dict] = None,
+) -> Dict[str, Any]:
+    """
+    Raw Groq chat completion. Returns the decoded JSON body (choices + usage).
+    response_format={"type": "json_object"} asks for JSON mode.
+
+    Identical concurrent calls share one upstream request. The response is also cached
+    when cache=True, or when cache is None and temperature == 0; cache=False disables
+    both.
+
+    The call runs under llm_policy: at most `timeout` seconds or whatever is left of the
+    request deadline, with hedging, retries and fallback to GROQ_FALLBACK_MODEL. An
+    answer from the fallback model carries "fallback_model" and is never cached.
+    """
+    if not GROQ_API_KEY:
+        raise ValueError("Missing GROQ_API_KEY")
+
+    async def _call() -> Dict[str, Any]:
+        async def attempt(candidate: str, budget: float) -> Dict[str, Any]:
+            data = await _post_completion(messages, candidate, temperature, max_tokens, budget, response_format)
+            return data if candidate == model else {**data, "fallback_model": candidate}
+        return await llm_policy.call(attempt, timeout=timeout, model=model)
+
+    if cache is False:
+        return await _call()
+    store = cache if cache is not None else temperature == 0
+    key = completion_key(model, messages, temperature, max_tokens, response_format)
+    return await completion_cache.get_or_call(
+        key, _call, store=lambda data: store and "fallback_model" not in data,
+    )
+
+@traced("groq.completion")
+async def _post_completion(
+    messages: List[dict], model: str, temperature: float, max_tokens: int, timeout: float,
+    response_format: Optional[dict] = None,
+) -> Dict[str, Any]:
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json"
     }
     payload = {
-        "model": GROQ_MODEL,
+        "model": model,
         "messages": messages,
-        "temperature": 0.7,
-        "max_tokens": 512
+        "temperature": temperature,
+        "max_tokens": max_tokens
     }
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(url, headers=headers, json=payload)
-        resp.raise_for_status()
-        data = resp.json()
-        return data["choices"][0]["message"]["content"].strip()
+    if response_format is not None:
+        payload["response_format"] = response_format
+    client = get_http_client()
+    resp = await client.post("/chat/completions", headers=headers, json=payload, timeout=request_timeout(timeout))
+    resp.raise_for_status()
+    return resp.json()
+
+async def call_groq(messages: List[dict], timeout: float = 30, cache: Optional[bool] = None) -> str:
+    data = await call_groq_completion(messages, timeout=timeout, cache=cache)
+    return data["choices"][0]["message"]["content"].strip()
+
+async def stream_groq(
+    messages: List[dict],
+    model: str = GROQ_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 512,
+    timeout: float = 30,
+    outcome: Optional[dict] = None,
+) -> AsyncIterator[str]:
+    """
+    Groq streaming chat completion. Yields content deltas as they arrive.
 
-async def generate_chat_response(message: str, context: Optional[dict] = None) -> str:
+    Opening the stream (up to the response headers) runs under llm_policy with retries
+    and model fallback but no hedging; once tokens flow, the stream is not retried.
+    `outcome`, if given, gets "fallback_model" when the fallback model answers and
+    "complete" once the stream ends with [DONE].
+    """
+    if outcome is None:
+        outcome = {}
+    if not GROQ_API_KEY:
+        raise ValueError("Missing GROQ_API_KEY")
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    client = get_http_client()
+
+    async def open_stream(candidate: str, budget: float):
+        payload = {
+            "model": candidate,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+        request = client.build_request("POST", "/chat/completions", headers=headers, json=payload,
+                                       timeout=request_timeout(budget))
+        response = await client.send(request, stream=True)
+        if response.is_error:
+            try:
+                await response.aread()
+                response.raise_for_status()
+            finally:
+                await response.aclose()
+        outcome["fallback_model"] = candidate if candidate != model else None
+        return response
+
+    resp = await llm_policy.call(open_stream, timeout=timeout, model=model, hedge=False)
+    try:
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                outcome["complete"] = True
+                break
+            delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+    finally:
+        await resp.aclose()
+
+@traced()
+async def generate_chat_response(message: str, context: Optional[dict] = None,
+                                 outcome: Optional[dict] = None) -> str:
     """
-    Groq-only chat response.
+    Groq-only chat response. `outcome`, if given, gets "complete" when the answer came
+    from Groq (not FALLBACK_RESPONSE) and "fallback_model" when the fallback model gave it.
     """
     messages = build_messages(message, context)
     try:
         if not GROQ_API_KEY:
             raise ValueError("Missing GROQ_API_KEY")
-        return await call_groq(messages)
+        data = await call_groq_completion(messages, cache=LLM_CACHE_CHAT or None)
+        text = data["choices"][0]["message"]["content"].strip()
+    except Exception:
+        return FALLBACK_RESPONSE
+    if outcome is not None:
+        outcome.update(complete=True, fallback_model=data.get("fallback_model"))
+    return text
+
+async def stream_chat_response(message: str, context: Optional[dict] = None,
+                               outcome: Optional[dict] = None) -> AsyncIterator[str]:
+    """
+    Streaming variant of generate_chat_response. Yields the fallback message if the
+    stream fails before producing any text; a failure after that ends the stream early,
+    and `outcome` (see stream_groq) then lacks "complete".
+    """
+    messages = build_messages(message, context)
+    produced = False
+    try:
+        async for delta in stream_groq(messages, outcome=outcome):
+            produced = True
+            yield delta
     except Exception:
-        return "Sorry, I am facing technical issues right now."
+        if outcome is not None:
+            outcome["complete"] = False
+        if not produced:
+            yield FALLBACK_RESPONSE
 
 
 async def summarize_policy(text: str) -> dict:
     """
     Summarize policy text in chunks, then create a rural-friendly ELI5 explanation.
-    Returns: { 'summary': ..., 'eli5': ... }
+    Returns: { 'summary': ..., 'eli5': ..., 'stats': {...} }
     """
-    # 1. Chunk text
-    chunk_size = 1500
-    chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
-    summaries = []
-    for chunk in chunks:
-        prompt = (
-            "Summarize the following insurance policy text in simple, clear language for rural India. "
-            "Avoid jargon.\n\nText:\n" + chunk
-        )
-        try:
-            summary = await generate_chat_response(prompt, context=None)
-        except Exception:
-            summary = "[Summary unavailable]"
-        summaries.append(summary)
-    raw_summary = "\n".join(summaries)
-
-    # 4. ELI5 rural-language version
-    eli5_prompt = (
-        "Explain the following insurance policy summary as if I am 5 years old, "
-        "using rural Indian language and examples. Avoid jargon.\n\nSummary:\n" + raw_summary
-    )
-    try:
-        eli5 = await generate_chat_response(eli5_prompt, context=None)
-    except Exception:
-        eli5 = "[ELI5 explanation unavailable]"
-
-    return {"summary": raw_summary, "eli5": eli5}
-
-
-    async def enhance_recommendations(plans: list, survey_data: dict) -> list:
-        """
-        Use the Groq LLM to:
-          - refine explanations for each plan
-          - assign a trust_score (0.0-1.0) with short reasoning
-          - rewrite explanations in simple, rural Hindi
-
-        Returns a list of dicts: [{name, refined_explanation, trust_score, trust_reason, hindi_explanation}, ...]
-        Falls back to a simple heuristic if LLM call or parsing fails.
-        """
-        # Normalize input plans to simple dicts
-        simple_plans = []
-        for p in plans:
-            if isinstance(p, dict):
-                simple_plans.append({
-                    "name": p.get("name"),
-                    "reason": p.get("reason"),
-                    "estimated_premium": p.get("estimated_premium")
-                })
-            else:
-                # assume p is a Pydantic model or object with attributes
-                simple_plans.append({
-                    "name": getattr(p, "name", None),
-                    "reason": getattr(p, "reason", None),
-                    "estimated_premium": getattr(p, "estimated_premium", None)
-                })
-
-        prompt = (
-            "You are an assistant that refines insurance plan recommendations for rural India. "
-            "Given the following plans and the user's survey data, do three things for each plan:\n"
-            "1) produce a short, clear refined explanation in simple English (1-2 sentences),\n"
-            "2) assign a trust_score between 0.0 and 1.0 (higher means more confident) and give a one-line reason for the score,\n"
-            "3) rewrite the refined explanation in simple rural Hindi (use very basic vocabulary).\n"
-            "Return ONLY valid JSON: an object with a single key \"improved_plans\" whose value is an array of objects. "
-            "Each object must contain the keys: name, refined_explanation, trust_score, trust_reason, hindi_explanation.\n\n"
-            "Survey data:\n" + json.dumps(survey_data or {}, ensure_ascii=False) + "\n\n"
-            "Plans:\n" + json.dumps(simple_plans, ensure_ascii=False) + "\n\n"
-            "Output example:\n{\"improved_plans\":[{\"name\":\"Crop Insurance\",\"refined_explanation\":\"...\",\"trust_score\":0.85,\"trust_reason\":\"...\",\"hindi_explanation\":\"...\"}] }"
-        )
-
-        try:
-            resp_text = await generate_chat_response(prompt, context=None)
-            # Try to parse JSON from the LLM response
-            try:
-                data = json.loads(resp_text)
-                improved = data.get("improved_plans")
-                if isinstance(improved, list):
-                    return improved
-            except Exception:
-                # attempt to extract JSON substring
-                start = resp_text.find("{")
-                end = resp_text.rfind("}")
-                if start != -1 and end != -1 and end > start:
-                    try:
-                        data = json.loads(resp_text[start:end+1])
-                        improved = data.get("improved_plans")
-                        if isinstance(improved, list):
-                            return improved
-                    except Exception:
-                        pass
-        except Exception:
-            # fall through to heuristic fallback
-            pass
-
-        # Fallback heuristic: create simple improved entries
-        fallback = []
-        occ = (survey_data.get("occupation") or "").lower() if survey_data else ""
-        income = survey_data.get("income") if survey_data and isinstance(survey_data.get("income"), (int, float)) else None
-        for p in simple_plans:
-            name = p.get("name")
-            reason = p.get("reason") or "Recommended"
-            # basic trust scoring
-            score = 0.6
-            if occ and "farm" in occ and name and "crop" in name.lower():
-                score += 0.2
-            if income is not None and income < 15000 and "micro" in (name or "").lower():
-                score += 0.15
-            score = max(0.0, min(1.0, score))
-            refined = f"{reason}. This plan is suggested based on your survey answers."
-            hindi = f"(हिंदी) {reason}"
-            fallback.append({
-                "name": name,
-                "refined_explanation": refined,
-                "trust_score": round(score, 2),
-                "trust_reason": "Heuristic fallback reasoning",
-                "hindi_explanation": hindi
-            })
-
-        return fallback
\ No newline at end of file
+    from .summarizer import summarize_document
+    return await summarize_document(text)
+
+
+async def enhance_recommendations(plans: list, survey_data: dict) -> list:
+    """
+    Use the Groq LLM to:
+      - refine explanations for each plan
+      - assign a trust_score (0.0-1.0) with short reasoning
+      - rewrite explanations in simple, rural Hindi
+
+    Returns a list of dicts: [{name, refined_explanation, trust_score, trust_reason, hindi_explanation}, ...]
+    Concurrent calls are micro-batched into one prompt and results are cached per survey
+    profile bucket (services/recommend_enhancer.py). Falls back to a simple heuristic if
+    the LLM call fails, cannot be parsed or misses the current deadline.
+    """
+    from .recommend_enhancer import enhancer
+    improved, _ = await enhancer.enhance(plans, survey_data)
+    return improved
@@ -0,0 +1,120 @@
+# Single-flight coalescing and a TTL/LRU response cache for Groq completions
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+
+
+def completion_key(model: str, messages: List[dict], temperature: float, max_tokens: int,
+                   response_format: Optional[dict] = None) -> str:
+    parts: List[Any] = [model, messages, temperature, max_tokens]
+    if response_format is not None:
+        parts.append(response_format)
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    Identical concurrent requests share one upstream call (single flight); completed
+    responses may also be kept for LLM_CACHE_TTL seconds in an LRU bounded by bytes.
+    Callers decide per call whether a response may be stored: sampling at
+    temperature > 0 is only cached when explicitly requested.
+    """
+
+    def __init__(self, max_bytes: int = LLM_CACHE_MAX_BYTES, ttl: float = LLM_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (expires, size in bytes, response), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        self._bytes = 0
+        self.stats = {
+            "upstream_calls": 0,
+            "cache_hits": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "saved_prompt_tokens": 0,
+            "saved_completion_tokens": 0,
+        }
+
+    def _saved(self, data: Dict[str, Any]) -> None:
+        usage = data.get("usage") or {}
+        self.stats["saved_prompt_tokens"] += int(usage.get("prompt_tokens") or 0)
+        self.stats["saved_completion_tokens"] += int(usage.get("completion_tokens") or 0)
+
+    def _lookup(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, size, data = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            self._bytes -= size
+            return None
+        self._entries.move_to_end(key)
+        return data
+
+    def _store(self, key: str, data: Dict[str, Any]) -> None:
+        size = len(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (time.monotonic() + self.ttl, size, data)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.stats["evictions"] += 1
+
+    async def get_or_call(self, key: str, call: Callable[[], Awaitable[Dict[str, Any]]],
+                          store: Union[bool, Callable[[Dict[str, Any]], bool]]) -> Dict[str, Any]:
+        """`store` may be a predicate over the response (e.g. to skip degraded answers)."""
+        data = self._lookup(key)
+        if data is not None:
+            self.stats["cache_hits"] += 1
+            self._saved(data)
+            return data
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            data = await asyncio.shield(future)
+            self._saved(data)
+            return data
+
+        self.stats["upstream_calls"] += 1
+        future = asyncio.ensure_future(call())
+        self._inflight[key] = future
+
+        def _done(fut: "asyncio.Future[Dict[str, Any]]") -> None:
+            self._inflight.pop(key, None)
+            if fut.cancelled() or fut.exception() is not None:
+                return
+            if store(fut.result()) if callable(store) else store:
+                self._store(key, fut.result())
+
+        future.add_done_callback(_done)
+        # shield: a caller that goes away must not cancel the call others are waiting on
+        return await asyncio.shield(future)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_s": self.ttl,
+            "in_flight": len(self._inflight),
+        }
+
+
+completion_cache = CompletionCache()
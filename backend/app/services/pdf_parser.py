@@ -1,22 +1,134 @@
 # Async PDF text extraction using PyMuPDF (fitz) with fallback
+#
+# Uploads are spooled to disk and page ranges are extracted in a process pool
+# (PyMuPDF holds the GIL), so large documents neither block the event loop's
+# default executor nor sit in memory as one giant bytes object.
+import os
 import asyncio
+import hashlib
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
 
+from .tracing import traced, span
+
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(50 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "1000"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+_SPOOL_CHUNK = 1024 * 1024
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class PDFLimitError(ValueError):
+    """Upload exceeds PDF_MAX_BYTES or PDF_MAX_PAGES."""
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that already runs an event loop and threads is unsafe
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pdf_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+@traced()
+async def spool_upload(upload, max_bytes: int = PDF_MAX_BYTES, dir: Optional[str] = None) -> Tuple[str, str, int]:
+    """
+    Copy an UploadFile to a temp file (in `dir`, default the system temp dir) in 1 MiB
+    chunks, hashing as it goes. Returns (path, sha256_hex, size). The caller removes the file.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    if dir is not None:
+        os.makedirs(dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(_SPOOL_CHUNK)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise PDFLimitError(f"PDF is larger than {max_bytes // (1024 * 1024)} MB.")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest(), size
+
+
+def _page_count(path: str) -> int:
+    import fitz  # PyMuPDF
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+def _extract_range(path: str, start: int, end: int) -> List[str]:
+    # Runs in a worker process; each task reopens the document (cheap, mmap-backed)
+    import fitz  # PyMuPDF
+    with fitz.open(path) as doc:
+        return [doc[i].get_text() for i in range(start, end)]
+
+
+async def iter_pdf_pages(path: str, max_pages: int = PDF_MAX_PAGES) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) in page order as soon as each page range is extracted.
+    Falls back to decoding the raw bytes when PyMuPDF is unavailable or the file is
+    not a readable PDF.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    try:
+        with span("pdf.page_count"):
+            count = await loop.run_in_executor(pool, _page_count, path)
+    except Exception:
+        with open(path, "rb") as f:
+            yield 0, f.read().decode("latin-1", errors="ignore")
+        return
+    if count > max_pages:
+        raise PDFLimitError(f"PDF has {count} pages; the limit is {max_pages}.")
+
+    ranges = [(s, min(s + PDF_PAGES_PER_TASK, count)) for s in range(0, count, PDF_PAGES_PER_TASK)]
+    futures = [loop.run_in_executor(pool, _extract_range, path, s, e) for s, e in ranges]
+    try:
+        for (start, end), future in zip(ranges, futures):
+            # time spent waiting for this range (later ranges mostly finish while earlier ones are consumed)
+            with span("pdf.extract_range", start=start, end=end):
+                texts = await future
+            for offset, text in enumerate(texts):
+                yield start + offset, text
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+async def extract_pages_from_file(path: str, max_pages: int = PDF_MAX_PAGES) -> List[str]:
+    return [text async for _, text in iter_pdf_pages(path, max_pages=max_pages)]
+
+
+@traced()
 async def extract_text_from_pdf(file_bytes: bytes) -> str:
     """
     Extract text from PDF bytes using PyMuPDF (fitz). Fallback to bytes.decode if needed.
     """
+    if len(file_bytes) > PDF_MAX_BYTES:
+        raise PDFLimitError(f"PDF is larger than {PDF_MAX_BYTES // (1024 * 1024)} MB.")
+    fd, path = tempfile.mkstemp(suffix=".pdf")
     try:
-        import fitz  # PyMuPDF
-        def _extract():
-            doc = fitz.open(stream=file_bytes, filetype="pdf")
-            text = "".join([page.get_text() for page in doc])
-            doc.close()
-            return text
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, _extract)
-    except Exception:
-        try:
-            # Fallback: decode bytes
-            return file_bytes.decode("latin-1", errors="ignore")
-        except Exception:
-            return ""
\ No newline at end of file
+        with os.fdopen(fd, "wb") as out:
+            out.write(file_bytes)
+        return "".join(await extract_pages_from_file(path))
+    finally:
+        os.remove(path)
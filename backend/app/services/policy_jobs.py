@@ -0,0 +1,539 @@
+# SQLite-backed job queue and worker pool for policy simplification
+#
+# An upload becomes a job row; a fixed pool of workers runs it through
+# extract -> summarize -> eli5 -> tts and writes per-stage progress and partial
+# results back to the row, so clients can poll, subscribe (SSE) and reconnect
+# without losing work.
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .pdf_parser import iter_pdf_pages, PDFLimitError
+from .summarizer import PROMPT_VERSION, summarize_pages, explain_summary
+from .result_cache import policy_cache
+from .retrieval import build_policy_index, has_policy_index
+from .exclusions import extract_exclusions
+from .tts import synthesize_tts, audio_path_to_url, prepare_tts
+from .analytics import analytics
+from .tracing import trace_root
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cache"))
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(CACHE_DIR, "policy_jobs.sqlite3"))
+# Uploads wait here (not in /tmp) so queued jobs survive a restart
+JOBS_SPOOL_DIR = os.getenv("JOBS_SPOOL_DIR", os.path.join(CACHE_DIR, "jobs"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "100"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# A running job whose worker has not checked in for this long is handed to another worker
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION_DAYS", "7")) * 86400
+
+STAGES = ("extract", "summarize", "eli5", "tts")
+FINISHED = ("done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    pdf_sha256 TEXT NOT NULL,
+    spool_path TEXT,
+    status TEXT NOT NULL,
+    stages TEXT NOT NULL,
+    result TEXT NOT NULL,
+    error TEXT,
+    version INTEGER NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created);
+CREATE INDEX IF NOT EXISTS jobs_pdf ON jobs(pdf_sha256, status);
+"""
+
+
+class JobError(Exception):
+    """A job failed in a way the client should see (mirrors an HTTP status)."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class QueueFullError(Exception):
+    """JOB_MAX_QUEUED jobs are already waiting."""
+
+
+def _row_to_job(row) -> Dict[str, Any]:
+    job_id, pdf_sha256, _, status, stages, result, error, version, created, updated = row
+    stages = json.loads(stages)
+    current = next((name for name in STAGES if stages[name]["status"] == "running"), None)
+    return {
+        "job_id": job_id,
+        "policy_id": pdf_sha256,
+        "status": status,
+        "stage": current,
+        "stages": stages,
+        "result": json.loads(result),
+        "error": json.loads(error) if error else None,
+        "version": version,
+        "created": created,
+        "updated": updated,
+    }
+
+
+class JobStore:
+    """
+    Job rows in one SQLite file in WAL mode (shared by all uvicorn workers on the host).
+    Blocking calls run in a worker thread; in-process waiters are woken through
+    per-job asyncio events, and everyone else polls.
+    """
+
+    def __init__(self, path: str, max_queued: int = JOB_MAX_QUEUED):
+        self.path = path
+        self.max_queued = max_queued
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._changed: Dict[str, asyncio.Event] = {}
+        self.wakeup = asyncio.Event()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    # -- sync, run in threads ------------------------------------------------
+    def _create(self, pdf_sha256: str, spool_path: str) -> Tuple[str, bool]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE pdf_sha256 = ? AND status IN ('queued', 'running') LIMIT 1",
+                (pdf_sha256,),
+            ).fetchone()
+            if row is not None:
+                conn.execute("COMMIT")
+                return row[0], False
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFullError(f"{queued} jobs are already queued")
+            job_id = uuid.uuid4().hex
+            stages = {name: {"status": "pending"} for name in STAGES}
+            now = time.time()
+            conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, 'queued', ?, '{}', NULL, 0, ?, ?)",
+                (job_id, pdf_sha256, spool_path, json.dumps(stages), now, now),
+            )
+            conn.execute("COMMIT")
+            return job_id, True
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _claim(self) -> Optional[Tuple[Dict[str, Any], str]]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', version = version + 1, updated = ? WHERE id = ?",
+                (time.time(), row[0]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        job = _row_to_job(row)
+        job["status"] = "running"
+        return job, row[2]
+
+    def _update(self, job_id: str, status: Optional[str] = None, stages: Optional[dict] = None,
+                result: Optional[dict] = None, error: Optional[dict] = None) -> None:
+        sets, params = ["version = version + 1", "updated = ?"], [time.time()]
+        for column, value in (("status", status), ("stages", stages), ("result", result), ("error", error)):
+            if value is not None:
+                sets.append(f"{column} = ?")
+                params.append(value if isinstance(value, str) else json.dumps(value, ensure_ascii=False))
+        if status in FINISHED:
+            sets.append("spool_path = NULL")
+        self._conn().execute(f"UPDATE jobs SET {', '.join(sets)} WHERE id = ?", (*params, job_id))
+
+    def _touch(self, job_id: str) -> None:
+        # lease renewal only; not a visible change, so the version stays the same
+        self._conn().execute("UPDATE jobs SET updated = ? WHERE id = ?", (time.time(), job_id))
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def _requeue(self, job_id: str) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = 'queued', version = version + 1, updated = ? "
+            "WHERE id = ? AND status = 'running'",
+            (time.time(), job_id),
+        )
+
+    def _maintain(self, lease: float, retention: float) -> Dict[str, int]:
+        """Requeue running jobs whose worker went away; drop old finished jobs."""
+        conn = self._conn()
+        now = time.time()
+        requeued = conn.execute(
+            "UPDATE jobs SET status = 'queued', version = version + 1, updated = ? "
+            "WHERE status = 'running' AND updated < ?",
+            (now, now - lease),
+        ).rowcount
+        old = conn.execute(
+            "SELECT id, spool_path FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+            (now - retention,),
+        ).fetchall()
+        for job_id, spool_path in old:
+            if spool_path and os.path.exists(spool_path):
+                os.remove(spool_path)
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return {"requeued": requeued, "purged": len(old)}
+
+    def _stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        oldest = conn.execute("SELECT MIN(created) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        durations: Dict[str, List[float]] = {name: [] for name in STAGES}
+        for (stages,) in conn.execute(
+            "SELECT stages FROM jobs WHERE status = 'done' ORDER BY updated DESC LIMIT 500"
+        ):
+            for name, info in json.loads(stages).items():
+                if info.get("duration_s") is not None and info.get("status") == "done":
+                    durations[name].append(info["duration_s"])
+        stage_stats = {}
+        for name, values in durations.items():
+            values.sort()
+            stage_stats[name] = {
+                "samples": len(values),
+                "mean_s": round(sum(values) / len(values), 3) if values else None,
+                "p50_s": values[len(values) // 2] if values else None,
+                "p95_s": values[min(len(values) - 1, int(len(values) * 0.95))] if values else None,
+            }
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "max_queued": self.max_queued,
+            "oldest_queued_wait_s": round(time.time() - oldest, 1) if oldest else 0.0,
+            "stage_durations": stage_stats,
+        }
+
+    # -- async API -----------------------------------------------------------
+    def _notify(self, job_id: str) -> None:
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def create(self, pdf_sha256: str, spool_path: str) -> Tuple[str, bool]:
+        """Queue a job; returns (job_id, created). An active job for the same PDF is reused."""
+        job_id, created = await asyncio.to_thread(self._create, pdf_sha256, spool_path)
+        if created:
+            self.wakeup.set()
+        return job_id, created
+
+    async def claim(self) -> Optional[Tuple[Dict[str, Any], str]]:
+        return await asyncio.to_thread(self._claim)
+
+    async def update(self, job_id: str, **fields) -> None:
+        await asyncio.to_thread(self._update, job_id, **fields)
+        self._notify(job_id)
+
+    async def touch(self, job_id: str) -> None:
+        await asyncio.to_thread(self._touch, job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def wait_change(self, job_id: str, timeout: float) -> None:
+        """Return when this process updates the job, or after `timeout` (other processes)."""
+        event = self._changed.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def wait_finished(self, job_id: str, result_key: Optional[str] = None) -> Dict[str, Any]:
+        """Wait until the job finishes (or, with result_key, until that partial result exists)."""
+        while True:
+            job = await self.get(job_id)
+            if job is None or job["status"] in FINISHED:
+                return job
+            if result_key is not None and result_key in job["result"]:
+                return job
+            await self.wait_change(job_id, JOB_POLL_INTERVAL)
+
+    async def maintain(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self._maintain, JOB_LEASE_SECONDS, JOB_RETENTION)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {**await asyncio.to_thread(self._stats), "workers": JOB_WORKERS}
+
+
+class _JobRun:
+    """Progress bookkeeping for one job; every change is written through to the store."""
+
+    def __init__(self, store: JobStore, job: Dict[str, Any]):
+        self.store = store
+        self.job_id = job["job_id"]
+        self.policy_id = job["policy_id"]
+        self.stages = {name: {"status": "pending"} for name in STAGES}
+        self.result: Dict[str, Any] = {"policy_id": self.policy_id}
+        self._started: Dict[str, float] = {}
+
+    async def _save(self, **fields) -> None:
+        await self.store.update(self.job_id, stages=self.stages, result=self.result, **fields)
+
+    async def start(self, *names: str) -> None:
+        for name in names:
+            self._started[name] = time.perf_counter()
+            self.stages[name] = {"status": "running", "started": time.time()}
+        await self._save()
+
+    async def finish(self, name: str, status: str = "done", **info) -> None:
+        started = self._started.pop(name, None)
+        stage = self.stages[name]
+        stage.update(status=status, finished=time.time(), **info)
+        if started is not None:
+            stage["duration_s"] = round(time.perf_counter() - started, 3)
+        await self._save()
+
+    async def publish(self, **partial) -> None:
+        """Add partial results (summary before the audio is ready, etc.)."""
+        self.result.update(partial)
+        await self._save()
+
+    async def progress(self, name: str, **info) -> None:
+        self.stages[name].update(info)
+        await self._save()
+
+    def mark_failed(self) -> None:
+        """Stages still running when the job fails are marked failed (saved by the caller)."""
+        for name, stage in self.stages.items():
+            if stage["status"] == "running":
+                self._started.pop(name, None)
+                stage.update(status="failed", finished=time.time())
+
+
+def _stage_summary(stats: Dict[str, Any]) -> Dict[str, Any]:
+    stages = stats.get("stages", [])
+    return {
+        "llm_calls": sum(s["calls"] for s in stages),
+        "llm_failed": sum(s["failed"] for s in stages),
+        "prompt_tokens": sum(s["prompt_tokens"] for s in stages),
+        "completion_tokens": sum(s["completion_tokens"] for s in stages),
+    }
+
+
+async def _from_cache(run: _JobRun, cache_key: str, cached: Dict[str, Any]) -> None:
+    analytics.record("policy_simplify", "cached")
+    for name in ("extract", "summarize", "eli5"):
+        run.stages[name] = {"status": "cached"}
+    exclusions = cached["extra"].get("exclusions")
+    if exclusions is None:
+        exclusions = await asyncio.to_thread(extract_exclusions, cached["text"])
+    await run.publish(summary=cached["summary"], exclusions=exclusions, explanation=cached["eli5"])
+    if not has_policy_index(run.policy_id):
+        # page boundaries are not cached; index the text as a single page
+        await build_policy_index(run.policy_id, [cached["text"]])
+
+    tts_audio_path = cached["audio"]
+    if tts_audio_path and os.path.exists(tts_audio_path):
+        run.stages["tts"] = {"status": "cached"}
+        await run.publish(tts_audio_url=audio_path_to_url(tts_audio_path), tts_ready=True)
+    else:
+        # audio was cleaned up or never synthesized; text results are still valid
+        tts_audio_path = await _speak(run, cached["eli5"])
+        if tts_audio_path != "tts_error":
+            await policy_cache.update_audio(cache_key, tts_audio_path)
+
+
+async def _speak(run: _JobRun, text: str) -> str:
+    """
+    The tts stage. The (deterministic) audio URL is published before synthesis starts, so
+    waiters can return it early; a GET of it meanwhile joins this synthesis.
+    """
+    await run.start("tts")
+    url, _ = await prepare_tts(text, lang="en", mode="on_demand")
+    await run.publish(tts_audio_url=url, tts_ready=False)
+    tts_audio_path = await synthesize_tts(text, lang="en")
+    ok = tts_audio_path != "tts_error"
+    await run.publish(tts_audio_url=audio_path_to_url(tts_audio_path) if ok else url, tts_ready=ok)
+    await run.finish("tts", "done" if ok else "failed")
+    return tts_audio_path
+
+
+async def _process(run: _JobRun, spool_path: str) -> None:
+    cache_key = f"{run.policy_id}:{PROMPT_VERSION}"
+    cached = await policy_cache.get(cache_key)
+    if cached is not None:
+        await _from_cache(run, cache_key, cached)
+        return
+    analytics.record("policy_simplify", "processed")
+
+    # extract and summarize overlap: chunks are summarized as pages arrive
+    pages: List[str] = []
+    side_tasks: List[asyncio.Task] = []
+
+    async def index_and_exclusions():
+        # Index the pages so /chat can answer questions about this policy (policy_id = PDF hash)
+        await build_policy_index(run.policy_id, pages)
+        # Rule-based, deterministic and fast; no extra LLM calls
+        exclusions = await asyncio.to_thread(extract_exclusions, "\n".join(pages))
+        await run.publish(exclusions=exclusions)
+        return exclusions
+
+    async def page_texts():
+        last_report = time.monotonic()
+        async for _, page_text in iter_pdf_pages(spool_path):
+            pages.append(page_text)
+            if time.monotonic() - last_report >= 1.0:
+                last_report = time.monotonic()
+                await run.progress("extract", pages=len(pages))
+            yield page_text
+        if "".join(pages).strip():
+            await run.finish("extract", pages=len(pages))
+            side_tasks.append(asyncio.create_task(index_and_exclusions()))
+
+    await run.start("extract", "summarize")
+    try:
+        summary_result = await summarize_pages(page_texts(), eli5=False)
+    except PDFLimitError as e:
+        raise JobError(413, str(e))
+    except BaseException:
+        for task in side_tasks:
+            task.cancel()
+        raise
+    try:
+        await _explain_and_speak(run, cache_key, pages, summary_result, side_tasks)
+    except BaseException:
+        for task in side_tasks:
+            task.cancel()
+        raise
+
+
+async def _explain_and_speak(run: _JobRun, cache_key: str, pages: List[str],
+                             summary_result: Dict[str, Any], side_tasks: List[asyncio.Task]) -> None:
+    text = "".join(pages)
+    if not text.strip():
+        raise JobError(400, "Could not extract text from PDF.")
+    summary_stats = summary_result.get("stats", {})
+    await run.publish(summary=summary_result.get("summary", ""))
+    chunking = summary_stats.get("chunking") or {}
+    await run.finish("summarize", chunks=summary_stats.get("chunks", 0),
+                     token_reduction_pct=chunking.get("token_reduction_pct", 0.0),
+                     **_stage_summary(summary_stats))
+
+    await run.start("eli5")
+    eli5_result = await explain_summary(run.result["summary"])
+    await run.publish(explanation=eli5_result["eli5"])
+    await run.finish("eli5", **_stage_summary(eli5_result["stats"]))
+
+    # 4. Generate TTS audio for explanation
+    tts_audio_path = await _speak(run, run.result["explanation"])
+
+    exclusions = await side_tasks[0]
+    # Only cache complete results so a transient Groq failure is retried next time
+    stages = summary_stats.get("stages", []) + eli5_result["stats"]["stages"]
+    if all(stage["failed"] == 0 for stage in stages):
+        await policy_cache.put(
+            cache_key, run.policy_id, text, run.result["summary"], run.result["explanation"],
+            audio=tts_audio_path if tts_audio_path != "tts_error" else None,
+            extra={"exclusions": exclusions},
+        )
+
+
+async def _run_job(store: JobStore, job: Dict[str, Any], spool_path: Optional[str]) -> None:
+    run = _JobRun(store, job)
+
+    async def heartbeat():
+        # keeps the lease so maintenance does not hand the job to another worker
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            await store.touch(run.job_id)
+
+    beat = asyncio.create_task(heartbeat())
+    requeued = False
+    try:
+        if not spool_path or not os.path.exists(spool_path):
+            raise JobError(410, "The uploaded PDF is no longer available; please upload it again.")
+        await _process(run, spool_path)
+        await store.update(run.job_id, status="done", stages=run.stages, result=run.result)
+    except asyncio.CancelledError:
+        # shutting down: hand the job back (upload included) so it resumes after restart
+        requeued = True
+        await asyncio.to_thread(store._requeue, run.job_id)
+        raise
+    except JobError as e:
+        run.mark_failed()
+        await store.update(run.job_id, status="failed", stages=run.stages, result=run.result,
+                           error={"status_code": e.status_code, "detail": e.detail})
+    except Exception as e:
+        logger.exception("policy job %s failed", run.job_id)
+        run.mark_failed()
+        await store.update(run.job_id, status="failed", stages=run.stages, result=run.result,
+                           error={"status_code": 500, "detail": f"Processing failed: {e}"})
+    finally:
+        beat.cancel()
+        # the job is done or failed (cache hits included): the upload is no longer needed
+        if not requeued and spool_path and os.path.exists(spool_path):
+            os.remove(spool_path)
+
+
+async def _worker(store: JobStore) -> None:
+    while True:
+        claimed = await store.claim()
+        if claimed is None:
+            store.wakeup.clear()
+            try:
+                await asyncio.wait_for(store.wakeup.wait(), JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        job, spool_path = claimed
+        # each job is its own trace; the submitting request's root span carries the job_id
+        with trace_root("policy.job", job_id=job["job_id"]):
+            await _run_job(store, job, spool_path)
+
+
+async def run_policy_workers(workers: int = JOB_WORKERS) -> None:
+    """Background task started from the app lifespan hook: the worker pool plus maintenance."""
+    tasks = [asyncio.create_task(_worker(policy_jobs)) for _ in range(max(1, workers))]
+    try:
+        while True:
+            changed = await policy_jobs.maintain()
+            if changed["requeued"] or changed["purged"]:
+                logger.info("policy jobs maintenance: %s", changed)
+                policy_jobs.wakeup.set()
+            await asyncio.sleep(JOB_LEASE_SECONDS)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+policy_jobs = JobStore(JOBS_DB_PATH)
@@ -0,0 +1,336 @@
+# LLM-refined explanations for /recommend, micro-batched and cached per survey profile
+#
+# Households are reduced to a profile bucket (occupation, income band, family-size band,
+# matched plans). Requests for buckets not in the cache wait a few milliseconds so that
+# concurrent households share one structured-JSON Groq call; identical buckets in flight
+# share one slot in it. Whatever is not answered within the request deadline gets the
+# rule-based heuristic instead, while the batch keeps running and fills the cache.
+import os
+import json
+import time
+import bisect
+import asyncio
+import logging
+import contextvars
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .resilience import deadline, remaining
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
+
+RECOMMEND_ENHANCE = os.getenv("RECOMMEND_ENHANCE", "1") != "0"
+# Time /recommend may wait for refined text before answering with the heuristic
+RECOMMEND_ENHANCE_DEADLINE_S = float(os.getenv("RECOMMEND_ENHANCE_DEADLINE_S", "2.5"))
+# How long a cache miss waits for other households to join its batch
+RECOMMEND_BATCH_WINDOW_S = float(os.getenv("RECOMMEND_BATCH_WINDOW_MS", "20")) / 1000
+RECOMMEND_BATCH_MAX = int(os.getenv("RECOMMEND_BATCH_MAX", "8"))
+# The shared batch call is not bound to any one request's deadline
+RECOMMEND_BATCH_TIMEOUT_S = float(os.getenv("RECOMMEND_BATCH_TIMEOUT_S", "20"))
+RECOMMEND_ENHANCE_CACHE_SIZE = int(os.getenv("RECOMMEND_ENHANCE_CACHE_SIZE", "4096"))
+RECOMMEND_ENHANCE_TTL = float(os.getenv("RECOMMEND_ENHANCE_TTL_HOURS", "24")) * 3600
+ENHANCE_PROMPT_VERSION = "1"
+# Band edges for income (₹/month) and family size; a band runs from one edge up to just
+# below the next. They include the rule table's thresholds (income < 15000,
+# family_size > 3), so a bucket never mixes households that get different plans.
+INCOME_BANDS = (5000, 10000, 15000, 25000, 50000)
+FAMILY_BANDS = (2, 4, 6)
+_PLAN_TOKENS = 120
+_LATENCY_SAMPLES = 1024
+
+ENHANCE_INSTRUCTIONS = (
+    "You refine insurance plan recommendations for rural India. For every household profile below "
+    "and every plan listed for it:\n"
+    "1) write a short, clear refined explanation in simple English (1-2 sentences),\n"
+    "2) assign a trust_score between 0.0 and 1.0 (higher means more confident) with a one-line trust_reason,\n"
+    "3) rewrite the refined explanation in simple rural Hindi (very basic vocabulary).\n"
+    "Return ONLY a JSON object: {\"profiles\": [{\"id\": ..., \"improved_plans\": [{\"name\", "
+    "\"refined_explanation\", \"trust_score\", \"trust_reason\", \"hindi_explanation\"}]}]}, "
+    "with one entry per profile id and one improved plan per listed plan, names unchanged."
+)
+
+
+def _band(value: Optional[int], edges: Tuple[int, ...], unit: str = "") -> str:
+    if value is None:
+        return "unknown"
+    i = bisect.bisect_right(edges, value)
+    if i == 0:
+        return f"below {edges[0]}{unit}"
+    if i == len(edges):
+        return f"{edges[-1]} or more{unit}"
+    return f"{edges[i - 1]}-{edges[i] - 1}{unit}"
+
+
+def _number(value: Any) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def simple_plans(plans: list) -> List[Dict[str, Any]]:
+    """Plans as plain {name, reason, estimated_premium} dicts (accepts dicts or Pydantic models)."""
+    out = []
+    for p in plans:
+        get = p.get if isinstance(p, dict) else lambda k, p=p: getattr(p, k, None)
+        out.append({"name": get("name"), "reason": get("reason"), "estimated_premium": get("estimated_premium")})
+    return out
+
+
+def profile_bucket(plans: List[Dict[str, Any]], survey_data: Optional[dict]) -> Tuple[tuple, dict]:
+    """(cache key, the profile the LLM sees) for a household; every household in a bucket gets the same text."""
+    survey_data = survey_data or {}
+    occupation = " ".join(str(survey_data.get("occupation") or "").lower().split())[:40] or "unknown"
+    profile = {
+        "occupation": occupation,
+        "monthly_income": _band(_number(survey_data.get("income")), INCOME_BANDS, " rupees"),
+        "family_size": _band(_number(survey_data.get("family_size")), FAMILY_BANDS, " members"),
+    }
+    key = (ENHANCE_PROMPT_VERSION, occupation, profile["monthly_income"], profile["family_size"],
+           tuple(p["name"] for p in plans))
+    return key, profile
+
+
+def heuristic_enhancements(plans: List[Dict[str, Any]], survey_data: Optional[dict]) -> List[Dict[str, Any]]:
+    """Rule-of-thumb refinement used when the LLM is unavailable, too slow or unparseable."""
+    fallback = []
+    occ = (survey_data.get("occupation") or "").lower() if survey_data else ""
+    income = survey_data.get("income") if survey_data and isinstance(survey_data.get("income"), (int, float)) else None
+    for p in plans:
+        name = p.get("name")
+        reason = p.get("reason") or "Recommended"
+        # basic trust scoring
+        score = 0.6
+        if occ and "farm" in occ and name and "crop" in name.lower():
+            score += 0.2
+        if income is not None and income < 15000 and "micro" in (name or "").lower():
+            score += 0.15
+        score = max(0.0, min(1.0, score))
+        refined = f"{reason}. This plan is suggested based on your survey answers."
+        hindi = f"(हिंदी) {reason}"
+        fallback.append({
+            "name": name,
+            "refined_explanation": refined,
+            "trust_score": round(score, 2),
+            "trust_reason": "Heuristic fallback reasoning",
+            "hindi_explanation": hindi
+        })
+    return fallback
+
+
+def parse_json_object(text: str) -> Optional[dict]:
+    """The JSON object in an LLM answer, tolerating prose or code fences around it."""
+    for candidate in (text, text[text.find("{"):text.rfind("}") + 1]):
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def _validated(entries: Any, plans: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """The improved plans in the order of `plans`, or None if any plan is missing or malformed."""
+    if not isinstance(entries, list):
+        return None
+    by_name = {str(e.get("name", "")).strip().lower(): e for e in entries if isinstance(e, dict)}
+    improved = []
+    for plan in plans:
+        entry = by_name.get(str(plan["name"]).strip().lower())
+        if entry is None:
+            return None
+        texts = [entry.get(k) for k in ("refined_explanation", "trust_reason", "hindi_explanation")]
+        if not all(isinstance(t, str) and t.strip() for t in texts):
+            return None
+        try:
+            score = float(entry.get("trust_score"))
+        except (TypeError, ValueError):
+            return None
+        improved.append({
+            "name": plan["name"],
+            "refined_explanation": texts[0].strip(),
+            "trust_score": round(min(1.0, max(0.0, score)), 2),
+            "trust_reason": texts[1].strip(),
+            "hindi_explanation": texts[2].strip(),
+        })
+    return improved
+
+
+class RecommendationEnhancer:
+    """Micro-batching, single-flight, TTL/LRU-cached LLM refinement of recommended plans."""
+
+    def __init__(self, window: float = RECOMMEND_BATCH_WINDOW_S, max_batch: int = RECOMMEND_BATCH_MAX,
+                 cache_size: int = RECOMMEND_ENHANCE_CACHE_SIZE, ttl: float = RECOMMEND_ENHANCE_TTL):
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self._cache: "OrderedDict[tuple, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._inflight: Dict[tuple, "asyncio.Future[Optional[List[Dict[str, Any]]]]"] = {}
+        self._pending: List[Tuple[tuple, dict, List[Dict[str, Any]]]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._latency: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self.stats = {
+            "requests": 0,
+            "cache_hits": 0,
+            "coalesced": 0,
+            "upstream_calls": 0,
+            "batched_profiles": 0,
+            "fallback_deadline": 0,
+            "fallback_error": 0,
+            "invalid_answers": 0,
+        }
+
+    def _lookup(self, key: tuple) -> Optional[List[Dict[str, Any]]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key: tuple, improved: List[Dict[str, Any]]) -> None:
+        self._cache[key] = (time.monotonic() + self.ttl, improved)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    @traced("recommend_enhancer.enhance")
+    async def enhance(self, plans: list, survey_data: Optional[dict]) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        (improved plans, source) where source is "cache", "llm" or "heuristic". Waits at
+        most until the current deadline (RECOMMEND_ENHANCE_DEADLINE_S if none is set).
+        """
+        started = time.perf_counter()
+        self.stats["requests"] += 1
+        plans = simple_plans(plans)
+        key, profile = profile_bucket(plans, survey_data)
+        improved = self._lookup(key)
+        source = "cache"
+        if improved is None:
+            improved, source = await self._wait_for_batch(key, profile, plans)
+        else:
+            self.stats["cache_hits"] += 1
+        if improved is None:
+            improved, source = heuristic_enhancements(plans, survey_data), "heuristic"
+        self._latency.append(time.perf_counter() - started)
+        return [dict(p) for p in improved], source
+
+    async def _wait_for_batch(self, key: tuple, profile: dict, plans: List[Dict[str, Any]]):
+        from .llm import GROQ_API_KEY
+        if not GROQ_API_KEY:
+            self.stats["fallback_error"] += 1
+            return None, "heuristic"
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self._pending.append((key, profile, plans))
+            self._schedule()
+        else:
+            self.stats["coalesced"] += 1
+        budget = remaining(RECOMMEND_ENHANCE_DEADLINE_S)
+        try:
+            # shield: the batch must still answer the other households and fill the cache
+            improved = await asyncio.wait_for(asyncio.shield(future), max(0.0, budget))
+        except asyncio.TimeoutError:
+            self.stats["fallback_deadline"] += 1
+            return None, "heuristic"
+        if improved is None:
+            self.stats["fallback_error"] += 1
+        return improved, "llm"
+
+    def _schedule(self) -> None:
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        # a fresh context, so the batch does not inherit the deadline of whichever
+        # request happened to fill it
+        task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[tuple, dict, List[Dict[str, Any]]]]) -> None:
+        self.stats["upstream_calls"] += 1
+        self.stats["batched_profiles"] += len(batch)
+        answers: Dict[str, Any] = {}
+        cacheable = False
+        try:
+            with deadline(RECOMMEND_BATCH_TIMEOUT_S):
+                answers, cacheable = await self._call(batch)
+        except Exception as e:
+            logger.warning("recommendation enhancement batch of %d failed: %s", len(batch), e)
+        for i, (key, _, plans) in enumerate(batch):
+            improved = _validated(answers.get(f"p{i}"), plans)
+            if improved is None:
+                self.stats["invalid_answers"] += 1
+            elif cacheable:
+                self._store(key, improved)
+            future = self._inflight.pop(key)
+            if not future.done():
+                future.set_result(improved)
+
+    async def _call(self, batch) -> Tuple[Dict[str, Any], bool]:
+        """One Groq call for the whole batch: ({profile id: improved_plans}, cacheable)."""
+        from .llm import SYSTEM_PROMPT, call_groq_completion
+        profiles = [
+            {"id": f"p{i}", "household": profile,
+             "plans": [{"name": p["name"], "reason": p["reason"], "estimated_premium": p["estimated_premium"]}
+                       for p in plans]}
+            for i, (_, profile, plans) in enumerate(batch)
+        ]
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": ENHANCE_INSTRUCTIONS + "\n\nProfiles: "
+                                        + json.dumps(profiles, ensure_ascii=False)},
+        ]
+        plan_count = sum(len(p["plans"]) for p in profiles)
+        data = await call_groq_completion(
+            messages, temperature=0, max_tokens=min(8000, 64 + _PLAN_TOKENS * plan_count),
+            timeout=RECOMMEND_BATCH_TIMEOUT_S, cache=False, response_format={"type": "json_object"},
+        )
+        parsed = parse_json_object(data["choices"][0]["message"]["content"]) or {}
+        entries = parsed.get("profiles")
+        answers = {str(e.get("id")): e.get("improved_plans") for e in entries if isinstance(e, dict)} \
+            if isinstance(entries, list) else {}
+        # answers from the fallback model are used but not kept, like llm_cache does
+        return answers, "fallback_model" not in data
+
+    def info(self) -> Dict[str, Any]:
+        latency = np.asarray(self._latency) * 1000
+        requests = self.stats["requests"]
+        return {
+            **self.stats,
+            "enabled": RECOMMEND_ENHANCE,
+            "calls_per_request": round(self.stats["upstream_calls"] / requests, 4) if requests else None,
+            "mean_batch_size": round(self.stats["batched_profiles"] / self.stats["upstream_calls"], 2)
+            if self.stats["upstream_calls"] else None,
+            "added_latency_ms": {
+                "p50": round(float(np.quantile(latency, 0.5)), 1),
+                "p95": round(float(np.quantile(latency, 0.95)), 1),
+                "p99": round(float(np.quantile(latency, 0.99)), 1),
+            } if len(latency) else None,
+            "cache_entries": len(self._cache),
+            "in_flight": len(self._inflight),
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+        }
+
+
+enhancer = RecommendationEnhancer()
@@ -0,0 +1,221 @@
+# Data-driven, vectorized recommendation engine (rules in app/data/recommend_rules.json)
+import os
+import json
+import operator
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RULES_PATH = os.getenv(
+    "RECOMMEND_RULES_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "recommend_rules.json")),
+)
+
+FIELDS = ("occupation", "income", "family_size")
+# Plausible ranges; also keep the int64 columns (and the float trust maths) from overflowing
+MAX_INCOME = 10 ** 12
+MAX_FAMILY_SIZE = 100
+
+# operator.* on ndarrays is elementwise and, unlike np.equal on older NumPy, also
+# works for unicode columns
+_OPS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+}
+
+
+class RuleError(ValueError):
+    """The rule table is malformed."""
+
+
+class HouseholdError(ValueError):
+    """income or family_size is out of range."""
+
+
+def _compile_conditions(conditions: List[dict]):
+    """Compile a list of {field, op, value} into a function columns -> bool array (AND)."""
+    compiled = []
+    for cond in conditions:
+        field, op, value = cond.get("field"), cond.get("op"), cond.get("value")
+        if field not in FIELDS:
+            raise RuleError(f"unknown field {field!r}")
+        if op == "in":
+            if not isinstance(value, list):
+                raise RuleError("'in' needs a list value")
+            compiled.append((field, lambda col, v=value: np.isin(col, v)))
+        elif op in _OPS:
+            if field == "occupation":
+                value = str(value).strip().lower()
+            compiled.append((field, lambda col, f=_OPS[op], v=value: f(col, v)))
+        else:
+            raise RuleError(f"unknown op {op!r}")
+
+    def evaluate(columns: Dict[str, np.ndarray]) -> np.ndarray:
+        mask = np.ones(len(columns["income"]), dtype=bool)
+        for field, fn in compiled:
+            mask &= fn(columns[field])
+        return mask
+
+    return evaluate
+
+
+def _plan_dict(plan: dict) -> Dict[str, Any]:
+    return {
+        "name": plan["name"],
+        "reason": plan.get("reason"),
+        "estimated_premium": float(plan["estimated_premium"]),
+    }
+
+
+class RecommendationEngine:
+    """
+    Compiles the declarative rule table into NumPy evaluation over column arrays.
+
+    Each household gets a bitmask of matched plans; everything that depends only on the
+    set of plans (plan list, total premium, explanation, pre-serialized JSON) is built
+    once per distinct mask, so per-row work is a lookup plus the trust score.
+    """
+
+    def __init__(self, rules: dict):
+        self.version = rules.get("version", 1)
+        self.plans = [_plan_dict(p) for p in rules["plans"]]
+        if len(self.plans) > 62:
+            raise RuleError("at most 62 plan rules are supported")
+        self._plan_masks = [_compile_conditions(p.get("when", [])) for p in rules["plans"]]
+        self.default_plan = _plan_dict(rules["default_plan"])
+
+        trust = rules["trust_score"]
+        self._trust_base = float(trust["base"])
+        self._trust_min = float(trust.get("min", 0.0))
+        self._trust_max = float(trust.get("max", 1.0))
+        self._trust_terms = []
+        for term in trust.get("terms", []):
+            if "when" in term:
+                self._trust_terms.append(("when", _compile_conditions(term["when"]), float(term["add"])))
+            elif term.get("field") in ("income", "family_size"):
+                self._trust_terms.append(("linear", term["field"], (
+                    float(term.get("subtract", 0)), float(term.get("scale", 1)), float(term.get("cap", np.inf)),
+                )))
+            else:
+                raise RuleError(f"bad trust_score term {term!r}")
+        self._templates: Dict[int, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_file(cls, path: str = RULES_PATH) -> "RecommendationEngine":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def columns(occupation: Sequence[str], income: Sequence[int], family_size: Sequence[int]) -> Dict[str, np.ndarray]:
+        return {
+            "occupation": np.char.lower(np.char.strip(np.asarray(occupation, dtype=str))),
+            "income": np.asarray(income, dtype=np.int64),
+            "family_size": np.asarray(family_size, dtype=np.int64),
+        }
+
+    def score(self, columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (plan bitmask, unrounded trust score) arrays for the given columns."""
+        n = len(columns["income"])
+        masks = np.zeros(n, dtype=np.int64)
+        for bit, evaluate in enumerate(self._plan_masks):
+            masks |= evaluate(columns).astype(np.int64) << bit
+        # same order of float additions as the original per-request heuristic
+        trust = np.full(n, self._trust_base, dtype=np.float64)
+        for kind, a, b in self._trust_terms:
+            if kind == "when":
+                trust += np.where(a(columns), b, 0.0)
+            else:
+                subtract, scale, cap = b
+                trust += np.minimum(cap, scale * np.maximum(0.0, columns[a] - subtract))
+        np.clip(trust, self._trust_min, self._trust_max, out=trust)
+        return masks, trust
+
+    def template(self, mask: int) -> Dict[str, Any]:
+        """Everything about a result that depends only on the matched plan set."""
+        tpl = self._templates.get(mask)
+        if tpl is None:
+            plans = [p for bit, p in enumerate(self.plans) if mask >> bit & 1] or [self.default_plan]
+            total = round(sum(p["estimated_premium"] or 0.0 for p in plans), 2)
+            explanation = "; ".join(
+                f"{p['name']}: {p['reason'] or 'recommended'} (premium ₹{p['estimated_premium']:.2f})" for p in plans
+            )
+            tpl = {
+                "plans": plans,
+                "total_premium": total,
+                "explanation": explanation,
+                # JSON tail shared by every bulk row with this plan set
+                "json_tail": json.dumps(
+                    {"plans": plans, "total_premium": total, "explanation": explanation}, ensure_ascii=False
+                )[1:],
+            }
+            self._templates[mask] = tpl
+        return tpl
+
+    def recommend_one(self, occupation: str, income: int, family_size: int) -> Dict[str, Any]:
+        """Recommendation for one household; HouseholdError if income or family_size is out of range."""
+        error = household_error(income, family_size)
+        if error is not None:
+            raise HouseholdError(error)
+        masks, trust = self.score(self.columns([occupation or ""], [income], [family_size]))
+        tpl = self.template(int(masks[0]))
+        return {
+            "plans": [dict(p) for p in tpl["plans"]],
+            "trust_score": round(float(trust[0]), 2),
+            "total_premium": tpl["total_premium"],
+            "explanation": tpl["explanation"],
+        }
+
+    def bulk_ndjson(self, records: List[Tuple[int, Optional[dict], Optional[str]]]) -> str:
+        """
+        Score a batch of (row_number, record, parse_error) and return NDJSON lines in row
+        order. Valid rows are scored in one vectorized pass; invalid rows get an error line.
+        """
+        lines: List[str] = [""] * len(records)
+        valid_idx: List[int] = []
+        households: List[Tuple[str, int, int]] = []
+        for i, (row_no, record, error) in enumerate(records):
+            if error is None:
+                household, error = parse_household(record)
+            if error is not None:
+                lines[i] = json.dumps({"row": row_no, "error": error}, ensure_ascii=False) + "\n"
+            else:
+                valid_idx.append(i)
+                households.append(household)
+        if households:
+            occupation, income, family_size = zip(*households)
+            masks, trust = self.score(self.columns(occupation, income, family_size))
+            for i, mask, score in zip(valid_idx, masks.tolist(), trust.tolist()):
+                lines[i] = f'{{"row": {records[i][0]}, "trust_score": {round(score, 2)!r}, {self.template(mask)["json_tail"]}\n'
+        return "".join(lines)
+
+
+def parse_household(record: dict) -> Tuple[Optional[Tuple[str, int, int]], Optional[str]]:
+    """Validate one bulk record. Returns ((occupation, income, family_size), None) or (None, error)."""
+    try:
+        occupation = str(record.get("occupation") or "")
+        income = int(float(record["income"]))
+        family_size = int(float(record["family_size"]))
+    except KeyError as e:
+        return None, f"missing field {e.args[0]}"
+    except (TypeError, ValueError, OverflowError):
+        # OverflowError: "inf"
+        return None, "income and family_size must be numbers"
+    error = household_error(income, family_size)
+    if error is not None:
+        return None, error
+    return (occupation, income, family_size), None
+
+
+def household_error(income: int, family_size: int) -> Optional[str]:
+    if not 0 <= income <= MAX_INCOME:
+        return f"income must be between 0 and {MAX_INCOME}"
+    if not 0 <= family_size <= MAX_FAMILY_SIZE:
+        return f"family_size must be between 0 and {MAX_FAMILY_SIZE}"
+    return None
+
+
+engine = RecommendationEngine.from_file()
@@ -0,0 +1,389 @@
+# Latency budgets, hedged requests, circuit breaking and model fallback for Groq calls
+import os
+import time
+import random
+import asyncio
+import logging
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import httpx
+import numpy as np
+
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Attempts on the last-resort model; earlier models get one fewer before falling back
+# (hedges do not count)
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.25"))
+RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "4"))
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") == "1"
+# A hedge goes out once the first attempt has taken longer than this quantile of recent latencies
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.2"))
+# Used until a model has HEDGE_MIN_SAMPLES successful calls
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "2.0"))
+HEDGE_MIN_SAMPLES = 20
+# Hedges allowed per primary call, on average (token bucket)
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "30"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_FAILURE_RATIO = float(os.getenv("BREAKER_FAILURE_RATIO", "0.5"))
+# This many 429s inside the window open the breaker regardless of the failure ratio
+BREAKER_429_BURST = int(os.getenv("BREAKER_429_BURST", "5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "15"))
+
+_LATENCY_SAMPLES = 256
+_RETRYABLE_STATUS = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's latency budget ran out before an upstream call succeeded."""
+
+
+class CircuitOpenError(Exception):
+    """Every candidate model's circuit breaker is open."""
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Give everything awaited inside the block (including tasks it creates) at most
+    `seconds` in total. Nested deadlines can only shorten the budget.
+    """
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """Seconds left on the current deadline, capped at `default` (None: no deadline set)."""
+    at = _deadline.get()
+    if at is None:
+        return default
+    left = at - time.monotonic()
+    return left if default is None else min(left, default)
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(exc: BaseException) -> Tuple[bool, Optional[int], Optional[float]]:
+    """(retryable, HTTP status, Retry-After seconds) for an upstream failure."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status in _RETRYABLE_STATUS, status, _retry_after(exc.response)
+    if isinstance(exc, (httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError)):
+        return True, None, None
+    return False, None, None
+
+
+class LatencyTracker:
+    """Latencies of the last _LATENCY_SAMPLES successful calls in a numpy ring buffer."""
+
+    def __init__(self, size: int = _LATENCY_SAMPLES):
+        self._values = np.zeros(size, dtype=np.float64)
+        self._count = 0
+
+    def record(self, seconds: float) -> None:
+        self._values[self._count % len(self._values)] = seconds
+        self._count += 1
+
+    @property
+    def samples(self) -> int:
+        return min(self._count, len(self._values))
+
+    def quantile(self, q: float, default: Optional[float] = None) -> Optional[float]:
+        if self.samples < HEDGE_MIN_SAMPLES:
+            return default
+        return float(np.quantile(self._values[:self.samples], q))
+
+
+class CircuitBreaker:
+    """
+    Opens when, within the last BREAKER_WINDOW seconds, at least BREAKER_MIN_CALLS calls
+    were made and BREAKER_FAILURE_RATIO of them failed, or BREAKER_429_BURST were rate
+    limited. Stays open for BREAKER_OPEN_SECONDS (or the upstream's Retry-After, if
+    longer), then lets one probe through; its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = "closed"
+        self.opened = 0
+        self._open_until = 0.0
+        self._probing = False
+        self._outcomes: Deque[Tuple[float, bool, bool]] = deque()
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() < self._open_until:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def _prune(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] < now - BREAKER_WINDOW:
+            self._outcomes.popleft()
+
+    def _open(self, now: float, retry_after: Optional[float]) -> None:
+        if self.state != "open":
+            self.opened += 1
+            logger.warning("circuit breaker %s opened", self.name)
+        self.state = "open"
+        self._open_until = now + max(BREAKER_OPEN_SECONDS, retry_after or 0.0)
+        self._outcomes.clear()
+
+    def record_success(self) -> None:
+        now = time.monotonic()
+        if self.state != "closed":
+            logger.info("circuit breaker %s closed", self.name)
+        self.state = "closed"
+        self._probing = False
+        self._prune(now)
+        self._outcomes.append((now, False, False))
+
+    def record_failure(self, status: Optional[int] = None, retry_after: Optional[float] = None) -> None:
+        now = time.monotonic()
+        if self.state == "half_open":
+            self._open(now, retry_after)
+            return
+        self._prune(now)
+        self._outcomes.append((now, True, status == 429))
+        calls = len(self._outcomes)
+        failures = sum(1 for _, failed, _ in self._outcomes if failed)
+        limited = sum(1 for _, _, is_429 in self._outcomes if is_429)
+        if (calls >= BREAKER_MIN_CALLS and failures >= BREAKER_FAILURE_RATIO * calls) or limited >= BREAKER_429_BURST:
+            self._open(now, retry_after)
+
+    def release_probe(self) -> None:
+        """A half-open probe was cancelled without an outcome; let the next call probe."""
+        self._probing = False
+
+    def info(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._prune(now)
+        return {
+            "state": self.state,
+            "opened": self.opened,
+            "open_for_s": round(max(0.0, self._open_until - now), 1) if self.state == "open" else 0.0,
+            "window_calls": len(self._outcomes),
+            "window_failures": sum(1 for _, failed, _ in self._outcomes if failed),
+        }
+
+
+class UpstreamPolicy:
+    """
+    Retry, hedge, circuit-break and fall back across `models` (preferred first) for
+    one kind of upstream call. `op(model, timeout)` performs a single attempt.
+
+    The budget is the smaller of the call's timeout and the current deadline (see
+    deadline()). An attempt that outlives the model's p95 latency gets one hedged
+    duplicate; the first success wins and the other is cancelled. Retryable failures
+    back off with jitter (at least Retry-After); a 429 or an open breaker moves on to
+    the next model straight away, and a model whose median latency no longer fits the
+    remaining budget is skipped in favour of a faster one.
+    """
+
+    def __init__(self, name: str, models: List[str]):
+        self.name = name
+        self.models = [m for i, m in enumerate(models) if m and m not in models[:i]]
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._hedge_tokens = 1.0
+        self.stats = {
+            "calls": 0, "succeeded": 0, "failed": 0, "attempts": 0, "retries": 0,
+            "hedges": 0, "hedge_wins": 0, "fallbacks": 0, "short_circuited": 0, "deadline_exceeded": 0,
+        }
+        self._call_latency = LatencyTracker(1024)
+
+    def latency(self, model: str) -> LatencyTracker:
+        return self._latency.setdefault(model, LatencyTracker())
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        return self._breakers.setdefault(model, CircuitBreaker(f"{self.name}:{model}"))
+
+    def candidates(self, model: Optional[str] = None) -> List[str]:
+        if model is None or model == self.models[0]:
+            return list(self.models)
+        return [model] + [m for m in self.models[1:] if m != model]
+
+    @staticmethod
+    def backoff(attempt: int, retry_after: Optional[float]) -> float:
+        # "equal jitter": half fixed, half random, so retries from many clients spread out
+        ceiling = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** (attempt - 1)))
+        delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+        return max(delay, retry_after or 0.0)
+
+    def _take_hedge(self) -> bool:
+        if self._hedge_tokens >= 1.0:
+            self._hedge_tokens -= 1.0
+            return True
+        return False
+
+    async def _attempt(self, op: Callable[[str, float], Awaitable[T]], model: str, left: float,
+                       hedge: bool) -> T:
+        """One attempt on `model`, with a hedged duplicate if it is slower than usual."""
+        breaker = self.breaker(model)
+        tracker = self.latency(model)
+        started = time.monotonic()
+
+        async def run(budget: float, hedged: bool = False) -> Tuple[T, float]:
+            begun = time.monotonic()
+            with span(f"{self.name}.attempt", model=model, hedge=hedged):
+                result = await asyncio.wait_for(op(model, budget), budget)
+            return result, time.monotonic() - begun
+
+        tasks = [asyncio.ensure_future(run(left))]
+        hedge_at = max(HEDGE_MIN_DELAY, tracker.quantile(HEDGE_QUANTILE, HEDGE_DEFAULT_DELAY))
+        try:
+            pending = set(tasks)
+            errors: List[BaseException] = []
+            while pending:
+                can_hedge = (hedge and HEDGE_ENABLED and len(tasks) == 1 and breaker.state == "closed"
+                             and hedge_at < left * 0.8)
+                timeout = max(0.0, started + hedge_at - time.monotonic()) if can_hedge else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if self._take_hedge():
+                        self.stats["hedges"] += 1
+                        task = asyncio.ensure_future(run(left - (time.monotonic() - started), hedged=True))
+                        tasks.append(task)
+                        pending.add(task)
+                    else:
+                        hedge = False
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        result, elapsed = task.result()
+                        tracker.record(elapsed)
+                        breaker.record_success()
+                        if len(tasks) > 1 and task is tasks[1]:
+                            self.stats["hedge_wins"] += 1
+                        return result
+                    errors.append(task.exception())
+                    retryable, status, retry_after = classify(task.exception())
+                    # a 400 is our request's fault, not a sign of upstream trouble
+                    if retryable:
+                        breaker.record_failure(status, retry_after)
+            raise errors[0]
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            if breaker.state == "half_open":
+                breaker.release_probe()
+
+    async def call(self, op: Callable[[str, float], Awaitable[T]], timeout: float = 30,
+                   model: Optional[str] = None, hedge: bool = True) -> T:
+        """Run `op` under this policy and return its result, or raise the last failure."""
+        self.stats["calls"] += 1
+        self._hedge_tokens = min(5.0, self._hedge_tokens + HEDGE_MAX_RATIO)
+        budget = remaining(timeout)
+        started = time.monotonic()
+        end = started + budget
+        models = self.candidates(model)
+        last_exc: Optional[BaseException] = None
+        attempts = 0
+        try:
+            for index, candidate in enumerate(models):
+                breaker = self.breaker(candidate)
+                is_last = index == len(models) - 1
+                if index > 0:
+                    self.stats["fallbacks"] += 1
+                allowed = RETRY_MAX_ATTEMPTS if is_last else max(1, RETRY_MAX_ATTEMPTS - 1)
+                for model_attempt in range(1, allowed + 1):
+                    left = end - time.monotonic()
+                    if left <= 0:
+                        raise DeadlineExceeded(f"{self.name}: budget of {budget:.1f}s exhausted")
+                    typical = self.latency(candidate).quantile(0.5)
+                    if not is_last and typical is not None and typical > left:
+                        break
+                    if not breaker.allow():
+                        self.stats["short_circuited"] += 1
+                        last_exc = last_exc or CircuitOpenError(f"{self.name}: circuit open for {candidate}")
+                        break
+                    attempts += 1
+                    self.stats["attempts"] += 1
+                    if attempts > 1:
+                        self.stats["retries"] += 1
+                    try:
+                        result = await self._attempt(op, candidate, left, hedge)
+                        self.stats["succeeded"] += 1
+                        self._call_latency.record(time.monotonic() - started)
+                        return result
+                    except Exception as exc:
+                        retryable, status, retry_after = classify(exc)
+                        if not retryable:
+                            raise
+                        last_exc = exc
+                        logger.info("%s attempt %d on %s failed: %s", self.name, attempts, candidate, exc)
+                        if status == 429 and not is_last:
+                            break
+                        if model_attempt == allowed:
+                            break
+                        delay = self.backoff(model_attempt, retry_after)
+                        if time.monotonic() + delay >= end:
+                            break
+                        await asyncio.sleep(delay)
+            if time.monotonic() >= end:
+                raise DeadlineExceeded(f"{self.name}: budget of {budget:.1f}s exhausted")
+            raise last_exc or CircuitOpenError(f"{self.name}: no model available")
+        except DeadlineExceeded:
+            self.stats["deadline_exceeded"] += 1
+            self.stats["failed"] += 1
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "models": self.models,
+            "latency_p50_s": _rounded(self._call_latency.quantile(0.5)),
+            "latency_p95_s": _rounded(self._call_latency.quantile(0.95)),
+            "latency_p99_s": _rounded(self._call_latency.quantile(0.99)),
+            "per_model": {
+                m: {
+                    "breaker": self.breaker(m).info(),
+                    "samples": self.latency(m).samples,
+                    "p50_s": _rounded(self.latency(m).quantile(0.5)),
+                    "hedge_delay_s": _rounded(max(HEDGE_MIN_DELAY, self.latency(m).quantile(HEDGE_QUANTILE, HEDGE_DEFAULT_DELAY))),
+                }
+                for m in self.models
+            },
+        }
+
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
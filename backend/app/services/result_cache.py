@@ -0,0 +1,159 @@
+# Content-addressed, SQLite-backed cache of /policy/simplify results
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from typing import Optional, Dict, Any
+
+from .tracing import traced
+
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cache"))
+POLICY_CACHE_PATH = os.getenv("POLICY_CACHE_PATH", os.path.join(CACHE_DIR, "policy_results.sqlite3"))
+POLICY_CACHE_MAX_BYTES = int(os.getenv("POLICY_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    pdf_sha256 TEXT NOT NULL,
+    text TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    eli5 TEXT NOT NULL,
+    audio TEXT,
+    extra TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_access ON results(last_access);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache:
+    """
+    LRU cache of policy results keyed by (SHA-256 of the upload, prompt/model version).
+
+    Lives in one SQLite file in WAL mode, so it survives restarts and is shared by all
+    uvicorn workers on the host. Hit/miss counters are stored alongside the rows for
+    the same reason. Blocking SQLite calls run in a worker thread.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            "INSERT INTO counters(name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT pdf_sha256, text, summary, eli5, audio, extra FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._bump(conn, "misses")
+            return None
+        conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+        self._bump(conn, "hits")
+        return {
+            "pdf_sha256": row[0],
+            "text": row[1],
+            "summary": row[2],
+            "eli5": row[3],
+            "audio": row[4],
+            "extra": json.loads(row[5]) if row[5] else {},
+        }
+
+    def _put(self, key: str, pdf_sha256: str, text: str, summary: str, eli5: str,
+             audio: Optional[str], extra: Optional[dict]) -> None:
+        extra_json = json.dumps(extra or {}, ensure_ascii=False)
+        size = sum(len(v.encode("utf-8")) for v in (text, summary, eli5, audio or "", extra_json))
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, pdf_sha256, text, summary, eli5, audio, extra_json, size, now, now),
+            )
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._bump(conn, "evictions")
+            total -= size
+
+    def _update_audio(self, key: str, audio: str) -> None:
+        self._conn().execute("UPDATE results SET audio = ? WHERE key = ?", (audio, key))
+
+    def _stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
+
+    @traced("policy_cache.get")
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, key)
+
+    @traced("policy_cache.put")
+    async def put(self, key: str, pdf_sha256: str, text: str, summary: str, eli5: str,
+                  audio: Optional[str] = None, extra: Optional[dict] = None) -> None:
+        await asyncio.to_thread(self._put, key, pdf_sha256, text, summary, eli5, audio, extra)
+
+    async def update_audio(self, key: str, audio: str) -> None:
+        await asyncio.to_thread(self._update_audio, key, audio)
+
+    async def stats(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._stats)
+
+
+policy_cache = ResultCache(POLICY_CACHE_PATH, POLICY_CACHE_MAX_BYTES)
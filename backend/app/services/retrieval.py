@@ -0,0 +1,227 @@
+# Local BM25 retrieval over uploaded policy text (English + Hindi)
+import os
+import re
+import json
+import asyncio
+import threading
+from collections import Counter, OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from .tracing import traced
+
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cache"))
+INDEX_DIR = os.getenv("POLICY_INDEX_DIR", os.path.join(CACHE_DIR, "index"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+PASSAGE_CHARS = int(os.getenv("RETRIEVAL_PASSAGE_CHARS", "600"))
+INDEX_CACHE_SIZE = int(os.getenv("RETRIEVAL_INDEX_CACHE_SIZE", "32"))
+# Bump when tokenize() changes; indexes built by an older version are rebuilt on upload
+INDEX_VERSION = "2"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Latin words/numbers, or runs of Devanagari letters *and* their combining vowel signs
+# (matras are category Mn/Mc, which \w does not match). Dandas (U+0964/5) split tokens.
+_TOKEN = re.compile(r"[a-z0-9]+|[\u0900-\u0963\u0966-\u097f]+")
+_POLICY_ID = re.compile(r"^[0-9a-f]{64}$")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have if in is it its of on or that the this to was "
+    "were will with shall any such under all than not be been which who whom your you we our "
+    "is what how does do can my me i "
+    "का की के को में से है हैं और या पर यह वह भी तो ही एक था थे थी गया गई क्या कैसे मेरा मेरी मैं"
+    .split()
+)
+
+
+def _stem(token: str) -> str:
+    # Light English suffix stripping so "covered"/"covers"/"covering" meet "cover".
+    # Plurals lose only the "s" ("diseases" -> "disease", like the singular), except
+    # "policies" -> "policy" and "losses" -> "loss"; "bonus", "basis" and "loss" stay
+    if token.isascii() and len(token) > 4:
+        if token.endswith("ies"):
+            return token[:-3] + "y"
+        if token.endswith("sses"):
+            return token[:-2]
+        if token.endswith("s"):
+            return token if token.endswith(("ss", "us", "is")) else token[:-1]
+        for suffix in ("ing", "ed"):
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def is_policy_id(value: str) -> bool:
+    return bool(value) and bool(_POLICY_ID.match(value))
+
+
+def split_passages(pages: List[str], max_chars: int = PASSAGE_CHARS) -> List[Dict[str, Any]]:
+    """Pack paragraphs into passages of about max_chars, never crossing a page."""
+    passages: List[Dict[str, Any]] = []
+    for page_no, page in enumerate(pages, start=1):
+        current = ""
+        for para in re.split(r"\n\s*\n|(?<=[.:;।])\n", page):
+            para = " ".join(para.split())
+            if not para:
+                continue
+            if current and len(current) + len(para) + 1 > max_chars:
+                passages.append({"page": page_no, "text": current})
+                current = ""
+            # hard-split paragraphs that are longer than a passage on their own
+            while len(para) > max_chars:
+                passages.append({"page": page_no, "text": para[:max_chars]})
+                para = para[max_chars:]
+            current = f"{current} {para}".strip()
+        if current:
+            passages.append({"page": page_no, "text": current})
+    return passages
+
+
+class BM25Index:
+    """
+    Inverted index in CSR layout: postings of term t are docs[ptr[t]:ptr[t+1]] with
+    their precomputed BM25 weights in weights[...]. A query is a handful of slice
+    adds into a dense score vector plus an argpartition.
+    """
+
+    def __init__(self, vocab: Dict[str, int], ptr: np.ndarray, docs: np.ndarray,
+                 weights: np.ndarray, passages: List[Dict[str, Any]]):
+        self.vocab = vocab
+        self.ptr = ptr
+        self.docs = docs
+        self.weights = weights
+        self.passages = passages
+
+    @classmethod
+    def build(cls, passages: List[Dict[str, Any]]) -> "BM25Index":
+        vocab: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        doc_len = np.zeros(len(passages), dtype=np.float32)
+        for d, passage in enumerate(passages):
+            counts = Counter(tokenize(passage["text"]))
+            doc_len[d] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(d)
+                tfs.append(tf)
+
+        terms = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")
+        terms = terms[order]
+        docs = np.asarray(doc_ids, dtype=np.int32)[order]
+        tf = np.asarray(tfs, dtype=np.float32)[order]
+
+        df = np.bincount(terms, minlength=len(vocab))
+        ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=ptr[1:])
+        n = max(len(passages), 1)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(doc_len.mean()) if len(passages) else 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[docs] / max(avgdl, 1e-6))
+        weights = (idf[terms] * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+        return cls(vocab, ptr, docs, weights, passages)
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> List[Dict[str, Any]]:
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or not self.passages:
+            return []
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        for t in term_ids:
+            a, b = self.ptr[t], self.ptr[t + 1]
+            # doc ids are unique within one posting list, so fancy-index add is safe
+            scores[self.docs[a:b]] += self.weights[a:b]
+        k = min(k, len(self.passages))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {**self.passages[i], "score": round(float(scores[i]), 4)}
+            for i in top if scores[i] > 0
+        ]
+
+    def save(self, path_prefix: str) -> None:
+        os.makedirs(os.path.dirname(path_prefix), exist_ok=True)
+        terms = sorted(self.vocab, key=self.vocab.get)
+        tmp = f"{path_prefix}.tmp"
+        with open(tmp + ".json", "w", encoding="utf-8") as f:
+            json.dump({"vocab": terms, "passages": self.passages}, f, ensure_ascii=False)
+        with open(tmp + ".npz", "wb") as f:
+            np.savez(f, ptr=self.ptr, docs=self.docs, weights=self.weights)
+        os.replace(tmp + ".npz", path_prefix + ".npz")
+        os.replace(tmp + ".json", path_prefix + ".json")
+
+    @classmethod
+    def load(cls, path_prefix: str) -> "BM25Index":
+        with open(path_prefix + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        with np.load(path_prefix + ".npz") as arrays:
+            ptr, docs, weights = arrays["ptr"], arrays["docs"], arrays["weights"]
+        vocab = {term: i for i, term in enumerate(meta["vocab"])}
+        return cls(vocab, ptr, docs, weights, meta["passages"])
+
+
+_loaded: "OrderedDict[str, BM25Index]" = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def _index_path(policy_id: str) -> str:
+    if not is_policy_id(policy_id):
+        raise ValueError("Invalid policy_id")
+    return os.path.join(INDEX_DIR, f"v{INDEX_VERSION}", policy_id[:2], policy_id)
+
+
+def _remember(policy_id: str, index: BM25Index) -> None:
+    with _loaded_lock:
+        _loaded[policy_id] = index
+        _loaded.move_to_end(policy_id)
+        while len(_loaded) > INDEX_CACHE_SIZE:
+            _loaded.popitem(last=False)
+
+
+@traced("retrieval.build_index")
+def _build_and_save(policy_id: str, pages: List[str]) -> int:
+    index = BM25Index.build(split_passages(pages))
+    index.save(_index_path(policy_id))
+    _remember(policy_id, index)
+    return len(index.passages)
+
+
+@traced("retrieval.load_index")
+def _get_index(policy_id: str) -> Optional[BM25Index]:
+    with _loaded_lock:
+        index = _loaded.get(policy_id)
+        if index is not None:
+            _loaded.move_to_end(policy_id)
+            return index
+    path = _index_path(policy_id)
+    if not os.path.exists(path + ".npz"):
+        return None
+    index = BM25Index.load(path)
+    _remember(policy_id, index)
+    return index
+
+
+def has_policy_index(policy_id: str) -> bool:
+    return is_policy_id(policy_id) and os.path.exists(_index_path(policy_id) + ".npz")
+
+
+async def build_policy_index(policy_id: str, pages: List[str]) -> int:
+    """Index a policy's page texts under its id (the SHA-256 of the PDF). Returns passage count."""
+    return await asyncio.to_thread(_build_and_save, policy_id, pages)
+
+
+@traced()
+async def retrieve(policy_id: str, query: str, k: int = RETRIEVAL_TOP_K) -> Optional[List[Dict[str, Any]]]:
+    """Top-k passages for query, or None if the policy has not been indexed."""
+    index = _loaded.get(policy_id)
+    if index is None:
+        index = await asyncio.to_thread(_get_index, policy_id)
+    if index is None:
+        return None
+    return index.search(query, k)
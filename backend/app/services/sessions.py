@@ -0,0 +1,283 @@
+# Server-side conversation store with token-budgeted history windows
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Set
+
+from .llm import SYSTEM_PROMPT, FALLBACK_RESPONSE, call_groq_completion, estimate_tokens
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cache"))
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")  # 'sqlite' or 'memory'
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(CACHE_DIR, "sessions.sqlite3"))
+SESSION_MAX_ACTIVE = int(os.getenv("SESSION_MAX_ACTIVE", "2000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_JANITOR_INTERVAL = float(os.getenv("SESSION_JANITOR_INTERVAL", "60"))
+# Token budget for everything the history contributes to a prompt (summary + recent turns)
+SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", "1500"))
+SESSION_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", "300"))
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a rural Indian user and an insurance advisor. "
+    "Keep facts about the user (occupation, family, location, policies, claims) and open questions. "
+    "Reply with the new summary only, in under 150 words.\n\n"
+)
+
+# Rough per-object overhead so memory accounting is not just string lengths
+_TURN_OVERHEAD = 120
+_SESSION_OVERHEAD = 400
+
+
+@dataclass
+class Session:
+    session_id: str
+    summary: str = ""
+    # Turns not yet folded into the summary: [{"role": ..., "content": ...}, ...]
+    turns: List[dict] = field(default_factory=list)
+    last_active: float = field(default_factory=time.time)
+    compacting: bool = False
+
+    def size_bytes(self) -> int:
+        return (
+            _SESSION_OVERHEAD
+            + len(self.summary.encode("utf-8"))
+            + sum(_TURN_OVERHEAD + len(t["content"].encode("utf-8")) for t in self.turns)
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"summary": self.summary, "turns": self.turns, "last_active": self.last_active}
+
+    @classmethod
+    def from_dict(cls, session_id: str, data: Dict[str, Any]) -> "Session":
+        return cls(
+            session_id=session_id,
+            summary=data.get("summary", ""),
+            turns=list(data.get("turns", [])),
+            last_active=data.get("last_active", time.time()),
+        )
+
+
+class SessionBackend:
+    """Persistence interface for sessions evicted from (or not yet in) memory."""
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryBackend(SessionBackend):
+    """No persistence: a session evicted from the LRU starts over."""
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        pass
+
+    def delete(self, session_id: str) -> None:
+        pass
+
+
+class SQLiteSessionBackend(SessionBackend):
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+            (session_id, json.dumps(data, ensure_ascii=False), time.time()),
+        )
+
+    def delete(self, session_id: str) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+
+class SessionStore:
+    """
+    Bounded LRU of active sessions in front of a persistent backend.
+
+    history() returns the prompt messages for a session under a fixed token budget:
+    the rolling summary first, then as many of the most recent turns as fit. After
+    each turn, turns that no longer fit are folded into the summary in the background,
+    so prompt size stays flat however long the session runs.
+    """
+
+    def __init__(self, backend: SessionBackend, max_active: int = SESSION_MAX_ACTIVE,
+                 idle_ttl: float = SESSION_IDLE_TTL, history_tokens: int = SESSION_HISTORY_TOKENS):
+        self.backend = backend
+        self.max_active = max_active
+        self.idle_ttl = idle_ttl
+        self.history_tokens = history_tokens
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+        self.compactions = 0
+        # running compactions; the loop only keeps weak references to tasks
+        self._compacting: Set["asyncio.Task[None]"] = set()
+
+    def _track(self, session: Session, before: int) -> None:
+        # a session dropped from the LRU was already subtracted in full
+        if self._sessions.get(session.session_id) is session:
+            self._bytes += session.size_bytes() - before
+
+    def _drop(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.size_bytes()
+            self.evictions += 1
+
+    @traced("sessions.get")
+    async def get(self, session_id: str) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            data = await asyncio.to_thread(self.backend.load, session_id)
+            # another request may have loaded it while we were in the thread
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session.from_dict(session_id, data) if data else Session(session_id=session_id)
+                self._sessions[session_id] = session
+                self._track(session, 0)
+        self._sessions.move_to_end(session_id)
+        session.last_active = time.time()
+        while len(self._sessions) > self.max_active:
+            # sessions are persisted after every turn, so dropping the LRU one loses nothing;
+            # one being compacted is skipped, its summary has not been saved yet
+            victim = next((sid for sid, s in self._sessions.items() if not s.compacting and sid != session_id), None)
+            if victim is None:
+                break
+            self._drop(victim)
+        return session
+
+    def history(self, session: Session) -> List[dict]:
+        budget = self.history_tokens
+        messages: List[dict] = []
+        if session.summary:
+            summary_msg = {"role": "system", "content": "Summary of the earlier conversation: " + session.summary}
+            budget -= estimate_tokens(summary_msg["content"])
+            messages.append(summary_msg)
+        # walk back whole user/assistant pairs so the window never starts mid-exchange
+        start = len(session.turns)
+        while start >= 2:
+            cost = sum(estimate_tokens(t["content"]) for t in session.turns[start - 2:start])
+            if cost > budget:
+                break
+            budget -= cost
+            start -= 2
+        return messages + session.turns[start:]
+
+    @traced("sessions.append")
+    async def append(self, session: Session, user_message: str, assistant_message: str) -> None:
+        if assistant_message == FALLBACK_RESPONSE:
+            # don't teach the model its own error message
+            return
+        before = session.size_bytes()
+        session.turns.append({"role": "user", "content": user_message})
+        session.turns.append({"role": "assistant", "content": assistant_message})
+        session.last_active = time.time()
+        self._track(session, before)
+        await asyncio.to_thread(self.backend.save, session.session_id, session.to_dict())
+        if self._overflow(session) and not session.compacting:
+            # claimed before the task starts, so an overlapping append cannot start a second
+            # compaction that folds the same prefix and then deletes unsummarized turns
+            session.compacting = True
+            task = asyncio.create_task(self._compact(session))
+            self._compacting.add(task)
+            task.add_done_callback(self._compacting.discard)
+
+    def _overflow(self, session: Session) -> List[dict]:
+        """Oldest turns that no longer fit in the history window."""
+        kept = len(self.history(session)) - (1 if session.summary else 0)
+        return session.turns[:len(session.turns) - kept]
+
+    @traced("sessions.compact")
+    async def _compact(self, session: Session) -> None:
+        # session.compacting is set by the caller
+        try:
+            folded = self._overflow(session)
+            if not folded:
+                return
+            transcript = "\n".join(f"{t['role']}: {t['content']}" for t in folded)
+            prompt = SUMMARY_PROMPT + f"Current summary:\n{session.summary or '(none)'}\n\nNew turns:\n{transcript}"
+            messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
+            try:
+                data = await call_groq_completion(messages, temperature=0.2, max_tokens=SESSION_SUMMARY_TOKENS)
+                new_summary = data["choices"][0]["message"]["content"].strip()
+            except Exception as exc:
+                # keep the turns; history() still windows them and the next append retries
+                logger.warning("session summary failed for %s: %s", session.session_id, exc)
+                return
+            before = session.size_bytes()
+            session.summary = new_summary
+            del session.turns[:len(folded)]
+            self._track(session, before)
+            self.compactions += 1
+            await asyncio.to_thread(self.backend.save, session.session_id, session.to_dict())
+        finally:
+            session.compacting = False
+
+    def evict_idle(self) -> int:
+        cutoff = time.time() - self.idle_ttl
+        idle = [sid for sid, s in self._sessions.items() if s.last_active < cutoff and not s.compacting]
+        for sid in idle:
+            self._drop(sid)
+        return len(idle)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "active_sessions": len(self._sessions),
+            "max_active": self.max_active,
+            "memory_bytes": self._bytes,
+            "evictions": self.evictions,
+            "compactions": self.compactions,
+            "idle_ttl_s": self.idle_ttl,
+            "history_tokens": self.history_tokens,
+        }
+
+
+async def run_session_janitor(interval: float = SESSION_JANITOR_INTERVAL) -> None:
+    """Background task started from the app lifespan hook."""
+    while True:
+        await asyncio.sleep(interval)
+        evicted = session_store.evict_idle()
+        if evicted:
+            logger.info("evicted %d idle sessions", evicted)
+
+
+def _make_backend() -> SessionBackend:
+    if SESSION_BACKEND == "memory":
+        return MemoryBackend()
+    return SQLiteSessionBackend(SESSION_DB_PATH)
+
+
+session_store = SessionStore(_make_backend())
@@ -1,29 +1,107 @@
 # Async STT service (Groq-only)
 import os
-import httpx
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List
+
+from .http_client import get_http_client, request_timeout
+from .audio import prepare_audio
+from .resilience import UpstreamPolicy
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 GROQ_MODEL = "whisper-large-v3"
+# Faster model for when the primary is rate limited, failing or too slow for the budget
+GROQ_FALLBACK_MODEL = os.getenv("STT_FALLBACK_MODEL", "whisper-large-v3-turbo")
+# Segments of one recording transcribed at the same time
+STT_CONCURRENCY = int(os.getenv("STT_CONCURRENCY", "4"))
+STT_SEGMENT_TIMEOUT = float(os.getenv("STT_SEGMENT_TIMEOUT", "30"))
+# Largest voice note accepted by /stt/transcribe
+STT_MAX_BYTES = int(os.getenv("STT_MAX_BYTES", str(25 * 1024 * 1024)))
+
+stt_stats: Dict[str, int] = {
+    "requests": 0,
+    "segmented": 0,
+    "segments": 0,
+    "passthrough": 0,
+    "bytes_received": 0,
+    "bytes_sent": 0,
+}
+
+stt_policy = UpstreamPolicy("stt", [GROQ_MODEL, GROQ_FALLBACK_MODEL])
 
-async def _call_groq_stt(file_bytes: bytes, language: str) -> str:
-    url = "https://api.groq.com/openai/v1/audio/transcriptions"
+
+@traced("groq.transcription")
+async def _call_groq_stt(file_bytes: bytes, language: str, timeout: float = 60, model: str = GROQ_MODEL) -> str:
     headers = {"Authorization": f"Bearer {GROQ_API_KEY}"}
-    data = {"model": GROQ_MODEL, "language": language}
+    data = {"model": model, "language": language}
     files = {"file": ("audio.wav", file_bytes, "audio/wav")}
-    async with httpx.AsyncClient(timeout=60) as client:
-        resp = await client.post(url, headers=headers, data=data, files=files)
-        resp.raise_for_status()
-        return resp.json().get("text", "")
+    client = get_http_client()
+    resp = await client.post("/audio/transcriptions", headers=headers, data=data, files=files, timeout=request_timeout(timeout))
+    resp.raise_for_status()
+    return resp.json().get("text", "")
+
+
+async def _transcribe(file_bytes: bytes, language: str, timeout: float) -> str:
+    """One upload under stt_policy (deadline, hedging, retries, model fallback)."""
+    async def attempt(model: str, budget: float) -> str:
+        return await _call_groq_stt(file_bytes, language, timeout=budget, model=model)
+    return await stt_policy.call(attempt, timeout=timeout)
+
 
+async def _transcribe_segments(segments: List[bytes], language: str) -> str:
+    sem = asyncio.Semaphore(max(1, STT_CONCURRENCY))
+
+    async def one(segment: bytes) -> str:
+        async with sem:
+            return (await _transcribe(segment, language, STT_SEGMENT_TIMEOUT)).strip()
+
+    # gather keeps input order, so the text is stitched back in playback order
+    texts = await asyncio.gather(*(one(s) for s in segments))
+    return " ".join(t for t in texts if t)
+
+
+@traced()
 async def transcribe_audio(file_bytes: bytes, language: str) -> str:
     """
     Async audio transcription using Groq only.
+
+    PCM WAV input is downmixed/resampled to 16 kHz mono first; recordings longer than
+    STT_SEGMENT_MIN_SECONDS are split on silence and the segments transcribed
+    concurrently. Other formats are uploaded unchanged.
     """
     try:
         if language not in ("en", "hi"):
             raise ValueError("Unsupported language")
         if not GROQ_API_KEY:
             raise ValueError("Missing GROQ_API_KEY")
-        return await _call_groq_stt(file_bytes, language)
+        started = time.perf_counter()
+        stt_stats["requests"] += 1
+        stt_stats["bytes_received"] += len(file_bytes)
+        # decoding, resampling and VAD are CPU work; keep them off the event loop
+        prepared = await asyncio.to_thread(prepare_audio, file_bytes)
+        if prepared is None:
+            stt_stats["passthrough"] += 1
+            stt_stats["bytes_sent"] += len(file_bytes)
+            return await _transcribe(file_bytes, language, 60)
+        stt_stats["bytes_sent"] += prepared.sent_bytes
+        stt_stats["segments"] += len(prepared.segments)
+        if len(prepared.segments) > 1:
+            stt_stats["segmented"] += 1
+        text = await _transcribe_segments(prepared.segments, language)
+        logger.info(
+            "stt: %.1fs audio (%.1fs speech) in %d segments, %d -> %d bytes, %.2fs",
+            prepared.duration_s, prepared.speech_s, len(prepared.segments),
+            prepared.original_bytes, prepared.sent_bytes, time.perf_counter() - started,
+        )
+        return text
     except Exception:
-        return "Transcription error, please try again."
\ No newline at end of file
+        return "Transcription error, please try again."
+
+
+def stt_info() -> Dict[str, Any]:
+    saved = stt_stats["bytes_received"] - stt_stats["bytes_sent"]
+    return {**stt_stats, "bytes_saved": saved, "upstream": stt_policy.info()}
@@ -0,0 +1,231 @@
+# Concurrent map-reduce summarization engine for long policy documents
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional, AsyncIterable
+
+from .llm import SYSTEM_PROMPT, GROQ_MODEL, call_groq_completion, estimate_tokens
+from .chunker import CHUNKER_VERSION, CHUNK_TOKENS, Chunker, chunk_pages, chunk_text
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "6"))
+# llama3-70b-8192 has an 8192-token window; keep reduce inputs well below it so the
+# prompt, instructions and the 512-token answer still fit.
+SUMMARY_REDUCE_INPUT_TOKENS = int(os.getenv("SUMMARY_REDUCE_INPUT_TOKENS", "5000"))
+SUMMARY_MAX_LEVELS = int(os.getenv("SUMMARY_MAX_LEVELS", "4"))
+
+CHUNK_PROMPT = (
+    "Summarize the following insurance policy text in simple, clear language for rural India. "
+    "Avoid jargon.\n\nText:\n"
+)
+REDUCE_PROMPT = (
+    "Combine the following partial summaries of one insurance policy into a single shorter summary "
+    "in simple, clear language for rural India. Keep every coverage, exclusion, limit and deadline. "
+    "Avoid jargon.\n\nPartial summaries:\n"
+)
+ELI5_PROMPT = (
+    "Explain the following insurance policy summary as if I am 5 years old, "
+    "using rural Indian language and examples. Avoid jargon.\n\nSummary:\n"
+)
+
+# Changes whenever the model, chunking or prompts change; part of every cached-result key.
+PROMPT_VERSION = hashlib.sha256(
+    "\x00".join([GROQ_MODEL, CHUNKER_VERSION, str(CHUNK_TOKENS), CHUNK_PROMPT, REDUCE_PROMPT, ELI5_PROMPT]).encode("utf-8")
+).hexdigest()[:16]
+
+CHUNK_FALLBACK = "[Summary unavailable]"
+ELI5_FALLBACK = "[ELI5 explanation unavailable]"
+
+
+def split_chunks(text: str, budget: int = CHUNK_TOKENS) -> List[str]:
+    """Structure-aware chunks of about `budget` tokens (see services/chunker.py)."""
+    return chunk_text(text, budget)
+
+
+@dataclass
+class StageStats:
+    name: str
+    calls: int = 0
+    failed: int = 0
+    wall_s: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class _Engine:
+    def __init__(self, concurrency: int):
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self.stages: List[StageStats] = []
+        self.chunking: Optional[Dict[str, Any]] = None
+
+    async def _complete(self, prompt: str, stage: StageStats) -> Optional[str]:
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
+        async with self._sem:
+            stage.calls += 1
+            try:
+                # identical boilerplate chunks (and repeat documents) reuse earlier answers
+                data = await call_groq_completion(messages, cache=True)
+                content = data["choices"][0]["message"]["content"].strip()
+            except Exception as exc:
+                stage.failed += 1
+                logger.warning("summarizer %s call failed: %s", stage.name, exc)
+                return None
+        usage = data.get("usage") or {}
+        stage.prompt_tokens += int(usage.get("prompt_tokens") or estimate_tokens(prompt))
+        stage.completion_tokens += int(usage.get("completion_tokens") or estimate_tokens(content))
+        return content
+
+    async def run_stage(self, name: str, prompts: List[str], fallback: str) -> List[str]:
+        stage = StageStats(name=name)
+        self.stages.append(stage)
+        started = time.perf_counter()
+        # gather keeps input order, so chunk i's summary stays at index i
+        results = await asyncio.gather(*(self._complete(p, stage) for p in prompts))
+        stage.wall_s = round(time.perf_counter() - started, 3)
+        return [r if r is not None else fallback for r in results]
+
+    async def map(self, chunks: List[str]) -> List[str]:
+        return await self.run_stage("map", [CHUNK_PROMPT + c for c in chunks], CHUNK_FALLBACK)
+
+    async def map_pages(self, pages: AsyncIterable[str], budget: int) -> List[str]:
+        """
+        Like map(), but chunks pages as they arrive and starts each chunk's summary
+        immediately, so summarization overlaps with extraction. Produces the same
+        chunks as split_chunks() over the pages joined with form feeds.
+        """
+        stage = StageStats(name="map")
+        self.stages.append(stage)
+        started = time.perf_counter()
+        tasks: List[asyncio.Task] = []
+        chunker = Chunker(budget)
+
+        def submit(chunks: List[str]) -> None:
+            for chunk in chunks:
+                tasks.append(asyncio.create_task(self._complete(CHUNK_PROMPT + chunk, stage)))
+
+        try:
+            async for page in pages:
+                submit(chunker.add_page(page))
+            submit(chunker.flush())
+            self.chunking = chunker.stats.to_dict()
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        stage.wall_s = round(time.perf_counter() - started, 3)
+        return [r if r is not None else CHUNK_FALLBACK for r in results]
+
+    async def reduce(self, summaries: List[str]) -> List[str]:
+        """
+        Collapse summaries level by level until they fit the reduce budget. Each level
+        packs neighbouring summaries into groups under the budget and summarizes the
+        groups concurrently.
+        """
+        level = 0
+        while estimate_tokens("\n".join(summaries)) > SUMMARY_REDUCE_INPUT_TOKENS and len(summaries) > 1:
+            if level >= SUMMARY_MAX_LEVELS:
+                break
+            level += 1
+            groups = _pack(summaries, SUMMARY_REDUCE_INPUT_TOKENS)
+            if len(groups) >= len(summaries):
+                # no two neighbours fit together, so another level cannot shrink anything
+                break
+            prompts = [REDUCE_PROMPT + "\n\n".join(g) for g in groups]
+            reduced = await self.run_stage(f"reduce_{level}", prompts, CHUNK_FALLBACK)
+            # a failed group keeps its inputs rather than losing that part of the policy
+            summaries = [r if r != CHUNK_FALLBACK else "\n".join(g) for r, g in zip(reduced, groups)]
+        return summaries
+
+
+def _pack(items: List[str], budget: int) -> List[List[str]]:
+    groups: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for item in items:
+        cost = estimate_tokens(item)
+        if current and used + cost > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def _finish(engine: _Engine, summaries: List[str], chunks: int, started: float,
+                  eli5: bool = True) -> Dict[str, Any]:
+    summaries = await engine.reduce(summaries)
+    raw_summary = "\n".join(summaries)
+
+    explanation = None
+    if eli5:
+        explanation = (await engine.run_stage("eli5", [ELI5_PROMPT + raw_summary], ELI5_FALLBACK))[0]
+
+    stats = {
+        "chunks": chunks,
+        "wall_s": round(time.perf_counter() - started, 3),
+        "stages": [asdict(s) for s in engine.stages],
+    }
+    if engine.chunking is not None:
+        stats["chunking"] = engine.chunking
+        logger.info("chunked %d pages: %d -> %d tokens (-%.1f%%), %d boilerplate lines, %d duplicates dropped",
+                    engine.chunking["pages"], engine.chunking["input_tokens"], engine.chunking["output_tokens"],
+                    engine.chunking["token_reduction_pct"], engine.chunking["boilerplate_lines"],
+                    engine.chunking["duplicate_blocks"] + engine.chunking["duplicate_chunks"])
+    logger.info("summarized %d chunks in %.2fs: %s", chunks, stats["wall_s"], stats["stages"])
+    return {"summary": raw_summary, "eli5": explanation, "stats": stats}
+
+
+@traced()
+async def summarize_chunks(chunks: List[str], concurrency: int = SUMMARY_CONCURRENCY) -> Dict[str, Any]:
+    """
+    Map-reduce summarization over pre-split chunks.
+    Returns: { 'summary': ..., 'eli5': ..., 'stats': {...} }
+    """
+    started = time.perf_counter()
+    engine = _Engine(concurrency)
+    summaries = await engine.map(chunks) if chunks else []
+    return await _finish(engine, summaries, len(chunks), started)
+
+
+@traced()
+async def summarize_pages(pages: AsyncIterable[str], concurrency: int = SUMMARY_CONCURRENCY,
+                          eli5: bool = True) -> Dict[str, Any]:
+    """
+    Map-reduce summarization fed by a page stream (see pdf_parser.iter_pdf_pages).
+    Makes no LLM calls when the pages contain no text. With eli5=False the ELI5 pass
+    is skipped ('eli5' is None) so callers can run explain_summary() as its own step.
+    """
+    started = time.perf_counter()
+    engine = _Engine(concurrency)
+    summaries = await engine.map_pages(pages, CHUNK_TOKENS)
+    if not summaries:
+        return {"summary": "", "eli5": "" if eli5 else None,
+                "stats": {"chunks": 0, "wall_s": 0.0, "stages": [], "chunking": engine.chunking}}
+    return await _finish(engine, summaries, len(summaries), started, eli5=eli5)
+
+
+@traced()
+async def explain_summary(summary: str) -> Dict[str, Any]:
+    """The ELI5 pass on its own. Returns { 'eli5': ..., 'stats': {'stages': [...]} }."""
+    engine = _Engine(1)
+    eli5 = (await engine.run_stage("eli5", [ELI5_PROMPT + summary], ELI5_FALLBACK))[0]
+    return {"eli5": eli5, "stats": {"stages": [asdict(s) for s in engine.stages]}}
+
+
+@traced()
+async def summarize_document(text: str, concurrency: int = SUMMARY_CONCURRENCY) -> Dict[str, Any]:
+    chunked = chunk_pages((text or "").split("\f"))
+    result = await summarize_chunks(chunked["chunks"], concurrency=concurrency)
+    result["stats"]["chunking"] = chunked["stats"]
+    return result
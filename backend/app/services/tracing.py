@@ -0,0 +1,516 @@
+# Request tracing, an on-demand sampling profiler and an event-loop lag monitor
+#
+# TracingMiddleware gives every request a trace id (taken from a W3C `traceparent`
+# header when present), returns it in X-Trace-Id and puts it on every log record
+# (%(trace_id)s). A sampled request also records nested spans: service functions
+# decorated with @traced and `with span(...)` blocks, including code run through
+# asyncio.to_thread, which copies the context. Finished traces are kept in memory for
+# /admin/traces and appended to TRACE_EXPORT_PATH in Chrome trace-event format (open it
+# in Perfetto or chrome://tracing), one row per request.
+#
+# With TRACING_ENABLED=0, @traced returns the function unchanged and the middleware is
+# not installed; unsampled requests cost one contextvar lookup per traced call
+# (benchmarks/bench_tracing.py).
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+import functools
+import itertools
+import contextvars
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, TypeVar
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cache"))
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"
+# Fraction of requests whose spans are recorded (changeable at runtime via /admin/tracing);
+# a request with `X-Trace: 1` or a sampled traceparent is always recorded
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", os.path.join(CACHE_DIR, "traces", "trace.json"))
+# The export file is rotated to <path>.1 past this size
+TRACE_EXPORT_MAX_BYTES = int(os.getenv("TRACE_EXPORT_MAX_BYTES", str(64 * 1024 * 1024)))
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "2"))
+# Spans kept per trace; a runaway loop of traced calls is cut off here
+TRACE_MAX_SPANS = 2000
+TRACE_RECENT = 200
+# Events waiting for the exporter; the oldest are dropped if the disk falls behind
+_EXPORT_BUFFER = 100_000
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+# Lag above this is logged (with the running trace ids) and marked in the trace export
+LOOP_LAG_WARN_MS = float(os.getenv("LOOP_LAG_WARN_MS", "100"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+_LAG_SAMPLES = 4096
+
+# perf_counter_ns() + _EPOCH_NS is wall time, for timestamps that line up across files
+_EPOCH_NS = time.time_ns() - time.perf_counter_ns()
+_PID = os.getpid()
+
+
+class Trace:
+    __slots__ = ("trace_id", "name", "sampled", "spans", "lane", "status", "dropped")
+
+    def __init__(self, trace_id: str, name: str, sampled: bool):
+        self.trace_id = trace_id
+        self.name = name
+        self.sampled = sampled
+        self.spans: List["Span"] = []
+        self.lane = 0
+        self.status: Optional[int] = None
+        self.dropped = 0
+
+
+class Span:
+    __slots__ = ("trace", "name", "attrs", "span_id", "parent_id", "start", "end", "thread", "_token")
+
+    def __init__(self, trace: Trace, name: str, attrs: Optional[Dict[str, Any]]):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.span_id = 0
+        self.parent_id = 0
+        self.start = 0
+        self.end = 0
+        self.thread: Optional[str] = None
+        self._token = None
+
+    def set(self, **attrs) -> None:
+        if self.attrs is None:
+            self.attrs = attrs
+        else:
+            self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        parent = _span.get()
+        self.parent_id = parent.span_id if parent is not None and parent.trace is self.trace else 0
+        self.span_id = next(_span_ids)
+        if asyncio._get_running_loop() is None:
+            # a worker thread (asyncio.to_thread), not the event loop
+            self.thread = threading.current_thread().name
+        self._token = _span.set(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end = time.perf_counter_ns()
+        if exc_type is not None and not issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            self.set(error=exc_type.__name__)
+        try:
+            _span.reset(self._token)
+        except ValueError:
+            # exited in another context (an async generator closed elsewhere); nothing to restore
+            pass
+        spans = self.trace.spans
+        if len(spans) < TRACE_MAX_SPANS:
+            spans.append(self)
+        else:
+            self.trace.dropped += 1
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+_span_ids = itertools.count(1)
+_lanes = itertools.count(1)
+
+
+def new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+def span(name: str, **attrs) -> Any:
+    """`with span("name", key=value) as s:` records a child of the current span in a sampled trace."""
+    trace = _trace.get()
+    if trace is None or not trace.sampled:
+        return _NOOP
+    return Span(trace, name, attrs or None)
+
+
+def annotate(**attrs) -> None:
+    """Add attributes to the current span (no-op outside a sampled trace)."""
+    current = _span.get()
+    if current is not None:
+        current.set(**attrs)
+
+
+def traced(name: Optional[str] = None) -> Callable[[F], F]:
+    """Decorator recording each call of a sync or async function as a span (default name module.qualname)."""
+    def decorate(fn: F) -> F:
+        if not TRACING_ENABLED:
+            return fn
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                trace = _trace.get()
+                if trace is None or not trace.sampled:
+                    return await fn(*args, **kwargs)
+                with Span(trace, label, None):
+                    return await fn(*args, **kwargs)
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _trace.get()
+            if trace is None or not trace.sampled:
+                return fn(*args, **kwargs)
+            with Span(trace, label, None):
+                return fn(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorate
+
+
+class Tracer:
+    """Sampling decisions, recently finished traces and the Chrome trace-event export buffer."""
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE, path: Optional[str] = TRACE_EXPORT_PATH,
+                 max_bytes: int = TRACE_EXPORT_MAX_BYTES):
+        self.sample_rate = sample_rate
+        self.path = path
+        self.max_bytes = max_bytes
+        self._recent: Deque[Trace] = deque(maxlen=TRACE_RECENT)
+        self.active: set = set()  # traces of requests in flight
+        self._pending: Deque[str] = deque(maxlen=_EXPORT_BUFFER)
+        self.stats = {"traces": 0, "sampled": 0, "spans": 0, "spans_dropped": 0, "events_written": 0,
+                      "events_dropped": 0, "export_errors": 0}
+
+    def start(self, name: str, trace_id: Optional[str] = None, force: bool = False) -> Trace:
+        self.stats["traces"] += 1
+        sampled = force or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        trace = Trace(trace_id or new_trace_id(), name, sampled)
+        if sampled:
+            trace.lane = next(_lanes)
+        return trace
+
+    def finish(self, trace: Trace) -> None:
+        if not trace.sampled:
+            return
+        self.stats["sampled"] += 1
+        self.stats["spans"] += len(trace.spans)
+        self.stats["spans_dropped"] += trace.dropped
+        self._recent.append(trace)
+        if self.path:
+            if len(self._pending) + len(trace.spans) + 1 > _EXPORT_BUFFER:
+                self.stats["events_dropped"] += len(trace.spans) + 1
+            self._pending.extend(json.dumps(event, ensure_ascii=False, default=str) for event in chrome_events(trace))
+
+    def mark(self, name: str, **args) -> None:
+        """An instant event on the process row of the export (e.g. an event-loop stall)."""
+        if self.path and self.sample_rate > 0:
+            self._pending.append(json.dumps({
+                "name": name, "ph": "i", "s": "p", "pid": _PID, "tid": 0,
+                "ts": (time.perf_counter_ns() + _EPOCH_NS) // 1000, "args": args,
+            }, default=str))
+
+    def drain(self) -> List[str]:
+        events = list(self._pending)
+        self._pending.clear()
+        return events
+
+    def write(self, events: List[str]) -> None:
+        """Append events to the export file (JSON array format, left unterminated as Chrome allows)."""
+        if not events or not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+        new = not os.path.exists(self.path)
+        with open(self.path, "a", encoding="utf-8") as f:
+            if new:
+                f.write("[\n")
+            f.write(",\n".join(events) + ",\n")
+        self.stats["events_written"] += len(events)
+
+    def recent(self, k: int = 20) -> List[Dict[str, Any]]:
+        out = []
+        for trace in reversed(self._recent):
+            root = next((s for s in trace.spans if s.parent_id == 0), None)
+            slowest = sorted((s for s in trace.spans if s is not root), key=lambda s: s.start - s.end)[:5]
+            out.append({
+                "trace_id": trace.trace_id,
+                "name": trace.name,
+                "status": trace.status,
+                "duration_ms": round((root.end - root.start) / 1e6, 2) if root else None,
+                "spans": len(trace.spans),
+                "slowest": [{"name": s.name, "ms": round((s.end - s.start) / 1e6, 2)} for s in slowest],
+            })
+            if len(out) >= k:
+                break
+        return out
+
+    def find(self, trace_id: str) -> Optional[Trace]:
+        return next((t for t in self._recent if t.trace_id == trace_id), None)
+
+    def info(self) -> Dict[str, Any]:
+        return {**self.stats, "enabled": TRACING_ENABLED, "sample_rate": self.sample_rate,
+                "export_path": self.path, "pending_events": len(self._pending), "recent": len(self._recent)}
+
+
+def chrome_events(trace: Trace) -> List[Dict[str, Any]]:
+    """Complete ("X") events for a trace on its own row, plus the row's name."""
+    events: List[Dict[str, Any]] = [{
+        "name": "thread_name", "ph": "M", "pid": _PID, "tid": trace.lane,
+        "args": {"name": f"{trace.name} {trace.trace_id[:8]}"},
+    }]
+    for s in trace.spans:
+        args: Dict[str, Any] = {"trace_id": trace.trace_id, "span_id": s.span_id, "parent_id": s.parent_id}
+        if s.thread:
+            args["thread"] = s.thread
+        if s.attrs:
+            args.update(s.attrs)
+        events.append({
+            "name": s.name, "cat": s.name.split(".", 1)[0], "ph": "X", "pid": _PID, "tid": trace.lane,
+            "ts": (s.start + _EPOCH_NS) // 1000, "dur": max(1, (s.end - s.start) // 1000), "args": args,
+        })
+    return events
+
+
+tracer = Tracer()
+
+
+class trace_root:
+    """`with trace_root("name"):` starts a trace outside a request (background jobs)."""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self._token = None
+        self._span: Any = _NOOP
+
+    def __enter__(self) -> Any:
+        if not TRACING_ENABLED:
+            return _NOOP
+        trace = tracer.start(self.name)
+        self._token = _trace.set(trace)
+        self._span = span(self.name, **self.attrs)
+        return self._span.__enter__()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is None:
+            return
+        self._span.__exit__(exc_type, exc, tb)
+        trace = _trace.get()
+        _trace.reset(self._token)
+        tracer.finish(trace)
+
+
+def _parse_traceparent(value: str):
+    # version-traceid-parentid-flags
+    parts = value.split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and parts[1] != "0" * 32:
+        try:
+            return parts[1], bool(int(parts[3], 16) & 1)
+        except ValueError:
+            pass
+    return None, False
+
+
+class TracingMiddleware:
+    """ASGI middleware starting a trace per HTTP request; its root span covers the whole response."""
+
+    def __init__(self, app, tracer: Tracer = tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace_id, force = None, False
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                trace_id, force = _parse_traceparent(value.decode("latin-1"))
+            elif key == b"x-trace" and value == b"1":
+                force = True
+        trace = self.tracer.start(f"{scope.get('method')} {scope.get('path')}", trace_id, force)
+        token = _trace.set(trace)
+        self.tracer.active.add(trace)
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", trace.trace_id.encode())]
+            await send(message)
+
+        try:
+            with span(trace.name) as root:
+                await self.app(scope, receive, traced_send)
+                root.set(status=trace.status)
+        finally:
+            _trace.reset(token)
+            self.tracer.active.discard(trace)
+            self.tracer.finish(trace)
+
+
+async def run_trace_exporter(interval: float = TRACE_FLUSH_INTERVAL) -> None:
+    """Background task started from the app lifespan hook: append finished traces to the export file."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            events = tracer.drain()
+            if events:
+                try:
+                    await asyncio.to_thread(tracer.write, events)
+                except OSError as e:
+                    tracer.stats["export_errors"] += 1
+                    logger.warning("trace export failed: %s", e)
+    finally:
+        try:
+            tracer.write(tracer.drain())
+        except OSError as e:
+            logger.warning("trace export failed: %s", e)
+
+
+# -- logging --------------------------------------------------------------------
+
+_base_record_factory = logging.getLogRecordFactory()
+
+
+def _record_factory(*args, **kwargs) -> logging.LogRecord:
+    record = _base_record_factory(*args, **kwargs)
+    trace = _trace.get()
+    record.trace_id = trace.trace_id if trace is not None else "-"
+    return record
+
+
+def install_log_context() -> None:
+    """Give every log record a trace_id attribute (the request's, or "-") for format strings."""
+    logging.setLogRecordFactory(_record_factory)
+
+
+# -- event-loop lag --------------------------------------------------------------
+
+class LoopMonitor:
+    """How late the event loop wakes a sleeper: a blocked loop delays every request."""
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, warn_ms: float = LOOP_LAG_WARN_MS):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self._lag = np.zeros(_LAG_SAMPLES, dtype=np.float64)
+        self._count = 0
+        self.stalls = 0
+        self.worst_ms = 0.0
+
+    def record(self, lag_ms: float) -> None:
+        self._lag[self._count % _LAG_SAMPLES] = lag_ms
+        self._count += 1
+        self.worst_ms = max(self.worst_ms, lag_ms)
+        if lag_ms >= self.warn_ms:
+            self.stalls += 1
+            running = sorted(t.trace_id[:8] for t in tracer.active)
+            logger.warning("event loop blocked for %.0f ms (requests in flight: %s)", lag_ms,
+                           ", ".join(running) or "none")
+            tracer.mark("loop.stall", lag_ms=round(lag_ms, 1))
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, (loop.time() - expected) * 1000))
+
+    def info(self) -> Dict[str, Any]:
+        lag = self._lag[:min(self._count, _LAG_SAMPLES)]
+        p50, p99 = np.quantile(lag, (0.5, 0.99)) if len(lag) else (None, None)
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self._count,
+            "lag_ms": {"p50": round(float(p50), 2), "p99": round(float(p99), 2),
+                       "max_recent": round(float(lag.max()), 2)} if len(lag) else None,
+            "worst_ms": round(self.worst_ms, 2),
+            "stalls": self.stalls,
+            "stall_threshold_ms": self.warn_ms,
+        }
+
+
+loop_monitor = LoopMonitor()
+
+
+# -- sampling profiler -----------------------------------------------------------
+
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    for marker in (os.sep + "site-packages" + os.sep, os.sep + "backend" + os.sep, os.sep + "lib" + os.sep):
+        if marker in filename:
+            filename = filename.rsplit(marker, 1)[1]
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, idle: bool = False) -> Dict[str, Any]:
+    """
+    Sample every thread's Python stack for `seconds` and return collapsed stacks
+    ("thread;outer;...;inner count" lines, the input format of flamegraph.pl and
+    speedscope). Runs in its own thread; threads parked in a wait are skipped unless idle.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        me = threading.get_ident()
+        names = {}
+        counts: Counter = Counter()
+        samples = 0
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            started = time.perf_counter()
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if not idle and stack and stack[0].split(" ", 1)[0] in _IDLE_LEAVES:
+                    continue
+                stack.append(names.get(ident, str(ident)))
+                counts[";".join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+        return {
+            "samples": samples,
+            "interval_ms": interval * 1000,
+            "collapsed": "\n".join(f"{stack} {n}" for stack, n in counts.most_common()),
+        }
+    finally:
+        _profile_lock.release()
+
+
+# innermost frames of a thread that is waiting rather than working
+_IDLE_LEAVES = {"wait", "select", "poll", "_worker", "get", "sleep", "accept", "_wait_for_tstate_lock"}
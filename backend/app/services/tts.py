@@ -1,28 +1,359 @@
-# Async TTS service using gTTS (ready for OpenAI TTS integration)
+# Async TTS service: content-addressed audio cache in front of a pluggable engine
+# (gTTS by default; see tts_engines.py), with long texts synthesized sentence-parallel
 import os
+import re
+import json
+import time
 import uuid
-from gtts import gTTS
 import asyncio
+import hashlib
+import logging
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from .tracing import traced, span
+from .tts_engines import TTSEngine, concat_mp3, get_engine, split_text
+
+logger = logging.getLogger(__name__)
+
+AUDIO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "audio"))
+# gtts | espeak | stub; part of every audio key, so switching engines never serves the old voice
+TTS_ENGINE_NAME = os.getenv("TTS_ENGINE", "gtts")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+TTS_CACHE_MAX_AGE = float(os.getenv("TTS_CACHE_MAX_AGE_DAYS", "30")) * 86400
+TTS_JANITOR_INTERVAL = float(os.getenv("TTS_JANITOR_INTERVAL", "600"))
+# How /chat and /policy/simplify hand out audio (clients may override per request):
+#   lazy      - return the URL at once and synthesize speculatively in the background
+#   on_demand - return the URL at once; synthesize on the first GET of it
+#   wait      - synthesize before responding (the old behaviour)
+#   off       - no audio
+TTS_MODES = ("lazy", "on_demand", "wait", "off")
+TTS_DEFAULT_MODE = os.getenv("TTS_DEFAULT_MODE", "lazy")
+# Background (speculative) syntheses running at once, so they cannot starve on-demand GETs
+TTS_SPECULATIVE_CONCURRENCY = int(os.getenv("TTS_SPECULATIVE_CONCURRENCY", "4"))
+# Start the engine's worker threads at startup rather than on the first synthesis
+TTS_PREWARM = os.getenv("TTS_PREWARM", "1") == "1"
+# Partially written files older than this are leftovers from a crashed worker
+_STALE_TMP_AGE = 3600
+
+_inflight: Dict[str, "asyncio.Future[None]"] = {}
+_speculative: Set["asyncio.Task[None]"] = set()
+_speculative_sem: Optional[asyncio.Semaphore] = None
+engine: TTSEngine = get_engine(TTS_ENGINE_NAME)
+_KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+tts_cache_stats: Dict[str, int] = {
+    "hits": 0, "misses": 0, "coalesced": 0, "evicted_files": 0, "evicted_bytes": 0,
+    "deferred": 0, "speculative": 0, "on_demand": 0,
+}
+
+
+class TTSError(Exception):
+    """Speech synthesis failed for a known audio key; the client may retry."""
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different texts share one audio file."""
+    return " ".join((text or "").split())
+
+
+def audio_key(text: str, lang: str, engine: str = TTS_ENGINE_NAME) -> str:
+    raw = f"{engine}\x00{lang}\x00{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def audio_path_for_key(key: str) -> str:
+    # Two levels of 256-way sharding keep every directory small for StaticFiles lookups
+    return os.path.join(AUDIO_DIR, key[:2], key[2:4], f"{key}.mp3")
+
+
+def is_audio_key(key: str) -> bool:
+    return bool(_KEY_RE.match(key or ""))
+
+
+def _request_path_for_key(key: str) -> str:
+    # text + language of an audio file that may not exist yet, so its URL can be served lazily
+    return os.path.join(AUDIO_DIR, key[:2], key[2:4], f"{key}.json")
+
+
+def audio_url_for_key(key: str) -> str:
+    return f"/audio/{key[:2]}/{key[2:4]}/{key}.mp3"
+
+
+def audio_path_to_url(file_path: str) -> str:
+    """Convert an absolute file path under AUDIO_DIR to its /audio URL."""
+    if file_path == "tts_error":
+        return "tts_error"
+    return file_path.replace(AUDIO_DIR, "/audio").replace("\\", "/")
+
+
+async def warm_tts_pool() -> None:
+    """Spawn and warm every engine worker (called from the app lifespan hook)."""
+    if not TTS_PREWARM:
+        return
+    try:
+        await asyncio.to_thread(engine.prewarm)
+    except Exception:
+        logger.exception("TTS engine %s: pre-warm failed", engine.name)
+
+
+def shutdown_tts_pool() -> None:
+    engine.shutdown()
+
+
+async def _synthesize_chunk(chunk: str, lang: str, index: int, started: List[float]) -> bytes:
+    def _run():
+        started.append(time.perf_counter())
+        return engine.run(chunk, lang)
+
+    with span("tts.chunk", index=index, chars=len(chunk)):
+        try:
+            # the timeout covers queueing too: a chunk stuck behind a saturated pool fails like a slow one
+            return await asyncio.wait_for(asyncio.wrap_future(engine.pool().submit(_run)), engine.timeout)
+        except asyncio.TimeoutError:
+            engine.stats["timeouts"] += 1
+            raise
+
+
+async def synthesize_audio(text: str, lang: str) -> bytes:
+    """
+    MP3 bytes for `text`: split into sentence-aligned chunks of at most
+    engine.chunk_chars, synthesized in parallel on the engine pool and joined frame by frame.
+    """
+    chunks = split_text(text, engine.chunk_chars)
+    submitted = time.perf_counter()
+    started: List[float] = []
+    with span("tts.synthesize", engine=engine.name, lang=lang, chars=len(text), chunks=len(chunks)) as s:
+        try:
+            parts = await asyncio.gather(*(_synthesize_chunk(c, lang, i, started) for i, c in enumerate(chunks)))
+        finally:
+            if started:
+                s.set(queue_ms=round((min(started) - submitted) * 1000, 1))
+    return concat_mp3(parts)
+
+
+def _write_audio(file_path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    # Write to a temp name and rename so readers (and other workers) never see a partial file
+    tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+async def _synthesize_to(file_path: str, text: str, lang: str) -> None:
+    data = await synthesize_audio(text, lang)
+    await asyncio.to_thread(_write_audio, file_path, data)
+
+
+async def _synthesize_cached(text: str, lang: str) -> str:
+    """File path for (text, lang), synthesizing it unless cached; raises on engine failure."""
+    if lang not in ("en", "hi"):
+        lang = "en"
+    key = audio_key(text, lang)
+    file_path = audio_path_for_key(key)
+    if os.path.exists(file_path):
+        tts_cache_stats["hits"] += 1
+        # mtime doubles as last-access time for the janitor's LRU order
+        os.utime(file_path)
+        return file_path
+
+    future = _inflight.get(key)
+    if future is None:
+        tts_cache_stats["misses"] += 1
+        future = asyncio.ensure_future(_synthesize_to(file_path, text, lang))
+        _inflight[key] = future
+        future.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        tts_cache_stats["coalesced"] += 1
+    # shield: one caller disconnecting must not cancel the synthesis others wait on
+    await asyncio.shield(future)
+    return file_path
+
 
 async def synthesize_tts(text: str, lang: str = "en") -> str:
     """
-    Synthesize speech from text using gTTS. Returns file path or 'tts_error' on failure.
+    Synthesize speech from text with the configured engine. Returns file path or 'tts_error' on failure.
+    Audio is content-addressed by (normalized text, language, engine): a cached file is
+    returned as-is, and concurrent requests for the same key share one synthesis.
+    """
+    try:
+        return await _synthesize_cached(text, lang)
+    except Exception as e:
+        logger.warning("TTS synthesis failed (%s, %d chars): %r", lang, len(text or ""), e)
+        return "tts_error"
+
+
+def _write_request(key: str, text: str, lang: str) -> None:
+    path = _request_path_for_key(key)
+    if os.path.exists(path):
+        os.utime(path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"text": text, "lang": lang}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+async def _speculate(text: str, lang: str) -> None:
+    global _speculative_sem
+    if _speculative_sem is None:
+        _speculative_sem = asyncio.Semaphore(max(1, TTS_SPECULATIVE_CONCURRENCY))
+    async with _speculative_sem:
+        await synthesize_tts(text, lang)
+
+
+@traced()
+async def prepare_tts(text: str, lang: str = "en", mode: Optional[str] = None) -> Tuple[Optional[str], bool]:
+    """
+    Hand out audio for `text` according to `mode` (see TTS_MODES; default
+    TTS_DEFAULT_MODE). Returns (url, ready): url is None for mode 'off' and 'tts_error'
+    when a 'wait' synthesis failed. A URL that is not ready yet is still valid: GET
+    /audio/... synthesizes it on first request, and GET /tts/status/{key} reports readiness.
     """
+    mode = mode or TTS_DEFAULT_MODE
+    if mode == "off" or not (text or "").strip():
+        return None, False
+    if lang not in ("en", "hi"):
+        lang = "en"
+    if mode == "wait":
+        path = await synthesize_tts(text, lang)
+        return audio_path_to_url(path), path != "tts_error"
+    key = audio_key(text, lang)
+    if os.path.exists(audio_path_for_key(key)):
+        return audio_url_for_key(key), True
     try:
-        if lang not in ("en", "hi"):
-            lang = "en"
-        audio_dir = os.path.join(os.path.dirname(__file__), "..", "audio")
-        audio_dir = os.path.abspath(audio_dir)
-        os.makedirs(audio_dir, exist_ok=True)
-        filename = f"tts_{uuid.uuid4().hex}.mp3"
-        file_path = os.path.join(audio_dir, filename)
-
-        def _synthesize():
-            tts = gTTS(text=text, lang=lang)
-            tts.save(file_path)
-
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, _synthesize)
+        await asyncio.to_thread(_write_request, key, text, lang)
+    except OSError:
+        logger.exception("could not record TTS request %s", key)
+        return "tts_error", False
+    tts_cache_stats["deferred"] += 1
+    if mode == "lazy" and key not in _inflight:
+        tts_cache_stats["speculative"] += 1
+        task = asyncio.create_task(_speculate(text, lang))
+        _speculative.add(task)
+        task.add_done_callback(_speculative.discard)
+    return audio_url_for_key(key), False
+
+
+@traced()
+async def synthesize_key(key: str) -> Optional[str]:
+    """
+    Audio file path for a key handed out by prepare_tts(), synthesizing it if needed
+    (coalesced with any synthesis already running). None if the key is unknown;
+    raises TTSError if synthesis failed.
+    """
+    if not is_audio_key(key):
+        return None
+    file_path = audio_path_for_key(key)
+    if os.path.exists(file_path):
+        tts_cache_stats["hits"] += 1
+        os.utime(file_path)
         return file_path
-    except Exception:
-        return "tts_error"
\ No newline at end of file
+    try:
+        with open(_request_path_for_key(key), encoding="utf-8") as f:
+            request = json.load(f)
+    except (OSError, ValueError):
+        return None
+    tts_cache_stats["on_demand"] += 1
+    try:
+        return await _synthesize_cached(request["text"], request["lang"])
+    except Exception as e:
+        logger.warning("TTS synthesis failed for %s: %r", key, e)
+        raise TTSError(str(e)) from e
+
+
+def tts_status(key: str) -> Dict[str, Any]:
+    ready = is_audio_key(key) and os.path.exists(audio_path_for_key(key))
+    known = ready or (is_audio_key(key) and os.path.exists(_request_path_for_key(key)))
+    return {
+        "key": key,
+        "url": audio_url_for_key(key) if known else None,
+        "ready": ready,
+        "known": known,
+        "synthesizing": key in _inflight,
+    }
+
+
+def enforce_audio_limits(max_bytes: int = TTS_CACHE_MAX_BYTES, max_age: float = TTS_CACHE_MAX_AGE) -> Dict[str, int]:
+    """
+    Delete audio unused for longer than max_age, then least-recently-used files until
+    the directory fits in max_bytes. Blocking; run it in a thread.
+    """
+    now = time.time()
+    files = []
+    removed = 0
+    removed_bytes = 0
+
+    def _remove(path: str, size: int) -> None:
+        nonlocal removed, removed_bytes
+        try:
+            os.remove(path)
+            removed += 1
+            removed_bytes += size
+        except FileNotFoundError:
+            pass
+
+    stack = [AUDIO_DIR]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+                continue
+            st = entry.stat(follow_symlinks=False)
+            if entry.name.endswith(".tmp"):
+                if now - st.st_mtime > _STALE_TMP_AGE:
+                    _remove(entry.path, st.st_size)
+            elif entry.name.endswith(".json"):
+                # pending-request records are tiny; only age matters
+                if now - st.st_mtime > max_age:
+                    _remove(entry.path, st.st_size)
+            elif entry.name.endswith(".mp3"):
+                if now - st.st_mtime > max_age:
+                    _remove(entry.path, st.st_size)
+                else:
+                    files.append((st.st_mtime, st.st_size, entry.path))
+
+    total = sum(size for _, size, _ in files)
+    if total > max_bytes:
+        files.sort()
+        for _, size, path in files:
+            if total <= max_bytes:
+                break
+            _remove(path, size)
+            total -= size
+
+    tts_cache_stats["evicted_files"] += removed
+    tts_cache_stats["evicted_bytes"] += removed_bytes
+    return {"removed": removed, "removed_bytes": removed_bytes, "remaining_bytes": total}
+
+
+async def run_audio_janitor(interval: float = TTS_JANITOR_INTERVAL) -> None:
+    """Background task started from the app lifespan hook."""
+    while True:
+        try:
+            result = await asyncio.to_thread(enforce_audio_limits)
+            if result["removed"]:
+                logger.info("audio janitor removed %d files (%d bytes)", result["removed"], result["removed_bytes"])
+        except Exception:
+            logger.exception("audio janitor failed")
+        await asyncio.sleep(interval)
+
+
+def tts_cache_info() -> Dict[str, Any]:
+    return {
+        **tts_cache_stats,
+        "in_flight": len(_inflight),
+        "speculative_in_flight": len(_speculative),
+        "default_mode": TTS_DEFAULT_MODE,
+        "max_bytes": TTS_CACHE_MAX_BYTES,
+        "max_age_s": TTS_CACHE_MAX_AGE,
+        "engine": engine.info(),
+    }
@@ -0,0 +1,356 @@
+# TTS engines behind one interface, each with its own pre-warmed worker pool
+#
+# An engine turns a short piece of text into MP3 bytes (blocking). tts.py splits long
+# texts on sentence boundaries into pieces of at most engine.chunk_chars, runs them in
+# parallel on the engine's pool and joins the results with concat_mp3(), which walks
+# MPEG audio frames so the output is one clean stream (no ID3/Xing headers mid-file,
+# no torn frames) rather than several files pasted together.
+#
+#   gtts   - Google Translate TTS over HTTPS (needs network)
+#   espeak - espeak-ng piped into lame, fully offline (both binaries must be installed)
+#   stub   - silent frames after a configurable delay, for tests and benchmarks
+#
+# Per-engine settings come from TTS_<ENGINE>_CONCURRENCY, TTS_<ENGINE>_TIMEOUT and
+# TTS_<ENGINE>_CHUNK_CHARS, e.g. TTS_GTTS_CONCURRENCY=8.
+import io
+import os
+import re
+import math
+import time
+import shutil
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ("en", "hi")
+
+
+def _setting(engine: str, name: str, default: float) -> float:
+    return float(os.getenv(f"TTS_{engine.upper()}_{name}", str(default)))
+
+
+class TTSEngineError(RuntimeError):
+    """The engine could not produce audio (missing binary, bad output, remote failure)."""
+
+
+class TTSEngine:
+    name = "base"
+    default_concurrency = 4
+    # seconds allowed for one chunk, time queued for a worker included
+    default_timeout = 30.0
+    default_chunk_chars = 200
+
+    def __init__(self, concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                 chunk_chars: Optional[int] = None):
+        self.concurrency = max(1, int(concurrency or _setting(self.name, "CONCURRENCY", self.default_concurrency)))
+        self.timeout = float(timeout or _setting(self.name, "TIMEOUT", self.default_timeout))
+        self.chunk_chars = max(20, int(chunk_chars or _setting(self.name, "CHUNK_CHARS", self.default_chunk_chars)))
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {"chunks": 0, "errors": 0, "timeouts": 0, "warmed_workers": 0, "busy_s": 0.0}
+
+    def warm(self) -> None:
+        """Per-worker setup, run once in each pool thread before its first chunk."""
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        """MP3 bytes for `text`. Blocking; runs in a pool thread."""
+        raise NotImplementedError
+
+    def _warm_worker(self) -> None:
+        try:
+            self.warm()
+            self.stats["warmed_workers"] += 1
+        except Exception:
+            # a failing initializer would break the whole pool; chunks report the real error
+            logger.exception("TTS engine %s: worker warm-up failed", self.name)
+
+    def run(self, text: str, lang: str) -> bytes:
+        started = time.perf_counter()
+        try:
+            return self.synthesize(text, lang)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            self.stats["chunks"] += 1
+            self.stats["busy_s"] += time.perf_counter() - started
+
+    def pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # its own threads, so a burst of syntheses cannot tie up the default
+                # executor that session and cache I/O (asyncio.to_thread) depend on
+                self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"tts-{self.name}",
+                                                initializer=self._warm_worker)
+            return self._pool
+
+    def prewarm(self) -> None:
+        """Start every worker thread now (and run warm() in each) instead of on first use. Blocking."""
+        pool = self.pool()
+        barrier = threading.Barrier(self.concurrency)
+        # each task holds its thread until all have started, so the pool has to spawn them all
+        futures = [pool.submit(barrier.wait, 30) for _ in range(self.concurrency)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "busy_s": round(self.stats["busy_s"], 3),
+            "name": self.name,
+            "concurrency": self.concurrency,
+            "timeout_s": self.timeout,
+            "chunk_chars": self.chunk_chars,
+            "pool_started": self._pool is not None,
+        }
+
+
+class GTTSEngine(TTSEngine):
+    name = "gtts"
+    # TTS_WORKERS was the single pool size before engines had their own settings
+    default_concurrency = int(os.getenv("TTS_WORKERS", "8"))
+    default_timeout = 15.0
+    # gTTS sends at most 100 characters per request; larger chunks become serial requests
+    default_chunk_chars = 100
+
+    def warm(self) -> None:
+        # imports gtts and validates the languages once, so chunks can skip lang_check
+        from gtts import gTTS
+        for lang in LANGUAGES:
+            gTTS(text="warm", lang=lang)
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        from gtts import gTTS
+        buf = io.BytesIO()
+        gTTS(text=text, lang=lang, lang_check=False, timeout=self.timeout).write_to_fp(buf)
+        return buf.getvalue()
+
+
+class EspeakEngine(TTSEngine):
+    name = "espeak"
+    default_concurrency = os.cpu_count() or 2
+    default_timeout = 30.0
+    default_chunk_chars = 400
+    ESPEAK_BIN = os.getenv("TTS_ESPEAK_BIN", "espeak-ng")
+    LAME_BIN = os.getenv("TTS_LAME_BIN", "lame")
+    VOICES = {"en": os.getenv("TTS_ESPEAK_VOICE_EN", "en"), "hi": os.getenv("TTS_ESPEAK_VOICE_HI", "hi")}
+
+    def warm(self) -> None:
+        missing = [b for b in (self.ESPEAK_BIN, self.LAME_BIN) if shutil.which(b) is None]
+        if missing:
+            raise TTSEngineError(f"espeak engine needs {', '.join(missing)} on PATH")
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        voice = self.VOICES.get(lang, self.VOICES["en"])
+        try:
+            # text on stdin (never argv, where it could read as an option); WAV on stdout
+            wav = subprocess.run([self.ESPEAK_BIN, "-v", voice, "-b", "1", "--stdin", "--stdout"],
+                                 input=text.encode("utf-8"), capture_output=True, check=True,
+                                 timeout=self.timeout).stdout
+            # -t: no Xing/Info frame, which lame cannot fill in on a pipe anyway
+            mp3 = subprocess.run([self.LAME_BIN, "--quiet", "-t", "-m", "m", "-b", "48", "-", "-"],
+                                 input=wav, capture_output=True, check=True, timeout=self.timeout).stdout
+        except FileNotFoundError as e:
+            raise TTSEngineError(f"espeak engine: {e.filename} not found") from e
+        except subprocess.CalledProcessError as e:
+            raise TTSEngineError(f"espeak engine: {e.cmd[0]} failed: {e.stderr.decode(errors='replace')[:200]}") from e
+        return mp3
+
+
+# Silent MPEG-1 Layer III frame: 32 kbps, 32 kHz, mono, no CRC -> 144 bytes, 36 ms
+_SILENT_FRAME = b"\xff\xfb\x18\xc0" + bytes(140)
+_SILENT_FRAME_S = 1152 / 32000
+
+
+class StubEngine(TTSEngine):
+    name = "stub"
+    default_concurrency = 8
+    default_timeout = 5.0
+    default_chunk_chars = 100
+
+    def __init__(self, latency: Optional[float] = None, latency_per_char: Optional[float] = None, **kwargs):
+        super().__init__(**kwargs)
+        # seconds per call and per character, to stand in for a remote engine's timing
+        self.latency = float(os.getenv("TTS_STUB_LATENCY", "0") if latency is None else latency)
+        self.latency_per_char = float(os.getenv("TTS_STUB_LATENCY_PER_CHAR", "0")
+                                      if latency_per_char is None else latency_per_char)
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        delay = self.latency + self.latency_per_char * len(text)
+        if delay > 0:
+            time.sleep(delay)
+        # roughly 70 ms of "speech" per character
+        frames = max(1, math.ceil(len(text) * 0.07 / _SILENT_FRAME_S))
+        # an empty ID3v2 tag and an Info frame in front, as real encoders write them
+        info = bytearray(_SILENT_FRAME)
+        info[4 + 17:4 + 21] = b"Info"
+        return b"ID3\x04\x00\x00\x00\x00\x00\x00" + bytes(info) + _SILENT_FRAME * frames
+
+
+ENGINES = {"gtts": GTTSEngine, "espeak": EspeakEngine, "stub": StubEngine}
+
+
+def get_engine(name: str) -> TTSEngine:
+    try:
+        return ENGINES[name]()
+    except KeyError:
+        raise ValueError(f"unknown TTS engine {name!r}; expected one of {', '.join(ENGINES)}") from None
+
+
+# --- Sentence splitting ----------------------------------------------------------------
+
+# end of a sentence: . ! ? or the Devanagari danda, then whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+
+
+def _pieces(sentence: str, limit: int) -> Iterator[str]:
+    """A sentence cut to `limit` characters: at clause punctuation first, then between words."""
+    if len(sentence) <= limit:
+        yield sentence
+        return
+    for clause in _CLAUSE_END.split(sentence):
+        if len(clause) <= limit:
+            yield clause
+            continue
+        line = ""
+        for word in clause.split():
+            while len(word) > limit:
+                # a "word" longer than a chunk (a URL, a number run): hard cut
+                if line:
+                    yield line
+                    line = ""
+                yield word[:limit]
+                word = word[limit:]
+            if line and len(line) + 1 + len(word) > limit:
+                yield line
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        if line:
+            yield line
+
+
+def split_text(text: str, limit: int) -> List[str]:
+    """
+    Split `text` into chunks of at most `limit` characters for parallel synthesis.
+    Chunks end on sentence boundaries where possible; consecutive short sentences are
+    packed into one chunk so short texts stay a single call.
+    """
+    chunks: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(" ".join(text.split())):
+        for piece in _pieces(sentence, limit):
+            if current and len(current) + 1 + len(piece) <= limit:
+                current = f"{current} {piece}"
+            else:
+                if current:
+                    chunks.append(current)
+                current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# --- MP3 frame handling ----------------------------------------------------------------
+
+# Layer III bitrates (kbps) by bitrate index, for MPEG-1 and for MPEG-2/2.5
+_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# sample rates by version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5) and rate index
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _frame_header(data: bytes, pos: int) -> Optional[Tuple[int, int, int, bool, bool]]:
+    """(frame_length, version_bits, sample_rate, mono, crc) for a Layer III header at pos, else None."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    version = (b1 >> 3) & 3
+    if version == 1 or (b1 >> 1) & 3 != 1:  # reserved version, or not Layer III
+        return None
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+    if bitrate_index in (0, 15) or rate_index == 3:  # free format / invalid
+        return None
+    bitrate = _BITRATES[1 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    length = (144 if version == 3 else 72) * bitrate // sample_rate + ((b2 >> 1) & 1)
+    return length, version, sample_rate, b3 >> 6 == 3, not b1 & 1
+
+
+def _is_vbr_header(frame: bytes, version: int, mono: bool, crc: bool) -> bool:
+    # Xing/Info sits right after the side info; VBRI (Fraunhofer) at a fixed offset
+    side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+    offset = 4 + (2 if crc else 0) + side_info
+    return frame[offset:offset + 4] in (b"Xing", b"Info") or frame[36:40] == b"VBRI"
+
+
+def _strip_tags(data: bytes) -> bytes:
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+def mp3_frames(data: bytes) -> Iterator[Tuple[bytes, int]]:
+    """Yield (frame_bytes, sample_rate) for every audio frame; tags, VBR headers and junk are skipped."""
+    data = _strip_tags(data)
+    pos = 0
+    end = len(data)
+    while pos + 4 <= end:
+        header = _frame_header(data, pos)
+        if header is None:
+            pos = data.find(b"\xff", pos + 1)
+            if pos < 0:
+                break
+            continue
+        length, version, sample_rate, mono, crc = header
+        if pos + length > end:
+            break  # torn last frame
+        frame = data[pos:pos + length]
+        if not _is_vbr_header(frame, version, mono, crc):
+            yield frame, sample_rate
+        pos += length
+
+
+def concat_mp3(parts: List[bytes]) -> bytes:
+    """
+    Join MP3 streams into one: only audio frames are kept, so ID3 tags and Xing/Info
+    headers (whose frame counts would describe just the first part) do not end up in the
+    middle or mislead players about the duration.
+    """
+    out = bytearray()
+    rate = None
+    for i, part in enumerate(parts):
+        for frame, sample_rate in mp3_frames(part):
+            if rate is None:
+                rate = sample_rate
+            elif sample_rate != rate:
+                raise TTSEngineError(f"part {i} is {sample_rate} Hz, expected {rate} Hz")
+            out += frame
+    if not out:
+        raise TTSEngineError("no MP3 frames in engine output")
+    return bytes(out)
+
+
+def mp3_duration(data: bytes) -> float:
+    """Seconds of audio in an MP3 stream (Layer III: 1152 samples per MPEG-1 frame, 576 otherwise)."""
+    total = 0.0
+    for frame, sample_rate in mp3_frames(data):
+        total += (1152 if (frame[1] >> 3) & 3 == 3 else 576) / sample_rate
+    return total
@@ -0,0 +1,149 @@
+# Streaming CSV / JSONL readers for bulk upload endpoints
+import io
+import csv
+import json
+import codecs
+import itertools
+from typing import AsyncIterator, List, Optional, Tuple
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# A quoted CSV field still open past csv's own field limit is a stray quote, not an address
+MAX_OPEN_RECORD_CHARS = csv.field_size_limit()
+# Sentinel line for _csv_rows; U+FFFF is a noncharacter, so never part of real text
+_END_OF_PIECE = "\uffff"
+# (row number, parsed record or None, error message or None)
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str], explicit: Optional[str] = None) -> str:
+    """'csv' or 'jsonl', from an explicit choice, the file extension or the content type."""
+    if explicit:
+        fmt = explicit.strip().lower()
+        if fmt in ("csv", "jsonl"):
+            return fmt
+        raise ValueError("format must be 'csv' or 'jsonl'")
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson", ".json")) or "json" in (content_type or ""):
+        return "jsonl"
+    return "csv"
+
+
+async def iter_upload_text(upload, chunk_size: int = UPLOAD_CHUNK_BYTES) -> AsyncIterator[str]:
+    """
+    Yield the decoded upload chunk by chunk, each piece cut after its last line break
+    (only the final piece may end mid-line), so memory stays flat regardless of file
+    size. Handles a UTF-8 BOM.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    while True:
+        chunk = await upload.read(chunk_size)
+        text = decoder.decode(chunk or b"", final=not chunk)
+        if text:
+            cut = text.rfind("\n") + 1
+            if cut:
+                yield pending + text[:cut]
+                pending = text[cut:]
+            else:
+                pending += text
+        if not chunk:
+            break
+    if pending.strip():
+        yield pending
+
+
+async def iter_upload_lines(upload, chunk_size: int = UPLOAD_CHUNK_BYTES) -> AsyncIterator[List[str]]:
+    """Yield lists of complete text lines as the upload is read; handles CRLF line endings."""
+    async for text in iter_upload_text(upload, chunk_size):
+        lines = text.split("\n")
+        if not lines[-1]:
+            lines.pop()
+        yield [line.rstrip("\r") for line in lines]
+
+
+def _csv_rows(text: str, final: bool) -> Tuple[List[List[str]], str]:
+    """
+    Parse the CSV records in text. Returns (rows, rest): rest is the raw text of a last
+    record whose quoted field is still open at the end of text (it continues in the next
+    piece), or "" when text ends on a record boundary or is the end of the file.
+    """
+    if final:
+        return list(csv.reader(io.StringIO(text))), ""
+    # csv decides where records end; a sentinel line after the text comes back as a row
+    # of its own unless a quoted field was still open and swallowed it
+    rows = list(csv.reader(itertools.chain(io.StringIO(text), (_END_OF_PIECE,))))
+    if rows and rows[-1] == [_END_OF_PIECE]:
+        rows.pop()
+        return rows, ""
+    # rare: a multi-line field spans two pieces; find the line its record starts on
+    lines = io.StringIO(text).readlines()
+    reader = csv.reader(lines)
+    rows, start, last_start = [], 0, 0
+    for row in reader:
+        rows.append(row)
+        last_start, start = start, reader.line_num
+    rows.pop()
+    return rows, "".join(lines[last_start:])
+
+
+async def _iter_csv_rows(upload) -> AsyncIterator[List[Optional[List[str]]]]:
+    """Lists of parsed CSV rows as the upload is read; None for a record that never closes its quotes."""
+    rest = ""
+    async for text in iter_upload_text(upload):
+        rows, rest = _csv_rows(rest + text, final=False)
+        if len(rest) > MAX_OPEN_RECORD_CHARS:
+            rows.append(None)
+            rest = ""
+        yield rows
+    if rest:
+        yield _csv_rows(rest, final=True)[0]
+
+
+async def iter_record_batches(upload, fmt: str, batch_size: int = 5000) -> AsyncIterator[List[Record]]:
+    """
+    Yield batches of (row_number, record, error). Row numbers count data rows from 1
+    (the CSV header is not a row). Quoted CSV fields may span lines (multi-line addresses).
+    """
+    header: Optional[List[str]] = None
+    row_no = 0
+    batch: List[Record] = []
+    if fmt == "csv":
+        async for rows in _iter_csv_rows(upload):
+            for values in rows:
+                if values is None:
+                    row_no += 1
+                    batch.append((row_no, None, "unterminated quoted field"))
+                    continue
+                if not values or not "".join(values).strip():
+                    continue
+                if header is None:
+                    header = [h.strip().lower() for h in values]
+                    continue
+                row_no += 1
+                if len(values) != len(header):
+                    batch.append((row_no, None, f"expected {len(header)} columns, got {len(values)}"))
+                else:
+                    batch.append((row_no, dict(zip(header, values)), None))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    else:
+        async for lines in iter_upload_lines(upload):
+            for line in lines:
+                if not line.strip():
+                    continue
+                row_no += 1
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    batch.append((row_no, None, f"invalid JSON: {e}"))
+                    continue
+                if isinstance(record, dict):
+                    batch.append((row_no, record, None))
+                else:
+                    batch.append((row_no, None, "each line must be a JSON object"))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,134 @@
+"""
+Chat latency during a burst of heavy uploads, with and without admission control.
+
+    cd backend
+    python -m benchmarks.bench_admission --burst 200 --chats 400
+
+The ASGI app under test is a stand-in for the real routes, so the run needs no Groq,
+PDFs or TTS: a "policy upload" blocks a default-executor thread for --heavy-ms (what
+PDF spooling and gTTS used to do) and a chat turn does a short to_thread lookup (session
+load) plus --llm-ms of awaiting. --burst uploads arrive at once while --chats chat
+requests arrive at --chat-rps. Requests go straight through AdmissionMiddleware (or
+not) without HTTP, so the numbers isolate scheduling: chat p50/p95/p99, heavy requests
+completed vs shed, and the controller's own counters.
+
+"contention" then saturates the shared slots: chats at --contended-rps need more slots
+than ADMISSION_SLOTS while the burst is split over the stt, policy and bulk routes. It
+runs once with the configured priorities and reserve, and once with every class at
+priority 0 and no reserve (plain first come, first served), to show what priority buys
+chat when a slot frees up.
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import time
+from typing import Dict, List, Optional
+
+from app.services.admission import ADMISSION_CLASSES, AdmissionController, AdmissionMiddleware
+
+HEAVY_PATHS = {"stt": "/stt/transcribe", "policy": "/policy/simplify", "bulk": "/recommend/bulk"}
+
+
+def _pct(values: List[float], q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+
+
+def make_app(args):
+    async def app(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+        if scope["path"] != "/chat":
+            await asyncio.to_thread(time.sleep, args.heavy_ms / 1000)
+        else:
+            await asyncio.to_thread(time.sleep, 0.002)
+            await asyncio.sleep(args.llm_ms / 1000)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+    return app
+
+
+async def call(app, path: str) -> int:
+    scope = {"type": "http", "method": "POST", "path": path, "headers": [(b"content-length", b"2")]}
+    status = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    await app(scope, receive, send)
+    return status["code"]
+
+
+async def run(args, admitted: bool, controller: Optional[AdmissionController] = None,
+              heavy: List[str] = ("policy",), chat_rps: Optional[float] = None) -> dict:
+    app = make_app(args)
+    controller = controller or AdmissionController()
+    if admitted:
+        app = AdmissionMiddleware(app, controller)
+    chat_latency: List[float] = []
+    codes: Dict[str, Dict[int, int]] = {"chat": {}, **{name: {} for name in heavy}}
+
+    async def one(kind: str, path: str):
+        started = time.perf_counter()
+        code = await call(app, path)
+        codes[kind][code] = codes[kind].get(code, 0) + 1
+        if kind == "chat" and code == 200:
+            chat_latency.append(time.perf_counter() - started)
+
+    async def chats():
+        tasks = []
+        for _ in range(args.chats):
+            tasks.append(asyncio.create_task(one("chat", "/chat")))
+            await asyncio.sleep(1 / (chat_rps or args.chat_rps))
+        await asyncio.gather(*tasks)
+
+    started = time.perf_counter()
+    burst = [asyncio.create_task(one(heavy[i % len(heavy)], HEAVY_PATHS[heavy[i % len(heavy)]]))
+             for i in range(args.burst)]
+    await asyncio.gather(chats(), *burst)
+    info = controller.info()["classes"] if admitted else None
+    return {
+        "admission": admitted,
+        "wall_s": round(time.perf_counter() - started, 2),
+        "chat_p50_ms": _pct(chat_latency, 0.50),
+        "chat_p95_ms": _pct(chat_latency, 0.95),
+        "chat_p99_ms": _pct(chat_latency, 0.99),
+        "status": codes,
+        "controller": {name: {k: info[name][k] for k in ("admitted", "waited", "rejected", "wait_ms")}
+                       for name in ("interactive", *heavy)} if info else None,
+    }
+
+
+async def contention(args) -> List[dict]:
+    fifo = {name: dataclasses.replace(cls, priority=0) for name, cls in ADMISSION_CLASSES.items()}
+    results = []
+    for label, controller in (("priority", AdmissionController()),
+                              ("fifo", AdmissionController(classes=fifo, reserved=0))):
+        result = await run(args, True, controller, heavy=list(HEAVY_PATHS), chat_rps=args.contended_rps)
+        results.append({"scheduling": label, "slots": controller.slots, "reserved": controller.reserved, **result})
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=200, help="heavy uploads arriving at once")
+    parser.add_argument("--chats", type=int, default=400)
+    parser.add_argument("--chat-rps", type=float, default=100)
+    parser.add_argument("--heavy-ms", type=float, default=300, help="executor time per heavy request")
+    parser.add_argument("--llm-ms", type=float, default=50, help="awaited upstream time per chat")
+    parser.add_argument("--contended-rps", type=float, default=200, help="chat rate for the contention runs")
+    args = parser.parse_args()
+    results = [await run(args, admitted) for admitted in (False, True)]
+    print(json.dumps({"burst": args.burst, "chats": args.chats, "results": results,
+                      "contention": await contention(args)}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""
+Per-event cost of the usage analytics pipeline behind /admin/stats.
+
+    cd backend
+    python -m benchmarks.bench_analytics --events 200000
+
+`record_us` is what a request handler pays (the hot path); `drain_us` is the background
+aggregation cost per event; `report_ms` is one /admin/stats read. The hot-path budget
+is 20 µs per event.
+"""
+import argparse
+import json
+import random
+import time
+
+from app.services.analytics import Analytics
+
+QUERIES = [
+    "How to file a claim?", "What does my policy cover?", "How to renew my policy?",
+    "Documents required for claim", "फसल बीमा का दावा कैसे करें?", "PMFBY premium kitna hai",
+]
+PLANS = ["Crop Insurance", "Family Health Plan", "Micro Insurance", "Standard Life Cover"]
+
+
+def make_events(n: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    events = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.5:
+            # long tail of one-off questions behind a few popular ones
+            query = rng.choice(QUERIES) if rng.random() < 0.6 else f"question {rng.randint(0, 50_000)}"
+            events.append(("chat", (rng.choice(["en", "hi"]),), query))
+        elif kind < 0.8:
+            events.append(("recommend", tuple(rng.sample(PLANS, rng.randint(1, 3))), None))
+        else:
+            events.append((rng.choice(["survey", "claim_guide", "policy_simplify"]), ("x",), None))
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200_000)
+    args = parser.parse_args()
+
+    events = make_events(args.events)
+    stats = Analytics(snapshot_path=None, buffer=args.events)
+
+    record = stats.record
+    started = time.perf_counter()
+    for event, labels, query in events:
+        record(event, *labels, query=query)
+    record_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    stats.drain()
+    drain_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    report = stats.report()
+    report_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    data = stats.snapshot_data()
+    snapshot_bytes = len(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    snapshot_s = time.perf_counter() - started
+
+    print(json.dumps({
+        "events": args.events,
+        "record_us": round(record_s / args.events * 1e6, 3),
+        "drain_us": round(drain_s / args.events * 1e6, 3),
+        "total_us": round((record_s + drain_s) / args.events * 1e6, 3),
+        "hot_path_budget_us": 20,
+        "report_ms": round(report_s * 1000, 2),
+        "snapshot_ms": round(snapshot_s * 1000, 2),
+        "snapshot_bytes": snapshot_bytes,
+        "top_queries": report["top_queries"][:5],
+        "dropped": report["pipeline"]["dropped"],
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+/claim/guide and /survey/questions: requests per second and bytes on the wire, before
+(route returns the dict, FastAPI encodes it on every hit, no caching headers) and after
+(pre-serialized, pre-gzipped variants with ETags).
+
+    cd backend
+    python -m benchmarks.bench_catalogs --requests 20000 --views 10
+
+Both versions are mounted on a bare FastAPI app (no middleware) and called through
+ASGI directly, one request at a time, so the numbers are per-request server CPU. The
+"before" handlers are the old ones, fed the English sections of the catalog files.
+Bytes count the status line, headers and body as HTTP/1.1 would send them. --views
+repeat visits of one screen model a phone that keeps its HTTP cache (revalidating
+each time, i.e. as if max-age had expired): before, every view downloads the full
+body; after, the first view gets gzip and the rest get 304.
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List, Tuple
+
+from fastapi import FastAPI
+
+from app.routes import claim, survey
+from app.services.analytics import analytics
+from app.services.catalogs import claim_guides, survey_questions
+
+
+def legacy_app() -> FastAPI:
+    with open(claim_guides.path, encoding="utf-8") as f:
+        guides = json.load(f)["languages"]["en"]
+    with open(survey_questions.path, encoding="utf-8") as f:
+        questions = json.load(f)["languages"]["en"]
+    app = FastAPI()
+
+    @app.get("/claim/guide")
+    async def get_claim_guide(policy_type: str):
+        key = (policy_type or "").strip().lower()
+        analytics.record("claim_guide", key)
+        return {"policy_type": key, "guide": guides[key]}
+
+    @app.get("/survey/questions")
+    def get_survey_questions():
+        analytics.record("survey", "questions")
+        return questions
+
+    return app
+
+
+def catalog_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(claim.router)
+    app.include_router(survey.router)
+    return app
+
+
+async def call(app, path: str, query: str, headers: List[Tuple[bytes, bytes]]) -> Tuple[int, int, Dict[bytes, bytes]]:
+    scope = {"type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "path": path,
+             "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+             "headers": [(b"host", b"bench")] + headers, "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+    out = {"status": 0, "bytes": 0, "headers": {}}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            out["status"] = message["status"]
+            out["headers"] = dict(message.get("headers", []))
+            out["bytes"] += len(f"HTTP/1.1 {message['status']} OK\r\n\r\n") + sum(
+                len(k) + len(v) + 4 for k, v in message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            out["bytes"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return out["status"], out["bytes"], out["headers"]
+
+
+ENDPOINTS = [("/claim/guide", "policy_type=crop"), ("/claim/guide", "policy_type=health"),
+             ("/claim/guide", "policy_type=life"), ("/survey/questions", "")]
+BROWSER = [(b"accept-encoding", b"gzip, deflate, br")]
+
+
+async def throughput(app, requests: int, headers_for) -> dict:
+    sizes = []
+    started = time.perf_counter()
+    for i in range(requests):
+        path, query = ENDPOINTS[i % len(ENDPOINTS)]
+        status, size, _ = await call(app, path, query, headers_for(path, query))
+        assert status in (200, 304), status
+        sizes.append(size)
+    elapsed = time.perf_counter() - started
+    return {"rps": round(requests / elapsed), "us_per_request": round(elapsed / requests * 1e6, 1),
+            "bytes_per_request": round(sum(sizes) / len(sizes))}
+
+
+async def views(app, count: int) -> int:
+    """Bytes for `count` views of every screen by one client with an HTTP cache."""
+    total = 0
+    for path, query in ENDPOINTS:
+        etag = None
+        for _ in range(count):
+            headers = BROWSER + ([(b"if-none-match", etag)] if etag else [])
+            status, size, response_headers = await call(app, path, query, headers)
+            etag = response_headers.get(b"etag", etag)
+            total += size
+    return total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--views", type=int, default=10, help="repeat visits per screen for the bytes-on-wire run")
+    args = parser.parse_args()
+    before, after = legacy_app(), catalog_app()
+
+    etags = {}
+    for path, query in ENDPOINTS:
+        etags[(path, query)] = (await call(after, path, query, BROWSER))[2][b"etag"]
+
+    results = {
+        "before": await throughput(before, args.requests, lambda p, q: BROWSER),
+        "after_identity": await throughput(after, args.requests, lambda p, q: []),
+        "after_gzip": await throughput(after, args.requests, lambda p, q: BROWSER),
+        "after_304": await throughput(after, args.requests,
+                                      lambda p, q: BROWSER + [(b"if-none-match", etags[(p, q)])]),
+    }
+    before_bytes, after_bytes = await views(before, args.views), await views(after, args.views)
+    print(json.dumps({
+        "requests": args.requests,
+        "throughput": results,
+        "screen_views": {
+            "views_per_screen": args.views,
+            "screens": len(ENDPOINTS),
+            "before_bytes": before_bytes,
+            "after_bytes": after_bytes,
+            "reduction_pct": round(100 * (1 - after_bytes / before_bytes), 1),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
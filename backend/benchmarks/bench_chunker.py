@@ -0,0 +1,109 @@
+"""
+Fixed 1500-character chunks (the previous splitter) vs the structure-aware,
+boilerplate-deduplicating chunker: map-stage LLM calls and prompt tokens per document.
+
+    cd backend
+    python -m benchmarks.bench_chunker                       # synthetic policy wording
+    python -m benchmarks.bench_chunker --pdf policy1.pdf policy2.pdf
+
+Real policy PDFs are read with PyMuPDF, page by page, exactly as the job pipeline sees
+them. Without --pdf a synthetic multi-page wording is built from the exclusion fixtures
+with running headers, footers, page numbers and a reprinted annexure. Tokens are counted
+with chunker.count_tokens for both paths so the numbers are comparable.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import time
+from typing import List
+
+from app.services.chunker import CHUNK_TOKENS, chunk_pages, count_tokens
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "exclusions")
+LEGACY_CHUNK_CHARS = 1500
+
+CLAUSE = (
+    "{n} The Company shall indemnify the Insured for loss of or damage to the {thing} caused by "
+    "{peril}, subject to the terms, conditions and exclusions of this Policy and to the sum insured "
+    "shown in the Schedule."
+)
+
+
+def legacy_chunks(pages: List[str]) -> List[str]:
+    text = "".join(pages)
+    chunks = [text[i:i + LEGACY_CHUNK_CHARS] for i in range(0, len(text), LEGACY_CHUNK_CHARS)]
+    return [c for c in chunks if c.strip()]
+
+
+def synthetic_pages(pages: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            fixtures.append(f.read())
+    annexure = "\n".join(CLAUSE.format(n=f"A.{i}", thing="crop", peril=p) for i, p in
+                         enumerate(["drought", "flood", "hailstorm", "cyclone", "pest attack"], 1))
+    out = []
+    for p in range(pages):
+        lines = ["Kisan Suraksha Crop Insurance Policy Wording", "UIN: KSCI-2024-07 | Kisan General Insurance Co. Ltd."]
+        if p % 6 == 0:
+            lines.append(f"SECTION {p // 6 + 1} - COVER AND CONDITIONS")
+        for i in range(8):
+            lines.append(CLAUSE.format(n=f"{p + 1}.{i + 1}", thing=rng.choice(["crop", "livestock", "farm equipment"]),
+                                       peril=rng.choice(["drought", "flood", "fire", "theft", "accident", "disease"])))
+        if p % 5 == 0:
+            lines.append(fixtures[p // 5 % len(fixtures)])
+        if p % 10 == 9:
+            # the same annexure reprinted after every tenth page
+            lines.append("ANNEXURE - STANDARD PERILS")
+            lines.append(annexure)
+        lines.append("This policy is issued under IRDAI registration no. 123 and is subject to the terms at www.example.in")
+        lines.append(f"Page {p + 1} of {pages}")
+        out.append("\n".join(lines))
+    return out
+
+
+def pdf_pages(path: str) -> List[str]:
+    import fitz  # PyMuPDF
+    with fitz.open(path) as doc:
+        return [page.get_text() for page in doc]
+
+
+def measure(name: str, pages: List[str], budget: int) -> dict:
+    old = legacy_chunks(pages)
+    started = time.perf_counter()
+    new = chunk_pages(pages, budget)
+    elapsed = time.perf_counter() - started
+    old_tokens = sum(count_tokens(c) for c in old)
+    new_tokens = sum(count_tokens(c) for c in new["chunks"])
+    return {
+        "document": name,
+        "pages": len(pages),
+        "legacy_calls": len(old),
+        "calls": len(new["chunks"]),
+        "calls_saved_pct": round(100 * (1 - len(new["chunks"]) / len(old)), 1) if old else 0.0,
+        "legacy_tokens": old_tokens,
+        "tokens": new_tokens,
+        "tokens_saved_pct": round(100 * (1 - new_tokens / old_tokens), 1) if old_tokens else 0.0,
+        "chunk_ms": round(elapsed * 1000, 1),
+        "chunking": new["stats"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="*", default=[], help="real policy PDFs to measure")
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--budget", type=int, default=CHUNK_TOKENS, help="chunk token budget")
+    args = parser.parse_args()
+
+    results = [measure(os.path.basename(path), pdf_pages(path), args.budget) for path in args.pdf]
+    if not args.pdf:
+        results = [measure(f"synthetic-{n}p", synthetic_pages(n), args.budget) for n in args.pages]
+    print(json.dumps({"budget": args.budget, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Groq calls per /recommend request and latency added by LLM enhancement: one call per
+household (no batching, no cache) vs micro-batching with the profile-bucket cache.
+
+    cd backend
+    python -m benchmarks.bench_enhance --requests 2000 --rps 100
+
+Households are drawn from a skewed synthetic population (a few occupations and income
+levels are much more common, like a real village survey) and arrive at --rps against a
+benchmarks.fake_groq instance answering in JSON mode after --latency seconds. Each
+request goes through RecommendationEnhancer.enhance under the /recommend deadline,
+exactly as the route calls it; plans come from the real rule engine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import List
+
+from benchmarks.fake_groq import FakeGroq, FakeGroqConfig
+
+OCCUPATIONS = ["farmer"] * 8 + ["labourer"] * 4 + ["shopkeeper"] * 2 + ["teacher", "driver", "weaver", "tailor"]
+
+
+def households(n: int, seed: int = 7) -> List[dict]:
+    rng = random.Random(seed)
+    return [{
+        "occupation": rng.choice(OCCUPATIONS),
+        "income": int(rng.lognormvariate(9.4, 0.6)),
+        "family_size": max(1, min(12, int(rng.gauss(4.5, 1.8)))),
+    } for _ in range(n)]
+
+
+def _pct(values: List[float], q: float):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1) if values else None
+
+
+async def run(args, batched: bool) -> dict:
+    fake = FakeGroq(FakeGroqConfig(latency=args.latency, jitter=0.3, token_delay=0.0, seed=args.seed))
+    base = await fake.start()
+    from app.services import http_client
+    from app.services.recommend_enhancer import RecommendationEnhancer
+    from app.services.recommender import engine
+    from app.services.resilience import deadline
+
+    http_client.GROQ_API_BASE = base
+    await http_client.close_http_client()
+    await http_client.init_http_client()
+    enhancer = RecommendationEnhancer(window=args.window_ms / 1000, max_batch=args.max_batch) if batched \
+        else RecommendationEnhancer(window=0, max_batch=1, cache_size=0)
+    latencies: List[float] = []
+    sources = {}
+
+    async def one(survey: dict):
+        plans = engine.recommend_one(survey["occupation"], survey["income"], survey["family_size"])["plans"]
+        started = time.perf_counter()
+        with deadline(args.deadline):
+            _, source = await enhancer.enhance(plans, survey)
+        latencies.append(time.perf_counter() - started)
+        sources[source] = sources.get(source, 0) + 1
+
+    wall = time.perf_counter()
+    tasks = []
+    try:
+        for survey in households(args.requests, args.seed):
+            tasks.append(asyncio.create_task(one(survey)))
+            await asyncio.sleep(1 / args.rps)
+        await asyncio.gather(*tasks)
+        # let batches that outlived their requests finish before the server goes away
+        await asyncio.sleep(args.latency * 3)
+    finally:
+        await http_client.close_http_client()
+        await fake.stop()
+    info = enhancer.info()
+    return {
+        "path": "batched+cached" if batched else "per-household",
+        "wall_s": round(time.perf_counter() - wall, 2),
+        "upstream_requests": sum(fake.stats.requests.values()),
+        "calls_per_request": info["calls_per_request"],
+        "mean_batch_size": info["mean_batch_size"],
+        "sources": sources,
+        "added_p50_ms": _pct(latencies, 0.50),
+        "added_p95_ms": _pct(latencies, 0.95),
+        "added_p99_ms": _pct(latencies, 0.99),
+        "cache_entries": info["cache_entries"],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rps", type=float, default=100)
+    parser.add_argument("--latency", type=float, default=0.6, help="fake Groq latency per call (s)")
+    parser.add_argument("--deadline", type=float, default=2.5, help="per-request enhancement budget (s)")
+    parser.add_argument("--window-ms", type=float, default=20)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    from app.services import llm
+    llm.GROQ_API_KEY = os.environ["GROQ_API_KEY"]
+
+    results = [await run(args, batched) for batched in (False, True)]
+    print(json.dumps({"requests": args.requests, "rps": args.rps, "latency_s": args.latency,
+                      "results": results}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
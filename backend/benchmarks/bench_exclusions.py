@@ -0,0 +1,84 @@
+"""
+Accuracy and timing of the rule-based exclusions extractor.
+
+    cd backend
+    python -m benchmarks.bench_exclusions --pages 100
+
+Checks every fixtures/exclusions/*.txt against its .expected.json, then times the
+extractor on a synthetic document of --pages pages built from the fixtures plus
+body text. The target is well under 50 ms for 100 pages.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+from app.services.exclusions import extract_exclusions
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "exclusions")
+BODY_LINE = (
+    "The Insured shall take all reasonable steps to safeguard the property insured against\n"
+    "loss or damage and shall comply with all statutory requirements and safety regulations.\n"
+)
+
+
+def check_fixtures() -> list:
+    results = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            got = extract_exclusions(f.read())
+        with open(path[:-4] + ".expected.json", encoding="utf-8") as f:
+            expected = json.load(f)
+        hits = len(set(got) & set(expected))
+        results.append({
+            "fixture": os.path.basename(path),
+            "exact": got == expected,
+            "precision": round(hits / len(got), 3) if got else 0.0,
+            "recall": round(hits / len(expected), 3) if expected else 1.0,
+        })
+    return results
+
+
+def synthetic_document(pages: int) -> str:
+    texts = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            texts.append(f.read())
+    # ~3 KB of body text per page, with a fixture section every few pages
+    page_body = BODY_LINE * 18
+    out = []
+    for p in range(pages):
+        out.append(page_body)
+        if p % 5 == 0:
+            out.append(texts[p // 5 % len(texts)])
+    return "\n".join(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    doc = synthetic_document(args.pages)
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        items = extract_exclusions(doc)
+        timings.append((time.perf_counter() - started) * 1000)
+    print(json.dumps({
+        "fixtures": check_fixtures(),
+        "timing": {
+            "pages": args.pages,
+            "chars": len(doc),
+            "items": len(items),
+            "median_ms": round(statistics.median(timings), 2),
+            "max_ms": round(max(timings), 2),
+        },
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+FAQ answer cache: hit rate and false-hit rate on a labeled sample, and lookup latency
+with a full cache.
+
+    cd backend
+    python -m benchmarks.bench_faq --fill 5000
+
+benchmarks/fixtures/faq_sample.json holds FAQs in English, Hinglish and Devanagari with
+paraphrases that should be answered from the stored question, and negatives (different
+scheme, insurance type, state, number, negation or intent, and unrelated questions)
+that must not be. For each threshold in --thresholds the FAQs are stored in a fresh
+cache and every labeled question is looked up: a paraphrase answered by its own FAQ
+is a hit, a negative answered by anything (or a paraphrase answered by another FAQ) is
+a false hit. Latency is then measured for the chosen threshold with --fill synthetic
+questions in the cache.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from typing import List
+
+import numpy as np
+
+from app.services.faq_cache import FAQCache, FAQ_CACHE_THRESHOLD
+
+SAMPLE = os.path.join(os.path.dirname(__file__), "fixtures", "faq_sample.json")
+WORDS = ("yojana", "scheme", "kisan", "loan", "subsidy", "pension", "gas", "bijli", "pani", "ration", "card",
+         "beej", "khad", "tractor", "mandi", "bhav", "school", "fees", "hospital", "dawai", "ghar", "awas",
+         "shauchalay", "mgnrega", "majdoori", "bank", "khata", "otp", "mobile", "link", "status", "form")
+
+
+def evaluate(sample: dict, threshold: float) -> dict:
+    cache = FAQCache(threshold=threshold, pinned_path=None)
+    ids = {cache.add(faq["question"], faq["language"], faq["id"]): faq["id"] for faq in sample["faqs"]}
+    assert None not in ids, "every sample FAQ must be storable"
+    hits = positives = false_hits = negatives = 0
+    misses, wrong = [], []
+    for faq in sample["faqs"]:
+        for question in faq["paraphrases"]:
+            positives += 1
+            hit = cache.lookup(question, faq["language"])
+            if hit and hit["answer"] == faq["id"]:
+                hits += 1
+            elif hit:
+                false_hits += 1
+                wrong.append((question, hit["answer"]))
+            else:
+                misses.append(question)
+        for question in faq["negatives"]:
+            negatives += 1
+            hit = cache.lookup(question, faq["language"])
+            if hit:
+                false_hits += 1
+                wrong.append((question, hit["answer"]))
+    for question in sample["unrelated"]:
+        for language in ("en", "hi"):
+            negatives += 1
+            hit = cache.lookup(question, language)
+            if hit:
+                false_hits += 1
+                wrong.append((question, hit["answer"]))
+    return {
+        "threshold": threshold,
+        "hit_rate": round(hits / positives, 3),
+        "false_hit_rate": round(false_hits / (positives + negatives), 3),
+        "false_hits": false_hits,
+        "missed": misses,
+        "wrong": wrong,
+    }
+
+
+def latency(sample: dict, threshold: float, fill: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    cache = FAQCache(capacity=max(fill, 1) + len(sample["faqs"]), threshold=threshold, pinned_path=None)
+    for faq in sample["faqs"]:
+        cache.add(faq["question"], faq["language"], faq["id"])
+    started = time.perf_counter()
+    for i in range(fill):
+        cache.add(" ".join(rng.sample(WORDS, rng.randint(3, 6))) + f" {i}", rng.choice(("en", "hi")), "filler")
+    fill_s = time.perf_counter() - started
+    queries = [q for faq in sample["faqs"] for q in faq["paraphrases"] + faq["negatives"]] + sample["unrelated"]
+    samples: List[float] = []
+    for _ in range(20):
+        for question in queries:
+            started = time.perf_counter()
+            cache.lookup(question, rng.choice(("en", "hi")))
+            samples.append(time.perf_counter() - started)
+    ms = np.asarray(samples) * 1000
+    info = cache.info()
+    return {
+        "entries": info["entries"],
+        "index_bytes": info["index_bytes"],
+        "store_us": round(fill_s / max(fill, 1) * 1e6, 1),
+        "lookups": len(samples),
+        "lookup_ms": {"p50": round(float(np.quantile(ms, 0.5)), 3), "p99": round(float(np.quantile(ms, 0.99)), 3),
+                      "max": round(float(ms.max()), 3)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--thresholds", default="0.4,0.5,0.6,0.7,0.8")
+    parser.add_argument("--threshold", type=float, default=FAQ_CACHE_THRESHOLD, help="threshold for the latency run")
+    parser.add_argument("--fill", type=int, default=5000, help="synthetic entries in the cache for the latency run")
+    parser.add_argument("--verbose", action="store_true", help="list missed paraphrases and false hits")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    with open(SAMPLE, encoding="utf-8") as f:
+        sample = json.load(f)
+
+    sweep = []
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        result = evaluate(sample, threshold)
+        if not args.verbose:
+            result["missed"], result["wrong"] = len(result["missed"]), len(result["wrong"])
+        sweep.append(result)
+    print(json.dumps({
+        "faqs": len(sample["faqs"]),
+        "paraphrases": sum(len(f["paraphrases"]) for f in sample["faqs"]),
+        "negatives": sum(len(f["negatives"]) for f in sample["faqs"]) + 2 * len(sample["unrelated"]),
+        "sweep": sweep,
+        "latency": {"threshold": args.threshold, **latency(sample, args.threshold, args.fill, args.seed)},
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
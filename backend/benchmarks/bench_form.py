@@ -0,0 +1,120 @@
+"""
+Rows per second and peak memory of bulk enrollment-form validation on a synthetic CSV.
+
+    cd backend
+    python -m benchmarks.bench_form --rows 200000
+
+Reports the streamed path /form/assist/bulk runs (CSV parsing with iter_record_batches,
+then bulk_ndjson per batch), the validation step alone, and validating one row at a time
+with assist_one + json.dumps, which is what calling /form/assist in a loop costs before
+any HTTP overhead. Peak Python memory is measured with tracemalloc for the streamed path;
+it should not grow with --rows.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import random
+import time
+import tracemalloc
+
+from app.services.form_validation import _STEP, assist_one, bulk_ndjson
+from app.utils.records import iter_record_batches
+
+NAMES = ["Ramesh Kumar", "Sunita Devi", "Abdul Rahman", "Lakshmi  Narayanan", "Gurpreet Singh"]
+PHONES = ["98765 43210", "+91 9876543210", "09876543210", "12345", "5876543210"]
+AGES = ["45", "45 yrs", "38.0", "130", "", "sixty"]
+
+
+def check_digit(body: str) -> str:
+    """Verhoeff check digit for an 11-digit body."""
+    for digit in range(10):
+        check = 0
+        for step, ch in zip(_STEP, reversed(body + str(digit))):
+            check = step[check * 10 + ord(ch) - 48]
+        if check == 0:
+            return str(digit)
+    raise AssertionError("no check digit")
+
+
+def make_csv(n: int, seed: int = 7) -> bytes:
+    rng = random.Random(seed)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["name", "aadhaar", "address", "phone", "age"])
+    for _ in range(n):
+        body = str(rng.randint(2, 9)) + "".join(rng.choice("0123456789") for _ in range(10))
+        aadhaar = body + check_digit(body)
+        kind = rng.random()
+        if kind < 0.1:
+            aadhaar = aadhaar[:5] + aadhaar[6] + aadhaar[5] + aadhaar[7:]  # swapped digits
+        elif kind < 0.15:
+            aadhaar = aadhaar[:10]
+        elif kind < 0.3:
+            aadhaar = f"{aadhaar[:4]} {aadhaar[4:8]} {aadhaar[8:]}"
+        writer.writerow([rng.choice(NAMES), aadhaar, f"Village {rng.randint(1, 999)}, Nashik",
+                         rng.choice(PHONES), rng.choice(AGES)])
+    return out.getvalue().encode("utf-8")
+
+
+class Upload:
+    """Enough of UploadFile for iter_record_batches."""
+
+    def __init__(self, data: bytes):
+        self._buf = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._buf.read(size)
+
+
+async def streamed(data: bytes, batch: int) -> int:
+    size = 0
+    async for records in iter_record_batches(Upload(data), "csv", batch):
+        size += len(bulk_ndjson(records))
+    return size
+
+
+async def collect(data: bytes, batch: int) -> list:
+    return [records async for records in iter_record_batches(Upload(data), "csv", batch)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--baseline-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    data = make_csv(args.rows)
+    report = {"rows": args.rows, "csv_bytes": len(data)}
+
+    started = time.perf_counter()
+    report["ndjson_bytes"] = asyncio.run(streamed(data, args.batch))
+    report["streamed_rows_per_s"] = round(args.rows / (time.perf_counter() - started))
+
+    batches = asyncio.run(collect(data, args.batch))
+    started = time.perf_counter()
+    for records in batches:
+        bulk_ndjson(records)
+    report["validate_only_rows_per_s"] = round(args.rows / (time.perf_counter() - started))
+
+    baseline = [r for records in batches for _, r, _ in records][:args.baseline_rows]
+    started = time.perf_counter()
+    for record in baseline:
+        json.dumps(assist_one(record), ensure_ascii=False)
+    report["per_row_rows_per_s"] = round(len(baseline) / (time.perf_counter() - started))
+    del batches, baseline
+
+    tracemalloc.start()
+    asyncio.run(streamed(data, args.batch))
+    report["streamed_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    tracemalloc.stop()
+
+    sample = asyncio.run(collect(data, 4))[0]
+    report["sample"] = [json.loads(line) for line in bulk_ndjson(sample).splitlines()]
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Per-request httpx clients vs the shared pooled client, against a local stub server.
+
+    cd backend
+    python -m benchmarks.bench_http_pool --requests 500 --concurrency 20 --tls
+
+The stub counts accepted connections, so "connections" is the number of TCP (and
+TLS, with --tls) handshakes each mode paid for.
+"""
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import time
+
+import httpx
+
+from app.services.http_client import _InstrumentedTransport
+
+BODY = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode()
+
+
+class StubServer:
+    """Minimal HTTP/1.1 keep-alive server answering every request with BODY."""
+
+    def __init__(self, latency: float = 0.0, tls: bool = False):
+        self.latency = latency
+        self.tls = tls
+        self.connections = 0
+        self.port = 0
+        self._server = None
+        self._tmp = None
+
+    def _ssl_context(self) -> ssl.SSLContext:
+        self._tmp = tempfile.TemporaryDirectory()
+        cert = os.path.join(self._tmp.name, "cert.pem")
+        key = os.path.join(self._tmp.name, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+            check=True, capture_output=True,
+        )
+        ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ctx.load_cert_chain(cert, key)
+        return ctx
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(BODY)).encode() + b"\r\n\r\n" + BODY
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> str:
+        ctx = self._ssl_context() if self.tls else None
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0, ssl=ctx)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return f"{'https' if self.tls else 'http'}://127.0.0.1:{self.port}"
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        if self._tmp is not None:
+            self._tmp.cleanup()
+
+
+async def _drive(call, requests: int, concurrency: int) -> list:
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with sem:
+            t0 = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+async def run_mode(mode: str, base: str, args) -> dict:
+    server_conns_before = args.server.connections
+    payload = {"model": "stub", "messages": [{"role": "user", "content": "hi"}]}
+    shared = None
+    if mode == "shared":
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        transport = _InstrumentedTransport(limits=limits, verify=False)
+        shared = httpx.AsyncClient(base_url=base, transport=transport)
+
+        async def call():
+            r = await shared.post("/chat/completions", json=payload)
+            r.raise_for_status()
+    else:
+        async def call():
+            async with httpx.AsyncClient(base_url=base, verify=False) as client:
+                r = await client.post("/chat/completions", json=payload)
+                r.raise_for_status()
+
+    t0 = time.perf_counter()
+    latencies = await _drive(call, args.requests, args.concurrency)
+    wall = time.perf_counter() - t0
+    if shared is not None:
+        await shared.aclose()
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": args.requests,
+        "connections": args.server.connections - server_conns_before,
+        "wall_s": round(wall, 3),
+        "rps": round(args.requests / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.005, help="stub server latency per request (s)")
+    parser.add_argument("--tls", action="store_true", help="serve HTTPS with a throwaway self-signed cert")
+    args = parser.parse_args()
+
+    args.server = StubServer(latency=args.latency, tls=args.tls)
+    base = await args.server.start()
+    try:
+        results = [await run_mode(mode, base, args) for mode in ("per_request", "shared")]
+    finally:
+        await args.server.stop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+/chat response latency and time-to-audio for each TTS mode (wait, lazy, on_demand, off),
+against benchmarks.fake_groq with a stub synthesizer of fixed latency.
+
+    cd backend
+    python -m benchmarks.bench_lazy_tts --requests 40 --concurrency 8 --tts-seconds 1.5
+
+Every request asks a distinct question so nothing is served from the audio cache. For
+modes that hand out the URL early, time-to-audio is measured by fetching it the way a
+client would (GET /audio/... blocks until the file exists), started right after the reply.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.fake_groq import FakeGroq, add_arguments, config_from_args
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1) if values else None
+
+
+async def run_mode(mode: str, args) -> dict:
+    from app.models.schemas import ChatRequest
+    from app.routes.audio import get_audio
+    from app.routes.chat import chat_endpoint
+
+    sem = asyncio.Semaphore(args.concurrency)
+    reply_s, audio_s = [], []
+
+    async def one(i: int):
+        async with sem:
+            started = time.perf_counter()
+            response = await chat_endpoint(ChatRequest(
+                message=f"{mode} question {i}: how do I claim crop insurance?",
+                session_id=f"bench-{mode}-{i}", language="en", tts=mode,
+            ))
+            reply_s.append(time.perf_counter() - started)
+        url = response.tts_audio
+        if not url or url == "tts_error":
+            return
+        if not response.tts_ready:
+            _, shard1, shard2, name = url.strip("/").split("/")
+            await get_audio(shard1, shard2, name)
+        audio_s.append(time.perf_counter() - started)
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    return {
+        "mode": mode,
+        "wall_s": round(time.perf_counter() - wall, 2),
+        "reply_p50_ms": _pct(reply_s, 0.5),
+        "reply_p95_ms": _pct(reply_s, 0.95),
+        "audio_p50_ms": _pct(audio_s, 0.5),
+        "audio_p95_ms": _pct(audio_s, 0.95),
+        "reply_mean_ms": round(statistics.fmean(reply_s) * 1000, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tts-seconds", type=float, default=1.5, help="stub synthesis time per reply")
+    parser.add_argument("--modes", nargs="+", default=["wait", "lazy", "on_demand", "off"])
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    fake = FakeGroq(config_from_args(args))
+    os.environ["GROQ_API_BASE"] = await fake.start()
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    workdir = tempfile.mkdtemp(prefix="bench-tts-")
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+    from app.services import http_client, tts
+
+    async def stub_synthesize_to(file_path: str, text: str, lang: str) -> None:
+        await asyncio.sleep(args.tts_seconds)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(b"\xff\xf3" + text.encode()[:64])
+
+    tts.AUDIO_DIR = os.path.join(workdir, "audio")
+    tts._synthesize_to = stub_synthesize_to
+    await http_client.init_http_client()
+    try:
+        results = [await run_mode(mode, args) for mode in args.modes]
+    finally:
+        await http_client.close_http_client()
+        await fake.stop()
+    print(json.dumps({"tts_seconds": args.tts_seconds, "llm_latency_s": args.latency,
+                      "requests": args.requests, "concurrency": args.concurrency,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
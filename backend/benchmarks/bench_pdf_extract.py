@@ -0,0 +1,103 @@
+"""
+Single-thread whole-document extraction (the previous path) vs the page-parallel
+process-pool engine, on synthetic multi-hundred-page PDFs.
+
+    cd backend
+    python -m benchmarks.bench_pdf_extract --pages 200 400 800
+
+Reports wall time, time to the first page and the parent's peak Python heap.
+Requires PyMuPDF.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import fitz  # PyMuPDF
+
+from app.services import pdf_parser
+
+CLAUSE = (
+    "{n}. The Company shall indemnify the Insured for loss of or damage to the crop caused by "
+    "drought, flood, inundation, pest attack, landslide, natural fire and lightning, storm, hailstorm "
+    "and cyclone, subject to the terms, conditions and exclusions of this Policy. "
+)
+
+
+def make_pdf(pages: int, path: str) -> None:
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        text = "".join(CLAUSE.format(n=f"{p + 1}.{i + 1}") for i in range(12))
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+async def old_path(path: str):
+    # What extract_text_from_pdf used to do: whole upload in memory, one executor thread
+    with open(path, "rb") as f:
+        file_bytes = f.read()
+    started = time.perf_counter()
+
+    def _extract():
+        doc = fitz.open(stream=file_bytes, filetype="pdf")
+        text = "".join([page.get_text() for page in doc])
+        doc.close()
+        return text
+
+    text = await asyncio.get_running_loop().run_in_executor(None, _extract)
+    elapsed = time.perf_counter() - started
+    # nothing is usable until the whole document is done
+    return text, elapsed, elapsed
+
+
+async def new_path(path: str):
+    started = time.perf_counter()
+    first = None
+    parts = []
+    async for _, page_text in pdf_parser.iter_pdf_pages(path):
+        if first is None:
+            first = time.perf_counter() - started
+        parts.append(page_text)
+    return "".join(parts), first, time.perf_counter() - started
+
+
+async def measure(fn, path: str) -> dict:
+    tracemalloc.start()
+    text, first, total = await fn(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"chars": len(text), "first_page_ms": round(first * 1000, 1),
+            "wall_ms": round(total * 1000, 1), "peak_heap_mb": round(peak / 1e6, 2)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[200, 500])
+    args = parser.parse_args()
+
+    # warm the worker processes so spawn cost is not billed to the first document
+    with tempfile.TemporaryDirectory() as tmp:
+        warm = os.path.join(tmp, "warm.pdf")
+        make_pdf(pdf_parser.PDF_WORKERS, warm)
+        await pdf_parser.extract_pages_from_file(warm)
+
+        results = []
+        for pages in args.pages:
+            path = os.path.join(tmp, f"policy_{pages}.pdf")
+            make_pdf(pages, path)
+            row = {"pages": pages, "bytes": os.path.getsize(path), "workers": pdf_parser.PDF_WORKERS}
+            row["old"] = await measure(old_path, path)
+            row["new"] = await measure(new_path, path)
+            row["speedup"] = round(row["old"]["wall_ms"] / row["new"]["wall_ms"], 2)
+            results.append(row)
+    pdf_parser.shutdown_pdf_pool()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+Rows per second of the vectorized recommendation engine on synthetic household registers.
+
+    cd backend
+    python -m benchmarks.bench_recommend --rows 100000
+
+Reports the vectorized scoring step alone, scoring plus NDJSON serialization (what
+/recommend/bulk does per batch), and the previous one-Pydantic-object-per-row path.
+"""
+import argparse
+import json
+import random
+import time
+
+from app.models.schemas import Plan, RecommendResponse
+from app.services.recommender import engine
+
+OCCUPATIONS = ["farmer", "Farmer", "labourer", "teacher", "shopkeeper", "driver", "weaver"]
+
+
+def make_rows(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [
+        (i + 1, {"occupation": rng.choice(OCCUPATIONS), "income": rng.randint(2000, 60000),
+                 "family_size": rng.randint(1, 12)}, None)
+        for i in range(n)
+    ]
+
+
+def per_row_pydantic(rows) -> int:
+    # One engine call + Pydantic response per row, like calling /recommend in a loop
+    count = 0
+    for _, r, _ in rows:
+        result = engine.recommend_one(r["occupation"], r["income"], r["family_size"])
+        RecommendResponse(plans=[Plan(**p) for p in result["plans"]], trust_score=result["trust_score"],
+                          total_premium=result["total_premium"], explanation=result["explanation"]).model_dump_json()
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--baseline-rows", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    report = {"rows": args.rows}
+
+    started = time.perf_counter()
+    cols = engine.columns([r["occupation"] for _, r, _ in rows], [r["income"] for _, r, _ in rows],
+                          [r["family_size"] for _, r, _ in rows])
+    engine.score(cols)
+    report["score_only_rows_per_s"] = round(args.rows / (time.perf_counter() - started))
+
+    started = time.perf_counter()
+    size = 0
+    for i in range(0, len(rows), args.batch):
+        size += len(engine.bulk_ndjson(rows[i:i + args.batch]))
+    report["bulk_ndjson_rows_per_s"] = round(args.rows / (time.perf_counter() - started))
+    report["ndjson_bytes"] = size
+
+    baseline = rows[:args.baseline_rows]
+    started = time.perf_counter()
+    per_row_pydantic(baseline)
+    report["per_row_pydantic_rows_per_s"] = round(len(baseline) / (time.perf_counter() - started))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Tail latency and success rate of Groq calls under injected faults: the previous plain
+call (one attempt, 30 s timeout) vs the resilient path (deadline, hedging, retries with
+backoff, circuit breaker, fallback to the small model).
+
+    cd backend
+    python -m benchmarks.bench_resilience --requests 400 --concurrency 16
+    python -m benchmarks.bench_resilience --target stt --scenarios outage
+
+Each scenario runs against a fresh benchmarks.fake_groq instance:
+
+    tail     5% of requests take an extra 5 s
+    hang     2% of requests never answer
+    errors   10% of requests fail with HTTP 500
+    outage   the primary model answers 429 for 3 s out of every 10 s
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+import wave
+from typing import Callable, Dict, List
+
+from benchmarks.fake_groq import FakeGroq, FakeGroqConfig
+
+SCENARIOS: Dict[str, dict] = {
+    "tail": {"tail_rate": 0.05, "tail_latency": 5.0},
+    "hang": {"hang_rate": 0.02},
+    "errors": {"error_rate": 0.1},
+    "outage": {"outage_every": 10.0, "outage_duration": 3.0, "outage_status": 429, "retry_after": 2.0},
+}
+
+
+def _pct(values: List[float], q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+
+def short_wav(seconds: float = 3.0, rate: int = 16000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\x00\x01" * int(seconds * rate))
+    return buf.getvalue()
+
+
+def make_calls(target: str, resilient: bool) -> Callable[[int], asyncio.Future]:
+    from app.services import llm, stt
+    from app.services.resilience import deadline
+
+    if target == "llm":
+        def messages(i: int) -> list:
+            return [{"role": "user", "content": f"question {i}: is flood damage covered?"}]
+
+        async def plain(i: int):
+            return await llm._post_completion(messages(i), llm.GROQ_MODEL, 0.7, 512, 30)
+
+        async def guarded(i: int):
+            with deadline(ARGS.deadline):
+                return await llm.call_groq_completion(messages(i), cache=False)
+    else:
+        audio = short_wav()
+
+        async def plain(i: int):
+            return await stt._call_groq_stt(audio, "hi", timeout=60)
+
+        async def guarded(i: int):
+            with deadline(ARGS.deadline):
+                return await stt._transcribe(audio, "hi", 60)
+
+    return guarded if resilient else plain
+
+
+async def run(target: str, scenario: str, resilient: bool) -> dict:
+    config = FakeGroqConfig(latency=ARGS.latency, jitter=0.3, token_delay=0.0, seed=ARGS.seed,
+                            stt_latency=ARGS.latency, **SCENARIOS[scenario])
+    fake = FakeGroq(config)
+    base = await fake.start()
+    from app.services import http_client, llm, stt
+    from app.services.resilience import UpstreamPolicy
+
+    http_client.GROQ_API_BASE = base
+    await http_client.close_http_client()
+    await http_client.init_http_client()
+    # fresh breaker and latency history per run
+    llm.llm_policy = UpstreamPolicy("llm", [llm.GROQ_MODEL, llm.GROQ_FALLBACK_MODEL])
+    stt.stt_policy = UpstreamPolicy("stt", [stt.GROQ_MODEL, stt.GROQ_FALLBACK_MODEL])
+    call = make_calls(target, resilient)
+
+    sem = asyncio.Semaphore(ARGS.concurrency)
+    latencies: List[float] = []
+    outcomes = {"ok": 0, "fallback": 0, "failed": 0}
+
+    async def one(i: int):
+        async with sem:
+            started = time.perf_counter()
+            try:
+                result = await call(i)
+                outcomes["ok"] += 1
+                if isinstance(result, dict) and "fallback_model" in result:
+                    outcomes["fallback"] += 1
+            except Exception:
+                outcomes["failed"] += 1
+            latencies.append(time.perf_counter() - started)
+
+    wall = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(i) for i in range(ARGS.requests)))
+    finally:
+        await http_client.close_http_client()
+        await fake.stop()
+    policy = (llm.llm_policy if target == "llm" else stt.stt_policy).info()
+    return {
+        "scenario": scenario,
+        "path": "resilient" if resilient else "plain",
+        "wall_s": round(time.perf_counter() - wall, 2),
+        "success_pct": round(100 * outcomes["ok"] / ARGS.requests, 1),
+        "fallback_answers": outcomes["fallback"],
+        "p50_s": _pct(latencies, 0.50),
+        "p95_s": _pct(latencies, 0.95),
+        "p99_s": _pct(latencies, 0.99),
+        "max_s": round(max(latencies), 3),
+        "upstream_requests": sum(fake.stats.requests.values()),
+        "policy": {k: policy[k] for k in ("retries", "hedges", "hedge_wins", "fallbacks", "short_circuited",
+                                           "deadline_exceeded")} if resilient else None,
+    }
+
+
+async def main():
+    global ARGS
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("llm", "stt"), default="llm")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.3, help="typical upstream latency (s)")
+    parser.add_argument("--deadline", type=float, default=8.0, help="per-request budget on the resilient path (s)")
+    parser.add_argument("--seed", type=int, default=11)
+    ARGS = parser.parse_args()
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    from app.services import llm, stt
+    llm.GROQ_API_KEY = stt.GROQ_API_KEY = os.environ["GROQ_API_KEY"]
+
+    results = []
+    for scenario in ARGS.scenarios:
+        for resilient in (False, True):
+            results.append(await run(ARGS.target, scenario, resilient))
+    print(json.dumps({"target": ARGS.target, "requests": ARGS.requests, "concurrency": ARGS.concurrency,
+                      "deadline_s": ARGS.deadline, "results": results}, indent=2))
+
+
+ARGS: argparse.Namespace
+
+if __name__ == "__main__":
+    asyncio.run(main())
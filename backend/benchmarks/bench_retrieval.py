@@ -0,0 +1,134 @@
+"""
+BM25 retrieval latency on a long policy: index build time, then per-query search time
+for the warm in-memory index and for the first query after a load from disk.
+
+    cd backend
+    python -m benchmarks.bench_retrieval --pages 500 --queries 2000
+
+The policy is synthetic: the exclusion fixtures plus generated clauses, --pages pages
+of about 3000 characters each. A set of facts (a numbered benefit with its own limit)
+is planted on random pages; each query asks for one of them in singular form while
+the page states it in the plural, and top1_accuracy is the share of queries whose best
+passage is the planted one. The target is p99 search under 10 ms for 500 pages.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import List, Tuple
+
+from app.services import retrieval
+from app.services.retrieval import BM25Index, split_passages
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "exclusions")
+TARGET_MS = 10.0
+
+THINGS = ["hospitalization", "ambulance", "day care", "maternity", "crop", "livestock", "pump set", "tractor",
+          "dialysis", "chemotherapy", "cataract", "organ donor", "home treatment", "ayush", "accident", "funeral"]
+PERILS = ["flood", "drought", "hailstorm", "cyclone", "pest attack", "fire", "lightning", "landslide", "theft"]
+CLAUSE = ("{n} The Company shall pay for {thing} following {peril}, subject to the sum insured, the waiting "
+          "period of {days} days and the exclusions of this Policy.")
+FACTS = ["{name} charges are reimbursed up to Rs {amount} for each claim.",
+         "{name} expenses are payable after {days} days of continuous cover.",
+         "Diseases treated under {name} are covered up to {pct}% of the sum insured."]
+FACT_QUERIES = ["what is the {name} charge limit", "when is {name} expense payable", "is a {name} disease covered"]
+NAMES = ["nebulizer", "physiotherapy", "prosthesis", "bariatric", "lasik", "hearing aid", "stent", "pacemaker",
+         "vaccination", "cochlear", "knee brace", "wheelchair", "insulin pump", "oxygen concentrator"]
+
+
+def synthetic_pages(pages: int, seed: int) -> Tuple[List[str], List[Tuple[str, int]]]:
+    rng = random.Random(seed)
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            fixtures.append(f.read())
+    out = []
+    for p in range(pages):
+        paras, size = [], 0
+        i = 0
+        while size < 3000:
+            i += 1
+            para = CLAUSE.format(n=f"{p + 1}.{i}", thing=rng.choice(THINGS), peril=rng.choice(PERILS),
+                                 days=rng.choice([15, 30, 90, 365]))
+            paras.append(para)
+            size += len(para)
+        if p % 25 == 0:
+            paras.append(fixtures[p // 25 % len(fixtures)])
+        out.append("\n\n".join(paras))
+    # one planted fact per (name, template); queries are answered by exactly that page
+    planted = []
+    for name in NAMES:
+        for t, fact in enumerate(FACTS):
+            page = rng.randrange(pages)
+            out[page] += "\n\n" + fact.format(name=name.capitalize(), amount=rng.randrange(1, 50) * 1000,
+                                              days=rng.choice([30, 60, 90]), pct=rng.choice([10, 25, 50]))
+            planted.append((FACT_QUERIES[t].format(name=name), page + 1))
+    return out, planted
+
+
+def quantiles(samples: List[float]) -> dict:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]  # noqa: E731
+    return {"p50_ms": round(statistics.median(ordered), 3), "p95_ms": round(pick(0.95), 3),
+            "p99_ms": round(pick(0.99), 3), "max_ms": round(ordered[-1], 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=retrieval.RETRIEVAL_TOP_K)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    pages, planted = synthetic_pages(args.pages, args.seed)
+
+    started = time.perf_counter()
+    passages = split_passages(pages)
+    index = BM25Index.build(passages)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    correct = 0
+    for query, page in planted:
+        hits = index.search(query, 1)
+        correct += bool(hits) and hits[0]["page"] == page
+
+    rng = random.Random(args.seed)
+    queries = [rng.choice(planted)[0] for _ in range(args.queries)]
+    warm = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, args.k)
+        warm.append((time.perf_counter() - started) * 1000)
+
+    # first query after a restart: load the saved index from disk, then search
+    with tempfile.TemporaryDirectory() as tmp:
+        prefix = os.path.join(tmp, "policy")
+        index.save(prefix)
+        size = os.path.getsize(prefix + ".npz") + os.path.getsize(prefix + ".json")
+        cold = []
+        for query in queries[:50]:
+            started = time.perf_counter()
+            BM25Index.load(prefix).search(query, args.k)
+            cold.append((time.perf_counter() - started) * 1000)
+
+    print(json.dumps({
+        "pages": args.pages,
+        "passages": len(passages),
+        "vocab": len(index.vocab),
+        "postings": int(index.docs.size),
+        "index_bytes": size,
+        "build_ms": round(build_ms, 1),
+        "top1_accuracy": round(correct / len(planted), 3),
+        "search": {"queries": len(warm), **quantiles(warm)},
+        "load_and_search": {"queries": len(cold), **quantiles(cold)},
+        "target_ms": TARGET_MS,
+        "meets_target": quantiles(warm)["p99_ms"] < TARGET_MS,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Single raw upload (the previous STT path) vs local compaction + silence-split parallel
+transcription, against benchmarks.fake_groq with a simulated shared uplink.
+
+    cd backend
+    python -m benchmarks.bench_stt --seconds 10 60 240 --upload-kbps 2000
+
+Recordings are synthetic 44.1 kHz stereo WAV voice notes (speech bursts with pauses,
+background noise). For each one: bytes uploaded, end-to-end latency, segment count and
+local preparation time. The fake server charges upload time on a link shared by all
+concurrent requests, plus a fixed cost and a per-audio-second cost per transcription.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+import wave
+
+import numpy as np
+
+from benchmarks.fake_groq import FakeGroq, add_arguments, config_from_args
+
+
+def make_voice_note(seconds: float, rate: int = 44100, channels: int = 2, seed: int = 3) -> bytes:
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate)
+    t = np.arange(n) / rate
+    signal = np.zeros(n, dtype=np.float32)
+    pos = 0
+    while pos < n:
+        talk = int(rng.uniform(1.5, 6.0) * rate)
+        pause = int(rng.uniform(0.3, 3.0) * rate)
+        seg = slice(pos, min(n, pos + talk))
+        f0 = rng.uniform(110, 240)
+        # voiced harmonics with a syllable-rate envelope
+        env = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(3, 6) * t[seg])
+        signal[seg] = 0.25 * env * (np.sin(2 * np.pi * f0 * t[seg]) + 0.4 * np.sin(4 * np.pi * f0 * t[seg]))
+        pos += talk + pause
+    signal += rng.normal(0, 0.004, n).astype(np.float32)
+    frames = np.repeat(signal[:, None], channels, axis=1)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes((np.clip(frames, -1, 1) * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+async def timed(coro, timeout: float):
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(coro, timeout)
+    except Exception as e:
+        result = f"{type(e).__name__}"
+    return result, round(time.perf_counter() - started, 2)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[10, 60, 240])
+    parser.add_argument("--timeout", type=float, default=60, help="old path's request timeout (s)")
+    add_arguments(parser)
+    parser.set_defaults(upload_kbps=2000, stt_latency=0.4, jitter=0.0)
+    args = parser.parse_args()
+
+    fake = FakeGroq(config_from_args(args))
+    base = await fake.start()
+    os.environ["GROQ_API_BASE"] = base
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    from app.services import http_client, stt
+    from app.services.audio import prepare_audio
+
+    await http_client.init_http_client()
+    results = []
+    try:
+        for seconds in args.seconds:
+            raw = make_voice_note(seconds)
+            _, old_s = await timed(stt._call_groq_stt(raw, "hi", timeout=args.timeout), args.timeout)
+
+            started = time.perf_counter()
+            prepared = prepare_audio(raw)
+            prep_s = time.perf_counter() - started
+            text, new_s = await timed(stt.transcribe_audio(raw, "hi"), 10 * args.timeout)
+            results.append({
+                "audio_s": seconds,
+                "original_bytes": len(raw),
+                "sent_bytes": prepared.sent_bytes,
+                "bytes_saved_pct": round(100 * (1 - prepared.sent_bytes / len(raw)), 1),
+                "speech_s": round(prepared.speech_s, 1),
+                "segments": len(prepared.segments),
+                "prepare_s": round(prep_s, 3),
+                "old_latency_s": old_s if old_s < args.timeout else f"timeout after {args.timeout:g}s",
+                "new_latency_s": new_s,
+                "new_ok": not text.startswith("Transcription error"),
+            })
+    finally:
+        await http_client.close_http_client()
+        await fake.stop()
+    print(json.dumps({"upload_kbps": args.upload_kbps, "concurrency": stt.STT_CONCURRENCY,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+"""
+Cost of tracing: per traced call, and per request through TracingMiddleware.
+
+    cd backend
+    python -m benchmarks.bench_tracing --calls 200000 --requests 20000
+
+Per call: a trivial sync and async function, undecorated vs @traced with tracing
+disabled (TRACING_ENABLED=0: the decorator returns the function itself), enabled
+outside any request, inside an unsampled request and inside a sampled one. Per
+request: a stand-in ASGI app making --spans traced calls (a few to_thread hops
+included) driven directly through the middleware, with no middleware vs sample rates
+0, 0.01 and 1. The export file goes to a temporary directory.
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+from app.services import tracing
+
+
+def _decorate(fn, enabled: bool):
+    saved = tracing.TRACING_ENABLED
+    tracing.TRACING_ENABLED = enabled
+    try:
+        return tracing.traced("bench.fn")(fn)
+    finally:
+        tracing.TRACING_ENABLED = saved
+
+
+def _work(x: int) -> int:
+    return x + 1
+
+
+async def _awork(x: int) -> int:
+    return x + 1
+
+
+def _per_call_ns(fn, calls: int) -> float:
+    started = time.perf_counter_ns()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter_ns() - started) / calls
+
+
+async def _per_acall_ns(fn, calls: int) -> float:
+    started = time.perf_counter_ns()
+    for i in range(calls):
+        await fn(i)
+    return (time.perf_counter_ns() - started) / calls
+
+
+async def per_call(calls: int) -> dict:
+    results = {}
+    variants = {
+        "plain": (_work, _awork),
+        "disabled": (_decorate(_work, False), _decorate(_awork, False)),
+        "no_trace": (_decorate(_work, True), _decorate(_awork, True)),
+    }
+    for label, (fn, afn) in variants.items():
+        results[label] = {"sync_ns": round(_per_call_ns(fn, calls), 1),
+                          "async_ns": round(await _per_acall_ns(afn, calls), 1)}
+    fn, afn = variants["no_trace"]
+    for label, sampled in (("unsampled", False), ("sampled", True)):
+        token = tracing._trace.set(tracing.Trace(tracing.new_trace_id(), "bench", sampled))
+        try:
+            # sampled traces stop keeping spans past TRACE_MAX_SPANS; still the full span cost
+            results[label] = {"sync_ns": round(_per_call_ns(fn, calls), 1),
+                              "async_ns": round(await _per_acall_ns(afn, calls), 1)}
+        finally:
+            tracing._trace.reset(token)
+    return results
+
+
+def make_app(spans: int):
+    step = tracing.traced("bench.step")(_awork)
+    blocking = tracing.traced("bench.blocking")(_work)
+
+    async def app(scope, receive, send):
+        await receive()
+        for i in range(spans):
+            if i % 4 == 0:
+                await asyncio.to_thread(blocking, i)
+            else:
+                await step(i)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    scope = {"type": "http", "method": "POST", "path": "/chat", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def per_request(args) -> dict:
+    base = make_app(args.spans)
+    results = {"no_middleware_us": round(await drive(base, args.requests), 1)}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rate in (0.0, 0.01, 1.0):
+            tracer = tracing.Tracer(sample_rate=rate, path=f"{tmp}/trace.json")
+            app = tracing.TracingMiddleware(base, tracer)
+            us = await drive(app, args.requests)
+            started = time.perf_counter()
+            tracer.write(tracer.drain())
+            results[f"rate_{rate:g}"] = {"request_us": round(us, 1),
+                                         "export_us_per_request": round((time.perf_counter() - started)
+                                                                        / args.requests * 1e6, 1),
+                                         "sampled": tracer.stats["sampled"]}
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--spans", type=int, default=12, help="traced calls per request")
+    args = parser.parse_args()
+    print(json.dumps({"per_call": await per_call(args.calls), "spans_per_request": args.spans,
+                      "per_request": await per_request(args)}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
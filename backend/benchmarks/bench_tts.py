@@ -0,0 +1,106 @@
+"""
+TTS latency against text length: one engine call per text, its chunks run one after
+another (what gTTS does internally for anything over 100 characters), vs the
+sentence-parallel path in tts.synthesize_audio().
+
+    cd backend
+    python -m benchmarks.bench_tts --lengths 100 300 1000 3000 --repeats 3
+
+The default engine is the stub, timed like a remote engine: --latency seconds per
+call plus --per-char seconds per character (a rough stand-in for one gTTS round trip;
+no network needed). --engine gtts or espeak measures the real thing. Texts are the
+claim-guide steps from the catalog, one sentence each, repeated to length and cut at
+the last full sentence. Every output is checked to be a clean MP3 stream: audio
+frames only, at one sample rate, and the same duration from both paths.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+from app.services import tts, tts_engines
+from app.services.catalogs import claim_guides
+
+
+def _sentences(lang: str) -> str:
+    with open(claim_guides.path, encoding="utf-8") as f:
+        guides = json.load(f)["languages"][lang]
+    end = "।" if lang == "hi" else "."
+    return " ".join(f"{step}{end}" for guide in guides.values() for step in guide["steps"])
+
+
+def text_of(sample: str, length: int) -> str:
+    text = sample
+    while len(text) < length:
+        text += " " + sample
+    # cut back to the last whole sentence at or under length
+    cut = text[:length + 1]
+    return cut[:max(cut.rfind(". "), cut.rfind("। ")) + 1] or cut[:length]
+
+
+def serial(engine: tts_engines.TTSEngine, text: str, lang: str) -> bytes:
+    return tts_engines.concat_mp3([engine.run(chunk, lang) for chunk in tts_engines.split_text(text, engine.chunk_chars)])
+
+
+def check(data: bytes) -> float:
+    frames = list(tts_engines.mp3_frames(data))
+    assert sum(len(f) for f, _ in frames) == len(data), "non-frame bytes in output"
+    assert len({rate for _, rate in frames}) == 1, "mixed sample rates"
+    return tts_engines.mp3_duration(data)
+
+
+async def measure(engine, lengths: List[int], repeats: int, lang: str) -> List[dict]:
+    tts.engine = engine
+    sample = _sentences(lang)
+    rows = []
+    for length in lengths:
+        text = text_of(sample, length)
+        chunks = len(tts_engines.split_text(text, engine.chunk_chars))
+        serial_s, parallel_s = [], []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            before = await asyncio.get_running_loop().run_in_executor(engine.pool(), serial, engine, text, lang)
+            serial_s.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            after = await tts.synthesize_audio(text, lang)
+            parallel_s.append(time.perf_counter() - started)
+        duration = check(after)
+        assert abs(duration - check(before)) < 1e-6
+        serial_med, parallel_med = statistics.median(serial_s), statistics.median(parallel_s)
+        rows.append({"chars": len(text), "chunks": chunks, "audio_s": round(duration, 1),
+                     "serial_s": round(serial_med, 3), "parallel_s": round(parallel_med, 3),
+                     "speedup": round(serial_med / parallel_med, 2)})
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=sorted(tts_engines.ENGINES), default="stub")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 300, 1000, 3000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--lang", choices=["en", "hi"], default="en")
+    parser.add_argument("--latency", type=float, default=0.25, help="stub: seconds per call")
+    parser.add_argument("--per-char", type=float, default=0.002, help="stub: seconds per character")
+    parser.add_argument("--concurrency", type=int, default=None, help="worker pool size (default: engine setting)")
+    args = parser.parse_args()
+    options = {"concurrency": args.concurrency}
+    if args.engine == "stub":
+        engine = tts_engines.StubEngine(latency=args.latency, latency_per_char=args.per_char, **options)
+    else:
+        engine = tts_engines.ENGINES[args.engine](**options)
+
+    started = time.perf_counter()
+    engine.prewarm()
+    prewarm_ms = (time.perf_counter() - started) * 1000
+    try:
+        rows = await measure(engine, args.lengths, args.repeats, args.lang)
+    finally:
+        engine.shutdown()
+    print(json.dumps({"engine": engine.name, "concurrency": engine.concurrency, "chunk_chars": engine.chunk_chars,
+                      "prewarm_ms": round(prewarm_ms, 1), "results": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,326 @@
+"""
+Local stand-in for the Groq OpenAI-compatible API, for load tests and benchmarks.
+
+Serves POST /chat/completions (JSON, or SSE when the request has "stream": true) and
+POST /audio/transcriptions over plain HTTP/1.1 keep-alive. Latency, per-token delay and
+error rates are configurable; point the backend at it with GROQ_API_BASE.
+
+Faults for resilience testing: a slow tail (--tail-rate/--tail-latency), requests that
+hang until the client gives up (--hang-rate), and periodic outages during which every
+request to the primary models gets 429 or 503 (--outage-every/--outage-duration).
+Smaller models (names containing 8b, instant or turbo) answer --fast-model-factor
+times faster and are not affected by outages, like a separate capacity pool.
+
+    cd backend
+    python -m benchmarks.fake_groq --port 8900 --latency 0.4 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+# Model names served from the "small model" pool (faster, separate capacity)
+_FAST_MODEL = re.compile(r"8b|instant|turbo")
+_FORM_MODEL = re.compile(rb'name="model"\r\n\r\n([^\r]*)')
+# JSON-mode prompts from services/recommend_enhancer.py list their profiles on one line
+_PROFILES = re.compile(r"^Profiles: (.*)$", re.MULTILINE)
+
+WORDS = (
+    "your policy covers crop loss from drought flood and pest attack within the policy period "
+    "claims must be reported within seventy two hours with photos of the damaged field and your "
+    "aadhaar card the insurer will arrange a survey and settle the claim as per the terms"
+).split()
+
+
+@dataclass
+class FakeGroqConfig:
+    latency: float = 0.3          # seconds before the first byte
+    jitter: float = 0.2           # +/- fraction of latency, uniform
+    token_delay: float = 0.01     # seconds between streamed tokens
+    tokens: int = 60              # completion length in words
+    stt_latency: float = 0.5      # fixed cost per transcription
+    stt_rtf: float = 0.05         # plus this many seconds per second of audio
+    upload_kbps: float = 0.0      # shared client uplink for request bodies; 0 = unlimited
+    error_rate: float = 0.0       # fraction of requests answered with HTTP 500
+    rate_limit_rate: float = 0.0  # fraction answered with HTTP 429 + Retry-After
+    retry_after: float = 1.0
+    tail_rate: float = 0.0        # fraction of requests delayed by tail_latency on top
+    tail_latency: float = 5.0
+    hang_rate: float = 0.0        # fraction of requests that never answer
+    outage_every: float = 0.0     # seconds between outages of the primary models; 0 = none
+    outage_duration: float = 0.0
+    outage_status: int = 429      # 429 (rate-limit storm) or 503
+    fast_model_factor: float = 0.3
+    seed: Optional[int] = None
+
+
+@dataclass
+class FakeGroqStats:
+    requests: Dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+    rate_limited: int = 0
+    tail: int = 0
+    hung: int = 0
+    models: Dict[str, int] = field(default_factory=dict)
+    connections: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+
+class FakeGroq:
+    """asyncio HTTP server; start() returns the base URL to use as GROQ_API_BASE."""
+
+    def __init__(self, config: Optional[FakeGroqConfig] = None):
+        self.config = config or FakeGroqConfig()
+        self.stats = FakeGroqStats()
+        self._rng = random.Random(self.config.seed)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._link_free_at = 0.0
+        self._started = time.monotonic()
+        self.port = 0
+
+    def _delay(self, base: float, model: str = "") -> float:
+        jitter = self.config.jitter
+        if _FAST_MODEL.search(model):
+            base *= self.config.fast_model_factor
+        delay = max(0.0, base * (1 + self._rng.uniform(-jitter, jitter)))
+        if self.config.tail_rate and self._rng.random() < self.config.tail_rate:
+            self.stats.tail += 1
+            delay += self.config.tail_latency
+        return delay
+
+    def _in_outage(self, model: str) -> bool:
+        if not self.config.outage_every or _FAST_MODEL.search(model):
+            return False
+        return (time.monotonic() - self._started) % self.config.outage_every < self.config.outage_duration
+
+    @staticmethod
+    def _model(path: str, body: bytes) -> str:
+        if path.endswith("/chat/completions"):
+            try:
+                return str(json.loads(body or b"{}").get("model", ""))
+            except ValueError:
+                return ""
+        match = _FORM_MODEL.search(body[:4096])
+        return match.group(1).decode() if match else ""
+
+    def _completion_text(self) -> str:
+        n = max(1, int(self.config.tokens * self._rng.uniform(0.5, 1.5)))
+        words = [self._rng.choice(WORDS) for _ in range(n)]
+        # sentence breaks so streaming TTS has something to split on
+        return " ".join(w + ("." if i % 12 == 11 else "") for i, w in enumerate(words)).capitalize() + "."
+
+    def _json_completion(self, payload: dict) -> str:
+        """JSON mode: a well-formed recommendation-enhancement answer, or {} for other prompts."""
+        match = _PROFILES.search(str(payload.get("messages", [{}])[-1].get("content", "")))
+        if not match:
+            return "{}"
+        return json.dumps({"profiles": [
+            {"id": profile["id"], "improved_plans": [
+                {"name": plan["name"], "refined_explanation": self._completion_text()[:160],
+                 "trust_score": round(self._rng.uniform(0.5, 0.95), 2), "trust_reason": "matches the household",
+                 "hindi_explanation": "यह योजना आपके परिवार के लिए उपयोगी है।"}
+                for plan in profile["plans"]]}
+            for profile in json.loads(match.group(1))
+        ]}, ensure_ascii=False)
+
+    @staticmethod
+    def _response(status: str, body: bytes, content_type: str = "application/json", extra: str = "") -> bytes:
+        return (
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n{extra}\r\n"
+        ).encode() + body
+
+    async def _completion(self, writer: asyncio.StreamWriter, payload: dict) -> None:
+        json_mode = (payload.get("response_format") or {}).get("type") == "json_object"
+        text = self._json_completion(payload) if json_mode else self._completion_text()
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in payload.get("messages", [])) // 4 + 1
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4 + 1}
+        await asyncio.sleep(self._delay(self.config.latency, str(payload.get("model", ""))))
+        if not payload.get("stream"):
+            body = json.dumps({
+                "id": "fake", "object": "chat.completion", "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            }).encode()
+            writer.write(self._response("200 OK", body))
+            await writer.drain()
+            return
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        for i, word in enumerate(text.split(" ")):
+            delta = word if i == 0 else " " + word
+            event = "data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": delta}}]}) + "\n\n"
+            self._write_chunk(writer, event.encode())
+            await writer.drain()
+            if self.config.token_delay:
+                await asyncio.sleep(self.config.token_delay)
+        self._write_chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def _upload_delay(self, size: int) -> float:
+        """Time to push `size` bytes through the shared uplink (bodies queue behind each other)."""
+        if not self.config.upload_kbps:
+            return 0.0
+        now = time.monotonic()
+        self._link_free_at = max(now, self._link_free_at) + size * 8 / (self.config.upload_kbps * 1000)
+        return self._link_free_at - now
+
+    @staticmethod
+    def _audio_seconds(body: bytes) -> float:
+        """Duration of the WAV inside a multipart body; assumes 16 kHz mono 16-bit otherwise."""
+        riff = body.find(b"RIFF")
+        if riff >= 0 and body[riff + 8:riff + 12] == b"WAVE":
+            byte_rate = struct.unpack_from("<I", body, riff + 28)[0]
+            data = body.find(b"data", riff + 12)
+            if byte_rate and data >= 0:
+                return struct.unpack_from("<I", body, data + 4)[0] / byte_rate
+        return len(body) / 32000
+
+    async def _transcription(self, writer: asyncio.StreamWriter, body: bytes, model: str = "") -> None:
+        # upload time on the shared link, then processing proportional to audio length
+        rtf = self.config.stt_rtf * (self.config.fast_model_factor if _FAST_MODEL.search(model) else 1)
+        processing = self._delay(self.config.stt_latency, model) + rtf * self._audio_seconds(body)
+        await asyncio.sleep(self._upload_delay(len(body)) + processing)
+        body = json.dumps({"text": "mera fasal kharab ho gaya claim kaise karein"}).encode()
+        writer.write(self._response("200 OK", body))
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                path = request_line.split(" ")[1] if " " in request_line else "/"
+                length = 0
+                for line in header_lines:
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                body = await reader.readexactly(length) if length else b""
+                self.stats.requests[path] = self.stats.requests.get(path, 0) + 1
+                model = self._model(path, body)
+                self.stats.models[model] = self.stats.models.get(model, 0) + 1
+                self.stats.in_flight += 1
+                self.stats.peak_in_flight = max(self.stats.peak_in_flight, self.stats.in_flight)
+                try:
+                    roll = self._rng.random()
+                    if self._in_outage(model):
+                        outage_429 = self.config.outage_status == 429
+                        self.stats.rate_limited += outage_429
+                        self.stats.errors += not outage_429
+                        writer.write(self._response(
+                            "429 Too Many Requests" if outage_429 else "503 Service Unavailable",
+                            b'{"error": {"message": "outage"}}',
+                            extra=f"Retry-After: {self.config.retry_after:g}\r\n",
+                        ))
+                    elif self.config.hang_rate and self._rng.random() < self.config.hang_rate:
+                        # never answer; the client's timeout (or hedge) has to deal with it
+                        self.stats.hung += 1
+                        await reader.read()
+                        return
+                    elif roll < self.config.rate_limit_rate:
+                        self.stats.rate_limited += 1
+                        writer.write(self._response(
+                            "429 Too Many Requests", b'{"error": {"message": "rate limited"}}',
+                            extra=f"Retry-After: {self.config.retry_after:g}\r\n",
+                        ))
+                    elif roll < self.config.rate_limit_rate + self.config.error_rate:
+                        self.stats.errors += 1
+                        await asyncio.sleep(self._delay(self.config.latency) / 4)
+                        writer.write(self._response("500 Internal Server Error", b'{"error": {"message": "fake"}}'))
+                    elif path.endswith("/chat/completions"):
+                        await self._completion(writer, json.loads(body or b"{}"))
+                    elif path.endswith("/audio/transcriptions"):
+                        await self._transcription(writer, body, model)
+                    else:
+                        writer.write(self._response("404 Not Found", b'{"error": {"message": "not found"}}'))
+                    await writer.drain()
+                finally:
+                    self.stats.in_flight -= 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._server = await asyncio.start_server(self._handle, host, port, limit=1 << 20)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{self.port}"
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Shared CLI flags for FakeGroqConfig (also used by benchmarks.loadtest)."""
+    defaults = FakeGroqConfig()
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="LLM time to first byte (s)")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter)
+    parser.add_argument("--token-delay", type=float, default=defaults.token_delay)
+    parser.add_argument("--tokens", type=int, default=defaults.tokens)
+    parser.add_argument("--stt-latency", type=float, default=defaults.stt_latency)
+    parser.add_argument("--stt-rtf", type=float, default=defaults.stt_rtf,
+                        help="transcription seconds per second of audio")
+    parser.add_argument("--upload-kbps", type=float, default=defaults.upload_kbps,
+                        help="simulated shared uplink for transcription uploads (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate)
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after)
+    parser.add_argument("--tail-rate", type=float, default=defaults.tail_rate,
+                        help="fraction of requests delayed by --tail-latency")
+    parser.add_argument("--tail-latency", type=float, default=defaults.tail_latency)
+    parser.add_argument("--hang-rate", type=float, default=defaults.hang_rate,
+                        help="fraction of requests that never get an answer")
+    parser.add_argument("--outage-every", type=float, default=defaults.outage_every,
+                        help="seconds between outages of the primary models (0 = none)")
+    parser.add_argument("--outage-duration", type=float, default=defaults.outage_duration)
+    parser.add_argument("--outage-status", type=int, choices=(429, 503), default=defaults.outage_status)
+    parser.add_argument("--fast-model-factor", type=float, default=defaults.fast_model_factor,
+                        help="latency multiplier for small models (8b/instant/turbo)")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeGroqConfig:
+    return FakeGroqConfig(
+        latency=args.latency, jitter=args.jitter, token_delay=args.token_delay, tokens=args.tokens,
+        stt_latency=args.stt_latency, stt_rtf=args.stt_rtf, upload_kbps=args.upload_kbps, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after, tail_rate=args.tail_rate, tail_latency=args.tail_latency,
+        hang_rate=args.hang_rate, outage_every=args.outage_every, outage_duration=args.outage_duration,
+        outage_status=args.outage_status, fast_model_factor=args.fast_model_factor, seed=args.seed,
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = FakeGroq(config_from_args(args))
+    print(f"fake Groq listening on {await server.start(args.host, args.port)}", flush=True)
+    started = time.monotonic()
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(json.dumps({"uptime_s": round(time.monotonic() - started), **server.stats.__dict__}), flush=True)
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
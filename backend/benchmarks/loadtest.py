@@ -0,0 +1,421 @@
+"""
+Offline load test of the whole backend: the real FastAPI app, a fake Groq server and a
+stub TTS engine, driven with a mixed workload.
+
+    cd backend
+    python -m benchmarks.loadtest --concurrency 32 --duration 20 --out loadtest.json
+    python -m benchmarks.loadtest --compare loadtest.json      # later, on another commit
+
+The app runs under uvicorn in a child process (so client CPU does not pollute its event
+loop) with GROQ_API_BASE pointed at benchmarks.fake_groq and gTTS replaced by a stub
+that sleeps --tts-latency and writes a dummy MP3. Caches live in a throwaway directory.
+
+Each phase (every endpoint alone, then the weighted mix) reports per-endpoint request
+count, error count, RPS and p50/p95/p99 latency, plus the server's RSS high-water mark
+and event-loop lag over the phase. The JSON report records the git commit and all
+settings; --compare prints p95/RPS deltas against an earlier report and exits 1 when
+anything regressed by more than --threshold.
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from typing import Dict, List, Optional
+
+from benchmarks.fake_groq import FakeGroq, add_arguments, config_from_args
+
+ENDPOINTS = ("chat", "policy", "stt", "recommend", "form")
+DEFAULT_MIX = "chat=40,recommend=25,form=20,stt=10,policy=5"
+PROBE_PATH = "/__loadtest/probe"
+
+QUESTIONS = [
+    "How to file a claim?", "What does my policy cover?", "How to renew my policy?",
+    "Documents required for claim", "Is flood damage covered?", "When will I get my claim money?",
+    "फसल बीमा का दावा कैसे करें?", "PMFBY premium kitna hai?", "Can I add my mother to the health plan?",
+]
+
+
+# -- server side (child process) ---------------------------------------------
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LoopProbe:
+    """Samples event-loop lag (sleep overshoot) and RSS every `interval` seconds."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.reset()
+
+    def reset(self) -> None:
+        self.lags: List[float] = []
+        self.rss_hwm = _rss_bytes()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+            self.rss_hwm = max(self.rss_hwm, _rss_bytes())
+
+    def report(self) -> dict:
+        lags = sorted(self.lags)
+        return {
+            "rss_hwm_mb": round(self.rss_hwm / 2**20, 1),
+            "rss_mb": round(_rss_bytes() / 2**20, 1),
+            "loop_lag_ms": {
+                "samples": len(lags),
+                "p50": round(_pct(lags, 50) * 1000, 2),
+                "p99": round(_pct(lags, 99) * 1000, 2),
+                "max": round((lags[-1] if lags else 0.0) * 1000, 2),
+            },
+        }
+
+
+def _stub_tts(latency: float):
+    async def _synthesize_to(file_path: str, text: str, lang: str) -> None:
+        await asyncio.sleep(latency)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            # MPEG-1 layer III frame header followed by padding; enough for a static file server
+            f.write(b"\xff\xfb\x90\x64" + b"\x00" * 413)
+        os.replace(tmp_path, file_path)
+    return _synthesize_to
+
+
+async def serve(args) -> None:
+    import uvicorn
+    from app.services import tts
+
+    tts.AUDIO_DIR = os.path.join(args.workdir, "audio")
+    tts._synthesize_to = _stub_tts(args.tts_latency)
+
+    from fastapi.responses import JSONResponse
+    from app.main import app
+
+    probe = LoopProbe()
+
+    async def probe_endpoint(reset: bool = False):
+        report = probe.report()
+        if reset:
+            probe.reset()
+        return JSONResponse(report)
+
+    app.add_api_route(PROBE_PATH, probe_endpoint, methods=["GET"])
+    task = asyncio.create_task(probe.run())
+    config = uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning", lifespan="on")
+    try:
+        await uvicorn.Server(config).serve()
+    finally:
+        task.cancel()
+
+
+# -- client side -------------------------------------------------------------
+
+def _pct(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def make_wav(seconds: float, rate: int = 16000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        frames = bytearray()
+        for i in range(int(seconds * rate)):
+            # speech-like bursts separated by silence
+            amp = 8000 if (i // (rate // 2)) % 3 else 0
+            frames += int(amp * math.sin(2 * math.pi * 220 * i / rate)).to_bytes(2, "little", signed=True)
+        w.writeframes(bytes(frames))
+    return buf.getvalue()
+
+
+def make_pdfs(count: int, pages: int) -> List[bytes]:
+    import fitz  # PyMuPDF, as in benchmarks.bench_pdf_extract
+
+    clause = (
+        "{n}. The Company shall indemnify the Insured for loss of or damage to the crop caused by drought, "
+        "flood, pest attack and cyclone. Exclusions: losses due to war, nuclear risk and wilful negligence. "
+    )
+    docs = []
+    for d in range(count):
+        doc = fitz.open()
+        for p in range(pages):
+            page = doc.new_page()
+            text = f"Policy LT-{d:04d}\n" + "".join(clause.format(n=f"{p + 1}.{i + 1}") for i in range(10))
+            page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=9)
+        docs.append(doc.tobytes())
+        doc.close()
+    return docs
+
+
+class Workload:
+    """Builds one request per endpoint name; returns (method, path, httpx kwargs)."""
+
+    def __init__(self, args, rng: random.Random):
+        self.rng = rng
+        self.sessions = args.sessions
+        self.wav = make_wav(args.audio_seconds)
+        self.pdfs = make_pdfs(args.policy_docs, args.policy_pages) if "policy" in args.endpoints else []
+        # Zipf-ish popularity: a few questions dominate, plus a tail of one-off ones
+        self.weights = [1 / (i + 1) for i in range(len(QUESTIONS))]
+
+    def chat(self):
+        if self.rng.random() < 0.7:
+            message = self.rng.choices(QUESTIONS, self.weights)[0]
+        else:
+            message = f"My policy number is {self.rng.randint(10000, 99999)}, is my tractor covered?"
+        return "POST", "/chat", {"json": {
+            "session_id": f"lt-{self.rng.randrange(self.sessions)}",
+            "message": message,
+            "language": self.rng.choice(["en", "hi"]),
+        }}
+
+    def policy(self):
+        pdf = self.rng.choice(self.pdfs)
+        return "POST", "/policy/simplify", {"files": {"pdf": ("policy.pdf", pdf, "application/pdf")}}
+
+    def stt(self):
+        return "POST", "/stt/transcribe", {
+            "params": {"language": "hi"},
+            "files": {"file": ("speech.wav", self.wav, "audio/wav")},
+        }
+
+    def recommend(self):
+        return "POST", "/recommend", {"json": {
+            "occupation": self.rng.choice(["farmer", "teacher", "labourer", "driver"]),
+            "income": self.rng.randint(3000, 50000),
+            "family_size": self.rng.randint(1, 9),
+        }}
+
+    def form(self):
+        aadhaar = "".join(self.rng.choice("0123456789") for _ in range(self.rng.choice([12, 12, 12, 11, 13])))
+        return "POST", "/form/assist", {"json": {
+            "name": "Ramesh Kumar", "aadhaar": aadhaar, "address": "Village Rampur, Sitapur",
+            "phone": f"9{self.rng.randint(100000000, 999999999)}", "age": self.rng.randint(18, 80),
+        }}
+
+
+async def run_phase(client, workload: Workload, mix: Dict[str, float], concurrency: int, duration: float) -> dict:
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    latencies: Dict[str, List[float]] = {n: [] for n in names}
+    errors: Dict[str, int] = {n: 0 for n in names}
+    statuses: Dict[str, Dict[str, int]] = {n: {} for n in names}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            name = workload.rng.choices(names, weights)[0]
+            method, path, kwargs = getattr(workload, name)()
+            started = time.perf_counter()
+            try:
+                resp = await client.request(method, path, **kwargs)
+                await resp.aread()
+                code = str(resp.status_code)
+                ok = resp.status_code < 400
+            except Exception as e:  # timeouts, resets: count them, keep going
+                code, ok = type(e).__name__, False
+            latencies[name].append(time.perf_counter() - started)
+            statuses[name][code] = statuses[name].get(code, 0) + 1
+            if not ok:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    endpoints = {}
+    for name in names:
+        lat = sorted(latencies[name])
+        if not lat:
+            continue
+        endpoints[name] = {
+            "requests": len(lat),
+            "errors": errors[name],
+            "status": statuses[name],
+            "rps": round(len(lat) / wall, 1),
+            "p50_ms": round(_pct(lat, 50) * 1000, 1),
+            "p95_ms": round(_pct(lat, 95) * 1000, 1),
+            "p99_ms": round(_pct(lat, 99) * 1000, 1),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {"wall_s": round(wall, 2), "rps": round(total / wall, 1), "endpoints": endpoints}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"unknown endpoint {name!r} in --mix (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def wait_ready(client, proc, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.returncode is not None:
+            raise SystemExit(f"server exited with code {proc.returncode}")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("server did not start in time")
+
+
+async def drive(args) -> dict:
+    import httpx
+
+    fake = FakeGroq(config_from_args(args))
+    groq_base = await fake.start()
+    workdir = tempfile.TemporaryDirectory(prefix="loadtest-")
+    env = {
+        **os.environ,
+        "GROQ_API_BASE": groq_base,
+        "GROQ_API_KEY": "loadtest",
+        "SESSION_BACKEND": args.session_backend,
+        "SESSION_DB_PATH": os.path.join(workdir.name, "sessions.sqlite3"),
+        "POLICY_CACHE_PATH": os.path.join(workdir.name, "policy_results.sqlite3"),
+        "POLICY_INDEX_DIR": os.path.join(workdir.name, "index"),
+        "ANALYTICS_SNAPSHOT_PATH": os.path.join(workdir.name, "analytics.json"),
+        "JOBS_DB_PATH": os.path.join(workdir.name, "policy_jobs.sqlite3"),
+        "JOBS_SPOOL_DIR": os.path.join(workdir.name, "jobs"),
+    }
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "benchmarks.loadtest", "--serve", "--port", str(args.port),
+        "--workdir", workdir.name, "--tts-latency", str(args.tts_latency), env=env,
+    )
+    mix = parse_mix(args.mix)
+    args.endpoints = list(mix)
+    workload = Workload(args, random.Random(args.seed))
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    report = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "settings": {k: v for k, v in vars(args).items() if k not in ("compare", "out", "serve", "workdir")},
+        "phases": {},
+    }
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits,
+                                     timeout=args.timeout) as client:
+            await wait_ready(client, proc)
+            phases = [(name, {name: 1.0}) for name in mix] if args.isolated else []
+            phases.append(("mixed", mix))
+            for phase, phase_mix in phases:
+                await client.get(PROBE_PATH, params={"reset": "true"})
+                upstream_before = dict(fake.stats.requests)
+                result = await run_phase(client, workload, phase_mix, args.concurrency, args.duration)
+                result["server"] = (await client.get(PROBE_PATH)).json()
+                result["upstream_requests"] = {
+                    path: count - upstream_before.get(path, 0) for path, count in fake.stats.requests.items()
+                }
+                report["phases"][phase] = result
+                print(f"{phase}: {result['rps']} req/s, server RSS high-water "
+                      f"{result['server']['rss_hwm_mb']} MB, loop lag p99 "
+                      f"{result['server']['loop_lag_ms']['p99']} ms", file=sys.stderr)
+    finally:
+        if proc.returncode is None:
+            proc.terminate()
+            await proc.wait()
+        await fake.stop()
+        workdir.cleanup()
+    return report
+
+
+def compare(old: dict, new: dict, threshold: float) -> List[str]:
+    """Human-readable p95/RPS deltas; lines starting with 'REGRESSION' exceed the threshold."""
+    lines = [f"baseline {old.get('commit')} -> {new.get('commit')}"]
+    for phase, result in new["phases"].items():
+        before = old.get("phases", {}).get(phase)
+        if not before:
+            continue
+        for name, cur in result["endpoints"].items():
+            prev = before["endpoints"].get(name)
+            if not prev:
+                continue
+            p95 = (cur["p95_ms"] - prev["p95_ms"]) / max(prev["p95_ms"], 1e-9)
+            rps = (cur["rps"] - prev["rps"]) / max(prev["rps"], 1e-9)
+            flag = "REGRESSION" if p95 > threshold or rps < -threshold else "ok"
+            lines.append(f"{flag:10} {phase}/{name}: p95 {prev['p95_ms']} -> {cur['p95_ms']} ms ({p95:+.0%}), "
+                         f"rps {prev['rps']} -> {cur['rps']} ({rps:+.0%})")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per phase")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,...; endpoints: " + ", ".join(ENDPOINTS))
+    parser.add_argument("--no-isolated", dest="isolated", action="store_false",
+                        help="only run the mixed phase")
+    parser.add_argument("--sessions", type=int, default=500, help="distinct chat session ids")
+    parser.add_argument("--session-backend", default="memory", choices=["memory", "sqlite"])
+    parser.add_argument("--policy-docs", type=int, default=8, help="distinct PDFs to upload (repeats hit the cache)")
+    parser.add_argument("--policy-pages", type=int, default=20)
+    parser.add_argument("--audio-seconds", type=float, default=8)
+    parser.add_argument("--tts-latency", type=float, default=0.4, help="stub TTS time per synthesis (s)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    add_arguments(parser)
+    parser.set_defaults(latency=0.4, seed=1)
+    # child-process mode
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(serve(args))
+        return
+
+    report = asyncio.run(drive(args))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            lines = compare(json.load(f), report, args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        if any(line.startswith("REGRESSION") for line in lines):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
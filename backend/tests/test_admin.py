@@ -0,0 +1,61 @@
+import os
+
+os.environ.setdefault("SESSION_BACKEND", "memory")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.routes import admin  # noqa: E402
+from app.services.faq_cache import faq_cache  # noqa: E402
+
+ENTRY = {"question": "When is the crop insurance claim paid?", "answer": "Within 2 months.", "language": "en"}
+MUTATIONS = [
+    ("post", "/admin/faq", {"json": ENTRY}),
+    ("post", "/admin/faq/1/pin", {}),
+    ("delete", "/admin/faq/1", {}),
+    ("delete", "/admin/faq", {}),
+    ("post", "/admin/tracing?sample_rate=1", {}),
+    ("get", "/admin/profile?seconds=1", {}),
+    ("post", "/admin/catalogs/reload", {}),
+]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(faq_cache, "pinned_path", str(tmp_path / "faq_pinned.json"))
+    faq_cache.clear(include_pinned=True)
+    with TestClient(app) as client:
+        yield client
+    faq_cache.clear(include_pinned=True)
+
+
+@pytest.mark.parametrize("method, path, kwargs", MUTATIONS)
+def test_admin_writes_fail_closed_without_a_configured_token(client, monkeypatch, method, path, kwargs):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "")
+    response = getattr(client, method)(path, headers={"X-Admin-Token": ""}, **kwargs)
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("method, path, kwargs", MUTATIONS)
+def test_admin_writes_need_the_token(client, monkeypatch, method, path, kwargs):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "s3cret")
+    assert getattr(client, method)(path, **kwargs).status_code == 403
+    assert getattr(client, method)(path, headers={"X-Admin-Token": "wrong"}, **kwargs).status_code == 403
+
+
+def test_admin_can_pin_an_answer(client, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "s3cret")
+    response = client.post("/admin/faq", json=ENTRY, headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert faq_cache.lookup(ENTRY["question"], "en")["answer"] == ENTRY["answer"]
+    # reads stay open
+    assert client.get("/admin/faq").status_code == 200
+
+
+def test_admin_can_change_the_trace_sample_rate(client, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(admin.tracer, "sample_rate", admin.tracer.sample_rate)
+    response = client.post("/admin/tracing?sample_rate=0.5", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert admin.tracer.sample_rate == 0.5
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import (
+    ADMISSION_CLASSES, ADMISSION_SLOTS, AdmissionClass, AdmissionController, AdmissionRejected,
+)
+
+
+def _classes(limit: int = 4, queue_size: int = 4, max_wait: float = 1.0):
+    return {
+        "interactive": AdmissionClass("interactive", 0, limit, queue_size, max_wait, 1024),
+        "bulk": AdmissionClass("bulk", 2, limit, queue_size, max_wait, 1024),
+    }
+
+
+def test_default_slots_are_contended():
+    assert ADMISSION_SLOTS < sum(cls.limit for cls in ADMISSION_CLASSES.values())
+
+
+def test_freed_slot_goes_to_the_higher_priority_waiter():
+    async def scenario():
+        controller = AdmissionController(_classes(), slots=2, reserved=0)
+        await controller.acquire("bulk")
+        await controller.acquire("bulk")
+        order = []
+
+        async def wait(name):
+            await controller.acquire(name)
+            order.append(name)
+
+        # the bulk request queued first, chat second
+        bulk = asyncio.create_task(wait("bulk"))
+        await asyncio.sleep(0)
+        chat = asyncio.create_task(wait("interactive"))
+        await asyncio.sleep(0)
+        controller.release("bulk")
+        await asyncio.sleep(0.01)
+        assert order == ["interactive"]
+        controller.release("bulk")
+        await asyncio.gather(bulk, chat)
+        return order
+
+    assert asyncio.run(scenario()) == ["interactive", "bulk"]
+
+
+def test_reserved_slots_are_kept_for_interactive_requests():
+    async def scenario():
+        controller = AdmissionController(_classes(max_wait=0.05), slots=3, reserved=1)
+        await controller.acquire("bulk")
+        await controller.acquire("bulk")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("bulk")
+        assert rejected.value.status_code == 503
+        assert await controller.acquire("interactive") == 0.0
+        return controller.info()
+
+    info = asyncio.run(scenario())
+    assert info["in_use"] == 3
+    assert info["classes"]["bulk"]["rejected"]["timeout"] == 1
+
+
+def test_full_queue_is_shed_at_once():
+    async def scenario():
+        controller = AdmissionController(_classes(limit=1, queue_size=1), slots=4, reserved=0)
+        await controller.acquire("bulk")
+        queued = asyncio.create_task(controller.acquire("bulk"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("bulk")
+        assert rejected.value.retry_after >= 1
+        controller.release("bulk")
+        await queued
+
+    asyncio.run(scenario())
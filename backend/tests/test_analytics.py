@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from app.services import analytics as analytics_module
+from app.services.analytics import Analytics, SpaceSaving, normalize_query, run_analytics
+
+
+def test_report_counts_events_labels_and_top_queries(tmp_path):
+    analytics = Analytics(snapshot_path=str(tmp_path / "analytics.json"))
+    for query in ["What is PMFBY?", "what is pmfby", "Claim status?"]:
+        analytics.record("chat", query=query)
+    analytics.record("recommend", "PM-KISAN", "PMFBY")
+    report = analytics.report()
+    assert report["total_chats"] == 3
+    assert report["top_queries"][0] == "what is pmfby"
+    assert report["recommendation_counts"] == {"PM-KISAN": 1, "PMFBY": 1}
+    assert report["last_hour"]["events"]["chat"] == 3
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "analytics.json")
+    analytics = Analytics(snapshot_path=path)
+    analytics.record("chat", query="when is the claim paid")
+    analytics.write_snapshot(analytics.snapshot_data())
+    restored = Analytics(snapshot_path=path)
+    assert restored.load()
+    assert restored.count("chat") == 1
+    assert restored.top_queries(k=1)[0]["query"] == "when is the claim paid"
+
+
+def test_space_saving_snapshot_is_a_copy():
+    summary = SpaceSaving(capacity=2)
+    summary.add("a")
+    data = summary.to_dict()
+    summary.add("b")
+    summary.add("c")
+    assert data == {"counts": {"a": 1}, "errors": {"a": 0}}
+    json.dumps(data)
+
+
+def test_normalize_query_keeps_devanagari_signs():
+    assert normalize_query("  फसल   बीमा?? ") == "फसल बीमा"
+
+
+def test_background_task_survives_a_failed_drain(tmp_path, monkeypatch):
+    analytics = Analytics(snapshot_path=str(tmp_path / "analytics.json"))
+    monkeypatch.setattr(analytics_module, "analytics", analytics)
+    real_drain = analytics.drain
+    calls = []
+
+    def flaky_drain():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("dictionary changed size during iteration")
+        return real_drain()
+
+    monkeypatch.setattr(analytics, "drain", flaky_drain)
+
+    async def scenario():
+        task = asyncio.create_task(run_analytics(drain_interval=0.01, snapshot_interval=0.02))
+        analytics.record("chat", query="claim")
+        await asyncio.sleep(0.1)
+        assert not task.done()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert len(calls) > 2
+    assert analytics.count("chat") == 1
+    with open(tmp_path / "analytics.json", encoding="utf-8") as f:
+        assert json.load(f)["counters"]["chat"]["total"] == 1
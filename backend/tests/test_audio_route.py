@@ -0,0 +1,43 @@
+import os
+
+os.environ.setdefault("SESSION_BACKEND", "memory")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.services import tts  # noqa: E402
+from app.services.tts_engines import TTSEngineError  # noqa: E402
+
+
+def _get(monkeypatch, tmp_path, synthesize):
+    monkeypatch.setattr(tts, "AUDIO_DIR", str(tmp_path))
+    monkeypatch.setattr(tts, "synthesize_audio", synthesize)
+    key = tts.audio_key("Your claim is approved.", "en")
+    tts._write_request(key, "Your claim is approved.", "en")
+    with TestClient(app) as client:
+        return client.get(tts.audio_url_for_key(key))
+
+
+def test_failed_synthesis_is_a_retryable_503(monkeypatch, tmp_path):
+    async def fail(text, lang):
+        raise TTSEngineError("engine down")
+
+    response = _get(monkeypatch, tmp_path, fail)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+
+def test_missing_audio_is_synthesized_on_first_get(monkeypatch, tmp_path):
+    async def ok(text, lang):
+        return b"ID3mp3"
+
+    response = _get(monkeypatch, tmp_path, ok)
+    assert response.status_code == 200
+    assert response.content == b"ID3mp3"
+
+
+def test_unknown_key_is_404(monkeypatch, tmp_path):
+    monkeypatch.setattr(tts, "AUDIO_DIR", str(tmp_path))
+    key = "ab" * 32
+    with TestClient(app) as client:
+        assert client.get(tts.audio_url_for_key(key)).status_code == 404
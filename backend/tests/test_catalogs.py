@@ -0,0 +1,34 @@
+import os
+
+os.environ.setdefault("SESSION_BACKEND", "memory")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.services.catalogs import _accepts_gzip  # noqa: E402
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("gzip;q=0", False),
+    ("gzip; level=1; q=0", False),
+    ("gzip;q=abc", True),
+    ("br, gzip;q=0.5", True),
+    ("*;q=0, gzip", True),
+    ("gzip;q=0, *", False),
+    ("*", True),
+    ("identity", False),
+    ("", False),
+])
+def test_accepts_gzip(header, expected):
+    assert _accepts_gzip(header) is expected
+
+
+@pytest.mark.parametrize("path", ["/claim/guide?policy_type=crop", "/survey/questions"])
+def test_malformed_accept_encoding_is_not_an_error(path):
+    with TestClient(app) as client:
+        response = client.get(path, headers={"Accept-Encoding": "gzip;q=abc"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()
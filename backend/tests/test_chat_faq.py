@@ -0,0 +1,56 @@
+import os
+import uuid
+
+os.environ.setdefault("SESSION_BACKEND", "memory")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.services import llm  # noqa: E402
+from app.services.faq_cache import faq_cache  # noqa: E402
+
+QUESTION = "When will I get money for crop insurance claim?"
+
+
+def _ask(client, path: str):
+    body = {"session_id": uuid.uuid4().hex, "message": QUESTION, "language": "en", "tts": "off"}
+    response = client.post(path, json=body)
+    assert response.status_code == 200
+    return response
+
+
+def test_truncated_stream_is_not_cached(monkeypatch):
+    async def broken_stream(messages, outcome=None, **kwargs):
+        yield "Claims are usually paid "
+        raise ConnectionError("stream dropped")
+
+    monkeypatch.setattr(llm, "stream_groq", broken_stream)
+    faq_cache.clear()
+    with TestClient(app) as client:
+        text = _ask(client, "/chat/stream").text
+    assert "Claims are usually paid" in text
+    assert faq_cache.lookup(QUESTION, "en") is None
+
+
+def test_complete_stream_is_cached(monkeypatch):
+    async def stream(messages, outcome=None, **kwargs):
+        yield "Claims are usually paid within 2 months."
+        outcome.update(complete=True, fallback_model=None)
+
+    monkeypatch.setattr(llm, "stream_groq", stream)
+    faq_cache.clear()
+    with TestClient(app) as client:
+        _ask(client, "/chat/stream")
+    assert faq_cache.lookup(QUESTION, "en")["answer"] == "Claims are usually paid within 2 months."
+
+
+def test_fallback_model_answer_is_not_cached(monkeypatch):
+    async def completion(messages, **kwargs):
+        return {"choices": [{"message": {"content": "Within 2 months."}}], "fallback_model": "small"}
+
+    monkeypatch.setattr(llm, "GROQ_API_KEY", "test")
+    monkeypatch.setattr(llm, "call_groq_completion", completion)
+    faq_cache.clear()
+    with TestClient(app) as client:
+        assert _ask(client, "/chat").json()["response"] == "Within 2 months."
+    assert faq_cache.lookup(QUESTION, "en") is None
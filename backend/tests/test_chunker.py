@@ -0,0 +1,51 @@
+from app.services.chunker import chunk_pages, chunk_text, count_tokens
+
+PLAN = (
+    "{name} Plan. The Company shall pay the hospitalization expenses of the Insured Person up to "
+    "the sum insured of Rs {amount} per policy year, for inpatient treatment of at least twenty "
+    "four hours in a network hospital, subject to the terms, conditions and exclusions of this Policy. "
+    "A co-payment of {copay}% of every admissible claim is borne by the Insured Person. Pre and post "
+    "hospitalization expenses are covered for thirty and sixty days respectively. Day care procedures, "
+    "ambulance charges up to the limit in the Schedule and organ donor expenses are payable within the "
+    "sum insured. Claims must be notified to the Third Party Administrator within forty eight hours of "
+    "an emergency admission and documents submitted within fifteen days of discharge."
+)
+PLANS = [("Silver", "1,00,000", "20"), ("Gold", "5,00,000", "10"), ("Platinum", "10,00,000", "0")]
+
+
+def _plan_pages():
+    return [PLAN.format(name=name, amount=amount, copay=copay) for name, amount, copay in PLANS]
+
+
+def test_chunks_that_differ_only_in_amounts_are_kept():
+    result = chunk_pages(_plan_pages(), budget=200)
+    text = "\n".join(result["chunks"])
+    for _, amount, copay in PLANS:
+        assert f"Rs {amount}" in text
+        assert f"{copay}% of every" in text
+    assert result["stats"]["duplicate_chunks"] == 0
+
+
+def test_repeated_chunks_are_dropped():
+    pages = _plan_pages()
+    result = chunk_pages(pages + [pages[1]], budget=200)
+    assert "\n".join(result["chunks"]).count("Rs 5,00,000") == 1
+    assert result["stats"]["duplicate_tokens"] > 0
+
+
+def test_repeated_page_furniture_is_stripped():
+    pages = [f"ACME Health Insurance\nClause {i}. The insured must notify every claim to the Company in writing "
+             f"together with the claim form and the original bills within {i + 7} days.\nPage {i} of 8"
+             for i in range(1, 9)]
+    chunks = chunk_text("\f".join(pages), budget=500)
+    text = "\n".join(chunks)
+    assert text.count("ACME Health Insurance") == 1
+    assert "Page 3 of 8" not in text
+    assert all(f"within {i + 7} days" in text for i in range(1, 9))
+
+
+def test_chunks_respect_the_budget():
+    text = " ".join(f"Clause {i} covers damage caused by flood, fire and storm to the insured crop." for i in range(200))
+    chunks = chunk_text(text, budget=100)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 100 for chunk in chunks)
@@ -0,0 +1,41 @@
+import glob
+import json
+import os
+
+import pytest
+
+from app.services.exclusions import extract_exclusions
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fixtures", "exclusions")
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(FIXTURES, "*.txt"))), ids=os.path.basename)
+def test_fixture_policies(path):
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    with open(path[:-4] + ".expected.json", encoding="utf-8") as f:
+        assert extract_exclusions(text) == json.load(f)
+
+
+def test_section_ends_at_the_next_heading():
+    text = ("Exclusions:\n1. War or nuclear risk;\n2. Self-inflicted injury.\n\n"
+            "Claim procedure\n1. Intimate the claim within 7 days.\n")
+    assert extract_exclusions(text) == ["War or nuclear risk", "Self-inflicted injury"]
+
+
+def test_intro_line_is_dropped_and_duplicates_merge():
+    text = ("WHAT IS NOT COVERED?\r\nWe will not pay for the following:\r\n- Dental treatment\r\n"
+            "\r\nGeneral Exclusions\r\n• dental treatment.\r\n• Any treatment outside India\r\n")
+    assert extract_exclusions(text) == ["Dental treatment", "Any treatment outside India"]
+
+
+def test_paragraphs_without_bullets_and_no_heading_in_prose():
+    text = ("The exclusions listed below apply to every member.\n\n"
+            "अपवाद\nयुद्ध या परमाणु जोखिम से हुई मृत्यु।\n\nआत्महत्या के मामले।\n\nशर्तें\nप्रीमियम हर वर्ष देय है।\n")
+    assert extract_exclusions(text) == ["युद्ध या परमाणु जोखिम से हुई मृत्यु।", "आत्महत्या के मामले।"]
+
+
+def test_max_items_and_empty_text():
+    text = "Exclusions\n" + "".join(f"- Item number {chr(65 + i)}\n" for i in range(10))
+    assert len(extract_exclusions(text, max_items=3)) == 3
+    assert extract_exclusions("") == []
@@ -0,0 +1,21 @@
+import pytest
+
+from app.services.faq_cache import FAQCache
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("When will I get money for crop insurance claim", "When will I get money for health insurance claim"),
+    ("documents for crop insurance claim in Punjab", "documents for crop insurance claim in Bihar"),
+    ("documents for crop insurance claim in Punjab", "documents for crop insurance claim in Maharashtra"),
+])
+def test_swapped_noun_is_not_a_hit(stored, asked):
+    cache = FAQCache(pinned_path=None)
+    assert cache.add(stored, "en", "answer") is not None
+    assert cache.lookup(asked, "en") is None
+
+
+def test_paraphrase_is_a_hit():
+    cache = FAQCache(pinned_path=None)
+    cache.add("Documents for crop insurance claim in Punjab", "en", "answer")
+    hit = cache.lookup("what documents are needed for crop insurance claim in Punjab?", "en")
+    assert hit is not None and hit["answer"] == "answer"
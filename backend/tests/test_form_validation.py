@@ -0,0 +1,20 @@
+import json
+
+from app.services.form_validation import assist_one, bulk_ndjson
+
+RECORDS = [
+    {"name": "  Sunita   Devi ", "aadhaar": "2345 6789 0124", "address": "Village 12, Nashik",
+     "phone": "+91 98765 43210", "age": "45 yrs"},
+    {"name": "Ramesh", "aadhaar": "123", "address": "", "phone": "12345", "age": "130"},
+    {"name": "अमित", "aadhaar": None, "address": "गाँव", "phone": "09876543210", "age": "४५ वर्ष"},
+    {},
+]
+
+
+def test_bulk_rows_match_assist_one():
+    records = [(i + 1, record, None) for i, record in enumerate(RECORDS)] + [(9, None, "bad row")]
+    lines = bulk_ndjson(records).splitlines()
+    for line, record in zip(lines, RECORDS):
+        row = json.loads(line)
+        assert row.pop("row") and row == assist_one(record)
+    assert json.loads(lines[-1]) == {"row": 9, "error": "bad row"}
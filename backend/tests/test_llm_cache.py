@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_cache import CompletionCache, completion_key
+
+MESSAGES = [{"role": "user", "content": "PMFBY claim kaise karein?"}]
+
+
+def _upstream(calls, delay=0.01, fail=False):
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError("upstream down")
+        return {"choices": [{"message": {"content": f"answer {len(calls)}"}}],
+                "usage": {"prompt_tokens": 12, "completion_tokens": 30}}
+
+    return call
+
+
+def test_key_covers_every_request_parameter():
+    base = completion_key("llama", MESSAGES, 0.0, 256)
+    assert base == completion_key("llama", [dict(m) for m in MESSAGES], 0.0, 256)
+    assert base != completion_key("llama", MESSAGES, 0.7, 256)
+    assert base != completion_key("llama", MESSAGES, 0.0, 256, {"type": "json_object"})
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    cache = CompletionCache()
+    calls = []
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_call("k", _upstream(calls), store=False) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1 and all(r is results[0] for r in results)
+    assert cache.stats["coalesced"] == 4
+    assert cache.stats["saved_completion_tokens"] == 4 * 30
+    # store=False: the next call goes upstream again
+    asyncio.run(cache.get_or_call("k", _upstream(calls), store=False))
+    assert len(calls) == 2
+
+
+def test_stored_answers_expire():
+    cache = CompletionCache(ttl=0.05)
+    calls = []
+
+    async def scenario():
+        first = await cache.get_or_call("k", _upstream(calls, delay=0), store=True)
+        assert await cache.get_or_call("k", _upstream(calls, delay=0), store=True) is first
+        await asyncio.sleep(0.06)
+        await cache.get_or_call("k", _upstream(calls, delay=0), store=True)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2 and cache.stats["cache_hits"] == 1
+
+
+def test_store_predicate_and_failures_are_not_cached():
+    cache = CompletionCache()
+    calls = []
+    asyncio.run(cache.get_or_call("k", _upstream(calls), store=lambda data: False))
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_or_call("bad", _upstream(calls, fail=True), store=True))
+    assert cache.info()["entries"] == 0 and cache.info()["in_flight"] == 0
+
+
+def test_lru_is_bounded_by_bytes():
+    cache = CompletionCache(max_bytes=300)
+    calls = []
+    for key in ("a", "b", "c"):
+        asyncio.run(cache.get_or_call(key, _upstream(calls, delay=0), store=True))
+    info = cache.info()
+    assert info["bytes"] <= 300 and info["entries"] < 3
+    assert info["evictions"] == 3 - info["entries"]
+    # the most recent answer survives
+    asyncio.run(cache.get_or_call("c", _upstream(calls, delay=0), store=True))
+    assert len(calls) == 3
@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+from app.services import policy_jobs
+from app.services.policy_jobs import JobStore
+
+
+def _spool(tmp_path) -> str:
+    path = tmp_path / "upload.pdf"
+    path.write_bytes(b"%PDF-1.4 test")
+    return str(path)
+
+
+def test_cancelled_job_keeps_upload_and_resumes(tmp_path, monkeypatch):
+    async def scenario():
+        store = JobStore(str(tmp_path / "jobs.sqlite3"))
+        spool_path = _spool(tmp_path)
+        job_id, created = await store.create("pdfhash", spool_path)
+        assert created
+
+        started = asyncio.Event()
+
+        async def stuck(run, path):
+            started.set()
+            await asyncio.Event().wait()
+
+        # first attempt: the worker is cancelled mid-job (e.g. shutdown)
+        monkeypatch.setattr(policy_jobs, "_process", stuck)
+        job, claimed_path = await store.claim()
+        task = asyncio.create_task(policy_jobs._run_job(store, job, claimed_path))
+        await started.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert (await store.get(job_id))["status"] == "queued"
+        assert os.path.exists(spool_path)
+
+        # second attempt (after restart) still has the upload and finishes
+        seen = []
+
+        async def finish(run, path):
+            seen.append(os.path.exists(path))
+            await run.publish(summary="ok")
+
+        monkeypatch.setattr(policy_jobs, "_process", finish)
+        job, claimed_path = await store.claim()
+        assert claimed_path == spool_path
+        await policy_jobs._run_job(store, job, claimed_path)
+        job = await store.get(job_id)
+        assert seen == [True]
+        assert job["status"] == "done" and job["result"]["summary"] == "ok"
+        assert not os.path.exists(spool_path)
+
+    asyncio.run(scenario())
+
+
+def test_failed_job_removes_upload(tmp_path, monkeypatch):
+    async def scenario():
+        store = JobStore(str(tmp_path / "jobs.sqlite3"))
+        spool_path = _spool(tmp_path)
+        job_id, _ = await store.create("pdfhash", spool_path)
+
+        async def broken(run, path):
+            raise policy_jobs.JobError(400, "Could not extract text from PDF.")
+
+        monkeypatch.setattr(policy_jobs, "_process", broken)
+        job, claimed_path = await store.claim()
+        await policy_jobs._run_job(store, job, claimed_path)
+        assert (await store.get(job_id))["status"] == "failed"
+        assert not os.path.exists(spool_path)
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+import os
+
+os.environ.setdefault("SESSION_BACKEND", "memory")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.routes import policy  # noqa: E402
+
+RESULT = {"policy_id": "abc", "summary": "Covers crop loss.", "explanation": "Pays if crops fail.",
+          "tts_audio_url": None}
+
+
+def _simplify(monkeypatch, later):
+    async def submit(pdf):
+        return "job1"
+
+    answers = [{"status": "done", "result": dict(RESULT)}, later]
+
+    async def wait_finished(job_id, result_key=None):
+        return answers.pop(0)
+
+    monkeypatch.setattr(policy, "_submit", submit)
+    monkeypatch.setattr(policy.policy_jobs, "wait_finished", wait_finished)
+    with TestClient(app) as client:
+        return client.post("/policy/simplify?tts=off", files={"pdf": ("p.pdf", b"%PDF-1.4", "application/pdf")})
+
+
+def test_purged_job_while_waiting_for_exclusions_still_answers(monkeypatch):
+    response = _simplify(monkeypatch, None)
+    assert response.status_code == 200
+    assert response.json()["summary"] == "Covers crop loss."
+    assert response.json()["exclusions"] == []
+
+
+def test_exclusions_are_picked_up_when_they_land(monkeypatch):
+    response = _simplify(monkeypatch, {"status": "done", "result": {**RESULT, "exclusions": ["war"]}})
+    assert response.json()["exclusions"] == ["war"]
@@ -0,0 +1,34 @@
+import json
+import os
+
+import pytest
+
+os.environ.setdefault("SESSION_BACKEND", "memory")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.services.recommender import engine, parse_household  # noqa: E402
+
+
+@pytest.mark.parametrize("income, family_size", [("inf", 4), ("1e30", 4), ("-5", 4), (20000, 1e9), (20000, "-inf")])
+def test_out_of_range_row_is_a_row_error(income, family_size):
+    household, error = parse_household({"occupation": "farmer", "income": income, "family_size": family_size})
+    assert household is None and error
+
+
+def test_bulk_keeps_going_past_bad_rows():
+    records = [(1, {"occupation": "farmer", "income": "inf", "family_size": 4}, None),
+               (2, {"occupation": "farmer", "income": "1e30", "family_size": 4}, None),
+               (3, {"occupation": "farmer", "income": 12000, "family_size": 5}, None)]
+    rows = [json.loads(line) for line in engine.bulk_ndjson(records).splitlines()]
+    assert [row["row"] for row in rows] == [1, 2, 3]
+    assert "error" in rows[0] and "error" in rows[1]
+    assert rows[2]["plans"]
+
+
+def test_huge_income_is_422():
+    with TestClient(app) as client:
+        response = client.post("/recommend?enhance=false",
+                               json={"occupation": "farmer", "income": 10 ** 30, "family_size": 4})
+    assert response.status_code == 422
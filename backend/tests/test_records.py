@@ -0,0 +1,75 @@
+import asyncio
+import csv
+import io
+
+import pytest
+
+from app.utils.records import iter_record_batches
+
+
+class Upload:
+    """UploadFile stand-in that returns at most `step` bytes per read, like a slow network."""
+
+    def __init__(self, data: bytes, step: int):
+        self.data = data
+        self.step = step
+        self.pos = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        chunk = self.data[self.pos:self.pos + self.step]
+        self.pos += len(chunk)
+        return chunk
+
+
+def _records(data: bytes, step: int, fmt: str = "csv"):
+    async def scenario():
+        return [r async for batch in iter_record_batches(Upload(data, step), fmt, batch_size=2) for r in batch]
+
+    return asyncio.run(scenario())
+
+
+def _csv(rows) -> bytes:
+    out = io.StringIO()
+    csv.writer(out).writerows(rows)
+    return out.getvalue().encode("utf-8")
+
+
+@pytest.mark.parametrize("step", [1, 5, 64, 1 << 20])
+def test_quoted_newlines_survive_any_chunking(step):
+    rows = [["name", "address", "age"],
+            ["Asha", "House 12,\nGandhi Nagar\nNashik", "45"],
+            ["Ravi", "Plot 4\r\nWard 2", "38"],
+            ["सीता", "गाँव \"रामपुर\"\nज़िला नासिक", "52"]]
+    records = _records(_csv(rows), step)
+    assert [r[0] for r in records] == [1, 2, 3]
+    assert [r[1]["address"] for r in records] == [row[1] for row in rows[1:]]
+    assert all(r[2] is None for r in records)
+
+
+def test_bom_blank_lines_and_column_count():
+    data = "\ufeffName,Age\r\nAsha,45\r\n\r\nRavi\r\n".encode("utf-8")
+    assert _records(data, 3) == [(1, {"name": "Asha", "age": "45"}, None),
+                                 (2, None, "expected 2 columns, got 1")]
+
+
+def test_unclosed_quote_runs_to_end_of_file():
+    data = b'name,address\nAsha,"House 12\nRavi,Ward 2\n'
+    records = _records(data, 4)
+    assert len(records) == 1
+    assert records[0][1]["address"] == "House 12\nRavi,Ward 2\n"
+
+
+def test_unclosed_quote_is_capped(monkeypatch):
+    from app.utils import records as module
+    monkeypatch.setattr(module, "MAX_OPEN_RECORD_CHARS", 20)
+    data = b'name,address\nAsha,"House 12\n' + b"more text\n" * 10 + b"Ravi,Ward 2"
+    records = _records(data, 8)
+    assert records[0] == (1, None, "unterminated quoted field")
+
+
+def test_jsonl_rows_and_errors():
+    data = b'{"name": "Asha"}\n\nnot json\n[1]\n'
+    records = _records(data, 7, "jsonl")
+    assert records[0] == (1, {"name": "Asha"}, None)
+    assert records[1][2].startswith("invalid JSON")
+    assert records[2] == (3, None, "each line must be a JSON object")
@@ -0,0 +1,113 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import resilience
+from app.services.resilience import CircuitBreaker, DeadlineExceeded, UpstreamPolicy, classify, deadline
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(resilience, "HEDGE_ENABLED", False)
+
+
+def _status(code: int, retry_after: str = "") -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://api.groq.test/v1/chat/completions")
+    headers = {"retry-after": retry_after} if retry_after else {}
+    return httpx.HTTPStatusError("upstream", request=request, response=httpx.Response(code, headers=headers,
+                                                                                         request=request))
+
+
+def _op(outcomes, calls):
+    """op(model, timeout) that raises or returns the next scripted outcome for its model."""
+    async def op(model, timeout):
+        calls.append(model)
+        outcome = outcomes[model].pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if isinstance(outcome, float):
+            await asyncio.sleep(outcome)
+            return f"{model} after {outcome}"
+        return outcome
+
+    return op
+
+
+def test_classify():
+    assert classify(_status(503, "7")) == (True, 503, 7.0)
+    assert classify(_status(400)) == (False, 400, None)
+    assert classify(httpx.ReadTimeout("slow"))[0] is True
+    assert classify(ValueError("bad json")) == (False, None, None)
+
+
+def test_retryable_failure_is_retried_on_the_same_model():
+    policy = UpstreamPolicy("llm", ["big", "small"])
+    calls = []
+    result = asyncio.run(policy.call(_op({"big": [_status(503), "ok"]}, calls)))
+    assert result == "ok" and calls == ["big", "big"]
+    assert policy.stats["retries"] == 1
+
+
+def test_rate_limit_falls_back_to_the_next_model_at_once():
+    policy = UpstreamPolicy("llm", ["big", "small"])
+    calls = []
+    result = asyncio.run(policy.call(_op({"big": [_status(429)], "small": ["ok"]}, calls)))
+    assert result == "ok" and calls == ["big", "small"]
+    assert policy.stats["fallbacks"] == 1
+
+
+def test_client_errors_are_not_retried():
+    policy = UpstreamPolicy("llm", ["big", "small"])
+    calls = []
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(policy.call(_op({"big": [_status(400)]}, calls)))
+    assert calls == ["big"]
+    assert policy.breaker("big").state == "closed"
+
+
+def test_deadline_bounds_the_whole_call():
+    policy = UpstreamPolicy("llm", ["big"])
+
+    async def scenario():
+        with deadline(0.05):
+            return await policy.call(_op({"big": [5.0, 5.0, 5.0]}, []), timeout=30)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+    assert policy.stats["deadline_exceeded"] == 1
+
+
+def test_slow_attempt_is_hedged(monkeypatch):
+    monkeypatch.setattr(resilience, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(resilience, "HEDGE_DEFAULT_DELAY", 0.02)
+    monkeypatch.setattr(resilience, "HEDGE_MIN_DELAY", 0.01)
+    policy = UpstreamPolicy("llm", ["big"])
+    result = asyncio.run(policy.call(_op({"big": [2.0, 0.0]}, []), timeout=5))
+    assert result == "big after 0.0"
+    assert policy.stats["hedges"] == 1 and policy.stats["hedge_wins"] == 1
+
+
+def test_breaker_opens_on_a_429_burst_then_lets_one_probe_through(monkeypatch):
+    monkeypatch.setattr(resilience, "BREAKER_OPEN_SECONDS", 0.0)
+    breaker = CircuitBreaker("llm:big")
+    for _ in range(resilience.BREAKER_429_BURST):
+        breaker.record_failure(429)
+    assert breaker.state == "open" and breaker.opened == 1
+    # open time elapsed: one probe, everyone else waits for its outcome
+    assert breaker.allow() is True and breaker.state == "half_open"
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() is True
+
+
+def test_open_breaker_short_circuits_to_the_fallback():
+    policy = UpstreamPolicy("llm", ["big", "small"])
+    for _ in range(resilience.BREAKER_429_BURST):
+        policy.breaker("big").record_failure(429, retry_after=60)
+    calls = []
+    assert asyncio.run(policy.call(_op({"small": ["ok"]}, calls))) == "ok"
+    assert calls == ["small"]
+    assert policy.stats["short_circuited"] == 1
+    assert policy.info()["per_model"]["big"]["breaker"]["open_for_s"] >= 59
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from app.services import retrieval
+from app.services.retrieval import BM25Index, split_passages, tokenize
+
+PAGES = [
+    "Pre-existing diseases are covered after a waiting period of 48 months.\n\n"
+    "Room rent charges are limited to 1% of the sum insured per day.",
+    "Claims must be intimated within 7 days of discharge.\n\n"
+    "The policy does not cover cosmetic surgery or expenses for dental treatment.",
+    "बीमा राशि का भुगतान दावा स्वीकृत होने के 30 दिनों के भीतर किया जाएगा।",
+]
+
+
+@pytest.mark.parametrize("singular, plural", [
+    ("disease", "diseases"), ("expense", "expenses"), ("charge", "charges"),
+    ("policy", "policies"), ("loss", "losses"), ("claim", "claims"),
+])
+def test_singular_and_plural_share_a_term(singular, plural):
+    assert tokenize(singular) == tokenize(plural)
+
+
+def test_words_ending_in_s_are_not_clipped():
+    assert tokenize("bonus basis loss") == ["bonus", "basis", "loss"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Is my heart disease covered?", "Pre-existing diseases"),
+    ("dental expense", "dental treatment"),
+    ("room rent charge limit", "Room rent charges"),
+    ("दावा भुगतान कब होगा", "बीमा राशि"),
+])
+def test_search_finds_the_passage(query, expected):
+    index = BM25Index.build(split_passages(PAGES, max_chars=120))
+    hits = index.search(query, k=1)
+    assert hits and expected in hits[0]["text"]
+
+
+def test_index_round_trips_through_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval, "INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(retrieval, "_loaded", retrieval.OrderedDict())
+    policy_id = "ab" * 32
+
+    async def scenario():
+        await retrieval.build_policy_index(policy_id, PAGES)
+        retrieval._loaded.clear()
+        return await retrieval.retrieve(policy_id, "claim intimation days")
+
+    hits = asyncio.run(scenario())
+    assert retrieval.has_policy_index(policy_id)
+    assert hits[0]["page"] == 2
+    assert asyncio.run(retrieval.retrieve("cd" * 32, "claim")) is None
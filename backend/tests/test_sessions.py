@@ -0,0 +1,105 @@
+import asyncio
+
+from app.services import sessions
+from app.services.sessions import MemoryBackend, SessionStore
+
+
+def test_overlapping_appends_compact_once(monkeypatch):
+    calls = []
+
+    async def fake_completion(messages, **kwargs):
+        calls.append(messages)
+        await asyncio.sleep(0.01)
+        return {"choices": [{"message": {"content": f"summary {len(calls)}"}}]}
+
+    monkeypatch.setattr(sessions, "call_groq_completion", fake_completion)
+
+    async def scenario():
+        # room for two exchanges of this size
+        store = SessionStore(MemoryBackend(), history_tokens=60)
+        session = await store.get("s1")
+        for i in range(2):
+            await store.append(session, f"question {i} " + "x" * 40, f"answer {i} " + "y" * 40)
+        await asyncio.gather(
+            store.append(session, "question A " + "x" * 40, "answer A " + "y" * 40),
+            store.append(session, "question B " + "x" * 40, "answer B " + "y" * 40),
+        )
+        # let the background compaction(s) finish
+        await asyncio.sleep(0.1)
+        return session
+
+    session = asyncio.run(scenario())
+    contents = [turn["content"] for turn in session.turns]
+    # newer exchanges are never dropped without being summarized
+    assert any(c.startswith("question B") for c in contents)
+    assert any(c.startswith("answer B") for c in contents)
+    assert session.summary
+    assert len(calls) == 1
+    assert not session.compacting
+
+
+def _fill(store, session, n):
+    async def run():
+        for i in range(n):
+            await store.append(session, f"question {i} " + "x" * 40, f"answer {i} " + "y" * 40)
+    return run()
+
+
+def test_failed_summary_keeps_turns_and_retries(monkeypatch):
+    calls = []
+
+    async def flaky_completion(messages, **kwargs):
+        calls.append(messages)
+        if len(calls) == 1:
+            raise ConnectionError("upstream down")
+        return {"choices": [{"message": {"content": "summary"}}]}
+
+    monkeypatch.setattr(sessions, "call_groq_completion", flaky_completion)
+
+    async def scenario():
+        store = SessionStore(MemoryBackend(), history_tokens=60)
+        session = await store.get("s1")
+        await _fill(store, session, 3)
+        await asyncio.sleep(0.05)
+        # the summary failed: nothing was folded away
+        assert [t["content"][:10] for t in session.turns[::2]] == ["question 0", "question 1", "question 2"]
+        assert not session.summary
+        await store.append(session, "question 3 " + "x" * 40, "answer 3 " + "y" * 40)
+        await asyncio.sleep(0.05)
+        return session
+
+    session = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert session.summary == "summary"
+    # the retry folded the turns the failed attempt left behind
+    assert "question 0" in calls[1][1]["content"]
+    assert not any(t["content"].startswith("question 0") for t in session.turns)
+
+
+def test_lru_skips_compacting_sessions_and_keeps_byte_count(monkeypatch):
+    release = None
+
+    async def slow_completion(messages, **kwargs):
+        await release.wait()
+        return {"choices": [{"message": {"content": "summary"}}]}
+
+    monkeypatch.setattr(sessions, "call_groq_completion", slow_completion)
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        store = SessionStore(MemoryBackend(), max_active=1, history_tokens=60)
+        session = await store.get("s1")
+        await _fill(store, session, 3)
+        assert session.compacting
+        await store.get("s2")
+        # over capacity until the compaction lands, rather than losing its summary
+        assert list(store._sessions) == ["s1", "s2"]
+        release.set()
+        await asyncio.sleep(0.05)
+        await store.get("s3")
+        return store
+
+    store = asyncio.run(scenario())
+    assert store.stats()["active_sessions"] == 1
+    assert store.stats()["memory_bytes"] == sum(s.size_bytes() for s in store._sessions.values())
@@ -0,0 +1,57 @@
+import pytest
+
+from app.services.tts_engines import (
+    TTSEngineError, StubEngine, concat_mp3, mp3_duration, mp3_frames, split_text,
+)
+
+SILENT_32K = b"\xff\xfb\x18\xc0" + bytes(140)   # MPEG-1, 32 kbps, 32 kHz, mono: 144 bytes
+FRAME_44K = b"\xff\xfb\x90\xc0" + bytes(413)    # MPEG-1, 128 kbps, 44.1 kHz, mono: 417 bytes
+
+
+def test_short_sentences_stay_one_chunk():
+    assert split_text("Your claim is approved.  Money arrives in 7 days!", 100) == [
+        "Your claim is approved. Money arrives in 7 days!"]
+
+
+def test_chunks_end_on_sentences_then_clauses_then_words():
+    text = ("आपका दावा स्वीकार हो गया है। राशि सात दिनों में आएगी। "
+            "Bring your Aadhaar card, the bank passbook, and the land record; the officer will verify them.")
+    chunks = split_text(text, 40)
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    assert chunks[0] == "आपका दावा स्वीकार हो गया है।"
+    assert "Bring your Aadhaar card," in chunks
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_overlong_word_is_hard_cut():
+    assert split_text("see https://pmfby.gov.in/claim-status now", 12) == [
+        "see", "https://pmfb", "y.gov.in/cla", "im-status", "now"]
+
+
+def test_stub_output_has_tag_and_info_header_but_they_are_not_audio():
+    data = StubEngine(latency=0).synthesize("Namaste", "hi")
+    frames = list(mp3_frames(data))
+    assert data.startswith(b"ID3")
+    assert all(frame == SILENT_32K and rate == 32000 for frame, rate in frames)
+
+
+def test_concat_keeps_only_audio_frames():
+    engine = StubEngine(latency=0)
+    parts = [engine.synthesize("Your claim is approved.", "en"), engine.synthesize("Thank you.", "en")]
+    joined = concat_mp3(parts)
+    assert joined == b"".join(frame for part in parts for frame, _ in mp3_frames(part))
+    assert mp3_duration(joined) == pytest.approx(mp3_duration(parts[0]) + mp3_duration(parts[1]))
+
+
+def test_junk_trailing_tag_and_torn_frame_are_skipped():
+    data = b"junk" + SILENT_32K + b"\x00\xff\x00" + SILENT_32K + SILENT_32K[:50]
+    assert [frame for frame, _ in mp3_frames(data)] == [SILENT_32K, SILENT_32K]
+    tagged = SILENT_32K * 2 + b"TAG" + bytes(125)
+    assert len(list(mp3_frames(tagged))) == 2
+
+
+def test_concat_rejects_mixed_sample_rates_and_empty_output():
+    with pytest.raises(TTSEngineError, match="44100 Hz, expected 32000 Hz"):
+        concat_mp3([SILENT_32K, FRAME_44K])
+    with pytest.raises(TTSEngineError):
+        concat_mp3([b"ID3\x04\x00\x00\x00\x00\x00\x00", b""])